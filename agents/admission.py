@@ -0,0 +1,609 @@
+"""
+Admission control for model and tool calls: per-provider rate limits, priority classes and bounded queueing.
+
+Every agent, team and workflow of the process shares the OpenAI and Anthropic keys. Without coordination, a burst
+(three researchers of the Research Workflow next to interactive chats) runs into the provider's rate limits, and
+the SDK retries of the 429 responses add to the load. `install_admission()` puts every model call of the process
+behind the limiter of its provider:
+- Two token buckets per provider, for requests and for tokens per minute, each holding up to a minute of budget like
+  the provider's own limits, less `BURST_HEADROOM`. A call takes its estimated input tokens when admitted. Its
+  actual input and output tokens are settled once it has finished. The prefix `CachedClaude` reads from Anthropic's
+  prompt cache is not charged, as cache reads do not count towards Anthropic's input token limit.
+- Calls wait in a queue, by priority class and in arrival order within a class: interactive runs of agents and teams
+  first, then workflow runs, then background jobs (memory updates and consolidation, see `admission_priority`).
+- A call that would wait more than `ADMISSION_MAX_WAIT` seconds fails at once with a 429 `AdmissionTimeout`
+  instead of queueing without bound. Background jobs wait as long as needed.
+- A 429 from the provider takes `RATE_LIMIT_BACKOFF_SECONDS` of budget from the request bucket, so the other calls
+  hold back instead of retrying too.
+- With `ADMISSION_SHARED`, the buckets are rows of `demo_db` that every worker and job takes from, so the limits
+  hold across processes. The queue order is kept per process. Without it every process has the full limits, so
+  `app/serve.py` refuses to start several workers with limits configured but not shared.
+
+Nothing is limited until `ADMISSION_LIMITS` is set to the limits of the organization's usage tier.
+
+Tool calls take from the `tool:<function name>` limiter when one is configured.
+
+    ADMISSION_ENABLED       Set to false to call the providers directly (default true)
+    ADMISSION_LIMITS        Limits per provider or tool (default: none)
+                            e.g. "openai:rpm=500,tpm=200000;anthropic:rpm=50,tpm=30000;tool:parallel_search:rpm=60"
+    ADMISSION_MAX_WAIT      Seconds an interactive or workflow call may wait (default 60)
+    ADMISSION_SHARED        Share the buckets between processes through Postgres (default false)
+
+Usage:
+    python -m agents.admission --benchmark
+    python -m agents.admission --benchmark --shared --rpm 300
+"""
+
+import asyncio
+import heapq
+import inspect
+import itertools
+import json
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import asdict, dataclass
+from functools import wraps
+from os import getenv
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+from agno.exceptions import ModelProviderError, ModelRateLimitError
+from agno.utils.log import log_info
+from sqlalchemy import Column, DateTime, Float, MetaData, String, Table, text
+from sqlalchemy.engine import Engine
+
+from agents.prompt_cache import split_system_message
+from workflows.compression import estimate_tokens
+
+ADMISSION_ENABLED = getenv("ADMISSION_ENABLED", "true").lower() in ("1", "true", "yes")
+ADMISSION_LIMITS = getenv("ADMISSION_LIMITS", "")
+ADMISSION_MAX_WAIT = float(getenv("ADMISSION_MAX_WAIT", "60"))
+ADMISSION_SHARED = getenv("ADMISSION_SHARED", "false").lower() in ("1", "true", "yes")
+
+# Buckets hold a minute of their rate, as the provider's limits do: a burst within the limits goes through at once
+BURST_SECONDS = 60.0
+# Share of the burst held back: the provider's bucket starts refilling only once the requests reach it
+BURST_HEADROOM = 0.05
+# Budget a 429 from the provider takes from the request bucket
+RATE_LIMIT_BACKOFF_SECONDS = 10.0
+
+PRIORITIES = {"interactive": 0, "workflow": 1, "background": 2}
+admission_priority: ContextVar[str] = ContextVar("admission_priority", default="interactive")
+
+
+@contextmanager
+def priority(name: str) -> Iterator[None]:
+    """Admit the calls made in this context, and in the tasks it starts, with the priority class `name`."""
+    token = admission_priority.set(name)
+    try:
+        yield
+    finally:
+        admission_priority.reset(token)
+
+
+class AdmissionTimeout(ModelRateLimitError):
+    """The call would have waited longer than allowed for its provider's rate limits."""
+
+
+def check_workers(workers: int) -> None:
+    """Refuse per-process buckets for several worker processes, as each would allow the full limits."""
+    if workers > 1 and ADMISSION_ENABLED and not ADMISSION_SHARED and parse_limits(ADMISSION_LIMITS):
+        raise RuntimeError(
+            f"ADMISSION_LIMITS hold per process, {workers} workers would allow {workers} times the limits. "
+            "Set ADMISSION_SHARED=true to share them through Postgres, or run a single worker."
+        )
+
+
+def parse_limits(spec: str) -> Dict[str, Dict[str, float]]:
+    """Parse "openai:rpm=500,tpm=200000;tool:search:rpm=60" into {"openai": {"rpm": 500, "tpm": 200000}, ...}."""
+    limits: Dict[str, Dict[str, float]] = {}
+    for entry in filter(None, (part.strip() for part in spec.split(";"))):
+        key, _, values = entry.rpartition(":")
+        limits[key.strip().lower()] = {
+            name.strip(): float(value) for name, value in (item.split("=") for item in values.split(",") if item)
+        }
+    return limits
+
+
+# ============================================================================
+# Token buckets
+# ============================================================================
+class TokenBucket:
+    """
+    Refills `per_minute` units a minute, up to `BURST_SECONDS` of them less `BURST_HEADROOM`.
+
+    `take` always succeeds and may leave the bucket in debt. It returns the seconds until the debt is paid off, which
+    the caller waits before going ahead, so the calls are spaced out at the rate of the bucket.
+    """
+
+    def __init__(self, name: str, per_minute: float):
+        self.name = name
+        self.rate = per_minute / 60.0
+        self.capacity = max(self.rate * BURST_SECONDS * (1 - BURST_HEADROOM), 1.0)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def take(self, cost: float) -> float:
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate) - cost
+            self._updated = now
+            return max(-self._tokens / self.rate, 0.0)
+
+    async def atake(self, cost: float) -> float:
+        return self.take(cost)
+
+    def drain(self, seconds: float = RATE_LIMIT_BACKOFF_SECONDS) -> None:
+        """Spend `seconds` of budget, e.g. after the provider answered 429."""
+        self.take(self.rate * seconds)
+
+
+class PostgresTokenBucket(TokenBucket):
+    """`TokenBucket` kept in a row of `table`, refilled and taken from in one statement by every process."""
+
+    def __init__(self, name: str, per_minute: float, engine: Engine, table: Table):
+        super().__init__(name, per_minute)
+        self.engine = engine
+        self.table = table
+
+    def take(self, cost: float) -> float:
+        table = f"{self.table.schema}.{self.table.name}"
+        statement = text(
+            f"INSERT INTO {table} (name, tokens, updated_at) VALUES (:name, :capacity - :cost, clock_timestamp()) "
+            f"ON CONFLICT (name) DO UPDATE SET tokens = LEAST(:capacity, {self.table.name}.tokens + :rate * "
+            f"EXTRACT(EPOCH FROM clock_timestamp() - {self.table.name}.updated_at)) - :cost, "
+            f"updated_at = clock_timestamp() RETURNING tokens"
+        )
+        with self.engine.begin() as conn:
+            tokens = conn.execute(
+                statement, {"name": self.name, "capacity": self.capacity, "rate": self.rate, "cost": cost}
+            ).scalar_one()
+        return max(-tokens / self.rate, 0.0)
+
+    async def atake(self, cost: float) -> float:
+        return await asyncio.to_thread(self.take, cost)
+
+
+def bucket_table(schema: str) -> Table:
+    return Table(
+        "admission_buckets",
+        MetaData(schema=schema),
+        Column("name", String, primary_key=True),
+        Column("tokens", Float, nullable=False),
+        Column("updated_at", DateTime(timezone=True), nullable=False),
+    )
+
+
+# ============================================================================
+# Limiters
+# ============================================================================
+@dataclass
+class AdmissionStats:
+    admitted: int = 0
+    rejected: int = 0
+    rate_limited: int = 0
+    queued: int = 0
+    wait_seconds: float = 0.0
+    max_wait_seconds: float = 0.0
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            **asdict(self),
+            "avg_wait_seconds": round(self.wait_seconds / self.admitted, 4) if self.admitted else 0.0,
+        }
+
+
+class Limiter:
+    """
+    Admits the calls of one provider or tool within its rate limits, one at a time and in priority order.
+
+    The call at the head of the queue takes from the buckets and waits for their debt before letting the next one
+    take, so later calls of a higher priority go ahead of everything still queued.
+
+    Args:
+        name (str): Provider or "tool:<function name>".
+        requests_per_minute (float): Request limit, 0 for none.
+        tokens_per_minute (float): Input and output token limit, 0 for none.
+        bucket (Callable[[str, float], TokenBucket]): Creates the bucket of a name and rate.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        requests_per_minute: float = 0,
+        tokens_per_minute: float = 0,
+        bucket: Callable[[str, float], TokenBucket] = TokenBucket,
+    ):
+        self.name = name
+        self.requests = bucket(f"{name}:requests", requests_per_minute) if requests_per_minute else None
+        self.tokens = bucket(f"{name}:tokens", tokens_per_minute) if tokens_per_minute else None
+        self.stats = AdmissionStats()
+        self._queue: List[Tuple[int, int, "asyncio.Future[None]"]] = []
+        self._sequence = itertools.count()
+        self._busy = False
+
+    async def acquire(self, tokens: float, max_wait: Optional[float]) -> None:
+        """Wait for the turn and the budget of a call of `tokens` estimated input tokens."""
+        started = time.monotonic()
+        if self._busy:
+            turn: "asyncio.Future[None]" = asyncio.get_running_loop().create_future()
+            heapq.heappush(self._queue, (PRIORITIES.get(admission_priority.get(), 0), next(self._sequence), turn))
+            self.stats.queued += 1
+            try:
+                await asyncio.wait_for(asyncio.shield(turn), timeout=max_wait)
+            except BaseException as e:
+                # Timed out or cancelled while its turn was being handed over: pass the turn on
+                if turn.done() and not turn.cancelled():
+                    self._release()
+                turn.cancel()
+                if isinstance(e, asyncio.TimeoutError):
+                    self.stats.rejected += 1
+                    raise AdmissionTimeout(f"{self.name}: no capacity within {max_wait:.0f}s") from None
+                raise
+            finally:
+                self.stats.queued -= 1
+        else:
+            self._busy = True
+
+        try:
+            delay = max(
+                await self.requests.atake(1) if self.requests else 0.0,
+                await self.tokens.atake(tokens) if self.tokens else 0.0,
+            )
+            waited = time.monotonic() - started + delay
+            if max_wait is not None and waited > max_wait:
+                self.refund(tokens)
+                self.stats.rejected += 1
+                raise AdmissionTimeout(f"{self.name}: no capacity within {max_wait:.0f}s")
+            if delay > 0:
+                await asyncio.sleep(delay)
+            self._admitted(waited)
+        finally:
+            self._release()
+
+    def acquire_sync(self, tokens: float, max_wait: Optional[float]) -> None:
+        """`acquire` for calls made outside the event loop, without a queue: they only wait for the budget."""
+        delay = max(self.requests.take(1) if self.requests else 0.0, self.tokens.take(tokens) if self.tokens else 0.0)
+        if max_wait is not None and delay > max_wait:
+            self.refund(tokens)
+            self.stats.rejected += 1
+            raise AdmissionTimeout(f"{self.name}: no capacity within {max_wait:.0f}s")
+        if delay > 0:
+            time.sleep(delay)
+        self._admitted(delay)
+
+    def settle(self, estimated: float, actual: float) -> None:
+        """Take or give back the difference between the estimated and the actual tokens of a finished call."""
+        if self.tokens is not None and actual:
+            self.tokens.take(actual - estimated)
+
+    def refund(self, tokens: float) -> None:
+        if self.requests is not None:
+            self.requests.take(-1)
+        if self.tokens is not None:
+            self.tokens.take(-tokens)
+
+    def rate_limited(self) -> None:
+        self.stats.rate_limited += 1
+        if self.requests is not None:
+            self.requests.drain()
+
+    def _admitted(self, waited: float) -> None:
+        self.stats.admitted += 1
+        self.stats.wait_seconds += waited
+        self.stats.max_wait_seconds = max(self.stats.max_wait_seconds, waited)
+
+    def _release(self) -> None:
+        while self._queue:
+            _, _, turn = heapq.heappop(self._queue)
+            if not turn.done():
+                turn.set_result(None)
+                return
+        self._busy = False
+
+
+class Admission:
+    """
+    The limiters of the process, by provider and tool.
+
+    Args:
+        limits (Dict[str, Dict[str, float]]): "rpm" and "tpm" by provider or "tool:<function name>".
+        max_wait (Optional[float]): Seconds an interactive or workflow call may wait.
+        engine (Optional[Engine]): Keep the buckets in this database, shared by every process.
+        schema (str): Schema of the bucket table.
+    """
+
+    def __init__(
+        self,
+        limits: Dict[str, Dict[str, float]],
+        max_wait: Optional[float] = 60.0,
+        engine: Optional[Engine] = None,
+        schema: str = "ai",
+    ):
+        self.max_wait = max_wait
+        bucket: Callable[[str, float], TokenBucket] = TokenBucket
+        if engine is not None:
+            table = bucket_table(schema)
+            with engine.begin() as conn:
+                conn.execute(text(f"CREATE SCHEMA IF NOT EXISTS {schema};"))
+            table.create(engine, checkfirst=True)
+
+            def bucket(name: str, per_minute: float) -> TokenBucket:
+                return PostgresTokenBucket(name, per_minute, engine, table)
+
+        self.limiters = {
+            name: Limiter(name, values.get("rpm", 0), values.get("tpm", 0), bucket) for name, values in limits.items()
+        }
+
+    def limiter(self, name: str) -> Optional[Limiter]:
+        return self.limiters.get(name.lower())
+
+    def call_max_wait(self) -> Optional[float]:
+        return None if admission_priority.get() == "background" else self.max_wait
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        return {name: limiter.stats.to_dict() for name, limiter in self.limiters.items()}
+
+
+admission: Optional[Admission] = None
+
+
+# ============================================================================
+# Installation
+# ============================================================================
+def _estimated_tokens(model: Any, messages: List[Any], tools: Optional[List[Dict[str, Any]]]) -> int:
+    # The tools and the stable system block of `CachedClaude` are read from the cache, which is not rate limited
+    cached_prefix = bool(getattr(model, "cache_breakpoints", False))
+    content = 0
+    for message in messages:
+        text = str(message.content or "")
+        if cached_prefix and message.role == "system":
+            text = split_system_message(text)[1]
+        content += estimate_tokens(text)
+    return content + (estimate_tokens(json.dumps(tools, default=str)) if tools and not cached_prefix else 0)
+
+
+def _admit_model_calls(cls: Any, method_name: str) -> None:
+    """Put `cls.method_name`, one of agno's model calls (messages, assistant_message, ...), behind the limiter."""
+    method = getattr(cls, method_name)
+    if getattr(method, "__admitted__", False):
+        return
+
+    def admit(model: Any, args: Tuple, kwargs: Dict) -> Tuple[Optional[Limiter], int]:
+        limiter = admission.limiter(str(model.provider)) if admission is not None else None
+        if limiter is None:
+            return None, 0
+        messages = kwargs.get("messages") or (args[0] if args else [])
+        return limiter, _estimated_tokens(model, messages, kwargs.get("tools"))
+
+    def settle(limiter: Limiter, estimated: int, args: Tuple, kwargs: Dict) -> None:
+        assistant_message = kwargs.get("assistant_message") or (args[1] if len(args) > 1 else None)
+        metrics = getattr(assistant_message, "metrics", None)
+        if metrics is not None:
+            # Anthropic reports cache writes apart from the input tokens, and counts them towards the limit
+            actual = (metrics.input_tokens or 0) + (metrics.cache_write_tokens or 0) + (metrics.output_tokens or 0)
+            limiter.settle(estimated, actual)
+
+    if inspect.isasyncgenfunction(method):
+
+        @wraps(method)
+        async def async_gen_wrapper(model: Any, *args: Any, **kwargs: Any) -> Any:
+            limiter, estimated = admit(model, args, kwargs)
+            if limiter is None or admission is None:
+                async for item in method(model, *args, **kwargs):
+                    yield item
+                return
+            await limiter.acquire(estimated, admission.call_max_wait())
+            try:
+                async for item in method(model, *args, **kwargs):
+                    yield item
+            except ModelProviderError as e:
+                if e.status_code == 429:
+                    limiter.rate_limited()
+                raise
+            finally:
+                settle(limiter, estimated, args, kwargs)
+
+        wrapper: Any = async_gen_wrapper
+
+    elif inspect.iscoroutinefunction(method):
+
+        @wraps(method)
+        async def async_wrapper(model: Any, *args: Any, **kwargs: Any) -> Any:
+            limiter, estimated = admit(model, args, kwargs)
+            if limiter is None or admission is None:
+                return await method(model, *args, **kwargs)
+            await limiter.acquire(estimated, admission.call_max_wait())
+            try:
+                return await method(model, *args, **kwargs)
+            except ModelProviderError as e:
+                if e.status_code == 429:
+                    limiter.rate_limited()
+                raise
+            finally:
+                settle(limiter, estimated, args, kwargs)
+
+        wrapper = async_wrapper
+
+    elif inspect.isgeneratorfunction(method):
+
+        @wraps(method)
+        def gen_wrapper(model: Any, *args: Any, **kwargs: Any) -> Any:
+            limiter, estimated = admit(model, args, kwargs)
+            if limiter is None or admission is None:
+                yield from method(model, *args, **kwargs)
+                return
+            limiter.acquire_sync(estimated, admission.call_max_wait())
+            try:
+                yield from method(model, *args, **kwargs)
+            except ModelProviderError as e:
+                if e.status_code == 429:
+                    limiter.rate_limited()
+                raise
+            finally:
+                settle(limiter, estimated, args, kwargs)
+
+        wrapper = gen_wrapper
+
+    else:
+
+        @wraps(method)
+        def sync_wrapper(model: Any, *args: Any, **kwargs: Any) -> Any:
+            limiter, estimated = admit(model, args, kwargs)
+            if limiter is None or admission is None:
+                return method(model, *args, **kwargs)
+            limiter.acquire_sync(estimated, admission.call_max_wait())
+            try:
+                return method(model, *args, **kwargs)
+            except ModelProviderError as e:
+                if e.status_code == 429:
+                    limiter.rate_limited()
+                raise
+            finally:
+                settle(limiter, estimated, args, kwargs)
+
+        wrapper = sync_wrapper
+
+    wrapper.__admitted__ = True
+    setattr(cls, method_name, wrapper)
+
+
+def _admit_tool_calls() -> None:
+    from agno.tools.function import FunctionCall
+
+    aexecute, execute = FunctionCall.aexecute, FunctionCall.execute
+    if getattr(aexecute, "__admitted__", False):
+        return
+
+    @wraps(aexecute)
+    async def admitted_aexecute(call: Any, *args: Any, **kwargs: Any) -> Any:
+        limiter = admission.limiter(f"tool:{call.function.name}") if admission is not None else None
+        if limiter is not None and admission is not None:
+            await limiter.acquire(0, admission.call_max_wait())
+        return await aexecute(call, *args, **kwargs)
+
+    @wraps(execute)
+    def admitted_execute(call: Any, *args: Any, **kwargs: Any) -> Any:
+        limiter = admission.limiter(f"tool:{call.function.name}") if admission is not None else None
+        if limiter is not None and admission is not None:
+            limiter.acquire_sync(0, admission.call_max_wait())
+        return execute(call, *args, **kwargs)
+
+    admitted_aexecute.__admitted__ = True  # type: ignore[attr-defined]
+    admitted_execute.__admitted__ = True  # type: ignore[attr-defined]
+    FunctionCall.aexecute = admitted_aexecute  # type: ignore[method-assign,assignment]
+    FunctionCall.execute = admitted_execute  # type: ignore[method-assign,assignment]
+
+
+class PriorityMiddleware:
+    """Admits the model calls of workflow runs with the "workflow" priority, below interactive runs."""
+
+    def __init__(self, app: Any):
+        self.app = app
+
+    async def __call__(self, scope: Dict[str, Any], receive: Any, send: Any) -> None:
+        if scope["type"] == "http" and scope.get("path", "").strip("/").startswith("workflows/"):
+            with priority("workflow"):
+                await self.app(scope, receive, send)
+            return
+        await self.app(scope, receive, send)
+
+
+def install_admission(app: Any = None, admission_settings: Optional[Admission] = None) -> Optional[Admission]:
+    """
+    Put the model and tool calls of the process behind the limiters, once.
+
+    Args:
+        app (Any): FastAPI app whose workflow runs get the "workflow" priority.
+        admission_settings (Optional[Admission]): Limiters to use. Defaults to the settings from the environment.
+    """
+    global admission
+    if (not ADMISSION_ENABLED or not parse_limits(ADMISSION_LIMITS)) and admission_settings is None:
+        return None
+    if admission is None or admission_settings is not None:
+        engine = None
+        if admission_settings is None:
+            check_workers(int(getenv("SERVE_WORKERS") or getenv("WEB_CONCURRENCY") or "1"))
+        if ADMISSION_SHARED and admission_settings is None:
+            from db.demo_db import demo_db
+
+            engine = demo_db.db_engine
+        admission = admission_settings or Admission(parse_limits(ADMISSION_LIMITS), ADMISSION_MAX_WAIT, engine)
+        log_info(f"Admission control for {', '.join(admission.limiters) or 'nothing'}")
+
+    from agno.models.base import Model
+
+    for method_name in (
+        "_process_model_response",
+        "_aprocess_model_response",
+        "process_response_stream",
+        "aprocess_response_stream",
+    ):
+        _admit_model_calls(Model, method_name)
+    _admit_tool_calls()
+    if app is not None:
+        app.add_middleware(PriorityMiddleware)
+    return admission
+
+
+if __name__ == "__main__":
+    import argparse
+    from statistics import quantiles
+
+    parser = argparse.ArgumentParser(description="Burst of calls against a rate limited mock provider")
+    parser.add_argument("--benchmark", action="store_true")
+    parser.add_argument("--rpm", type=float, default=600, help="Request limit of the mock provider")
+    parser.add_argument("--calls", type=int, default=60, help="Calls per priority class, all started at once")
+    parser.add_argument("--max-wait", type=float, default=10.0)
+    parser.add_argument("--shared", action="store_true", help="Keep the buckets in Postgres")
+    args = parser.parse_args()
+    if not args.benchmark:
+        parser.print_help()
+        raise SystemExit(0)
+
+    from agno.agent import Agent
+    from agno.models.openai import OpenAIChat
+
+    from loadtest.mock_provider import MockSettings, serve_mock_provider
+
+    provider = serve_mock_provider(
+        MockSettings(ttft=0.2, tokens=20, token_interval=0.005, tool_call_rate=0, rate_limit_rpm=args.rpm)
+    )
+    agent = Agent(model=OpenAIChat(id="gpt-5-mini"), telemetry=False)
+
+    async def call(name: str) -> Tuple[str, float, bool]:
+        started = time.perf_counter()
+        with priority(name):
+            try:
+                output = await agent.arun("Summarize the quarter")
+                ok = output.status.value == "COMPLETED"
+            except ModelProviderError:
+                ok = False
+        return name, time.perf_counter() - started, ok
+
+    async def burst(label: str) -> None:
+        before = provider.rate_limited
+        results = await asyncio.gather(*(call(name) for name in PRIORITIES for _ in range(args.calls)))
+        print(f"{label}: {provider.rate_limited - before} responses 429 from the provider")
+        for name in PRIORITIES:
+            latencies = [latency for result, latency, _ in results if result == name]
+            failed = sum(not ok for result, _, ok in results if result == name)
+            p = quantiles(latencies, n=100)
+            print(f"  {name:<12} failed {failed:>3}/{len(latencies)}  p50={p[49]:6.2f}s  p95={p[94]:6.2f}s")
+
+    async def main() -> None:
+        await burst("without admission control")
+        provider.reset_rate_limit()
+        engine = None
+        if args.shared:
+            from db.demo_db import demo_db
+
+            engine = demo_db.db_engine
+        install_admission(admission_settings=Admission({"openai": {"rpm": args.rpm}}, args.max_wait, engine))
+        await burst(f"with admission control, {args.max_wait:.0f}s max wait")
+        if admission is not None:
+            print(f"  {admission.stats()['openai']}")
+
+    asyncio.run(main())
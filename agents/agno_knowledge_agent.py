@@ -1,24 +1,49 @@
+from os import getenv
 from textwrap import dedent
 
 from agno.agent import Agent
 from agno.knowledge.embedder.openai import OpenAIEmbedder
 from agno.knowledge.knowledge import Knowledge
-from agno.models.anthropic import Claude
-from agno.vectordb.pgvector import PgVector, SearchType
+from agno.vectordb.pgvector import SearchType
 
+from agents.history import history_settings
+from agents.memory_queue import memory_settings
+from agents.prompt_cache import CachedClaude
 from db.demo_db import demo_db
+from db.pool import get_engine
 from db.url import get_db_url
+from db.vector_index import get_vector_index
+from knowledge.embedding_cache import CachedEmbedder
+from knowledge.fusion import FusionStage
+from knowledge.quantized import QuantizedPgVector
 
 # ============================================================================
 # Setup knowledge base for storing Agno documentation
 # ============================================================================
-knowledge = Knowledge(
+# Embeddings are cached in-process and in Postgres, so repeated queries
+# and re-ingested chunks don't pay an embedding round trip
+docs_embedder = CachedEmbedder(
+    embedder=OpenAIEmbedder(id="text-embedding-3-small"),
+    db_engine=get_engine(),
+    table_name="agno_docs_embedding_cache",
+)
+knowledge: Knowledge = Knowledge(
     name="Agno Documentation",
-    vector_db=PgVector(
+    # Set AGNO_DOCS_QUANTIZATION to `halfvec` or `binary` to search a quantized index
+    # and rescore with full-precision vectors. Unset, vectors are compared at full precision,
+    # but hybrid search still goes through the fusion stage below instead of PgVector's scoring.
+    vector_db=QuantizedPgVector(
         db_url=get_db_url(),
+        db_engine=get_engine(),
         table_name="agno_docs",
+        quantization=getenv("AGNO_DOCS_QUANTIZATION"),
         search_type=SearchType.hybrid,
-        embedder=OpenAIEmbedder(id="text-embedding-3-small"),
+        # Keyword and vector candidates are fused with reciprocal rank fusion and
+        # near-duplicate chunks are dropped, so each search returns more diverse chunks
+        fusion=FusionStage(),
+        # Index type, build and query-time parameters, tuned with `python -m db.vector_index`
+        vector_index=get_vector_index(),
+        embedder=docs_embedder,
     ),
     # 10 results returned on query
     max_results=10,
@@ -79,17 +104,28 @@ instructions = dedent(
 # ============================================================================
 agno_knowledge_agent = Agent(
     name="Agno Knowledge Agent",
-    model=Claude(id="claude-sonnet-4-5"),
+    model=CachedClaude(id="claude-sonnet-4-5"),
     knowledge=knowledge,
     description=description,
     instructions=instructions,
-    add_history_to_context=True,
+    **history_settings(num_history_runs=5),
     add_datetime_to_context=True,
-    enable_agentic_memory=True,
-    num_history_runs=5,
+    **memory_settings(),
     markdown=True,
     db=demo_db,
 )
 
 if __name__ == "__main__":
-    knowledge.add_content(name="Agno Documentation", url="https://docs.agno.com/llms-full.txt")
+    import sys
+
+    if "--incremental" in sys.argv:
+        # Stream, diff and batch-embed the docs: only changed chunks are re-embedded
+        from knowledge.ingest import ingest_knowledge
+
+        ingest_knowledge(
+            knowledge,
+            name="Agno Documentation",
+            url="https://docs.agno.com/llms-full.txt",
+        )
+    else:
+        knowledge.add_content(name="Agno Documentation", url="https://docs.agno.com/llms-full.txt")
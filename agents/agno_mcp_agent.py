@@ -1,10 +1,19 @@
+from os import getenv
 from textwrap import dedent
 
 from agno.agent import Agent
-from agno.models.anthropic import Claude
-from agno.tools.mcp import MCPTools
 
+from agents.history import history_settings
+from agents.memory_queue import memory_settings
+from agents.prompt_cache import CachedClaude
 from db.demo_db import demo_db
+from tools.mcp_pool import PooledMCPTools
+
+# Warm sessions shared by all runs. AgentOS opens the pool on startup and closes it on shutdown
+agno_docs_mcp = PooledMCPTools(
+    url=getenv("AGNO_MCP_URL", "https://docs.agno.com/mcp"),
+    pool_size=int(getenv("AGNO_MCP_POOL_SIZE", "2")),
+)
 
 # ============================================================================
 # Description & Instructions
@@ -62,14 +71,13 @@ instructions = dedent(
 # ============================================================================
 agno_mcp_agent = Agent(
     name="Agno MCP Agent",
-    model=Claude(id="claude-sonnet-4-5"),
-    tools=[MCPTools(transport="streamable-http", url="https://docs.agno.com/mcp")],
+    model=CachedClaude(id="claude-sonnet-4-5"),
+    tools=[agno_docs_mcp],
     description=description,
     instructions=instructions,
-    add_history_to_context=True,
+    **history_settings(num_history_runs=5),
     add_datetime_to_context=True,
-    enable_agentic_memory=True,
-    num_history_runs=5,
+    **memory_settings(),
     markdown=True,
     db=demo_db,
 )
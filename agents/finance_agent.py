@@ -2,9 +2,11 @@ from textwrap import dedent
 
 from agno.agent import Agent
 from agno.models.openai import OpenAIChat
-from agno.tools.yfinance import YFinanceTools
 
+from agents.history import history_settings
+from agents.memory_queue import memory_settings
 from db.demo_db import demo_db
+from tools.finance import CachedYFinanceTools
 
 # ============================================================================
 # Description & Instructions
@@ -18,22 +20,24 @@ instructions = dedent("""\
       - Detect and confirm company names and tickers; if missing or ambiguous, ask for clarification.
       - Default to most common ticker if unambiguous (e.g., Apple → AAPL).
 
-   2) Data Retrieval (use YFinanceTools)
-      - You have tools to retrieve the following data: last price, % change, market cap, P/E, EPS, revenue, EBITDA, dividend, 52-week range.
-      - When comparing companies, use the tools to pull the same fields for each ticker.
+   2) Data Retrieval (use the yfinance_tools toolkit; results are cached, so repeat calls are cheap)
+      - get_stock_snapshots: last price, % change, market cap, P/E, EPS, revenue, EBITDA, dividend and 52-week range. When comparing companies, call it once with all tickers.
+      - get_comparison_table: the ratio table used in the analysis below, for one or more tickers in one call.
+      - For details, use get_company_info, get_stock_fundamentals, get_income_statements, get_key_financial_ratios, get_analyst_recommendations, get_company_news, get_technical_indicators or get_historical_stock_prices.
 
    3) Analysis
-      - When asked, you should be comfortable computing and reporting the following metrics: P/E, P/S, EV/EBITDA (if fields available), revenue growth (YoY), margin highlights.
+      - For P/E, P/S, EV/EBITDA, revenue growth (YoY) and margins, call get_comparison_table once with all tickers. It returns a ready table with unavailable fields marked "N/A".
+      - Do not compute ratios yourself; reuse the table and narrate what it shows.
       - Summarize drivers and risks (1–3 bullets each). Avoid speculation.
 
    4) Output Format (concise, readable)
       - Start with a one-paragraph snapshot (company name + ticker + timestamp).
-      - Then a small table of key metrics.
+      - Then the key metrics table from get_comparison_table (drop columns that are not relevant).
       - Add a short Insights section (bullets).
       - If asked, provide a simple Rec/Outlook with horizon, thesis, risks, and confidence (low/med/high).
 
    5) Integrity & Limits
-      - Note the data timestamp and source (Yahoo Finance via YFinanceTools).
+      - Note the data timestamp and source (Yahoo Finance).
       - If a metric is unavailable, say "N/A" and continue.
       - Do not provide personalized financial advice; include a brief disclaimer.
 
@@ -44,16 +48,19 @@ instructions = dedent("""\
 # ============================================================================
 # Create the Agent
 # ============================================================================
+# Yahoo Finance calls are cached and de-duplicated across runs (see tools/finance.py)
+finance_tools = CachedYFinanceTools()
+
 finance_agent = Agent(
     name="Finance Agent",
     role="Handle financial data requests and market analysis",
     model=OpenAIChat(id="gpt-5-mini"),
-    tools=[YFinanceTools()],
+    tools=[finance_tools],
     description=description,
     instructions=instructions,
-    add_history_to_context=True,
+    **history_settings(),
     add_datetime_to_context=True,
-    enable_agentic_memory=True,
+    **memory_settings(),
     markdown=True,
     db=demo_db,
 )
@@ -77,6 +84,6 @@ finance_agent = Agent(
    - 4–6 bullets on drivers/risks; short sector outlook.
 
 5) Earnings Prep — Microsoft (MSFT)
-   - Current metrics + recent trend context (as available from YFinance data).
+   - Current metrics + recent trend context (as available from Yahoo Finance data).
    - Short playbook: what to watch (revenue lines, margins), typical post-earnings pattern (if inferable).
 """
@@ -0,0 +1,484 @@
+"""
+Rolling history compaction for agents and teams with long sessions.
+
+With plain `add_history_to_context`, every run replays the last `num_history_runs` runs with their full tool
+results, and every stored run keeps a copy of the history it was given, so prompts and session reads keep growing
+with the conversation. In the "compacted" history mode (`HISTORY_MODE`, the default):
+
+- The last `keep_runs` runs are always replayed as is. Older runs are folded into a rolling session summary that
+  the agent adds to its system message, `fold_batch` runs at a time: a fold runs once `keep_runs + fold_batch` runs
+  are not summarized yet, and the history window (`history_window`) covers the runs waiting for the next fold.
+  Each fold summarizes the previous summary and the newly evicted runs only, so its cost does not depend on the
+  length of the session, and only one run in `fold_batch` pays for it.
+- Tool results are truncated to `tool_result_tokens` estimated tokens before the run is stored, and runs do not
+  store the history they were given (`store_history_messages=False`).
+- Once a session holds more than `max_stored_runs` runs, its oldest summarized runs are moved to an archive table.
+
+Usage:
+    python -m agents.history --turns 40 --keep-runs 3
+"""
+
+import asyncio
+import time
+from dataclasses import dataclass, field
+from os import getenv
+from textwrap import dedent
+from typing import Any, Dict, List, Optional, Sequence, Union
+
+from agno.models.message import Message
+from agno.models.openai import OpenAIChat
+from agno.run.agent import RunOutput
+from agno.run.base import RunStatus
+from agno.run.team import TeamRunOutput
+from agno.session import AgentSession, TeamSession
+from agno.session.summary import SessionSummary, SessionSummaryManager, SessionSummaryResponse
+from agno.utils.log import log_debug, logger
+from agno.utils.prompts import get_json_output_prompt
+from sqlalchemy import Column, DateTime, MetaData, String, Table, func, text
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import SQLAlchemyError
+
+from db.demo_db import demo_db
+from workflows.compression import CHARS_PER_TOKEN, estimate_tokens
+
+# "compacted" replays the last HISTORY_KEEP_RUNS runs after a rolling summary, "raw" replays full runs
+HISTORY_MODE = getenv("HISTORY_MODE", "compacted")
+HISTORY_KEEP_RUNS = int(getenv("HISTORY_KEEP_RUNS", "3"))
+# Runs folded into the summary at once, so that a fold runs every HISTORY_FOLD_BATCH runs instead of on every run
+HISTORY_FOLD_BATCH = int(getenv("HISTORY_FOLD_BATCH", "4"))
+HISTORY_TOOL_RESULT_TOKENS = int(getenv("HISTORY_TOOL_RESULT_TOKENS", "500"))
+# Runs kept in a session before the oldest summarized ones are archived, 0 keeps all of them
+HISTORY_MAX_STORED_RUNS = int(getenv("HISTORY_MAX_STORED_RUNS", "20"))
+HISTORY_SUMMARY_MODEL = getenv("HISTORY_SUMMARY_MODEL", "gpt-5-mini")
+
+# Key of the compaction state in `session.session_data`
+STATE_KEY = "history_compaction"
+
+Session = Union[AgentSession, TeamSession]
+Run = Union[RunOutput, TeamRunOutput]
+
+
+@dataclass
+class HistoryCompactionStats:
+    folds: int = 0
+    fold_failures: int = 0
+    folded_runs: int = 0
+    # Estimated tokens sent to the summary model, which stay flat as sessions grow
+    fold_input_tokens: int = 0
+    fold_time: float = 0.0
+    truncated_tool_results: int = 0
+    truncated_tokens: int = 0
+    archived_runs: int = 0
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "folds": self.folds,
+            "fold_failures": self.fold_failures,
+            "folded_runs": self.folded_runs,
+            "avg_fold_input_tokens": round(self.fold_input_tokens / self.folds) if self.folds else 0,
+            "avg_fold_ms": round(self.fold_time / self.folds * 1000, 3) if self.folds else 0.0,
+            "truncated_tool_results": self.truncated_tool_results,
+            "truncated_tokens": self.truncated_tokens,
+            "archived_runs": self.archived_runs,
+        }
+
+
+# Shared by the managers created with `history_settings()`
+history_stats = HistoryCompactionStats()
+
+
+def truncate_text(content: str, max_tokens: int) -> str:
+    tokens = estimate_tokens(content)
+    if tokens <= max_tokens:
+        return content
+    # Leave room for the marker, so that truncated text stays within `max_tokens` and is not cut again
+    keep = max(0, max_tokens * CHARS_PER_TOKEN - 40)
+    return f"{content[:keep]}\n[... {tokens - estimate_tokens(content[:keep])} tokens truncated]"
+
+
+def truncate_tool_results(run: Run, max_tokens: int, stats: Optional[HistoryCompactionStats] = None) -> None:
+    """Cut the tool results of `run` (tool messages and tool executions) to `max_tokens` estimated tokens each."""
+    for message in run.messages or []:
+        if message.role == "tool" and isinstance(message.content, str):
+            tokens = estimate_tokens(message.content)
+            if tokens > max_tokens:
+                message.content = truncate_text(message.content, max_tokens)
+                if stats is not None:
+                    stats.truncated_tool_results += 1
+                    stats.truncated_tokens += tokens - max_tokens
+    for tool in run.tools or []:
+        if isinstance(tool.result, str):
+            tool.result = truncate_text(tool.result, max_tokens)
+
+
+def history_runs(session: Session) -> List[Run]:
+    """The runs that can be replayed as history, as `session.get_messages()` selects them."""
+    skip_statuses = (RunStatus.paused, RunStatus.cancelled, RunStatus.error)
+    return [
+        run
+        for run in session.runs or []
+        if getattr(run, "parent_run_id", None) is None and getattr(run, "status", None) not in skip_statuses
+    ]
+
+
+def format_turns(runs: Sequence[Run], tool_result_tokens: int) -> str:
+    """Render runs as a plain transcript, with tool results cut to `tool_result_tokens`."""
+    lines: List[str] = []
+    tool_names: Dict[str, str] = {}
+    for run in runs:
+        for message in run.messages or []:
+            if message.from_history or message.role == "system":
+                continue
+            content = message.get_content_string() if message.content is not None else ""
+            if message.role == "user":
+                lines.append(f"User: {content}")
+            elif message.role == "assistant":
+                for tool_call in message.tool_calls or []:
+                    tool_names[tool_call.get("id", "")] = tool_call.get("function", {}).get("name", "tool")
+                if content:
+                    lines.append(f"Assistant: {content}")
+            elif message.role == "tool":
+                name = message.tool_name or tool_names.get(message.tool_call_id or "", "tool")
+                lines.append(f"Tool ({name}): {truncate_text(content, tool_result_tokens)}")
+        lines.append("")
+    return "\n".join(lines)
+
+
+class RunArchive:
+    """
+    Table of the runs moved out of their session once they were summarized.
+
+    Args:
+        db_engine (Engine): Engine of the database, usually `demo_db.db_engine`.
+        table_name (str): Name of the archive table.
+        schema (str): Schema of the archive table.
+    """
+
+    def __init__(self, db_engine: Engine, table_name: str = "agent_run_archive", schema: str = "ai"):
+        self.db_engine = db_engine
+        self.schema = schema
+        self.table = Table(
+            table_name,
+            MetaData(schema=schema),
+            Column("run_id", String, primary_key=True),
+            Column("session_id", String, nullable=False, index=True),
+            Column("agent_id", String),
+            Column("team_id", String),
+            Column("run", postgresql.JSONB, nullable=False),
+            Column("archived_at", DateTime(timezone=True), server_default=func.now()),
+        )
+        self._table_ready = False
+
+    def _ensure_table(self) -> None:
+        if not self._table_ready:
+            with self.db_engine.begin() as conn:
+                conn.execute(text(f"CREATE SCHEMA IF NOT EXISTS {self.schema};"))
+            self.table.create(self.db_engine, checkfirst=True)
+            self._table_ready = True
+
+    def save(self, session_id: str, runs: Sequence[Run]) -> None:
+        rows = [
+            {
+                "run_id": run.run_id,
+                "session_id": session_id,
+                "agent_id": getattr(run, "agent_id", None),
+                "team_id": getattr(run, "team_id", None),
+                "run": run.to_dict(),
+            }
+            for run in runs
+        ]
+        self._ensure_table()
+        with self.db_engine.begin() as conn:
+            conn.execute(postgresql.insert(self.table).values(rows).on_conflict_do_nothing(index_elements=["run_id"]))
+
+
+@dataclass
+class RollingSummaryManager(SessionSummaryManager):
+    """
+    Session summary manager that folds the runs leaving the history window into a rolling summary.
+
+    Agno calls it after every run, before the session is saved. Set the agent's `num_history_runs` to
+    `history_window`.
+
+    Args:
+        keep_runs (int): Number of latest runs replayed as is, which are not summarized yet.
+        fold_batch (int): Number of runs folded at once, beyond the `keep_runs` latest ones.
+        tool_result_tokens (int): Estimated tokens kept of each tool result.
+        max_stored_runs (Optional[int]): Runs kept in the session before the oldest summarized ones are archived.
+        archive (Optional[RunArchive]): Where archived runs are written. Without one, runs are never archived.
+        summary_words (int): Target length of the summary.
+    """
+
+    keep_runs: int = 3
+    fold_batch: int = 1
+    tool_result_tokens: int = 500
+    max_stored_runs: Optional[int] = None
+    archive: Optional[RunArchive] = None
+    summary_words: int = 400
+    stats: HistoryCompactionStats = field(default_factory=HistoryCompactionStats)
+
+    def __post_init__(self) -> None:
+        if self.fold_batch < 1:
+            raise ValueError("fold_batch must be at least 1")
+        if self.max_stored_runs is not None and self.max_stored_runs <= self.history_window:
+            raise ValueError("max_stored_runs must be larger than keep_runs + fold_batch - 1")
+
+    @property
+    def history_window(self) -> int:
+        """Runs to replay so that the runs not summarized yet are never left out."""
+        return self.keep_runs + self.fold_batch - 1
+
+    # ============================================================================
+    # Folding
+    # ============================================================================
+    def runs_to_fold(self, session: Session) -> List[Run]:
+        """Runs before the `keep_runs` latest ones that are not in the summary yet, once there are `fold_batch`."""
+        runs = history_runs(session)
+        summarized_through = (session.session_data or {}).get(STATE_KEY, {}).get("summarized_through")
+        run_ids = [run.run_id for run in runs]
+        if summarized_through in run_ids:
+            runs = runs[run_ids.index(summarized_through) + 1 :]
+        if len(runs) < self.keep_runs + self.fold_batch:
+            return []
+        return runs[: -self.keep_runs] if self.keep_runs else runs
+
+    def _prepare_summary_messages(self, session: Optional[Any] = None) -> Optional[List[Message]]:
+        runs = self.runs_to_fold(session) if session is not None else []
+        if not runs:
+            return None
+        previous = session.summary.summary if session is not None and session.summary else ""
+        system_prompt = dedent(f"""\
+            You maintain the running summary of a conversation between a user and an assistant. The summary
+            replaces the older turns of the conversation, which the assistant no longer sees.
+            Update the previous summary with the new turns and return the full updated summary:
+            - Keep facts, decisions, user preferences, open questions and results (numbers, names, links) that
+              later turns may refer to.
+            - Drop small talk and details that the new turns supersede.
+            - Keep the summary under {self.summary_words} words.
+            - Topics (Optional[List[str]]): The topics of the whole conversation.
+            """)
+        system_prompt += f"<previous_summary>\n{previous}\n</previous_summary>\n"
+        system_prompt += f"<new_turns>\n{format_turns(runs, self.tool_result_tokens)}</new_turns>"
+        if self.model is not None and self.get_response_format(self.model) == {"type": "json_object"}:
+            system_prompt += "\n" + get_json_output_prompt(SessionSummaryResponse)  # type: ignore[arg-type]
+        self.stats.fold_input_tokens += estimate_tokens(system_prompt)
+        return [
+            Message(role="system", content=system_prompt),
+            Message(role="user", content=self.summary_request_message),
+        ]
+
+    def _before_fold(self, session: Session) -> List[Run]:
+        for run in session.runs or []:
+            truncate_tool_results(run, self.tool_result_tokens, self.stats)
+        return self.runs_to_fold(session)
+
+    def _after_fold(self, session: Session, runs: List[Run], summary: Optional[SessionSummary], started: float) -> None:
+        if summary is None:
+            # The runs stay in the queue and are folded with the next ones
+            self.stats.fold_failures += 1
+            return
+        self.stats.folds += 1
+        self.stats.folded_runs += len(runs)
+        self.stats.fold_time += time.perf_counter() - started
+        if session.session_data is None:
+            session.session_data = {}
+        session.session_data[STATE_KEY] = {
+            "summarized_through": runs[-1].run_id,
+            "summarized_runs": session.session_data.get(STATE_KEY, {}).get("summarized_runs", 0) + len(runs),
+        }
+        log_debug(f"Folded {len(runs)} runs into the summary of session {session.session_id}")
+
+    def create_session_summary(self, session: Session) -> Optional[SessionSummary]:
+        runs = self._before_fold(session)
+        summary = None
+        if runs:
+            started = time.perf_counter()
+            summary = self.summarize(session)
+            self._after_fold(session, runs, summary, started)
+        self.archive_runs(session)
+        return summary
+
+    async def acreate_session_summary(self, session: Session) -> Optional[SessionSummary]:
+        runs = self._before_fold(session)
+        summary = None
+        if runs:
+            started = time.perf_counter()
+            summary = await self.asummarize(session)
+            self._after_fold(session, runs, summary, started)
+        await asyncio.to_thread(self.archive_runs, session)
+        return summary
+
+    def summarize(self, session: Session) -> Optional[SessionSummary]:
+        return super().create_session_summary(session)
+
+    async def asummarize(self, session: Session) -> Optional[SessionSummary]:
+        return await super().acreate_session_summary(session)
+
+    # ============================================================================
+    # Archiving
+    # ============================================================================
+    def archive_runs(self, session: Session) -> None:
+        """Move the oldest summarized runs out of the session once it holds more than `max_stored_runs` runs."""
+        if self.archive is None or self.max_stored_runs is None or not session.runs:
+            return
+        excess = len(session.runs) - self.max_stored_runs
+        summarized_through = (session.session_data or {}).get(STATE_KEY, {}).get("summarized_through")
+        run_ids = [run.run_id for run in session.runs]
+        if excess <= 0 or summarized_through not in run_ids:
+            return
+        # The last summarized run stays in the session, it marks where the next fold starts
+        runs = session.runs[: min(excess, run_ids.index(summarized_through))]
+        if not runs:
+            return
+        try:
+            self.archive.save(session.session_id, runs)
+        except SQLAlchemyError as e:
+            logger.warning(f"Archiving runs of session {session.session_id} failed: {e}")
+            return
+        archived = {run.run_id for run in runs}
+        session.runs = [run for run in session.runs if run.run_id not in archived]  # type: ignore[assignment]
+        self.stats.archived_runs += len(runs)
+        log_debug(f"Archived {len(runs)} runs of session {session.session_id}")
+
+
+run_archive = RunArchive(demo_db.db_engine)
+
+
+def history_settings(num_history_runs: Optional[int] = None) -> Dict[str, Any]:
+    """
+    Agent or Team arguments for the history mode set in `HISTORY_MODE`.
+
+    Args:
+        num_history_runs (Optional[int]): Latest runs replayed as is, in both modes. Defaults to `HISTORY_KEEP_RUNS`.
+    """
+    keep_runs = num_history_runs if num_history_runs is not None else HISTORY_KEEP_RUNS
+    if HISTORY_MODE == "raw":
+        return {"add_history_to_context": True, "num_history_runs": keep_runs}
+    if HISTORY_MODE != "compacted":
+        raise ValueError(f"Unknown history mode: {HISTORY_MODE}")
+    manager = RollingSummaryManager(
+        model=OpenAIChat(id=HISTORY_SUMMARY_MODEL),
+        keep_runs=keep_runs,
+        fold_batch=HISTORY_FOLD_BATCH,
+        tool_result_tokens=HISTORY_TOOL_RESULT_TOKENS,
+        # Agents that keep more runs than the default store at least their history window
+        max_stored_runs=max(HISTORY_MAX_STORED_RUNS, keep_runs + HISTORY_FOLD_BATCH)
+        if HISTORY_MAX_STORED_RUNS
+        else None,
+        archive=run_archive if HISTORY_MAX_STORED_RUNS else None,
+        stats=history_stats,
+    )
+    return {
+        "add_history_to_context": True,
+        "num_history_runs": manager.history_window,
+        "session_summary_manager": manager,
+        "add_session_summary_to_context": True,
+        "store_history_messages": False,
+    }
+
+
+if __name__ == "__main__":
+    import argparse
+    import json
+    from uuid import uuid4
+
+    from agno.models.response import ToolExecution
+    from agno.run.agent import RunInput
+
+    parser = argparse.ArgumentParser(description="Compare raw and compacted history on a simulated session")
+    parser.add_argument("--turns", type=int, default=40)
+    parser.add_argument("--raw-runs", type=int, default=5, help="num_history_runs of the raw mode")
+    parser.add_argument("--keep-runs", type=int, default=3)
+    parser.add_argument("--fold-batch", type=int, default=HISTORY_FOLD_BATCH)
+    parser.add_argument("--tool-tokens", type=int, default=4000, help="Estimated tokens of each tool result")
+    parser.add_argument("--tool-result-tokens", type=int, default=500)
+    parser.add_argument("--max-stored-runs", type=int, default=20)
+    args = parser.parse_args()
+
+    class MemoryArchive(RunArchive):
+        def __init__(self) -> None:
+            self.runs: List[Run] = []
+
+        def save(self, session_id: str, runs: Sequence[Run]) -> None:
+            self.runs.extend(runs)
+
+    class OfflineSummaryManager(RollingSummaryManager):
+        """Stands in for the summary model: keeps the first sentence of each folded answer."""
+
+        def summarize(self, session: Session) -> Optional[SessionSummary]:
+            messages = self._prepare_summary_messages(session)
+            if messages is None:
+                return None
+            answers = [
+                str(m.content).split(". ")[0]
+                for run in self.runs_to_fold(session)
+                for m in run.messages or []
+                if m.role == "assistant" and m.content
+            ]
+            previous = session.summary.summary.split() if session.summary else []
+            words = (previous + " ".join(answers).split())[-self.summary_words :]
+            session.summary = SessionSummary(summary=" ".join(words))
+            return session.summary
+
+    def simulate_run(turn: int, history: List[Message]) -> RunOutput:
+        call_id = f"call_{turn}"
+        tool_result = " ".join(f"row {turn}.{i}: value={i * 1.5:.1f}" for i in range(args.tool_tokens * 4 // 20))
+        answer = f"Turn {turn} found value {turn * 1.5:.1f} in the data. " + "Details follow. " * 40
+        messages = [Message(role="system", content="You are a helpful assistant.")]
+        messages += [Message(role=m.role, content=m.content, from_history=True) for m in history]
+        messages += [
+            Message(role="user", content=f"Question {turn}: what changed in the data?"),
+            Message(
+                role="assistant",
+                tool_calls=[{"id": call_id, "type": "function", "function": {"name": "get_data", "arguments": "{}"}}],
+            ),
+            Message(role="tool", tool_call_id=call_id, tool_name="get_data", content=tool_result),
+            Message(role="assistant", content=answer),
+        ]
+        return RunOutput(
+            run_id=str(uuid4()),
+            session_id="benchmark",
+            status=RunStatus.completed,
+            input=RunInput(input_content=f"Question {turn}"),
+            content=answer,
+            messages=messages,
+            tools=[ToolExecution(tool_call_id=call_id, tool_name="get_data", result=tool_result)],
+        )
+
+    def tokens(messages: List[Message]) -> int:
+        return sum(estimate_tokens(m.get_content_string()) for m in messages if m.content is not None)
+
+    def session_bytes(session: Session) -> int:
+        return len(json.dumps(session.to_dict(), default=str))
+
+    stats = HistoryCompactionStats()
+    manager = OfflineSummaryManager(
+        keep_runs=args.keep_runs,
+        fold_batch=args.fold_batch,
+        tool_result_tokens=args.tool_result_tokens,
+        max_stored_runs=args.max_stored_runs or None,
+        archive=MemoryArchive(),
+        stats=stats,
+    )
+    raw = AgentSession(session_id="benchmark", runs=[], session_data={})
+    compacted = AgentSession(session_id="benchmark", runs=[], session_data={})
+    checkpoints = {args.turns * i // 4 for i in range(1, 5)} | {1}
+    print(f"{'turn':>5} | {'raw prompt':>10} {'raw session':>12} | {'compacted prompt':>16} {'session':>10}")
+    for turn in range(1, args.turns + 1):
+        raw_history = raw.get_messages(last_n_runs=args.raw_runs)
+        raw.upsert_run(simulate_run(turn, raw_history))
+
+        history = compacted.get_messages(last_n_runs=manager.history_window)
+        summary_tokens = estimate_tokens(compacted.summary.summary) if compacted.summary else 0
+        # store_history_messages=False: the run does not keep the history it was given
+        compacted.upsert_run(simulate_run(turn, []))
+        manager.create_session_summary(compacted)
+
+        if turn in checkpoints:
+            print(
+                f"{turn:>5} | {tokens(raw_history):>10} {session_bytes(raw):>12} | "
+                f"{tokens(history) + summary_tokens:>16} {session_bytes(compacted):>10}"
+            )
+    print("prompt: estimated history tokens sent with the turn, session: bytes of the stored session")
+    print(stats.to_dict())
@@ -0,0 +1,474 @@
+"""
+Offline consolidation of user memories.
+
+Agents keep adding memories, and every memory of a user is added to the system message of each of their runs. This
+job walks all users in pages, ordered by user id so that an interrupted job resumes after the last finished page. For
+each user it embeds the memories, groups near-duplicates with one similarity matrix product, and asks the model to
+merge each group. Users without near-duplicates cost no model call, and model calls are paced to
+`max_calls_per_minute`.
+
+Usage:
+    python -m agents.memory_manager --consolidate
+    python -m agents.memory_consolidation --dry-run
+    python -m agents.memory_consolidation --benchmark --users 50
+"""
+
+import asyncio
+import time
+from dataclasses import asdict, dataclass
+from textwrap import dedent
+from typing import Any, Awaitable, Callable, Dict, List, Optional, TypeVar
+from uuid import uuid4
+
+import numpy as np
+from agno.agent import Agent
+from agno.db.postgres import PostgresDb
+from agno.db.schemas.memory import UserMemory
+from agno.knowledge.embedder.base import Embedder
+from agno.models.openai import OpenAIChat
+from agno.utils.log import log_debug, log_info, logger
+from pydantic import BaseModel, Field
+from sqlalchemy import Column, DateTime, MetaData, String, Table, func, text
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.exc import SQLAlchemyError
+
+from workflows.compression import estimate_tokens
+
+T = TypeVar("T")
+
+# Merges the memories of one cluster, returning the memories that replace them
+Merger = Callable[[List[UserMemory]], Awaitable[Optional[List[UserMemory]]]]
+
+
+def memory_tokens(memories: List[UserMemory]) -> int:
+    """Estimated tokens the memories add to the system message (one "- memory" line each)."""
+    return sum(estimate_tokens(f"\n- {memory.memory}") for memory in memories)
+
+
+@dataclass
+class MemoryConsolidationStats:
+    users: int = 0
+    memories_before: int = 0
+    memories_after: int = 0
+    tokens_before: int = 0
+    tokens_after: int = 0
+    clusters: int = 0
+    failed_clusters: int = 0
+    model_calls: int = 0
+    embed_time: float = 0.0
+    merge_time: float = 0.0
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            **asdict(self),
+            "memories_per_user_before": round(self.memories_before / self.users, 2) if self.users else 0.0,
+            "memories_per_user_after": round(self.memories_after / self.users, 2) if self.users else 0.0,
+            "memory_reduction": round(1 - self.memories_after / self.memories_before, 4)
+            if self.memories_before
+            else 0.0,
+            "token_reduction": round(1 - self.tokens_after / self.tokens_before, 4) if self.tokens_before else 0.0,
+        }
+
+
+def cluster_near_duplicates(embeddings: np.ndarray, threshold: float, max_cluster_size: int = 12) -> List[List[int]]:
+    """
+    Group the rows of `embeddings` whose cosine similarity reaches `threshold`, as connected components.
+
+    Only groups of two or more are returned, each cut into chunks of at most `max_cluster_size` memories.
+    """
+    if len(embeddings) < 2:
+        return []
+    vectors = embeddings / np.maximum(np.linalg.norm(embeddings, axis=1, keepdims=True), 1e-12)
+    rows, cols = np.nonzero(np.triu(vectors @ vectors.T >= threshold, k=1))
+
+    parent = list(range(len(vectors)))
+
+    def find(i: int) -> int:
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    for i, j in zip(rows.tolist(), cols.tolist()):
+        parent[find(i)] = find(j)
+    groups: Dict[int, List[int]] = {}
+    for i in range(len(vectors)):
+        groups.setdefault(find(i), []).append(i)
+    clusters = []
+    for members in groups.values():
+        for start in range(0, len(members), max_cluster_size):
+            chunk = members[start : start + max_cluster_size]
+            if len(chunk) > 1:
+                clusters.append(chunk)
+    return clusters
+
+
+class RateLimiter:
+    """Spaces out calls so that at most `calls_per_minute` start in any minute."""
+
+    def __init__(self, calls_per_minute: float):
+        self.interval = 60.0 / calls_per_minute if calls_per_minute > 0 else 0.0
+        self._next = 0.0
+        self._lock = asyncio.Lock()
+
+    async def wait(self) -> None:
+        async with self._lock:
+            now = time.monotonic()
+            delay = self._next - now
+            self._next = max(now, self._next) + self.interval
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+
+# ============================================================================
+# Model merge
+# ============================================================================
+class ConsolidatedMemory(BaseModel):
+    memory: str = Field(..., description="One self-contained fact about the user, in the third person.")
+    topics: List[str] = Field(default_factory=list, description="Topics of the memory.")
+
+
+class ConsolidatedMemories(BaseModel):
+    memories: List[ConsolidatedMemory] = Field(..., description="Memories that replace the given ones.")
+
+
+def model_merger(model_id: str = "gpt-5-mini") -> Merger:
+    """Merge clusters with a model, returning None when the answer cannot replace the cluster."""
+    merger = Agent(
+        name="Memory Consolidator",
+        model=OpenAIChat(id=model_id),
+        instructions=dedent("""\
+            You receive memories about one user that overlap. Rewrite them as the smallest set of memories that
+            keeps every distinct fact:
+            - Merge duplicates and paraphrases into one memory.
+            - When memories conflict, keep the most recent one (memories are listed from oldest to newest).
+            - Do not add facts that are not in the memories.
+            """),
+        output_schema=ConsolidatedMemories,
+    )
+
+    async def merge(memories: List[UserMemory]) -> Optional[List[UserMemory]]:
+        listing = "\n".join(f"- {memory.memory}" for memory in memories)
+        response = await merger.arun(input=f"<memories>\n{listing}\n</memories>")
+        if not isinstance(response.content, ConsolidatedMemories):
+            return None
+        merged = [m for m in response.content.memories if m.memory.strip()]
+        if not merged or len(merged) >= len(memories):
+            return None
+        return [UserMemory(memory=m.memory.strip(), topics=m.topics or None) for m in merged]
+
+    return merge
+
+
+# ============================================================================
+# Job
+# ============================================================================
+class MemoryConsolidator:
+    """
+    Args:
+        db (PostgresDb): Database holding the memories, usually `demo_db`.
+        embedder (Embedder): Embedder for the memories. Wrap it in a `CachedEmbedder` so that reruns only embed new
+            memories.
+        merger (Merger): Merges a cluster of near-duplicate memories, see `model_merger()`.
+        similarity_threshold (float): Minimum cosine similarity for two memories to be merged.
+        page_size (int): Users processed between two checkpoints.
+        concurrency (int): Users consolidated at the same time.
+        max_calls_per_minute (float): Maximum merge calls started per minute, 0 for no limit.
+        dry_run (bool): Find the clusters without merging them.
+        job (str): Name of the checkpoint, one per independent job.
+    """
+
+    def __init__(
+        self,
+        db: PostgresDb,
+        embedder: Embedder,
+        merger: Merger,
+        similarity_threshold: float = 0.85,
+        page_size: int = 50,
+        concurrency: int = 4,
+        max_calls_per_minute: float = 60.0,
+        dry_run: bool = False,
+        job: str = "default",
+    ):
+        self.db = db
+        self.embedder = embedder
+        self.merger = merger
+        self.similarity_threshold = similarity_threshold
+        self.page_size = page_size
+        self.concurrency = concurrency
+        self.limiter = RateLimiter(max_calls_per_minute)
+        self.dry_run = dry_run
+        self.job = job
+        self.stats = MemoryConsolidationStats()
+        # PostgresDb reflects its tables into shared metadata on first use, which is not safe across threads
+        self._db_lock = asyncio.Lock()
+        self.checkpoints = Table(
+            "memory_consolidation_checkpoint",
+            MetaData(schema=db.db_schema),
+            Column("job", String, primary_key=True),
+            Column("after_user_id", String),
+            Column("stats", postgresql.JSONB),
+            Column("updated_at", DateTime(timezone=True), server_default=func.now(), onupdate=func.now()),
+        )
+
+    @property
+    def memory_table(self) -> str:
+        return f"{self.db.db_schema}.{self.db.memory_table_name}"
+
+    async def _db(self, fn: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+        async with self._db_lock:
+            return await asyncio.to_thread(fn, *args, **kwargs)
+
+    # ============================================================================
+    # Checkpoint
+    # ============================================================================
+    def _load_checkpoint(self) -> Optional[str]:
+        """Return the last finished user of an interrupted run, restoring the stats of that run."""
+        self.checkpoints.create(self.db.db_engine, checkfirst=True)
+        with self.db.db_engine.connect() as conn:
+            row = conn.execute(self.checkpoints.select().where(self.checkpoints.c.job == self.job)).first()
+        if row is None or row.after_user_id is None:
+            return None
+        fields = MemoryConsolidationStats.__dataclass_fields__
+        self.stats = MemoryConsolidationStats(**{k: v for k, v in (row.stats or {}).items() if k in fields})
+        return row.after_user_id
+
+    def _save_checkpoint(self, after_user_id: Optional[str]) -> None:
+        values = {"job": self.job, "after_user_id": after_user_id, "stats": self.stats.to_dict()}
+        stmt = postgresql.insert(self.checkpoints).values(values)
+        with self.db.db_engine.begin() as conn:
+            conn.execute(stmt.on_conflict_do_update(index_elements=["job"], set_={**values, "updated_at": func.now()}))
+
+    def _user_page(self, after_user_id: Optional[str]) -> List[str]:
+        with self.db.db_engine.connect() as conn:
+            rows = conn.execute(
+                text(
+                    f"SELECT DISTINCT user_id FROM {self.memory_table} "
+                    f"WHERE user_id IS NOT NULL AND (CAST(:after AS TEXT) IS NULL OR user_id > :after) "
+                    f"ORDER BY user_id LIMIT :limit"
+                ),
+                {"after": after_user_id, "limit": self.page_size},
+            ).all()
+        return [row.user_id for row in rows]
+
+    # ============================================================================
+    # Consolidation
+    # ============================================================================
+    async def _merge_cluster(self, user_id: str, cluster: List[UserMemory]) -> int:
+        """Replace the cluster with its merged memories, returning the number of memories removed."""
+        await self.limiter.wait()
+        started = time.perf_counter()
+        self.stats.model_calls += 1
+        try:
+            merged = await self.merger(cluster)
+        except Exception as e:  # noqa: BLE001 - one failed merge must not stop the job
+            logger.warning(f"Merging memories of user {user_id} failed: {e!r}")
+            merged = None
+        self.stats.merge_time += time.perf_counter() - started
+        if merged is None:
+            self.stats.failed_clusters += 1
+            return 0
+        # Keep the agent or team a memory belongs to when the whole cluster shares it, so per-agent filters still match
+        agent_ids = {m.agent_id for m in cluster}
+        team_ids = {m.team_id for m in cluster}
+        agent_id = agent_ids.pop() if len(agent_ids) == 1 else None
+        team_id = team_ids.pop() if len(team_ids) == 1 else None
+        for memory in merged:
+            memory.memory_id = str(uuid4())
+            memory.user_id = user_id
+            memory.agent_id = agent_id
+            memory.team_id = team_id
+            memory.input = f"Consolidated from {len(cluster)} memories"
+        # Write the merged memories first: an interrupted job leaves duplicates for the next run, never gaps
+        await self._db(self.db.upsert_memories, merged)
+        await self._db(self.db.delete_user_memories, [m.memory_id for m in cluster if m.memory_id], user_id)
+        self.stats.tokens_after -= memory_tokens(cluster) - memory_tokens(merged)
+        return len(cluster) - len(merged)
+
+    async def _embed(self, texts: List[str]) -> List[List[float]]:
+        embedder: Any = self.embedder
+        if hasattr(embedder, "async_get_embeddings_batch_and_usage"):
+            embeddings, _ = await embedder.async_get_embeddings_batch_and_usage(texts)
+            return embeddings
+        return await asyncio.gather(*[embedder.async_get_embedding(t) for t in texts])
+
+    async def consolidate_user(self, user_id: str) -> None:
+        memories = await self._db(self.db.get_user_memories, user_id=user_id, sort_by="created_at", sort_order="asc")
+        memories = [m for m in memories or [] if isinstance(m, UserMemory) and m.memory]
+        self.stats.users += 1
+        self.stats.memories_before += len(memories)
+        tokens = memory_tokens(memories)
+        self.stats.tokens_before += tokens
+        self.stats.tokens_after += tokens
+        if len(memories) < 2:
+            self.stats.memories_after += len(memories)
+            return
+
+        started = time.perf_counter()
+        embeddings = await self._embed([m.memory for m in memories])
+        self.stats.embed_time += time.perf_counter() - started
+        clusters = cluster_near_duplicates(np.asarray(embeddings, dtype=np.float32), self.similarity_threshold)
+        self.stats.clusters += len(clusters)
+        if self.dry_run or not clusters:
+            self.stats.memories_after += len(memories)
+            return
+        removed = await asyncio.gather(
+            *[self._merge_cluster(user_id, [memories[i] for i in cluster]) for cluster in clusters]
+        )
+        self.stats.memories_after += len(memories) - sum(removed)
+
+    async def run(self, restart: bool = False, max_pages: Optional[int] = None) -> MemoryConsolidationStats:
+        """
+        Consolidate the memories of all users, resuming after the last checkpoint unless `restart` is set.
+
+        Args:
+            restart (bool): Start from the first user, ignoring the checkpoint.
+            max_pages (Optional[int]): Stop after this many pages of users. The next run resumes from there.
+        """
+        after_user_id = await asyncio.to_thread(self._load_checkpoint)
+        if restart:
+            after_user_id, self.stats = None, MemoryConsolidationStats()
+        if after_user_id is not None:
+            log_info(f"Resuming memory consolidation after user {after_user_id}")
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        async def consolidate(user_id: str) -> None:
+            async with semaphore:
+                await self.consolidate_user(user_id)
+
+        pages = 0
+        while users := await asyncio.to_thread(self._user_page, after_user_id):
+            await asyncio.gather(*[consolidate(user_id) for user_id in users])
+            after_user_id = users[-1]
+            pages += 1
+            if not self.dry_run:
+                await asyncio.to_thread(self._save_checkpoint, after_user_id)
+            log_debug(f"Consolidated memories of {self.stats.users} users")
+            if max_pages is not None and pages >= max_pages:
+                return self.stats
+        if not self.dry_run:
+            # Done: the next run starts from the first user again
+            await asyncio.to_thread(self._save_checkpoint, None)
+        return self.stats
+
+
+def consolidate_memories(
+    similarity_threshold: float = 0.85,
+    page_size: int = 50,
+    max_calls_per_minute: float = 60.0,
+    dry_run: bool = False,
+    restart: bool = False,
+    max_pages: Optional[int] = None,
+) -> MemoryConsolidationStats:
+    """Consolidate the memories stored in `demo_db` with the OpenAI embedder and model."""
+    from agno.knowledge.embedder.openai import OpenAIEmbedder
+
+    from agents.admission import install_admission, priority
+    from db.demo_db import demo_db
+    from knowledge.embedding_cache import CachedEmbedder
+
+    consolidator = MemoryConsolidator(
+        db=demo_db,
+        embedder=CachedEmbedder(
+            embedder=OpenAIEmbedder(id="text-embedding-3-small"),
+            db_engine=demo_db.db_engine,
+            table_name="memory_embedding_cache",
+        ),
+        merger=model_merger(),
+        similarity_threshold=similarity_threshold,
+        page_size=page_size,
+        max_calls_per_minute=max_calls_per_minute,
+        dry_run=dry_run,
+    )
+    # Within the provider's rate limits shared with the AgentOS (ADMISSION_SHARED), after its runs
+    install_admission()
+    try:
+        with priority("background"):
+            return asyncio.run(consolidator.run(restart=restart, max_pages=max_pages))
+    except SQLAlchemyError as e:
+        logger.error(f"Memory consolidation stopped, rerun it to resume: {e}")
+        raise
+
+
+if __name__ == "__main__":
+    import argparse
+    import json
+    import random
+
+    parser = argparse.ArgumentParser(description="Merge near-duplicate user memories")
+    parser.add_argument("--threshold", type=float, default=0.85, help="Cosine similarity of near-duplicates")
+    parser.add_argument("--page-size", type=int, default=50, help="Users per checkpoint")
+    parser.add_argument("--max-pages", type=int, help="Stop after this many pages, the next run resumes")
+    parser.add_argument("--max-calls-per-minute", type=float, default=60.0)
+    parser.add_argument("--dry-run", action="store_true", help="Count the clusters without merging them")
+    parser.add_argument("--restart", action="store_true", help="Ignore the checkpoint")
+    parser.add_argument("--benchmark", action="store_true", help="Run on synthetic memories, offline")
+    parser.add_argument("--users", type=int, default=50, help="Synthetic users of the benchmark")
+    args = parser.parse_args()
+
+    if not args.benchmark:
+        stats = consolidate_memories(
+            similarity_threshold=args.threshold,
+            page_size=args.page_size,
+            max_calls_per_minute=args.max_calls_per_minute,
+            dry_run=args.dry_run,
+            restart=args.restart,
+            max_pages=args.max_pages,
+        )
+        print(json.dumps(stats.to_dict(), indent=2))
+        raise SystemExit(0)
+
+    from db.pool import get_engine
+    from knowledge.embedders import StubEmbedder
+
+    FACTS = [
+        ["User likes green tea", "The user likes drinking green tea", "User likes green tea in the morning"],
+        ["User works as a data engineer", "The user works as a data engineer at a bank", "User is a data engineer"],
+        ["User lives in Berlin", "The user lives in Berlin, Germany", "User recently moved to Berlin"],
+        ["User prefers metric units", "The user prefers metric units for all answers"],
+        ["User invests in index funds", "The user mostly invests in index funds", "User holds index funds"],
+        ["User has two children", "The user has two children"],
+        ["User is learning Rust", "The user is learning the Rust programming language"],
+        ["User follows NVDA and AMD stocks", "The user follows NVDA stock", "The user follows AMD stock"],
+        ["User prefers short answers with tables", "The user prefers short answers"],
+        ["User runs marathons", "The user trains for a marathon in the spring"],
+    ]
+
+    async def keep_longest(memories: List[UserMemory]) -> Optional[List[UserMemory]]:
+        """Stands in for the model: keeps the most detailed memory of the cluster."""
+        return [UserMemory(memory=max((m.memory for m in memories), key=len))]
+
+    async def main() -> None:
+        db = PostgresDb(db_engine=get_engine(), memory_table="memory_consolidation_bench")
+        rng = random.Random(7)
+        memories = []
+        for u in range(args.users):
+            for variants in rng.sample(FACTS, k=6):
+                memories += [
+                    UserMemory(memory=v, user_id=f"user-{u:04d}", memory_id=str(uuid4()))
+                    for v in rng.sample(variants, k=rng.randint(1, len(variants)))
+                ]
+        db.upsert_memories(memories)
+        consolidator = MemoryConsolidator(
+            db=db,
+            embedder=StubEmbedder(),
+            merger=keep_longest,
+            similarity_threshold=args.threshold,
+            page_size=args.page_size,
+            max_calls_per_minute=0,
+            job="benchmark",
+        )
+        try:
+            # Stop after one page and resume, as an interrupted job would
+            await consolidator.run(restart=True, max_pages=1)
+            resumed_after = await asyncio.to_thread(consolidator._load_checkpoint)
+            stats = await consolidator.run()
+            print(f"resumed after {resumed_after}")
+            print(json.dumps(stats.to_dict(), indent=2))
+        finally:
+            consolidator.checkpoints.create(db.db_engine, checkfirst=True)
+            with db.db_engine.begin() as conn:
+                conn.execute(text(f"DROP TABLE IF EXISTS {consolidator.memory_table}"))
+                conn.execute(consolidator.checkpoints.delete().where(consolidator.checkpoints.c.job == "benchmark"))
+
+    asyncio.run(main())
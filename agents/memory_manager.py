@@ -1,8 +1,9 @@
 from textwrap import dedent
 
 from agno.agent import Agent
-from agno.models.anthropic import Claude
 
+from agents.history import history_settings
+from agents.prompt_cache import CachedClaude
 from db.demo_db import demo_db
 
 # ============================================================================
@@ -29,13 +30,22 @@ instructions = dedent(
 # ============================================================================
 memory_manager = Agent(
     name="Memory Manager",
-    model=Claude(id="claude-sonnet-4-5"),
+    model=CachedClaude(id="claude-sonnet-4-5"),
     description=description,
     instructions=instructions,
-    add_history_to_context=True,
+    **history_settings(num_history_runs=10),
     add_datetime_to_context=True,
     enable_agentic_memory=True,
-    num_history_runs=10,
     markdown=True,
     db=demo_db,
 )
+
+if __name__ == "__main__":
+    import sys
+
+    if "--consolidate" in sys.argv:
+        # Merge near-duplicate memories of all users, resuming an interrupted run
+        from agents.memory_consolidation import consolidate_memories
+
+        stats = consolidate_memories(dry_run="--dry-run" in sys.argv, restart="--restart" in sys.argv)
+        print(stats.to_dict())
@@ -0,0 +1,504 @@
+"""
+Background queue for agentic memory updates.
+
+With `enable_agentic_memory`, the model calls `update_user_memory`, and the memory manager runs a second model call
+and its database writes before the run can continue. In the "queued" memory mode (`MEMORY_MODE`, the default) the
+agents use a `QueuedMemoryManager`, which stores the task in a Postgres table and returns right away. A worker
+started in the AgentOS lifespan then applies the tasks:
+
+- Pending tasks are claimed with `FOR UPDATE SKIP LOCKED`, so several processes can share the queue, and tasks
+  left running by a stopped process are claimed again after `lease` seconds.
+- A process claims the tasks of a user under a per-user advisory lock, and only if no task of the user is running,
+  so the updates of a user never run concurrently, in one process or across processes.
+- All the pending tasks of a user are coalesced into a single memory update, and users are updated with bounded
+  concurrency. The update is applied by the agents' own memory manager (`queued_memory_manager`).
+- Failed updates are retried with backoff, up to `max_attempts` times.
+
+Queue depth and lag are available from `memory_queue.depth()` and `memory_queue.stats`.
+
+Usage:
+    python -m agents.memory_queue --status
+    python -m agents.memory_queue --drain
+    python -m agents.memory_queue --benchmark --requests 200 --concurrency 8
+"""
+
+import asyncio
+import time
+from dataclasses import dataclass
+from os import getenv
+from typing import Any, Dict, List, Optional
+
+from agno.memory import MemoryManager
+from agno.models.openai import OpenAIChat
+from agno.utils.log import log_debug, log_info, log_warning, logger
+from sqlalchemy import BigInteger, Column, DateTime, Index, Integer, MetaData, String, Table, Text, func, text
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.sql.expression import insert
+
+from agents.admission import priority
+from db.demo_db import demo_db
+
+# "queued" applies agentic memory updates in the background, "inline" applies them during the run
+MEMORY_MODE = getenv("MEMORY_MODE", "queued")
+MEMORY_MODEL = getenv("MEMORY_MODEL", "gpt-5-mini")
+MEMORY_QUEUE_CONCURRENCY = int(getenv("MEMORY_QUEUE_CONCURRENCY", "4"))
+
+QUEUED_RESPONSE = "Memory update queued, it will be saved in the background in a few seconds."
+# First key of the per-user advisory locks taken while claiming, the second one is the hash of the user id
+CLAIM_LOCK_KEY = 0x4D454D51
+
+
+@dataclass
+class MemoryQueueStats:
+    enqueued: int = 0
+    enqueue_failures: int = 0
+    applied_jobs: int = 0
+    # Memory updates run, each covering all the jobs of a user that were pending
+    batches: int = 0
+    failed_batches: int = 0
+    apply_time: float = 0.0
+    # Seconds from enqueueing a job to its memory update
+    lag_total: float = 0.0
+    max_lag: float = 0.0
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "enqueued": self.enqueued,
+            "enqueue_failures": self.enqueue_failures,
+            "applied_jobs": self.applied_jobs,
+            "batches": self.batches,
+            "failed_batches": self.failed_batches,
+            "avg_apply_ms": round(self.apply_time / self.batches * 1000, 3) if self.batches else 0.0,
+            "avg_lag_ms": round(self.lag_total / self.applied_jobs * 1000, 3) if self.applied_jobs else 0.0,
+            "max_lag_ms": round(self.max_lag * 1000, 3),
+        }
+
+
+@dataclass
+class MemoryJob:
+    id: int
+    user_id: str
+    task: str
+    # Seconds the job waited in the queue before it was claimed
+    lag: float
+
+
+def coalesce_tasks(tasks: List[str]) -> str:
+    """Merge the pending tasks of a user into one, keeping their order and dropping repeats."""
+    unique = list(dict.fromkeys(task.strip() for task in tasks))
+    if len(unique) == 1:
+        return unique[0]
+    steps = "\n".join(f"{i}. {task}" for i, task in enumerate(unique, start=1))
+    return f"Apply the following memory updates in order. When they conflict, the later update wins.\n{steps}"
+
+
+class MemoryQueue:
+    """
+    Postgres-backed queue of memory tasks, applied by an in-process worker.
+
+    Args:
+        db_engine (Engine): Engine of the database, usually `demo_db.db_engine`.
+        memory_manager (Optional[MemoryManager]): Memory manager that applies the tasks. A `QueuedMemoryManager`
+            applies them without queueing them again. Must be set before the worker starts.
+        concurrency (int): Maximum number of users updated at the same time.
+        poll_interval (float): Seconds between checks for jobs enqueued by other processes.
+        lease (float): Seconds after which a running job is considered abandoned and claimed again.
+        max_attempts (int): Attempts before a job is marked as failed.
+        retry_delay (float): Delay before the first retry, doubled on each attempt.
+        table_name (str): Name of the queue table.
+        schema (str): Schema of the queue table.
+    """
+
+    def __init__(
+        self,
+        db_engine: Engine,
+        memory_manager: Optional[MemoryManager] = None,
+        concurrency: int = 4,
+        poll_interval: float = 1.0,
+        lease: float = 300.0,
+        max_attempts: int = 3,
+        retry_delay: float = 5.0,
+        table_name: str = "memory_jobs",
+        schema: str = "ai",
+    ):
+        self.db_engine = db_engine
+        self.memory_manager = memory_manager
+        self.concurrency = concurrency
+        self.poll_interval = poll_interval
+        self.lease = lease
+        self.max_attempts = max_attempts
+        self.retry_delay = retry_delay
+        self.schema = schema
+        self.stats = MemoryQueueStats()
+        self.table = Table(
+            table_name,
+            MetaData(schema=schema),
+            Column("id", BigInteger, primary_key=True, autoincrement=True),
+            Column("user_id", String, nullable=False),
+            Column("task", Text, nullable=False),
+            Column("status", String, nullable=False, server_default="pending"),
+            Column("attempts", Integer, nullable=False, server_default="0"),
+            Column("error", Text),
+            Column("enqueued_at", DateTime(timezone=True), nullable=False, server_default=func.now()),
+            Column("available_at", DateTime(timezone=True), nullable=False, server_default=func.now()),
+            Column("started_at", DateTime(timezone=True)),
+            Index(f"idx_{table_name}_status_user", "status", "user_id"),
+        )
+        self._table_ready = False
+        self._task: Optional["asyncio.Task[None]"] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._wake: Optional[asyncio.Event] = None
+        self._in_flight: Dict[str, "asyncio.Task[None]"] = {}
+        self._stopping = False
+
+    @property
+    def qualified_name(self) -> str:
+        return f"{self.schema}.{self.table.name}"
+
+    def _ensure_table(self) -> None:
+        if not self._table_ready:
+            with self.db_engine.begin() as conn:
+                conn.execute(text(f"CREATE SCHEMA IF NOT EXISTS {self.schema};"))
+            self.table.create(self.db_engine, checkfirst=True)
+            self._table_ready = True
+
+    # ============================================================================
+    # Producer
+    # ============================================================================
+    def enqueue(self, user_id: str, task: str) -> None:
+        self._ensure_table()
+        with self.db_engine.begin() as conn:
+            conn.execute(insert(self.table).values(user_id=user_id, task=task))
+        self.stats.enqueued += 1
+        # Wake the worker up instead of waiting for the next poll. Tools may run outside the event loop thread
+        if self._loop is not None and self._wake is not None and not self._loop.is_closed():
+            self._loop.call_soon_threadsafe(self._wake.set)
+
+    def depth(self) -> Dict[str, Any]:
+        """Jobs per status and the age in seconds of the oldest pending job."""
+        self._ensure_table()
+        with self.db_engine.connect() as conn:
+            rows = conn.execute(
+                text(
+                    f"SELECT status, count(*), extract(epoch FROM now() - min(enqueued_at)) "
+                    f"FROM {self.qualified_name} GROUP BY status"
+                )
+            ).all()
+        counts = {status: count for status, count, _ in rows}
+        oldest = {status: age for status, _, age in rows}
+        return {
+            "pending": counts.get("pending", 0),
+            "running": counts.get("running", 0),
+            "failed": counts.get("failed", 0),
+            "oldest_pending_seconds": round(float(oldest.get("pending") or 0.0), 3),
+        }
+
+    # ============================================================================
+    # Worker
+    # ============================================================================
+    def _claim(self, max_users: int) -> List[MemoryJob]:
+        """Claim all pending jobs of up to `max_users` users that have no job running."""
+        self._ensure_table()
+        with self.db_engine.begin() as conn:
+            # Jobs of a process that stopped while applying them go back to the queue
+            conn.execute(
+                text(
+                    f"UPDATE {self.qualified_name} SET status = 'pending' "
+                    f"WHERE status = 'running' AND started_at < now() - make_interval(secs => :lease)"
+                ),
+                {"lease": self.lease},
+            )
+            candidates = conn.execute(
+                text(f"""
+                    SELECT user_id FROM {self.qualified_name}
+                    WHERE status = 'pending' AND available_at <= now() AND user_id NOT IN (
+                        SELECT user_id FROM {self.qualified_name} WHERE status = 'running'
+                    )
+                    GROUP BY user_id ORDER BY min(id) LIMIT :max_users
+                """),
+                {"max_users": max_users},
+            ).scalars()
+            # Users being claimed by another process are skipped. The lock is held until this transaction commits
+            users = conn.execute(
+                text(
+                    "SELECT user_id FROM unnest(CAST(:users AS text[])) AS candidates(user_id) "
+                    "WHERE pg_try_advisory_xact_lock(:key, hashtext(user_id))"
+                ),
+                {"users": list(candidates), "key": CLAIM_LOCK_KEY},
+            ).scalars()
+            # A new statement sees the jobs claimed by the processes that held a user's lock before, so a user
+            # whose update started in the meantime is skipped
+            rows = conn.execute(
+                text(f"""
+                    WITH claimed AS (
+                        SELECT id FROM {self.qualified_name} AS pending
+                        WHERE status = 'pending' AND available_at <= now() AND user_id = ANY(:users)
+                        AND NOT EXISTS (
+                            SELECT 1 FROM {self.qualified_name} AS running
+                            WHERE running.user_id = pending.user_id AND running.status = 'running'
+                        )
+                        FOR UPDATE SKIP LOCKED
+                    )
+                    UPDATE {self.qualified_name} AS jobs
+                    SET status = 'running', started_at = now(), attempts = jobs.attempts + 1
+                    FROM claimed WHERE jobs.id = claimed.id
+                    RETURNING jobs.id, jobs.user_id, jobs.task, extract(epoch FROM now() - jobs.enqueued_at) AS lag
+                """),
+                {"users": list(users)},
+            ).all()
+        jobs = [MemoryJob(id=row.id, user_id=row.user_id, task=row.task, lag=float(row.lag)) for row in rows]
+        return sorted(jobs, key=lambda job: job.id)
+
+    def _complete(self, jobs: List[MemoryJob]) -> None:
+        with self.db_engine.begin() as conn:
+            conn.execute(text(f"DELETE FROM {self.qualified_name} WHERE id = ANY(:ids)"), {"ids": [j.id for j in jobs]})
+
+    def _fail(self, jobs: List[MemoryJob], error: str) -> None:
+        """Put the jobs back in the queue with exponential backoff, or mark them failed after `max_attempts`."""
+        with self.db_engine.begin() as conn:
+            conn.execute(
+                text(f"""
+                    UPDATE {self.qualified_name}
+                    SET status = CASE WHEN attempts >= :max_attempts THEN 'failed' ELSE 'pending' END,
+                        available_at = now() + make_interval(secs => :delay * power(2, attempts - 1)),
+                        error = :error
+                    WHERE id = ANY(:ids)
+                """),
+                {
+                    "ids": [j.id for j in jobs],
+                    "max_attempts": self.max_attempts,
+                    "delay": self.retry_delay,
+                    "error": error,
+                },
+            )
+
+    async def _apply(self, user_id: str, jobs: List[MemoryJob]) -> None:
+        started = time.perf_counter()
+        try:
+            # Behind the interactive and workflow runs for the provider's rate limits, see agents/admission.py
+            task = coalesce_tasks([j.task for j in jobs])
+            with priority("background"):
+                if isinstance(self.memory_manager, QueuedMemoryManager):
+                    await self.memory_manager.aapply_memory_task(task=task, user_id=user_id)
+                else:
+                    await self.memory_manager.aupdate_memory_task(task=task, user_id=user_id)  # type: ignore[union-attr]
+        except Exception as e:  # noqa: BLE001 - a failed update must go back to the queue, whatever the cause
+            self.stats.failed_batches += 1
+            log_warning(f"Memory update for user {user_id} failed: {e!r}")
+            await asyncio.to_thread(self._fail, jobs, repr(e))
+            return
+        elapsed = time.perf_counter() - started
+        await asyncio.to_thread(self._complete, jobs)
+        self.stats.batches += 1
+        self.stats.applied_jobs += len(jobs)
+        self.stats.apply_time += elapsed
+        for job in jobs:
+            lag = job.lag + elapsed
+            self.stats.lag_total += lag
+            self.stats.max_lag = max(self.stats.max_lag, lag)
+        log_debug(f"Applied {len(jobs)} memory jobs for user {user_id} in {elapsed * 1000:.1f}ms")
+
+    async def run_once(self) -> int:
+        """Claim the jobs of as many users as there are free slots and start applying them. Returns the jobs claimed."""
+        free = self.concurrency - len(self._in_flight)
+        if free <= 0:
+            return 0
+        jobs = await asyncio.to_thread(self._claim, free)
+        by_user: Dict[str, List[MemoryJob]] = {}
+        for job in jobs:
+            by_user.setdefault(job.user_id, []).append(job)
+        for user_id, user_jobs in by_user.items():
+            task = asyncio.create_task(self._apply(user_id, user_jobs), name=f"memory-update-{user_id}")
+            self._in_flight[user_id] = task
+            task.add_done_callback(lambda _, user_id=user_id: self._on_done(user_id))  # type: ignore[misc]
+        return len(jobs)
+
+    def _on_done(self, user_id: str) -> None:
+        self._in_flight.pop(user_id, None)
+        if self._wake is not None:
+            # A slot is free, and the user may have new jobs that could not be claimed while this one ran
+            self._wake.set()
+
+    async def drain(self) -> None:
+        """Apply jobs until the queue has no pending job that can be claimed."""
+        while await self.run_once() or self._in_flight:
+            if self._in_flight:
+                await asyncio.wait(list(self._in_flight.values()), return_when=asyncio.FIRST_COMPLETED)
+
+    async def _run(self) -> None:
+        assert self._wake is not None
+        while not self._stopping:
+            self._wake.clear()
+            try:
+                await self.run_once()
+            except SQLAlchemyError as e:
+                logger.warning(f"Memory queue poll failed: {e}")
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout=self.poll_interval)
+            except asyncio.TimeoutError:
+                pass
+
+    async def start(self) -> None:
+        if self._task is not None:
+            return
+        if self.memory_manager is None:
+            raise RuntimeError("The memory queue has no memory manager to apply the tasks with")
+        self._stopping = False
+        self._loop = asyncio.get_running_loop()
+        self._wake = asyncio.Event()
+        self._task = asyncio.create_task(self._run(), name="memory-queue")
+        log_info(f"Started memory queue worker ({self.concurrency} concurrent users)")
+
+    async def stop(self, timeout: float = 10.0) -> None:
+        """Stop claiming jobs and wait up to `timeout` seconds for the running updates. The rest stay queued."""
+        self._stopping = True
+        if self._wake is not None:
+            self._wake.set()
+        if self._task is not None:
+            await self._task
+            self._task = None
+        if self._in_flight:
+            _, pending = await asyncio.wait(list(self._in_flight.values()), timeout=timeout)
+            for task in pending:
+                task.cancel()
+        self._loop = None
+        log_debug("Stopped memory queue worker")
+
+
+class QueuedMemoryManager(MemoryManager):
+    """
+    Memory manager whose `update_user_memory` tool queues the task instead of applying it during the run.
+
+    Memories are still read from the database when the agent builds its context. If the task cannot be queued, it is
+    applied right away. The worker of the queue applies the queued tasks with `aapply_memory_task` of the same
+    manager, so they run with the model and settings of the agents.
+
+    Args:
+        queue (MemoryQueue): Queue the tasks are added to.
+    """
+
+    def __init__(self, queue: MemoryQueue, **kwargs: Any):
+        super().__init__(**kwargs)
+        self.queue = queue
+
+    def update_memory_task(self, task: str, user_id: Optional[str] = None) -> str:
+        try:
+            self.queue.enqueue(user_id=user_id or "default", task=task)
+        except SQLAlchemyError as e:
+            self.queue.stats.enqueue_failures += 1
+            logger.warning(f"Queueing memory update failed, applying it now: {e}")
+            return super().update_memory_task(task=task, user_id=user_id)
+        return QUEUED_RESPONSE
+
+    async def aupdate_memory_task(self, task: str, user_id: Optional[str] = None) -> str:
+        try:
+            await asyncio.to_thread(self.queue.enqueue, user_id or "default", task)
+        except SQLAlchemyError as e:
+            self.queue.stats.enqueue_failures += 1
+            logger.warning(f"Queueing memory update failed, applying it now: {e}")
+            return await super().aupdate_memory_task(task=task, user_id=user_id)
+        return QUEUED_RESPONSE
+
+    async def aapply_memory_task(self, task: str, user_id: Optional[str] = None) -> str:
+        """Apply a task now, as the worker of the queue does."""
+        return await super().aupdate_memory_task(task=task, user_id=user_id)
+
+
+memory_queue = MemoryQueue(demo_db.db_engine, concurrency=MEMORY_QUEUE_CONCURRENCY)
+# Shared by the agents and teams, and applies the tasks they queue
+queued_memory_manager = QueuedMemoryManager(queue=memory_queue, model=OpenAIChat(id=MEMORY_MODEL), db=demo_db)
+memory_queue.memory_manager = queued_memory_manager
+
+
+def memory_settings() -> Dict[str, Any]:
+    """Agent or Team arguments for agentic memory in the mode set in `MEMORY_MODE`."""
+    if MEMORY_MODE == "inline":
+        return {"enable_agentic_memory": True}
+    if MEMORY_MODE != "queued":
+        raise ValueError(f"Unknown memory mode: {MEMORY_MODE}")
+    return {
+        "enable_agentic_memory": True,
+        "memory_manager": queued_memory_manager,
+    }
+
+
+if __name__ == "__main__":
+    import argparse
+    import json
+    import random
+    from statistics import quantiles
+
+    parser = argparse.ArgumentParser(description="Inspect the memory queue, or compare inline and queued updates")
+    parser.add_argument("--status", action="store_true", help="Print the queue depth")
+    parser.add_argument("--drain", action="store_true", help="Apply all pending jobs now")
+    parser.add_argument("--benchmark", action="store_true", help="Simulate runs with a stub memory manager")
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=8, help="Concurrent simulated runs")
+    parser.add_argument("--users", type=int, default=20)
+    parser.add_argument("--memory-rate", type=float, default=0.4, help="Share of runs that update memory")
+    parser.add_argument("--run-latency", type=float, default=0.3, help="Median seconds of a run without memory")
+    parser.add_argument("--memory-latency", type=float, default=0.5, help="Median seconds of a memory update")
+    args = parser.parse_args()
+
+    if args.status:
+        print(json.dumps(memory_queue.depth(), indent=2))
+    if args.drain:
+        asyncio.run(memory_queue.drain())
+        print(json.dumps(memory_queue.stats.to_dict(), indent=2))
+    if not args.benchmark:
+        raise SystemExit(0)
+
+    class StubMemoryManager(MemoryManager):
+        """Stands in for the memory model and its writes."""
+
+        async def aupdate_memory_task(self, task: str, user_id: Optional[str] = None) -> str:
+            await asyncio.sleep(random.lognormvariate(0, 0.5) * args.memory_latency)
+            return "Memory updated"
+
+    def simulated_runs() -> List[Optional[str]]:
+        """The user of each run that updates memory, None for the others"""
+        rng = random.Random(7)
+        return [
+            f"user-{rng.randrange(args.users)}" if rng.random() < args.memory_rate else None
+            for _ in range(args.requests)
+        ]
+
+    async def measure(manager: MemoryManager) -> List[float]:
+        semaphore = asyncio.Semaphore(args.concurrency)
+
+        async def run(user_id: Optional[str]) -> float:
+            async with semaphore:
+                started = time.perf_counter()
+                await asyncio.sleep(random.lognormvariate(0, 0.5) * args.run_latency)
+                if user_id is not None:
+                    await manager.aupdate_memory_task(task=f"Remember a preference of {user_id}", user_id=user_id)
+                return time.perf_counter() - started
+
+        return list(await asyncio.gather(*[run(user_id) for user_id in simulated_runs()]))
+
+    def report(label: str, latencies: List[float]) -> None:
+        p = quantiles(latencies, n=100)
+        print(f"{label:<8} p50={p[49] * 1000:7.1f}ms p95={p[94] * 1000:7.1f}ms p99={p[98] * 1000:7.1f}ms")
+
+    async def main() -> None:
+        print(f"{args.requests} runs, {args.concurrency} concurrent, {args.memory_rate:.0%} with a memory update")
+        report("inline", await measure(StubMemoryManager()))
+
+        queue = MemoryQueue(
+            demo_db.db_engine, StubMemoryManager(), concurrency=MEMORY_QUEUE_CONCURRENCY, table_name="memory_jobs_bench"
+        )
+        await queue.start()
+        try:
+            report("queued", await measure(QueuedMemoryManager(queue=queue)))
+            print(f"depth after the runs: {queue.depth()}")
+            started = time.perf_counter()
+            while queue.depth()["pending"] or queue.depth()["running"]:
+                await asyncio.sleep(0.05)
+            print(f"queue drained {time.perf_counter() - started:.2f}s after the last run")
+            print(queue.stats.to_dict())
+        finally:
+            await queue.stop()
+            queue.table.drop(queue.db_engine, checkfirst=True)
+
+    asyncio.run(main())
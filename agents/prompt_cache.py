@@ -0,0 +1,203 @@
+"""
+Anthropic prompt caching for the Claude agents and teams.
+
+Anthropic caches a request prefix up to a `cache_control` breakpoint, in the order tools, system, messages, and
+reuses it only when the next request starts with the same bytes. agno sends the system message as one block, and
+with `add_datetime_to_context` the current time sits in `<additional_information>`, ahead of the tool instructions
+and right after the description and instructions. No two runs share a prefix then, so nothing is ever read back.
+
+`CachedClaude` lays the system message out for the cache:
+- A stable block with the description, role, instructions, additional information without the time, tool
+  instructions and expected output, ending with the breakpoint. Together with the tool schemas in front of it,
+  this is the cached prefix.
+- A volatile block after it with the current time, the user's memories, the session summary and session state.
+  The history and the new message follow in `messages`.
+
+The cache reads and writes of every model call are in the run metrics (`cache_read_tokens`, `cache_write_tokens`)
+and in `agentos_model_tokens_total` of app/telemetry.py.
+
+    PROMPT_CACHE        Set to false to send the system message as agno does, without breakpoint (default true)
+    PROMPT_CACHE_TTL    "5m" or "1h" (default 5m). The 1 hour cache costs more to write
+
+Usage:
+    python -m agents.prompt_cache --check            # the app's Claude agents and teams, needs Postgres
+    python -m agents.prompt_cache --check --offline  # an in-memory agent with the same volatile sections, no Postgres
+"""
+
+import hashlib
+import json
+import re
+from dataclasses import dataclass
+from os import getenv
+from typing import Any, Dict, List, Optional, Tuple, Type, Union
+
+from agno.models.anthropic import Claude
+from pydantic import BaseModel
+
+PROMPT_CACHE = getenv("PROMPT_CACHE", "true").lower() in ("1", "true", "yes")
+PROMPT_CACHE_TTL = getenv("PROMPT_CACHE_TTL", "5m")
+
+# Start of the sections agno adds per user or session, in the order it adds them
+VOLATILE_SECTIONS = (
+    "You have access to user info and preferences from previous interactions",
+    "You have the capability to retain memories from previous interactions",
+    "<memories_from_previous_interactions>",
+    "Here is a brief summary of your previous interactions",
+    "<summary_of_previous_interactions>",
+    "\n<session_state>",
+)
+# Lines of <additional_information> that change on every run
+VOLATILE_INFORMATION = re.compile(r"\n- (?:The current time is |Your approximate location is: )[^\n]*")
+EMPTY_INFORMATION = "<additional_information>\n</additional_information>\n\n"
+
+
+def split_system_message(system_message: str) -> Tuple[str, str]:
+    """Split an agno system message into the part shared by every run and the part specific to this run."""
+    volatile_lines = [match.group(0).lstrip("\n") for match in VOLATILE_INFORMATION.finditer(system_message)]
+    stable = VOLATILE_INFORMATION.sub("", system_message).replace(EMPTY_INFORMATION, "")
+    starts = [index for index in (stable.find(section) for section in VOLATILE_SECTIONS) if index >= 0]
+    split = min(starts, default=len(stable))
+    volatile = "\n".join(volatile_lines)
+    if stable[split:].strip():
+        volatile = f"{volatile}\n\n{stable[split:]}" if volatile else stable[split:]
+    return stable[:split], volatile
+
+
+def prefix_hash(request: Dict[str, Any]) -> str:
+    """Hash of the tools and system blocks up to the first breakpoint, i.e. the prefix Anthropic caches."""
+    blocks: List[Any] = [*(request.get("tools") or [])]
+    for block in request.get("system") or []:
+        blocks.append({key: value for key, value in block.items() if key != "cache_control"})
+        if "cache_control" in block:
+            break
+    return hashlib.sha256(json.dumps(blocks, sort_keys=True).encode()).hexdigest()[:16]
+
+
+@dataclass
+class CachedClaude(Claude):
+    """
+    `Claude` that sends the system message as a cached stable block followed by a volatile block.
+
+    Args:
+        cache_breakpoints (bool): Split the system message and cache its stable part. Defaults to `PROMPT_CACHE`.
+    """
+
+    cache_breakpoints: bool = PROMPT_CACHE
+    extended_cache_time: Optional[bool] = PROMPT_CACHE_TTL == "1h"
+
+    def _prepare_request_kwargs(
+        self,
+        system_message: str,
+        tools: Optional[List[Dict[str, Any]]] = None,
+        response_format: Optional[Union[Dict, Type[BaseModel]]] = None,
+    ) -> Dict[str, Any]:
+        request_kwargs = super()._prepare_request_kwargs(system_message, tools=tools, response_format=response_format)
+        if not self.cache_breakpoints or not system_message:
+            return request_kwargs
+
+        stable, volatile = split_system_message(system_message)
+        cache_control = {"type": "ephemeral", "ttl": "1h"} if self.extended_cache_time else {"type": "ephemeral"}
+        system = [{"text": stable, "type": "text", "cache_control": cache_control}]
+        if volatile:
+            system.append({"text": volatile, "type": "text"})
+        request_kwargs["system"] = system
+        return request_kwargs
+
+
+if __name__ == "__main__":
+    import argparse
+    import asyncio
+    from importlib import import_module
+    from uuid import uuid4
+
+    parser = argparse.ArgumentParser(description="Check that the cached prefix is byte-stable across runs")
+    parser.add_argument("--check", action="store_true")
+    parser.add_argument("--runs", type=int, default=3, help="Runs per agent, each for a new user and session")
+    parser.add_argument(
+        "--offline", action="store_true", help="Check an agent with an in-memory db instead of the app's components"
+    )
+    args = parser.parse_args()
+    if not args.check:
+        parser.print_help()
+        raise SystemExit(0)
+
+    from loadtest.mock_provider import MIN_CACHEABLE_TOKENS, MockSettings, serve_mock_provider
+
+    # Without tool calls, so that every run is a single model call
+    provider = serve_mock_provider(MockSettings(ttft=0, tokens=5, token_interval=0, tool_call_rate=0))
+
+    def offline_agent() -> Any:
+        """An agent laid out like the app's: tool schemas, instructions, the time, memories and session state."""
+        from agno.agent import Agent
+        from agno.db.in_memory import InMemoryDb
+
+        from tools.finance import CachedYFinanceTools
+
+        return Agent(
+            name="Offline Cache Check",
+            model=CachedClaude(id="claude-sonnet-4-5"),
+            tools=[CachedYFinanceTools()],
+            description="You are a finance analyst who answers with market data and fundamentals.",
+            instructions=[
+                "Detect the company names and tickers in the question, ask when a ticker is ambiguous.",
+                "Call get_stock_snapshots once with all tickers, then get_comparison_table for the ratios.",
+                "Start with a one-paragraph snapshot, then a table of the key metrics and 3-5 insights.",
+                "Note the data timestamp and source, and say N/A for unavailable metrics.",
+            ],
+            db=InMemoryDb(),
+            add_datetime_to_context=True,
+            add_memories_to_context=True,
+            session_state={"watchlist": []},
+            add_session_state_to_context=True,
+            markdown=True,
+        )
+
+    if args.offline:
+        components = [offline_agent()]
+    else:
+        # Imported once the SDKs point at the mock provider
+        components = [
+            getattr(import_module(module), name)
+            for module, name in (
+                ("agents.agno_knowledge_agent", "agno_knowledge_agent"),
+                ("agents.memory_manager", "memory_manager"),
+                ("agents.youtube_agent", "youtube_agent"),
+                ("teams.finance_team", "finance_team"),
+            )
+        ]
+
+    async def check(component: Any) -> bool:
+        """Run the component for new users and sessions, seconds apart, and compare the prefixes sent."""
+        hashes: List[str] = []
+        tokens: List[int] = []
+        reads: List[int] = []
+        writes: List[int] = []
+        for _ in range(args.runs):
+            seen = len(provider.cache_requests)
+            user_id = f"cache-check-{uuid4().hex[:8]}"
+            if args.offline:
+                from agno.db.schemas import UserMemory
+
+                # A memory per user, so the volatile block differs on every run
+                component.db.upsert_user_memory(UserMemory(memory=f"{user_id} follows semiconductors", user_id=user_id))
+            output = await component.arun("Hello", user_id=user_id, session_id=str(uuid4()))
+            for request in list(provider.cache_requests)[seen:]:
+                hashes.append(request["prefix"])
+                tokens.append(request["tokens"])
+            reads.append(output.metrics.cache_read_tokens)
+            writes.append(output.metrics.cache_write_tokens)
+            await asyncio.sleep(1.1)
+        stable = len(set(hashes)) == 1
+        # Anthropic does not cache a prefix below the minimum, the breakpoint is ignored then
+        cacheable = max(tokens, default=0) >= MIN_CACHEABLE_TOKENS
+        print(
+            f"{component.name:<24} prefix {'stable' if stable else 'CHANGED'} over {len(hashes)} calls "
+            f"(~{max(tokens, default=0)} tokens{'' if cacheable else ', too short to cache'}), "
+            f"cache read tokens per run {reads}, written {writes}"
+        )
+        return stable and (not cacheable or all(reads[1:]))
+
+    async def main() -> bool:
+        return all([await check(component) for component in components])
+
+    raise SystemExit(0 if asyncio.run(main()) else 1)
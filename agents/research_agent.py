@@ -4,6 +4,8 @@ from agno.agent import Agent
 from agno.models.openai import OpenAIChat
 from agno.tools.parallel import ParallelTools
 
+from agents.history import history_settings
+from agents.memory_queue import memory_settings
 from db.demo_db import demo_db
 
 # ============================================================================
@@ -30,9 +32,9 @@ research_agent = Agent(
     model=OpenAIChat(id="gpt-5-mini"),
     tools=[ParallelTools(enable_search=True, enable_extract=True)],
     instructions=instructions,
-    add_history_to_context=True,
+    **history_settings(),
     add_datetime_to_context=True,
-    enable_agentic_memory=True,
+    **memory_settings(),
     markdown=True,
     db=demo_db,
 )
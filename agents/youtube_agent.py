@@ -1,10 +1,11 @@
 from textwrap import dedent
 
 from agno.agent import Agent
-from agno.models.anthropic import Claude
-from agno.tools.youtube import YouTubeTools
 
+from agents.history import history_settings
+from agents.prompt_cache import CachedClaude
 from db.demo_db import demo_db
+from tools.youtube import TranscriptStore, YouTubeTranscriptTools
 
 # ============================================================================
 # Description & Instructions
@@ -14,11 +15,12 @@ description = dedent("""\
     and answers questions about their content with accuracy and clarity.
     """)
 instructions = dedent("""
-    1. When given a YouTube URL, use the `get_youtube_video_data` and `get_youtube_video_captions`
-       tools to retrieve video info and captions.
-    2. Use that data to answer the user's question clearly and concisely.
-    3. If the answer isn't in the video, say so and ask for more details.
-    4. Keep responses short, engaging, and focused on key insights.
+    1. When given a YouTube URL, use the `get_youtube_video_data` tool to retrieve video info.
+    2. To answer a question about the video, use `search_video_transcript` with the key terms of the question.
+       For an overview or summary, use `get_video_summary`. For a specific moment, use `get_video_transcript_window`.
+    3. Use that data to answer the user's question clearly and concisely, citing timestamps.
+    4. If the answer isn't in the video, say so and ask for more details.
+    5. Keep responses short, engaging, and focused on key insights.
     """)
 
 # ============================================================================
@@ -26,11 +28,13 @@ instructions = dedent("""
 # ============================================================================
 youtube_agent = Agent(
     name="YouTube Agent",
-    model=Claude(id="claude-sonnet-4-5"),
-    tools=[YouTubeTools()],
+    model=CachedClaude(id="claude-sonnet-4-5"),
+    # Transcripts are fetched once per video and stored in demo_db; the agent
+    # reads only the relevant windows or a cached summary (see tools/youtube.py)
+    tools=[YouTubeTranscriptTools(store=TranscriptStore(demo_db.db_engine))],
     description=description,
     instructions=instructions,
-    add_history_to_context=True,
+    **history_settings(),
     add_datetime_to_context=True,
     markdown=True,
     db=demo_db,
@@ -1,33 +1,144 @@
+from contextlib import asynccontextmanager
 from pathlib import Path
 
-from agno.os import AgentOS
-
-from agents.agno_knowledge_agent import agno_knowledge_agent
-from agents.agno_mcp_agent import agno_mcp_agent
-from agents.finance_agent import finance_agent
-from agents.memory_manager import memory_manager
-from agents.research_agent import research_agent
-from agents.youtube_agent import youtube_agent
-from teams.finance_team import finance_team
-from workflows.research_workflow import research_workflow
+from agents.admission import install_admission
+from agents.history import history_stats, run_archive
+from agents.memory_queue import memory_queue
+from app.registry import LazyAgentOS, Registry
+from app.shared_runs import install_shared_runs
+from app.telemetry import install_telemetry, register_stats
+from db.demo_db import demo_db
+from db.maintenance import StorageMaintenance
+from db.pool import get_pool_stats
 
 # ============================================================================
 # AgentOS Config
 # ============================================================================
 os_config_path = str(Path(__file__).parent.joinpath("config.yaml"))
 
+
+@asynccontextmanager
+async def lifespan(app):
+    # Applies the memory updates queued by the agents, see agents/memory_queue.py
+    await memory_queue.start()
+    # Builds the components in the background, see app/registry.py
+    registry.start_warmup()
+    # Refreshes the answers to the popular quick prompts, see app/shared_runs.py
+    shared_runs.start_warmer()
+    # Compacts, archives and prunes old sessions on a schedule, see db/maintenance.py
+    await storage_maintenance.start()
+    yield
+    await storage_maintenance.stop()
+    await shared_runs.close()
+    await registry.close()
+    await memory_queue.stop()
+
+
+# ============================================================================
+# Components, imported on first use or by the warm-up
+# ============================================================================
+registry = Registry()
+docs_knowledge = registry.knowledge(
+    "agents.agno_knowledge_agent:knowledge", name="Agno Documentation", contents_db=demo_db
+)
+registry.agent(
+    "agents.agno_mcp_agent:agno_mcp_agent",
+    name="Agno MCP Agent",
+    description="Answers questions about Agno with the documentation MCP server",
+    db=demo_db,
+)
+registry.agent(
+    "agents.agno_knowledge_agent:agno_knowledge_agent",
+    name="Agno Knowledge Agent",
+    description="Answers questions about Agno from the documentation knowledge base",
+    db=demo_db,
+    knowledge=docs_knowledge,
+)
+registry.agent(
+    "agents.finance_agent:finance_agent",
+    name="Finance Agent",
+    description="Retrieves market data and fundamentals and produces decision-ready analysis",
+    db=demo_db,
+)
+registry.agent(
+    "agents.research_agent:research_agent",
+    name="Research Agent",
+    description="Searches the web and synthesizes research with sources",
+    db=demo_db,
+)
+registry.agent(
+    "agents.memory_manager:memory_manager",
+    name="Memory Manager",
+    description="Analyzes, maintains and improves user memories",
+    db=demo_db,
+)
+registry.agent(
+    "agents.youtube_agent:youtube_agent",
+    name="YouTube Agent",
+    description="Answers questions about the content of YouTube videos",
+    db=demo_db,
+)
+registry.team(
+    "teams.finance_team:finance_team",
+    name="Finance Team",
+    description="Combines fundamentals from the Finance Agent with context and sources from the Research Agent",
+    db=demo_db,
+)
+registry.workflow(
+    "workflows.research_workflow:research_workflow",
+    name="Research Workflow",
+    description="Researches a topic from multiple sources in parallel, then writes and reviews a report",
+    db=demo_db,
+)
+
+
 # ============================================================================
 # Create AgentOS
 # ============================================================================
-agent_os = AgentOS(
+agent_os = LazyAgentOS(
+    registry=registry,
     id="ai-eng-os",
-    agents=[agno_mcp_agent, agno_knowledge_agent, finance_agent, research_agent, memory_manager, youtube_agent],
-    teams=[finance_team],
-    workflows=[research_workflow],
     config=os_config_path,
+    lifespan=lifespan,
 )
 app = agent_os.get_app()
 
+# ============================================================================
+# Telemetry: spans of model, tool, DB and step calls, served with these stats on /metrics/prometheus
+# Stats of the components read nothing until the component has been imported
+# ============================================================================
+install_telemetry(app)
+register_stats("db_pool", get_pool_stats, label="pool")
+# Rate limits and priority classes of the model calls, see agents/admission.py
+admission = install_admission(app)
+if admission is not None:
+    register_stats("admission", admission.stats, label="limiter")
+register_stats("registry", registry.stats)
+# Single-flight runs and kept answers for identical stateless requests, added last to see the requests first
+shared_runs = install_shared_runs(app, db=demo_db, config_path=os_config_path)
+register_stats("shared_runs", shared_runs.stats.to_dict)
+register_stats(
+    "finance_cache", registry.stats_of("agents.finance_agent:finance_tools", lambda t: t.cache.stats.to_dict())
+)
+register_stats("mcp_pool", registry.stats_of("agents.agno_mcp_agent:agno_docs_mcp", lambda t: t.pool.stats.to_dict()))
+register_stats("history", history_stats.to_dict)
+storage_maintenance = StorageMaintenance(demo_db, runs_archive=run_archive)
+register_stats("storage", storage_maintenance.stats.to_dict)
+register_stats("memory_queue", lambda: {**memory_queue.stats.to_dict(), **memory_queue.depth()})
+register_stats(
+    "docs_embedding_cache", registry.stats_of("agents.agno_knowledge_agent:docs_embedder", lambda e: e.stats.to_dict())
+)
+register_stats(
+    "research_cache", registry.stats_of("workflows.research_workflow:research_cache", lambda c: c.stats.to_dict())
+)
+register_stats(
+    "research_embedding_cache",
+    registry.stats_of(
+        "workflows.research_workflow:research_cache",
+        lambda c: c.embedder.stats.to_dict() if hasattr(c.embedder, "stats") else {},
+    ),
+)
+
 # ============================================================================
 # Run AgentOS
 # ============================================================================
@@ -0,0 +1,417 @@
+"""
+Lazy registry of the agents, teams and workflows served by the AgentOS.
+
+Components are declared by import path, with the metadata the AgentOS lists them with, and imported on first use or by
+a background warm-up started with the app. A worker starts serving after importing agno and the shared modules only:
+yfinance/pandas, the MCP client, the YouTube transcript library, the ParallelTools SDK and the PgVector/embedder setup
+are loaded once a component needs them.
+
+`LazyAgentOS` takes a registry instead of agent, team and workflow lists:
+- `/agents`, `/teams` and `/workflows` list the declared metadata and don't build anything.
+- Routes of one component, e.g. `POST /agents/finance-agent/runs`, build it in a worker thread before running,
+  so the event loop keeps serving other requests meanwhile.
+- Other attribute access builds the component in place, e.g. `/models` reads the model of every component.
+
+    REGISTRY_WARMUP     Set to false to build components on first use only (default true)
+
+Usage:
+    registry = Registry()
+    registry.agent("agents.finance_agent:finance_agent", name="Finance Agent", description="Market data and analysis")
+    agent_os = LazyAgentOS(registry=registry, id="ai-eng-os")
+
+    python -m app.registry --benchmark
+"""
+
+import asyncio
+import sys
+import threading
+import time
+from dataclasses import dataclass
+from importlib import import_module
+from os import getenv
+from typing import Any, Callable, Dict, List, Literal, Optional, cast
+
+from agno.agent import Agent
+from agno.db.base import BaseDb
+from agno.knowledge.knowledge import Knowledge
+from agno.os import AgentOS
+from agno.os.schema import AgentSummaryResponse, TeamSummaryResponse, WorkflowSummaryResponse
+from agno.os.utils import collect_mcp_tools_from_team, collect_mcp_tools_from_workflow
+from agno.team.team import Team
+from agno.utils.log import log_info, log_warning
+from agno.utils.string import generate_id_from_name
+from agno.workflow.workflow import Workflow
+
+REGISTRY_WARMUP = getenv("REGISTRY_WARMUP", "true").lower() in ("1", "true", "yes")
+
+ComponentKind = Literal["agent", "team", "workflow", "knowledge"]
+# First path segment of the AgentOS routes of each kind
+ROUTE_KINDS: Dict[str, ComponentKind] = {"agents": "agent", "teams": "team", "workflows": "workflow"}
+
+
+@dataclass
+class ComponentSpec:
+    """A component declared by import path, e.g. "agents.finance_agent:finance_agent"."""
+
+    kind: ComponentKind
+    path: str
+    id: str
+    name: str
+    description: Optional[str] = None
+    db: Optional[BaseDb] = None
+    knowledge: Optional["LazyComponent"] = None
+
+
+class LazyComponent:
+    """
+    Stands in for a declared component. Its metadata is answered from the declaration, any other attribute builds it.
+
+    Args:
+        spec (ComponentSpec): Declaration of the component.
+        registry (Registry): Registry that builds it.
+    """
+
+    def __init__(self, spec: ComponentSpec, registry: "Registry"):
+        self._spec = spec
+        self._registry = registry
+        self.id = spec.id
+        self.name = spec.name
+        self.description = spec.description
+        self.db = spec.db
+        self.knowledge = spec.knowledge
+        # Knowledge instances are looked up by the id of their contents DB
+        self.contents_db = spec.db
+
+    def __getattr__(self, name: str) -> Any:
+        if name.startswith("__"):
+            raise AttributeError(name)
+        return getattr(self._registry.build(self._spec), name)
+
+    def __repr__(self) -> str:
+        return f"LazyComponent({self._spec.kind} {self._spec.path}, built={self._registry.is_built(self._spec)})"
+
+
+# ============================================================================
+# Registry
+# ============================================================================
+class Registry:
+    """Declared components, built once each, from any thread."""
+
+    def __init__(self) -> None:
+        self.specs: List[ComponentSpec] = []
+        self.build_seconds: Dict[str, float] = {}
+        # MCP toolkits of the built components, connected from the event loop
+        self.mcp_tools: List[Any] = []
+        self._connected: List[Any] = []
+        self._proxies: Dict[str, LazyComponent] = {}
+        self._built: Dict[str, Any] = {}
+        self._lock = threading.RLock()
+        self._warmup_task: Optional[asyncio.Task] = None
+
+    def _declare(self, spec: ComponentSpec) -> LazyComponent:
+        if spec.path in self._proxies:
+            raise ValueError(f"{spec.path} is already declared")
+        self.specs.append(spec)
+        self._proxies[spec.path] = LazyComponent(spec, self)
+        return self._proxies[spec.path]
+
+    def agent(
+        self,
+        path: str,
+        *,
+        name: str,
+        description: Optional[str] = None,
+        id: Optional[str] = None,
+        db: Optional[BaseDb] = None,
+        knowledge: Optional[LazyComponent] = None,
+    ) -> LazyComponent:
+        """Declare an agent.
+
+        Args:
+            path (str): "<module>:<attribute>" of the agent.
+            name (str): Name of the agent.
+            description (Optional[str]): Short description, listed by `/agents`.
+            id (Optional[str]): Id of the agent, defaults to the id agno derives from the name.
+            db (Optional[BaseDb]): DB of the agent, registered with the AgentOS.
+            knowledge (Optional[LazyComponent]): Knowledge of the agent, declared with `knowledge()`.
+        """
+        return self._declare(
+            ComponentSpec("agent", path, id or generate_id_from_name(name), name, description, db, knowledge)
+        )
+
+    def team(
+        self,
+        path: str,
+        *,
+        name: str,
+        description: Optional[str] = None,
+        id: Optional[str] = None,
+        db: Optional[BaseDb] = None,
+    ) -> LazyComponent:
+        """Declare a team, see `agent()` for the arguments."""
+        return self._declare(ComponentSpec("team", path, id or generate_id_from_name(name), name, description, db))
+
+    def workflow(
+        self,
+        path: str,
+        *,
+        name: str,
+        description: Optional[str] = None,
+        id: Optional[str] = None,
+        db: Optional[BaseDb] = None,
+    ) -> LazyComponent:
+        """Declare a workflow, see `agent()` for the arguments."""
+        return self._declare(ComponentSpec("workflow", path, id or generate_id_from_name(name), name, description, db))
+
+    def knowledge(self, path: str, *, name: str, contents_db: BaseDb) -> LazyComponent:
+        """Declare a knowledge base, served by the knowledge routes under the id of `contents_db`."""
+        return self._declare(ComponentSpec("knowledge", path, generate_id_from_name(name), name, db=contents_db))
+
+    def agents(self) -> List[Agent]:
+        return [cast(Agent, self._proxies[spec.path]) for spec in self.specs if spec.kind == "agent"]
+
+    def teams(self) -> List[Team]:
+        return [cast(Team, self._proxies[spec.path]) for spec in self.specs if spec.kind == "team"]
+
+    def workflows(self) -> List[Workflow]:
+        return [cast(Workflow, self._proxies[spec.path]) for spec in self.specs if spec.kind == "workflow"]
+
+    def knowledge_bases(self) -> List[Knowledge]:
+        return [cast(Knowledge, self._proxies[spec.path]) for spec in self.specs if spec.kind == "knowledge"]
+
+    def find(self, kind: ComponentKind, id: str) -> Optional[ComponentSpec]:
+        return next((spec for spec in self.specs if spec.kind == kind and spec.id == id), None)
+
+    def is_built(self, spec: ComponentSpec) -> bool:
+        return spec.path in self._built
+
+    # ============================================================================
+    # Build
+    # ============================================================================
+    def build(self, spec: ComponentSpec) -> Any:
+        """Import the component and prepare it like the AgentOS prepares the components it is given."""
+        component = self._built.get(spec.path)
+        if component is not None:
+            return component
+        with self._lock:
+            if spec.path in self._built:
+                return self._built[spec.path]
+            started = time.perf_counter()
+            module_name, _, attribute = spec.path.partition(":")
+            component = getattr(import_module(module_name), attribute)
+            self._prepare(spec.kind, component)
+            if spec.kind != "knowledge" and component.id != spec.id:
+                raise ValueError(f"{spec.path} has id {component.id!r}, declared as {spec.id!r}")
+            self.build_seconds[spec.path] = time.perf_counter() - started
+            self._built[spec.path] = component
+        log_info(f"Built {spec.kind} {spec.id} in {self.build_seconds[spec.path] * 1000:.0f}ms")
+        return component
+
+    def _prepare(self, kind: ComponentKind, component: Any) -> None:
+        if kind == "agent":
+            for tool in component.tools or []:
+                is_mcp = bool({cls.__name__ for cls in type(tool).__mro__} & {"MCPTools", "MultiMCPTools"})
+                if is_mcp and tool not in self.mcp_tools:
+                    self.mcp_tools.append(tool)
+            component.initialize_agent()
+            # Required for the built-in routes to work
+            component.store_events = True
+        elif kind == "team":
+            collect_mcp_tools_from_team(component, self.mcp_tools)
+            component.initialize_team()
+            for member in component.members:
+                if isinstance(member, Agent):
+                    member.team_id = None
+                    member.initialize_agent()
+                elif isinstance(member, Team):
+                    member.initialize_team()
+            component.store_events = True
+        elif kind == "workflow":
+            collect_mcp_tools_from_workflow(component, self.mcp_tools)
+            if not component.id:
+                component.id = generate_id_from_name(component.name)
+            component.store_events = True
+
+    def build_all(self) -> None:
+        for spec in self.specs:
+            self.build(spec)
+
+    async def ensure(self, spec: ComponentSpec) -> None:
+        """Build the component in a worker thread if needed, then connect the MCP toolkits it brought."""
+        if not self.is_built(spec):
+            await asyncio.to_thread(self.build, spec)
+        await self.connect_mcp_tools()
+
+    async def connect_mcp_tools(self) -> None:
+        for tool in [tool for tool in self.mcp_tools if tool not in self._connected]:
+            self._connected.append(tool)
+            await tool.connect()
+
+    async def close(self) -> None:
+        if self._warmup_task is not None:
+            self._warmup_task.cancel()
+        for tool in self._connected:
+            await tool.close()
+        self._connected = []
+
+    # ============================================================================
+    # Warm-up
+    # ============================================================================
+    async def warm_up(self) -> None:
+        started = time.perf_counter()
+        for spec in self.specs:
+            try:
+                await self.ensure(spec)
+            except Exception as e:  # noqa: BLE001 - the other components still warm up, this one fails on first use
+                log_warning(f"Could not build {spec.kind} {spec.id}: {e!r}")
+        log_info(f"Warmed up {len(self._built)}/{len(self.specs)} components in {time.perf_counter() - started:.2f}s")
+
+    def start_warmup(self) -> None:
+        """Build every component in the background, unless `REGISTRY_WARMUP` is false. Call it from the lifespan."""
+        if REGISTRY_WARMUP and self._warmup_task is None:
+            self._warmup_task = asyncio.create_task(self.warm_up())
+
+    # ============================================================================
+    # Stats
+    # ============================================================================
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "declared": len(self.specs),
+            "built": len(self._built),
+            "build_seconds": sum(self.build_seconds.values()),
+        }
+
+    def stats_of(self, path: str, read: Callable[[Any], Dict[str, Any]]) -> Callable[[], Dict[str, Any]]:
+        """Stats provider reading `read(<object at path>)`, empty until the module of `path` has been imported."""
+        module_name, _, attribute = path.partition(":")
+
+        def provider() -> Dict[str, Any]:
+            # A module being imported by the warm-up may not define the attribute yet
+            target = getattr(sys.modules.get(module_name), attribute, None)
+            return read(target) if target is not None else {}
+
+        return provider
+
+
+# ============================================================================
+# AgentOS
+# ============================================================================
+class RegistryMiddleware:
+    """Builds the component a request is for before the AgentOS route looks it up."""
+
+    def __init__(self, app: Any, registry: Registry):
+        self.app = app
+        self.registry = registry
+
+    async def __call__(self, scope: Dict[str, Any], receive: Any, send: Any) -> None:
+        if scope["type"] in ("http", "websocket"):
+            for spec in self._specs_for(scope.get("path", "")):
+                await self.registry.ensure(spec)
+        await self.app(scope, receive, send)
+
+    def _specs_for(self, path: str) -> List[ComponentSpec]:
+        parts = path.strip("/").split("/")
+        if parts[0] in ROUTE_KINDS and len(parts) > 1:
+            spec = self.registry.find(ROUTE_KINDS[parts[0]], parts[1])
+            return [spec] if spec is not None else []
+        if parts[0] == "knowledge":
+            return [spec for spec in self.registry.specs if spec.kind == "knowledge"]
+        if parts[0] == "models":
+            return [spec for spec in self.registry.specs if spec.kind in ("agent", "team")]
+        return []
+
+
+class LazyAgentOS(AgentOS):
+    """
+    AgentOS serving the components declared in a registry.
+
+    Args:
+        registry (Registry): Declared agents, teams, workflows and knowledge bases.
+        **kwargs: Passed on to `AgentOS`.
+    """
+
+    def __init__(self, registry: Registry, **kwargs: Any):
+        self.registry = registry
+        super().__init__(
+            agents=registry.agents(),
+            teams=registry.teams(),
+            workflows=registry.workflows(),
+            knowledge=registry.knowledge_bases() or None,
+            **kwargs,
+        )
+
+    # The registry prepares each component when it is built
+    def _initialize_agents(self) -> None:
+        pass
+
+    def _initialize_teams(self) -> None:
+        pass
+
+    def _initialize_workflows(self) -> None:
+        pass
+
+    def get_app(self) -> Any:
+        from fastapi.routing import APIRoute
+
+        app = super().get_app()
+
+        # Replace the listings, which describe every component in full, with the declared metadata
+        listings = {"/agents", "/teams", "/workflows"}
+        app.router.routes = [
+            route
+            for route in app.router.routes
+            if not (isinstance(route, APIRoute) and route.path in listings and "GET" in route.methods)
+        ]
+
+        @app.get("/agents", response_model=List[AgentSummaryResponse], tags=["Agents"])
+        async def get_agents() -> List[AgentSummaryResponse]:
+            return [AgentSummaryResponse.from_agent(agent) for agent in self.agents or []]
+
+        @app.get("/teams", response_model=List[TeamSummaryResponse], tags=["Teams"])
+        async def get_teams() -> List[TeamSummaryResponse]:
+            return [TeamSummaryResponse.from_team(team) for team in self.teams or []]
+
+        @app.get("/workflows", response_model=List[WorkflowSummaryResponse], tags=["Workflows"])
+        async def get_workflows() -> List[WorkflowSummaryResponse]:
+            return [WorkflowSummaryResponse.from_workflow(workflow) for workflow in self.workflows or []]
+
+        app.add_middleware(RegistryMiddleware, registry=self.registry)
+        return app
+
+
+if __name__ == "__main__":
+    import argparse
+    import json
+    import subprocess
+
+    parser = argparse.ArgumentParser(description="Measure the cold start of app.main with and without building")
+    parser.add_argument("--benchmark", action="store_true")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    # Each measurement runs in a fresh interpreter, like a new worker
+    probe = """
+import json, resource, time
+started = time.perf_counter()
+from app.main import registry
+imported = time.perf_counter() - started
+rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+if {build}:
+    registry.build_all()
+print(json.dumps({{"import": imported, "total": time.perf_counter() - started, "import_rss": rss,
+    "rss": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024}}))
+"""
+
+    def measure(build: bool) -> Dict[str, float]:
+        runs = []
+        for _ in range(args.repeat):
+            output = subprocess.run(
+                [sys.executable, "-c", probe.format(build=build)], capture_output=True, text=True, check=True
+            ).stdout
+            runs.append(json.loads(output.strip().splitlines()[-1]))
+        return {key: sorted(run[key] for run in runs)[len(runs) // 2] for key in runs[0]}
+
+    lazy, eager = measure(build=False), measure(build=True)
+    print(f"{'':<28}{'ready after':>12}{'peak RSS':>12}")
+    print(f"{'lazy (serve, then warm up)':<28}{lazy['import']:>11.2f}s{lazy['import_rss']:>10.0f}MB")
+    print(f"{'eager (build everything)':<28}{eager['total']:>11.2f}s{eager['rss']:>10.0f}MB")
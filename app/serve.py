@@ -0,0 +1,214 @@
+"""
+Production serving profile: several uvicorn workers behind one socket, without reload or debug logging.
+
+`uvicorn app.main:app --reload` serves every request from one event loop on one core and watches the files for
+changes. `python -m app.serve` (`scripts/entrypoint.sh serve`) instead:
+- Forks one worker per available core, or `SERVE_WORKERS`. They share the listening socket and a worker that dies
+  is replaced.
+- With `SERVE_PRELOAD`, imports the app and builds its components (see app/registry.py) before forking, so the
+  workers start at once and share the loaded modules copy-on-write. Each worker opens its own DB connections.
+- Splits `DB_POOL_BUDGET` connections between the workers, keeping the 1:2 pool size to overflow ratio of the
+  defaults. Unset, each worker gets `DB_POOL_SIZE` + `DB_MAX_OVERFLOW`.
+- On SIGTERM or SIGINT, stops accepting connections and lets the workers finish in-flight requests and their
+  lifespan shutdown (e.g. the memory queue) for up to `SERVE_GRACEFUL_TIMEOUT` seconds, then kills them.
+- Turns `AGNO_DEBUG` off and logs warnings only, without access logs.
+- Refuses to start several workers with `ADMISSION_LIMITS` but without `ADMISSION_SHARED`, as every worker would
+  allow the full rate limits (see agents/admission.py).
+
+    SERVE_WORKERS           Worker processes (default: available cores, or WEB_CONCURRENCY)
+    SERVE_PRELOAD           Load the app before forking the workers (default true)
+    SERVE_GRACEFUL_TIMEOUT  Seconds allowed to drain in-flight requests on shutdown (default 30)
+    SERVE_LOG_LEVEL         uvicorn log level (default warning)
+    SERVE_ACCESS_LOG        Log every request (default false)
+    DB_POOL_BUDGET          Connections allowed for all the workers together (default unset)
+
+Each worker keeps its own metrics, so `/metrics/prometheus` shows the counters of the worker that answered.
+
+Usage:
+    python -m app.serve --host 0.0.0.0 --port 8000
+    SERVE_WORKERS=4 DB_POOL_BUDGET=60 python -m app.serve
+"""
+
+import os
+import signal
+import time
+from dataclasses import dataclass
+from os import getenv
+from typing import Any, Dict, Optional
+
+from agno.utils.log import log_info, log_warning
+
+
+def available_cpus() -> int:
+    """Cores this process may run on, bounded by the cgroup CPU quota of the container."""
+    cpus = len(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else os.cpu_count() or 1
+    try:
+        with open("/sys/fs/cgroup/cpu.max") as f:
+            quota, period = f.read().split()
+        if quota != "max":
+            cpus = min(cpus, max(int(int(quota) / int(period)), 1))
+    except (OSError, ValueError):
+        pass
+    return cpus
+
+
+@dataclass
+class ServeSettings:
+    host: str = "0.0.0.0"
+    port: int = 8000
+    workers: int = 1
+    preload: bool = True
+    graceful_timeout: int = 30
+    log_level: str = "warning"
+    access_log: bool = False
+    db_pool_budget: Optional[int] = None
+
+    @classmethod
+    def from_env(cls) -> "ServeSettings":
+        budget = getenv("DB_POOL_BUDGET")
+        return cls(
+            workers=int(getenv("SERVE_WORKERS", getenv("WEB_CONCURRENCY", str(available_cpus())))),
+            preload=getenv("SERVE_PRELOAD", "true").lower() in ("1", "true", "yes"),
+            graceful_timeout=int(getenv("SERVE_GRACEFUL_TIMEOUT", "30")),
+            log_level=getenv("SERVE_LOG_LEVEL", "warning"),
+            access_log=getenv("SERVE_ACCESS_LOG", "false").lower() in ("1", "true", "yes"),
+            db_pool_budget=int(budget) if budget else None,
+        )
+
+
+def pool_budget(budget: int, workers: int) -> Dict[str, int]:
+    """Pool size and overflow of each worker so that `workers` pools stay within `budget` connections."""
+    per_worker = max(budget // workers, 1)
+    pool_size = max(per_worker // 3, 1)
+    return {"DB_POOL_SIZE": pool_size, "DB_MAX_OVERFLOW": per_worker - pool_size}
+
+
+# ============================================================================
+# Workers
+# ============================================================================
+class Supervisor:
+    """
+    Forks the workers, replaces the ones that die and drains them on shutdown.
+
+    Args:
+        config (uvicorn.Config): Config of the workers, loaded already when preloading.
+        settings (ServeSettings): Serving settings.
+    """
+
+    def __init__(self, config: Any, settings: ServeSettings):
+        self.config = config
+        self.settings = settings
+        self.socket = config.bind_socket()
+        self.workers: Dict[int, float] = {}  # pid -> start time
+        self.stopping = False
+
+    def spawn(self) -> None:
+        import uvicorn
+
+        pid = os.fork()
+        if pid == 0:
+            # The worker installs its own handlers for a graceful shutdown
+            signal.signal(signal.SIGTERM, signal.SIG_DFL)
+            signal.signal(signal.SIGINT, signal.SIG_DFL)
+            try:
+                uvicorn.Server(self.config).run(sockets=[self.socket])
+            finally:
+                os._exit(0)
+        self.workers[pid] = time.monotonic()
+
+    def stop(self, signum: int, _frame: Any) -> None:
+        if self.stopping:
+            return
+        self.stopping = True
+        log_info(f"Draining {len(self.workers)} workers (signal {signum})")
+        self.signal_workers(signal.SIGTERM)
+
+    def signal_workers(self, signum: int) -> None:
+        for pid in list(self.workers):
+            try:
+                os.kill(pid, signum)
+            except ProcessLookupError:
+                pass
+
+    def run(self) -> None:
+        signal.signal(signal.SIGTERM, self.stop)
+        signal.signal(signal.SIGINT, self.stop)
+        for _ in range(self.settings.workers):
+            self.spawn()
+        log_info(f"Serving on {self.settings.host}:{self.settings.port} with {self.settings.workers} workers")
+
+        deadline: Optional[float] = None
+        while self.workers:
+            pid, status = os.waitpid(-1, os.WNOHANG)
+            if pid == 0:
+                if self.stopping:
+                    deadline = deadline or time.monotonic() + self.settings.graceful_timeout + 5
+                    if time.monotonic() > deadline:
+                        log_warning(f"Killing {len(self.workers)} workers that did not drain in time")
+                        self.signal_workers(signal.SIGKILL)
+                time.sleep(0.2)
+                continue
+            started = self.workers.pop(pid, None)
+            if started is None or self.stopping:
+                continue
+            log_warning(f"Worker {pid} exited with status {os.waitstatus_to_exitcode(status)}, starting another")
+            # A worker that fails at startup should not be restarted in a tight loop
+            if time.monotonic() - started < 1:
+                time.sleep(1)
+            self.spawn()
+        self.socket.close()
+
+
+def serve(app: str = "app.main:app", settings: Optional[ServeSettings] = None, factory: bool = False) -> None:
+    """Serve `app` with the production profile.
+
+    Args:
+        app (str): Import path of the ASGI app, or of a function creating it with `factory`.
+        settings (Optional[ServeSettings]): Defaults to the settings from the environment.
+        factory (bool): `app` is a function returning the app.
+    """
+    import uvicorn
+
+    from agents.admission import check_workers
+
+    settings = settings or ServeSettings.from_env()
+    check_workers(settings.workers)
+    # The workers check the count again when they install admission control
+    os.environ["SERVE_WORKERS"] = str(settings.workers)
+    # Agents read AGNO_DEBUG on every run, and debug logging formats every message of every run
+    os.environ["AGNO_DEBUG"] = "false"
+    if settings.db_pool_budget:
+        for key, value in pool_budget(settings.db_pool_budget, settings.workers).items():
+            os.environ[key] = str(value)
+
+    config = uvicorn.Config(
+        app,
+        host=settings.host,
+        port=settings.port,
+        factory=factory,
+        log_level=settings.log_level,
+        access_log=settings.access_log,
+        timeout_graceful_shutdown=settings.graceful_timeout,
+    )
+    if settings.preload:
+        started = time.perf_counter()
+        config.load()
+        from app.main import registry
+
+        registry.build_all()
+        log_info(f"Preloaded the app in {time.perf_counter() - started:.2f}s")
+    Supervisor(config, settings).run()
+
+
+if __name__ == "__main__":
+    import argparse
+
+    defaults = ServeSettings.from_env()
+    parser = argparse.ArgumentParser(description="Serve the AgentOS with the production profile")
+    parser.add_argument("--host", default=defaults.host)
+    parser.add_argument("--port", type=int, default=int(getenv("PORT", str(defaults.port))))
+    parser.add_argument("--workers", type=int, default=defaults.workers)
+    args = parser.parse_args()
+
+    defaults.host, defaults.port, defaults.workers = args.host, args.port, args.workers
+    serve(settings=defaults)
@@ -0,0 +1,549 @@
+"""
+Single-flight runs and pre-warmed answers for stateless requests.
+
+Every request to a run route makes its own run, even when a burst of users clicks the same quick prompt: each run
+makes the same model and tool calls and streams the same answer. `SharedRunsMiddleware` collapses them:
+- A request is shared when it starts a new session, sends no files or extra fields, and either comes without a
+  user id or is one of the quick prompts of app/config.yaml for a route of `SHARED_RUN_TARGETS`, whose answers don't
+  depend on who asks.
+- Identical shared requests (same route, message and `stream`) join the run in flight, started by the first of them.
+  The run is made as `SHARED_RUN_USER` in a session of its own, so no user's memories or history end up in an answer
+  served to others. Its response is sent to every waiter as it streams, with the waiter's own session id.
+- Once the run is done, each waiter gets a copy of it in a session of its own, under its own user id, so follow-up
+  messages have the history and the chat shows in the user's sessions.
+- Answers to the shared quick prompts are kept for `QUICK_PROMPT_TTL` seconds and replayed to the next requests.
+  Every `QUICK_PROMPT_REFRESH` seconds, a background warmer runs again the quick prompts asked since its previous pass
+  whose answer expires before the next one, so a popular prompt does not wait for a run.
+
+Runs and answers are shared within a worker process. With `OS_SECURITY_KEY` set, only requests with the key are
+shared: the others go on to the AgentOS routes, which reject them. Copies are made under the user id of the request,
+as the AgentOS routes would store the run: without a key, AgentOS trusts the user id sent by the caller. The
+middleware can't validate the tokens of agno's `JWTMiddleware`, so shared runs are turned off when the app uses it.
+
+    SHARED_RUNS             Set to false to make a run per request (default true)
+    SHARED_RUN_TARGETS      Comma-separated routes whose quick prompts are shared across users
+                            (default every route with quick prompts but agents/finance-agent and agents/memory-manager)
+    SHARED_RUN_USER         User id of the shared runs (default shared-runs)
+    QUICK_PROMPT_TTL        Seconds an answer to a quick prompt is replayed (default 900, 0 disables)
+    QUICK_PROMPT_REFRESH    Seconds between two passes of the warmer (default 300, 0 disables the warmer)
+    QUICK_PROMPT_WARMUP     Set to true to answer every shared quick prompt at startup (default false)
+
+Usage:
+    shared_runs = install_shared_runs(app, db=demo_db, config_path=os_config_path)
+
+    python -m app.shared_runs --benchmark
+"""
+
+import asyncio
+import hmac
+import json
+import time
+from dataclasses import dataclass, field
+from os import getenv
+from typing import Any, Dict, List, Optional, Set, Tuple
+from urllib.parse import urlencode
+from uuid import uuid4
+
+import yaml
+from agno.db.base import BaseDb, SessionType
+from agno.session import AgentSession, TeamSession, WorkflowSession
+from agno.utils.log import log_debug, log_info, log_warning
+from starlette.datastructures import UploadFile
+from starlette.requests import Request
+
+from app.telemetry import run_route
+
+SHARED_RUNS = getenv("SHARED_RUNS", "true").lower() in ("1", "true", "yes")
+SHARED_RUN_TARGETS = getenv(
+    "SHARED_RUN_TARGETS",
+    "agents/agno-mcp-agent,agents/agno-knowledge-agent,agents/research-agent,agents/youtube-agent,"
+    "teams/finance-team,workflows/research-workflow",
+)
+SHARED_RUN_USER = getenv("SHARED_RUN_USER", "shared-runs")
+QUICK_PROMPT_TTL = float(getenv("QUICK_PROMPT_TTL", "900"))
+QUICK_PROMPT_REFRESH = float(getenv("QUICK_PROMPT_REFRESH", "300"))
+QUICK_PROMPT_WARMUP = getenv("QUICK_PROMPT_WARMUP", "false").lower() in ("1", "true", "yes")
+OS_SECURITY_KEY = getenv("OS_SECURITY_KEY")
+
+# Form fields of a shared request, any other field makes the run depend on the request
+SHARED_FIELDS = {"message", "stream", "session_id", "user_id", "monitor"}
+SESSION_TYPES = {"agents": SessionType.AGENT, "teams": SessionType.TEAM, "workflows": SessionType.WORKFLOW}
+SESSION_CLASSES: Dict[str, Any] = {"agents": AgentSession, "teams": TeamSession, "workflows": WorkflowSession}
+
+# (route, message, stream)
+RunKey = Tuple[str, str, bool]
+
+
+def authenticated(scope: Dict[str, Any]) -> bool:
+    """Whether the request carries the `OS_SECURITY_KEY` bearer token. Without a key set, no request is."""
+    if not OS_SECURITY_KEY:
+        return False
+    headers = dict(scope.get("headers") or [])
+    scheme, _, token = headers.get(b"authorization", b"").decode("latin-1").partition(" ")
+    return scheme.lower() == "bearer" and hmac.compare_digest(token.strip().encode(), OS_SECURITY_KEY.encode())
+
+
+def normalize_message(message: str) -> str:
+    return " ".join(message.split())
+
+
+def load_quick_prompts(config_path: str) -> Dict[str, List[str]]:
+    """Quick prompts of the AgentOS config, by component id."""
+    with open(config_path) as f:
+        config = yaml.safe_load(f) or {}
+    return (config.get("chat") or {}).get("quick_prompts") or {}
+
+
+@dataclass
+class SharedRunStats:
+    # Runs started for requests and by the warmer
+    runs: int = 0
+    warmed: int = 0
+    # Requests that joined a run in flight, and requests answered with a kept answer
+    coalesced: int = 0
+    hits: int = 0
+    errors: int = 0
+    # Runs copied to the sessions of the requests
+    copies: int = 0
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "runs": self.runs,
+            "warmed": self.warmed,
+            "coalesced": self.coalesced,
+            "hits": self.hits,
+            "errors": self.errors,
+            "copies": self.copies,
+        }
+
+
+@dataclass
+class SharedResponse:
+    """Response of a shared run as sent by the AgentOS, appended to while it streams."""
+
+    session_id: str
+    status: int = 0
+    headers: List[Tuple[bytes, bytes]] = field(default_factory=list)
+    chunks: List[bytes] = field(default_factory=list)
+    done: bool = False
+    expires_at: float = 0.0
+    # Session and user ids of the requests waiting for the run, to copy it to once done
+    waiters: List[Tuple[str, Optional[str]]] = field(default_factory=list)
+    changed: asyncio.Condition = field(default_factory=asyncio.Condition)
+
+
+class SharedRuns:
+    """
+    Single-flight runs of the shared requests and the answers kept for the quick prompts.
+
+    Args:
+        db (BaseDb): Database of the sessions of the components.
+        quick_prompts (Dict[str, List[str]]): Quick prompts by component id.
+        targets (Set[str]): Routes whose quick prompts are shared across users, e.g. "teams/finance-team".
+        user_id (str): User id of the shared runs.
+        ttl (float): Seconds an answer to a quick prompt is replayed. 0 disables.
+        refresh (float): Seconds between two passes of the warmer. 0 disables the warmer.
+        enabled (bool): Share runs. False makes a run per request.
+    """
+
+    def __init__(
+        self,
+        db: BaseDb,
+        quick_prompts: Dict[str, List[str]],
+        targets: Set[str],
+        user_id: str = SHARED_RUN_USER,
+        ttl: float = QUICK_PROMPT_TTL,
+        refresh: float = QUICK_PROMPT_REFRESH,
+        enabled: bool = SHARED_RUNS,
+    ):
+        self.db = db
+        self.targets = targets
+        self.user_id = user_id
+        self.ttl = ttl
+        self.refresh = refresh
+        self.enabled = enabled
+        # Shared quick prompts, as (route, message)
+        self.quick_prompts: Set[Tuple[str, str]] = set()
+        for component_id, messages in quick_prompts.items():
+            for route in targets:
+                if route.split("/", 1)[-1] == component_id:
+                    self.quick_prompts.update((route, normalize_message(message)) for message in messages)
+        # The app below the middleware, which the shared runs are sent to, and the FastAPI app of their scope
+        self.app: Any = None
+        self.fastapi_app: Any = None
+        self.in_flight: Dict[RunKey, SharedResponse] = {}
+        self.answers: Dict[RunKey, SharedResponse] = {}
+        # When each quick prompt was last asked
+        self.asked: Dict[RunKey, float] = {}
+        self.stats = SharedRunStats()
+        self._tasks: Set[asyncio.Task] = set()
+        self._warmer: Optional[asyncio.Task] = None
+
+    # ============================================================================
+    # Requests
+    # ============================================================================
+    async def shared_key(
+        self, route: str, scope: Dict[str, Any], body: bytes
+    ) -> Optional[Tuple[RunKey, Optional[str]]]:
+        """Key and user id of a request to a run route, or None when it is not shared."""
+        if not self.enabled:
+            return None
+        form = await Request(scope, replay_body(body)).form()
+        try:
+            if set(form.keys()) - SHARED_FIELDS or any(isinstance(value, UploadFile) for value in form.values()):
+                return None
+            message, user_id = form.get("message"), form.get("user_id") or None
+            if not isinstance(message, str) or not message.strip() or form.get("session_id"):
+                return None
+            default_stream = "false" if route.startswith("agents/") else "true"
+            stream = str(form.get("stream") or default_stream).lower() in ("1", "true", "yes", "on")
+            key = (route, normalize_message(message), stream)
+            if user_id is not None and not self.is_quick_prompt(key):
+                return None
+            return key, str(user_id) if user_id is not None else None
+        finally:
+            await form.close()
+
+    def is_quick_prompt(self, key: RunKey) -> bool:
+        return (key[0], key[1]) in self.quick_prompts
+
+    async def serve(self, key: RunKey, user_id: Optional[str], send: Any) -> None:
+        """Answer a shared request from a kept answer, the run in flight, or a new run."""
+        session_id = str(uuid4())
+        response = self.answers.get(key)
+        if response is not None and response.expires_at > time.monotonic():
+            self.stats.hits += 1
+            self._spawn(self._copy_run(key[0], response.session_id, [(session_id, user_id)]))
+        else:
+            response = self.in_flight.get(key)
+            if response is not None:
+                self.stats.coalesced += 1
+            else:
+                response = self.start(key)
+            response.waiters.append((session_id, user_id))
+        if self.is_quick_prompt(key):
+            self.asked[key] = time.monotonic()
+        log_debug(f"Shared run of {key[0]}: {'replayed' if response.done else 'streaming'} to session {session_id}")
+        await self._send(response, session_id, user_id, send)
+
+    async def _send(self, response: SharedResponse, session_id: str, user_id: Optional[str], send: Any) -> None:
+        """Send the response of the shared run as the response to one request."""
+        replacements = [
+            (response.session_id.encode(), session_id.encode()),
+            (json.dumps(self.user_id).encode(), json.dumps(user_id).encode()),
+        ]
+
+        def rewrite(chunk: bytes) -> bytes:
+            for old, new in replacements:
+                chunk = chunk.replace(old, new)
+            return chunk
+
+        async with response.changed:
+            await response.changed.wait_for(lambda: response.status != 0)
+        # The rewritten body differs in length
+        headers = [(name, value) for name, value in response.headers if name.lower() != b"content-length"]
+        await send({"type": "http.response.start", "status": response.status, "headers": headers})
+        sent = 0
+        while True:
+            async with response.changed:
+                while len(response.chunks) == sent and not response.done:
+                    await response.changed.wait()
+                chunks, done = response.chunks[sent:], response.done and len(response.chunks) == sent
+            for chunk in chunks:
+                await send({"type": "http.response.body", "body": rewrite(chunk), "more_body": True})
+            sent += len(chunks)
+            if done:
+                break
+        await send({"type": "http.response.body", "body": b"", "more_body": False})
+
+    # ============================================================================
+    # Shared runs
+    # ============================================================================
+    def start(self, key: RunKey, warm: bool = False) -> SharedResponse:
+        """Start the shared run of `key` in the background."""
+        response = SharedResponse(session_id=str(uuid4()))
+        self.in_flight[key] = response
+        if warm:
+            self.stats.warmed += 1
+        else:
+            self.stats.runs += 1
+        self._spawn(self._run(key, response))
+        return response
+
+    async def _run(self, key: RunKey, response: SharedResponse) -> None:
+        route, message, stream = key
+        fields = {"message": message, "stream": str(stream).lower(), "session_id": response.session_id}
+        body = urlencode({**fields, "user_id": self.user_id}).encode()
+        headers = [
+            (b"content-type", b"application/x-www-form-urlencoded"),
+            (b"content-length", str(len(body)).encode()),
+        ]
+        if OS_SECURITY_KEY:
+            headers.append((b"authorization", f"Bearer {OS_SECURITY_KEY}".encode()))
+        scope = {
+            "type": "http",
+            "asgi": {"version": "3.0"},
+            "http_version": "1.1",
+            "method": "POST",
+            "scheme": "http",
+            "path": f"/{route}/runs",
+            "raw_path": f"/{route}/runs".encode(),
+            "root_path": "",
+            "query_string": b"",
+            "headers": headers,
+            "client": ("127.0.0.1", 0),
+            "server": ("127.0.0.1", 0),
+            "app": self.fastapi_app,
+            "state": {},
+        }
+
+        async def send(message: Dict[str, Any]) -> None:
+            async with response.changed:
+                if message["type"] == "http.response.start":
+                    response.status, response.headers = message["status"], list(message.get("headers", []))
+                elif message["type"] == "http.response.body" and message.get("body"):
+                    response.chunks.append(message["body"])
+                response.changed.notify_all()
+
+        started = time.perf_counter()
+        try:
+            await self.app(scope, replay_body(body), send)
+        except Exception as e:  # noqa: BLE001 - the error is sent to every waiter
+            log_warning(f"Shared run of {route} failed: {e}")
+            if response.status == 0:
+                response.status = 500
+                response.headers = [(b"content-type", b"application/json")]
+                response.chunks.append(json.dumps({"detail": "Run failed"}).encode())
+        finally:
+            async with response.changed:
+                response.done = True
+                response.changed.notify_all()
+            self.in_flight.pop(key, None)
+
+        if response.status != 200:
+            self.stats.errors += 1
+            return
+        log_debug(f"Shared run of {route} done in {time.perf_counter() - started:.2f}s")
+        if self.ttl > 0 and self.is_quick_prompt(key):
+            response.expires_at = time.monotonic() + self.ttl
+            self.answers[key] = response
+        await self._copy_run(route, response.session_id, response.waiters)
+
+    async def _copy_run(self, route: str, shared_session_id: str, waiters: List[Tuple[str, Optional[str]]]) -> None:
+        """Copy the session of a shared run to the session of each waiter."""
+        if waiters:
+            await asyncio.to_thread(self.copy_run, route, shared_session_id, list(waiters))
+
+    def copy_run(self, route: str, shared_session_id: str, waiters: List[Tuple[str, Optional[str]]]) -> None:
+        kind = route.split("/", 1)[0]
+        try:
+            stored = self.db.get_session(
+                session_id=shared_session_id, session_type=SESSION_TYPES[kind], deserialize=False
+            )
+            if not isinstance(stored, dict):
+                log_warning(f"Session {shared_session_id} of the shared run of {route} not found")
+                return
+            serialized, now = json.dumps(stored, default=str), int(time.time())
+            for session_id, user_id in waiters:
+                session = json.loads(serialized.replace(shared_session_id, session_id))
+                session.update(user_id=user_id, created_at=now, updated_at=now)
+                for run in session.get("runs") or []:
+                    run["user_id"] = user_id
+                self.db.upsert_session(SESSION_CLASSES[kind].from_dict(session))
+                self.stats.copies += 1
+        except Exception as e:  # noqa: BLE001 - the answers have been sent, only the copies are missing
+            self.stats.errors += 1
+            log_warning(f"Could not copy the shared run of {route}: {e}")
+
+    def _spawn(self, coroutine: Any) -> None:
+        # Runs outlive the request that started them: every waiter reads from them
+        task = asyncio.create_task(coroutine)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    # ============================================================================
+    # Warmer
+    # ============================================================================
+    def warm(self, keys: List[RunKey]) -> None:
+        """Start the runs of `keys` that are not in flight."""
+        for key in keys:
+            if key not in self.in_flight:
+                self.start(key, warm=True)
+
+    def due(self, since: float) -> List[RunKey]:
+        """Quick prompts asked since `since` whose answer expires before the next pass of the warmer."""
+        now = time.monotonic()
+        for key in [key for key, asked in self.asked.items() if asked < since]:
+            del self.asked[key]
+        return [
+            key
+            for key in self.asked
+            if key not in self.answers or self.answers[key].expires_at < now + self.refresh + 1
+        ]
+
+    async def _warm_loop(self) -> None:
+        if QUICK_PROMPT_WARMUP:
+            # The chat UI streams its runs
+            self.warm([(route, message, True) for route, message in sorted(self.quick_prompts)])
+        since = time.monotonic()
+        while True:
+            await asyncio.sleep(self.refresh)
+            due = self.due(since)
+            since = time.monotonic()
+            if due:
+                log_debug(f"Refreshing {len(due)} quick prompt answers")
+                self.warm(due)
+
+    def start_warmer(self) -> None:
+        if self.enabled and self.ttl > 0 and self.refresh > 0 and self._warmer is None:
+            self._warmer = asyncio.create_task(self._warm_loop())
+
+    async def close(self) -> None:
+        tasks = [*self._tasks, *([self._warmer] if self._warmer is not None else [])]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._warmer = None
+
+
+def replay_body(body: bytes) -> Any:
+    """ASGI receive that sends `body`, then waits until the response is done."""
+    sent = False
+
+    async def receive() -> Dict[str, Any]:
+        nonlocal sent
+        if not sent:
+            sent = True
+            return {"type": "http.request", "body": body, "more_body": False}
+        # A disconnect would cancel a streaming response
+        await asyncio.Event().wait()
+        return {"type": "http.disconnect"}
+
+    return receive
+
+
+class SharedRunsMiddleware:
+    """Serves the shared requests to the run routes through `SharedRuns`."""
+
+    def __init__(self, app: Any, shared_runs: SharedRuns):
+        self.app = app
+        self.shared_runs = shared_runs
+        shared_runs.app = app
+
+    async def __call__(self, scope: Dict[str, Any], receive: Any, send: Any) -> None:
+        route = run_route(scope.get("path", "")) if scope["type"] == "http" else None
+        if route is None or scope.get("method") != "POST" or not self.shared_runs.enabled:
+            await self.app(scope, receive, send)
+            return
+
+        chunks, more_body = [], True
+        while more_body:
+            message = await receive()
+            if message["type"] == "http.disconnect":
+                return
+            chunks.append(message.get("body", b""))
+            more_body = message.get("more_body", False)
+        body = b"".join(chunks)
+
+        is_authenticated = authenticated(scope)
+        # Unauthenticated requests get the answer of the AgentOS route: a 401 when a key is set
+        shared = (
+            await self.shared_runs.shared_key(route, scope, body) if is_authenticated or not OS_SECURITY_KEY else None
+        )
+        if shared is None:
+            await self.app(scope, replay_body(body), send)
+            return
+        key, user_id = shared
+        # Only authenticated requests get here when a key is set. Without a key, AgentOS runs under the user id the
+        # caller sends, so the copy goes to that user's sessions too.
+        await self.shared_runs.serve(key, user_id, send)
+
+
+def install_shared_runs(app: Any, db: BaseDb, config_path: str) -> SharedRuns:
+    """
+    Share the runs of identical stateless requests to the AgentOS app.
+
+    Add it last: the middleware has to see the requests before the middlewares that open spans or build components,
+    which then apply to the shared runs.
+
+    Args:
+        app (Any): FastAPI app of the AgentOS.
+        db (BaseDb): Database of the sessions of the components.
+        config_path (str): AgentOS config with the quick prompts.
+    """
+    targets = {target.strip().strip("/") for target in SHARED_RUN_TARGETS.split(",") if target.strip()}
+    shared_runs = SharedRuns(db=db, quick_prompts=load_quick_prompts(config_path), targets=targets)
+    shared_runs.fastapi_app = app
+    if any(middleware.cls.__name__ == "JWTMiddleware" for middleware in app.user_middleware):
+        log_warning("Shared runs are disabled: they can't validate the tokens of JWTMiddleware")
+        shared_runs.enabled = False
+    app.add_middleware(SharedRunsMiddleware, shared_runs=shared_runs)
+    if shared_runs.enabled:
+        log_info(f"Shared runs enabled for {len(shared_runs.quick_prompts)} quick prompts")
+    return shared_runs
+
+
+if __name__ == "__main__":
+    import argparse
+
+    import httpx
+
+    parser = argparse.ArgumentParser(description="Compare a burst of identical quick prompts with and without sharing")
+    parser.add_argument("--benchmark", action="store_true")
+    parser.add_argument("--burst", type=int, default=20, help="Identical requests sent at once")
+    parser.add_argument("--ttft", type=float, default=0.5, help="Seconds before the first token of the mock provider")
+    parser.add_argument("--tokens", type=int, default=100, help="Tokens per answer of the mock provider")
+    args = parser.parse_args()
+    if not args.benchmark:
+        parser.print_help()
+        raise SystemExit(0)
+
+    import os
+
+    from loadtest.mock_provider import MockSettings, serve_mock_provider
+
+    # Without rate limits, as in loadtest/run.py
+    os.environ.setdefault("ADMISSION_LIMITS", "")
+    provider = serve_mock_provider(
+        MockSettings(ttft=args.ttft, tokens=args.tokens, token_interval=0.01, tool_call_rate=0, seed=0)
+    )
+
+    from importlib import import_module
+
+    from loadtest.serve import stub_tools
+
+    # Imported once the SDKs point at the mock provider
+    main = import_module("app.main")
+    stub_tools()
+    shared_runs: SharedRuns = main.shared_runs
+    route, message = min(shared_runs.quick_prompts)
+
+    async def burst(client: httpx.AsyncClient, label: str) -> None:
+        calls, started = sum(provider.requests.values()), time.perf_counter()
+
+        async def request(index: int) -> float:
+            form = {"message": message, "stream": "true", "user_id": f"burst-{index}"}
+            response = await client.post(f"/{route}/runs", data=form)
+            response.raise_for_status()
+            return time.perf_counter() - started
+
+        latencies = sorted(await asyncio.gather(*[request(index) for index in range(args.burst)]))
+        await asyncio.sleep(0.5)
+        print(
+            f"{label:<22} {sum(provider.requests.values()) - calls:>4} model calls, "
+            f"p50 {latencies[len(latencies) // 2]:.2f}s, max {latencies[-1]:.2f}s"
+        )
+
+    async def run() -> None:
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=120) as client:
+            print(f"{args.burst} requests for {route}: {message!r}")
+            shared_runs.enabled = False
+            await burst(client, "a run per request")
+            shared_runs.enabled = True
+            await burst(client, "shared run")
+            await burst(client, "kept answer")
+        await shared_runs.close()
+        print(f"stats: {shared_runs.stats.to_dict()}")
+
+    asyncio.run(run())
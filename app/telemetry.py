@@ -0,0 +1,548 @@
+"""
+Span-based tracing of the AgentOS hot path and a Prometheus metrics endpoint.
+
+`install_telemetry(app)` wraps these agno methods at class level, so every agent, team and workflow is covered:
+
+    model       one model call: Model._process_model_response, process_response_stream and their async versions
+    tool        one tool call: FunctionCall.execute and aexecute
+    db          PostgresDb methods, e.g. get_session, upsert_session, get_user_memories
+    vector      PgVector.search and async_search
+    step        workflow steps: Step.execute, execute_stream, aexecute and aexecute_stream
+    run         agent, team and workflow run routes of the AgentOS
+
+Spans started while another span is active become its children, so a trace shows where the time of a run went.
+Durations are kept as histograms per kind and name, model spans add token counters and the time to first token of
+streams, and every SQL statement is timed by type. `/metrics/prometheus` serves them in the Prometheus text format,
+together with the stats registered with `register_stats()` (caches, pools, queues). `/metrics` is taken by the usage
+metrics of the AgentOS.
+
+    TELEMETRY_ENABLED       Set to false to skip the instrumentation. The endpoint still serves the registered stats
+    TELEMETRY_METRICS_PATH  Path of the Prometheus endpoint (default /metrics/prometheus)
+    TRACE_EXPORT_PATH       Append finished spans to this JSONL file, written from a background thread
+
+Usage:
+    curl http://localhost:8000/metrics/prometheus
+    python -m app.telemetry --benchmark
+"""
+
+import inspect
+import json
+import os
+import threading
+import time
+from bisect import bisect_left
+from contextvars import ContextVar
+from dataclasses import asdict, dataclass, field
+from functools import wraps
+from os import getenv
+from queue import SimpleQueue
+from random import getrandbits
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+from agno.utils.log import log_info, log_warning
+
+TELEMETRY_ENABLED = getenv("TELEMETRY_ENABLED", "true").lower() in ("1", "true", "yes")
+TELEMETRY_METRICS_PATH = getenv("TELEMETRY_METRICS_PATH", "/metrics/prometheus")
+TRACE_EXPORT_PATH = getenv("TRACE_EXPORT_PATH")
+
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+SQL_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 5.0)
+
+
+# ============================================================================
+# Metrics
+# ============================================================================
+class Histogram:
+    def __init__(self, name: str, help: str, label_names: Tuple[str, ...], buckets: Tuple[float, ...]):
+        self.name = name
+        self.help = help
+        self.label_names = label_names
+        self.buckets = buckets
+        # Per label values: counts per bucket (the last one is +Inf), sum
+        self._series: Dict[Tuple[str, ...], Tuple[List[int], List[float]]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, labels: Tuple[str, ...], value: float) -> None:
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = ([0] * (len(self.buckets) + 1), [0.0])
+            series[0][bisect_left(self.buckets, value)] += 1
+            series[1][0] += value
+
+    def render(self) -> Iterator[str]:
+        yield f"# HELP {self.name} {self.help}"
+        yield f"# TYPE {self.name} histogram"
+        with self._lock:
+            series = [(labels, list(counts), total[0]) for labels, (counts, total) in self._series.items()]
+        for labels, counts, total in sorted(series):
+            label_text = format_labels(self.label_names, labels)
+            cumulative = 0
+            for bound, count in zip((*self.buckets, "+Inf"), counts):
+                cumulative += count
+                le = format_labels((*self.label_names, "le"), (*labels, str(bound)))
+                yield f"{self.name}_bucket{le} {cumulative}"
+            yield f"{self.name}_sum{label_text} {total}"
+            yield f"{self.name}_count{label_text} {cumulative}"
+
+
+class Counter:
+    def __init__(self, name: str, help: str, label_names: Tuple[str, ...]):
+        self.name = name
+        self.help = help
+        self.label_names = label_names
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, labels: Tuple[str, ...], value: float = 1) -> None:
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + value
+
+    def render(self) -> Iterator[str]:
+        yield f"# HELP {self.name} {self.help}"
+        yield f"# TYPE {self.name} counter"
+        with self._lock:
+            values = sorted(self._values.items())
+        for labels, value in values:
+            yield f"{self.name}{format_labels(self.label_names, labels)} {value}"
+
+
+def format_labels(names: Tuple[str, ...], values: Tuple[str, ...]) -> str:
+    if not names:
+        return ""
+    escaped = (str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for v in values)
+    return "{" + ",".join(f'{n}="{v}"' for n, v in zip(names, escaped)) + "}"
+
+
+span_duration = Histogram(
+    "agentos_span_duration_seconds", "Duration of traced operations", ("kind", "name"), DURATION_BUCKETS
+)
+span_errors = Counter("agentos_span_errors_total", "Traced operations that raised or failed", ("kind", "name"))
+model_tokens = Counter("agentos_model_tokens_total", "Tokens of model calls", ("model", "type"))
+model_ttft = Histogram(
+    "agentos_model_time_to_first_token_seconds",
+    "Time to the first chunk of streamed model calls",
+    ("model",),
+    DURATION_BUCKETS,
+)
+sql_duration = Histogram("agentos_sql_duration_seconds", "Duration of SQL statements", ("statement",), SQL_BUCKETS)
+
+# Stats of caches, pools and queues, exported as gauges: name -> (provider, label of the first level or None)
+_stats_providers: Dict[str, Tuple[Callable[[], Dict[str, Any]], Optional[str]]] = {}
+
+
+def register_stats(name: str, provider: Callable[[], Dict[str, Any]], label: Optional[str] = None) -> None:
+    """
+    Export the numeric values returned by `provider` as `agentos_<name>_<key>` gauges.
+
+    Args:
+        name (str): Name of the component, e.g. "memory_queue".
+        provider (Callable[[], Dict[str, Any]]): Returns the stats, usually a `to_dict()` method.
+        label (Optional[str]): When the stats are keyed by instance, e.g. {"sync": {...}, "async": {...}}, the label
+            holding that key.
+    """
+    _stats_providers[name] = (provider, label)
+
+
+def render_stats() -> Iterator[str]:
+    for name, (provider, label) in sorted(_stats_providers.items()):
+        try:
+            stats = provider()
+        except Exception as e:  # noqa: BLE001 - a failing provider must not break the endpoint
+            log_warning(f"Could not read {name} stats: {e!r}")
+            continue
+        series = stats.items() if label else [("", stats)]
+        gauges: Dict[str, List[str]] = {}
+        for instance, values in series:
+            labels = format_labels((label,), (instance,)) if label else ""
+            for key, value in values.items():
+                if isinstance(value, (int, float)):
+                    gauges.setdefault(f"agentos_{name}_{key}", []).append(f"{labels} {float(value)}")
+        for metric, samples in gauges.items():
+            yield f"# TYPE {metric} gauge"
+            yield from (f"{metric}{sample}" for sample in samples)
+
+
+def render_metrics() -> str:
+    lines: List[str] = []
+    for metric in (span_duration, span_errors, model_tokens, model_ttft, sql_duration):
+        lines.extend(metric.render())
+    lines.extend(render_stats())
+    return "\n".join(lines) + "\n"
+
+
+# ============================================================================
+# Spans
+# ============================================================================
+@dataclass
+class Span:
+    kind: str
+    name: str
+    trace_id: str
+    span_id: str
+    parent_id: Optional[str]
+    start: float
+    duration: float = 0.0
+    error: Optional[str] = None
+    attributes: Dict[str, Any] = field(default_factory=dict)
+
+
+class JsonlExporter:
+    """Writes finished spans to a JSONL file from a background thread, off the request path."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._start()
+        # A forked worker (see app/serve.py) has no writer thread, and spans queued in the parent are its own
+        os.register_at_fork(after_in_child=self._start)
+
+    def _start(self) -> None:
+        self._queue: SimpleQueue = SimpleQueue()
+        threading.Thread(target=self._write, name="trace-exporter", daemon=True).start()
+
+    def export(self, span: Span) -> None:
+        self._queue.put(span)
+
+    def _write(self) -> None:
+        with open(self.path, "a") as f:
+            while True:
+                spans = [self._queue.get()]
+                while not self._queue.empty() and len(spans) < 1000:
+                    spans.append(self._queue.get())
+                f.writelines(json.dumps(asdict(span), default=str) + "\n" for span in spans)
+                f.flush()
+
+
+current_span: ContextVar[Optional[Span]] = ContextVar("current_span", default=None)
+exporter: Optional[JsonlExporter] = None
+
+
+def start_span(kind: str, name: str) -> Span:
+    parent = current_span.get()
+    return Span(
+        kind=kind,
+        name=name,
+        trace_id=parent.trace_id if parent else f"{getrandbits(128):032x}",
+        span_id=f"{getrandbits(64):016x}",
+        parent_id=parent.span_id if parent else None,
+        start=time.time(),
+    )
+
+
+def end_span(span: Span, started: float) -> None:
+    span.duration = time.perf_counter() - started
+    span_duration.observe((span.kind, span.name), span.duration)
+    if span.error is not None:
+        span_errors.inc((span.kind, span.name))
+    if exporter is not None:
+        exporter.export(span)
+
+
+def instrument(
+    cls: Any,
+    method_name: str,
+    kind: str,
+    name: Callable[..., str],
+    on_end: Optional[Callable[..., None]] = None,
+) -> None:
+    """
+    Trace every call of `cls.method_name` as a span.
+
+    Args:
+        cls (Any): Class defining the method.
+        method_name (str): Method to wrap. Functions, coroutines, generators and async generators are supported.
+        kind (str): Kind of the spans, e.g. "tool".
+        name (Callable[..., str]): Name of the span, from the arguments of the call (self included).
+        on_end (Optional[Callable[..., None]]): Called with the span, the result and the arguments of the call once
+            it has finished, to add attributes. The result is None for generators.
+    """
+    method = getattr(cls, method_name)
+    if getattr(method, "__traced__", False):
+        return
+
+    def finish(span: Span, started: float, result: Any, args: Tuple, kwargs: Dict) -> None:
+        if on_end is not None:
+            try:
+                on_end(span, result, *args, **kwargs)
+            except Exception as e:  # noqa: BLE001 - attributes are best effort
+                span.attributes["telemetry_error"] = repr(e)
+        end_span(span, started)
+
+    if inspect.isasyncgenfunction(method):
+
+        @wraps(method)
+        async def async_gen_wrapper(*args: Any, **kwargs: Any) -> Any:
+            span, started = start_span(kind, name(*args, **kwargs)), time.perf_counter()
+            generator = method(*args, **kwargs)
+            try:
+                while True:
+                    # The span is only current while the generator runs, not while the consumer handles its items
+                    token = current_span.set(span)
+                    try:
+                        item = await generator.__anext__()
+                    except StopAsyncIteration:
+                        break
+                    finally:
+                        current_span.reset(token)
+                    span.attributes.setdefault("first_item_seconds", time.perf_counter() - started)
+                    yield item
+            except BaseException as e:
+                span.error = repr(e)
+                raise
+            finally:
+                await generator.aclose()
+                finish(span, started, None, args, kwargs)
+
+        wrapper: Any = async_gen_wrapper
+
+    elif inspect.iscoroutinefunction(method):
+
+        @wraps(method)
+        async def async_wrapper(*args: Any, **kwargs: Any) -> Any:
+            span, started = start_span(kind, name(*args, **kwargs)), time.perf_counter()
+            token = current_span.set(span)
+            result = None
+            try:
+                result = await method(*args, **kwargs)
+                return result
+            except BaseException as e:
+                span.error = repr(e)
+                raise
+            finally:
+                current_span.reset(token)
+                finish(span, started, result, args, kwargs)
+
+        wrapper = async_wrapper
+
+    elif inspect.isgeneratorfunction(method):
+
+        @wraps(method)
+        def gen_wrapper(*args: Any, **kwargs: Any) -> Any:
+            span, started = start_span(kind, name(*args, **kwargs)), time.perf_counter()
+            generator = method(*args, **kwargs)
+            try:
+                while True:
+                    token = current_span.set(span)
+                    try:
+                        item = next(generator)
+                    except StopIteration:
+                        break
+                    finally:
+                        current_span.reset(token)
+                    span.attributes.setdefault("first_item_seconds", time.perf_counter() - started)
+                    yield item
+            except BaseException as e:
+                span.error = repr(e)
+                raise
+            finally:
+                generator.close()
+                finish(span, started, None, args, kwargs)
+
+        wrapper = gen_wrapper
+
+    else:
+
+        @wraps(method)
+        def sync_wrapper(*args: Any, **kwargs: Any) -> Any:
+            span, started = start_span(kind, name(*args, **kwargs)), time.perf_counter()
+            token = current_span.set(span)
+            result = None
+            try:
+                result = method(*args, **kwargs)
+                return result
+            except BaseException as e:
+                span.error = repr(e)
+                raise
+            finally:
+                current_span.reset(token)
+                finish(span, started, result, args, kwargs)
+
+        wrapper = sync_wrapper
+
+    wrapper.__traced__ = True
+    setattr(cls, method_name, wrapper)
+
+
+# ============================================================================
+# Instrumentation
+# ============================================================================
+def _model_name(model: Any, *_: Any, **__: Any) -> str:
+    return str(model.id)
+
+
+def _end_model_call(span: Span, _result: Any, model: Any, *args: Any, **kwargs: Any) -> None:
+    """Record the tokens of the assistant message filled by the call, and the time to first token of streams."""
+    assistant_message = kwargs.get("assistant_message") or (args[1] if len(args) > 1 else None)
+    metrics = getattr(assistant_message, "metrics", None)
+    span.attributes["provider"] = model.provider
+    if metrics is not None:
+        for token_type in ("input_tokens", "output_tokens", "cache_read_tokens", "cache_write_tokens"):
+            tokens = getattr(metrics, token_type, 0) or 0
+            if tokens:
+                span.attributes[token_type] = tokens
+                model_tokens.inc((span.name, token_type.removesuffix("_tokens")), tokens)
+    if "first_item_seconds" in span.attributes:
+        model_ttft.observe((span.name,), span.attributes["first_item_seconds"])
+
+
+def _end_tool_call(span: Span, result: Any, *_: Any, **__: Any) -> None:
+    if result is not None and getattr(result, "status", None) == "failure":
+        span.error = str(result.error)
+
+
+def _end_vector_search(span: Span, result: Any, vector_db: Any, *_: Any, **__: Any) -> None:
+    span.attributes["table"] = vector_db.table_name
+    span.attributes["results"] = len(result or [])
+
+
+def _instrument_agno() -> None:
+    from agno.db.postgres import PostgresDb
+    from agno.models.base import Model
+    from agno.tools.function import FunctionCall
+    from agno.vectordb.pgvector import PgVector
+    from agno.workflow.step import Step
+
+    for method_name in ("_process_model_response", "_aprocess_model_response"):
+        instrument(Model, method_name, "model", _model_name, _end_model_call)
+    for method_name in ("process_response_stream", "aprocess_response_stream"):
+        instrument(Model, method_name, "model", _model_name, _end_model_call)
+
+    for method_name in ("execute", "aexecute"):
+        instrument(FunctionCall, method_name, "tool", lambda call: call.function.name, _end_tool_call)
+
+    for method_name in ("search", "async_search"):
+        instrument(PgVector, method_name, "vector", lambda vector_db, *_, **__: "search", _end_vector_search)
+
+    for method_name in ("execute", "execute_stream", "aexecute", "aexecute_stream"):
+        instrument(Step, method_name, "step", lambda step, *_, **__: str(step.name))
+
+    for method_name, method in list(vars(PostgresDb).items()):
+        if not method_name.startswith("_") and inspect.isfunction(method):
+            instrument(PostgresDb, method_name, "db", lambda *_, _name=method_name, **__: _name)
+
+
+def _instrument_sql() -> None:
+    from sqlalchemy import event
+    from sqlalchemy.engine import Engine
+
+    def before_cursor_execute(conn: Any, *_: Any) -> None:
+        conn.info.setdefault("telemetry_started", []).append(time.perf_counter())
+
+    def after_cursor_execute(conn: Any, _cursor: Any, statement: str, *_: Any) -> None:
+        started = conn.info.get("telemetry_started")
+        if started:
+            statement_type = statement.lstrip().split(None, 1)[0].upper() if statement.strip() else "OTHER"
+            sql_duration.observe((statement_type,), time.perf_counter() - started.pop())
+
+    def handle_error(context: Any) -> None:
+        started = context.connection.info.get("telemetry_started") if context.connection is not None else None
+        if started:
+            started.pop()
+
+    event.listen(Engine, "before_cursor_execute", before_cursor_execute)
+    event.listen(Engine, "after_cursor_execute", after_cursor_execute)
+    event.listen(Engine, "handle_error", handle_error)
+
+
+def run_route(path: str) -> Optional[str]:
+    """Return "<kind>/<id>" for the run routes of agents, teams and workflows."""
+    parts = path.strip("/").split("/")
+    if len(parts) == 3 and parts[0] in ("agents", "teams", "workflows") and parts[2] == "runs":
+        return f"{parts[0]}/{parts[1]}"
+    return None
+
+
+class RunSpanMiddleware:
+    """Opens the root span of agent, team and workflow runs, kept current until the response has been streamed."""
+
+    def __init__(self, app: Any):
+        self.app = app
+
+    async def __call__(self, scope: Dict[str, Any], receive: Any, send: Any) -> None:
+        route = run_route(scope.get("path", "")) if scope["type"] == "http" else None
+        if route is None or scope.get("method") != "POST":
+            await self.app(scope, receive, send)
+            return
+
+        span, started = start_span("run", route), time.perf_counter()
+
+        async def send_with_status(message: Dict[str, Any]) -> None:
+            if message["type"] == "http.response.start":
+                span.attributes["status"] = message["status"]
+                if message["status"] >= 500:
+                    span.error = f"HTTP {message['status']}"
+            await send(message)
+
+        token = current_span.set(span)
+        try:
+            await self.app(scope, receive, send_with_status)
+        except BaseException as e:
+            span.error = repr(e)
+            raise
+        finally:
+            current_span.reset(token)
+            end_span(span, started)
+
+
+def install_telemetry(app: Any) -> None:
+    """Instrument agno and add the Prometheus endpoint to the AgentOS app."""
+    from fastapi.responses import PlainTextResponse
+
+    global exporter
+
+    if TELEMETRY_ENABLED:
+        _instrument_agno()
+        _instrument_sql()
+        app.add_middleware(RunSpanMiddleware)
+        if TRACE_EXPORT_PATH and exporter is None:
+            exporter = JsonlExporter(TRACE_EXPORT_PATH)
+        log_info(f"Telemetry enabled{f', exporting spans to {TRACE_EXPORT_PATH}' if TRACE_EXPORT_PATH else ''}")
+
+    @app.get(TELEMETRY_METRICS_PATH, include_in_schema=False)
+    async def metrics() -> PlainTextResponse:
+        return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4")
+
+
+if __name__ == "__main__":
+    import argparse
+    import asyncio
+    import tempfile
+
+    parser = argparse.ArgumentParser(description="Measure the overhead of the instrumentation")
+    parser.add_argument("--benchmark", action="store_true")
+    parser.add_argument("--calls", type=int, default=200_000)
+    args = parser.parse_args()
+
+    class Target:
+        def call(self, value: int) -> int:
+            return value + 1
+
+        async def acall(self, value: int) -> int:
+            return value + 1
+
+    def measure(target: Target) -> Tuple[float, float]:
+        started = time.perf_counter()
+        for i in range(args.calls):
+            target.call(i)
+        sync = (time.perf_counter() - started) / args.calls
+
+        async def run() -> None:
+            for i in range(args.calls):
+                await target.acall(i)
+
+        started = time.perf_counter()
+        asyncio.run(run())
+        return sync, (time.perf_counter() - started) / args.calls
+
+    baseline = measure(Target())
+    instrument(Target, "call", "bench", lambda *_, **__: "call")
+    instrument(Target, "acall", "bench", lambda *_, **__: "acall")
+    traced = measure(Target())
+    with tempfile.NamedTemporaryFile(suffix=".jsonl") as f:
+        exporter = JsonlExporter(f.name)
+        exported = measure(Target())
+    for label, (sync, coroutine) in (("plain", baseline), ("traced", traced), ("traced+jsonl", exported)):
+        print(f"{label:<14} sync {sync * 1e6:6.2f}us/call  async {coroutine * 1e6:6.2f}us/call")
+    print(
+        f"overhead per span: sync {(traced[0] - baseline[0]) * 1e6:.2f}us, async {(traced[1] - baseline[1]) * 1e6:.2f}us"
+    )
@@ -3,8 +3,9 @@
 # ============================================================================
 from agno.db.postgres import PostgresDb
 
+from db.pool import get_engine
 from db.url import get_db_url
 
 # ************* Create database *************
 db_url = get_db_url()
-demo_db = PostgresDb(id="demo-db", db_url=db_url)
+demo_db = PostgresDb(id="demo-db", db_engine=get_engine())
@@ -0,0 +1,674 @@
+"""
+Storage maintenance of the sessions of `demo_db`: indexes, compaction, archival and retention.
+
+Agno keeps a session as one row of the sessions table, with every run of the session in its `runs` JSONB column. The
+table only grows, and the AgentOS lists sessions by user with a sequential scan. Agno upserts sessions on their unique
+`session_id`, which a partitioned table cannot enforce without its partition key, so the table stays a plain table
+and is kept small instead. Each pass of `StorageMaintenance`:
+- Creates the indexes of the lookups the table has none for: the sessions of a user by creation time, and sessions
+  by last activity for the passes themselves. The latest runs of a session are read with its row, by `session_id`.
+- Compacts the sessions idle for `STORAGE_COMPACT_AFTER_DAYS`: tool results are cut to `STORAGE_TOOL_RESULT_TOKENS`
+  estimated tokens and the history messages copied into each run are dropped (agno skips them when it replays the
+  history). Each session is compacted once per idle period, after the checkpoint of the previous pass.
+- Moves the sessions idle for `STORAGE_ARCHIVE_AFTER_DAYS` to an archive table partitioned by month of last activity,
+  where `restore` finds them.
+- Drops the archive partitions older than `STORAGE_RETENTION_DAYS`, and prunes the runs archived by agents/history.py
+  as old.
+- Prunes the embedding cache tables of knowledge/embedding_cache.py: expired rows, and the oldest rows above
+  `EMBEDDING_CACHE_MAX_ROWS` per table.
+
+A pass holds an advisory lock, so one worker of the app runs it. The sizes measured after the last pass are exported
+with the pass counters on `/metrics/prometheus` as `agentos_storage_*`.
+
+    STORAGE_MAINTENANCE_INTERVAL    Seconds between two passes in the app (default 86400, 0 disables)
+    STORAGE_COMPACT_AFTER_DAYS      Idle days before a session is compacted (default 7)
+    STORAGE_ARCHIVE_AFTER_DAYS      Idle days before a session is archived (default 90, 0 disables)
+    STORAGE_RETENTION_DAYS          Days archived sessions and runs are kept (default 365, 0 keeps them)
+    STORAGE_TOOL_RESULT_TOKENS      Estimated tokens kept of each tool result (default HISTORY_TOOL_RESULT_TOKENS)
+
+Usage:
+    storage_maintenance = StorageMaintenance(demo_db, runs_archive=run_archive)
+    await storage_maintenance.start()
+
+    python -m db.maintenance report
+    python -m db.maintenance run
+    python -m db.maintenance restore --session-id <session_id>
+    python -m db.maintenance benchmark --months 12
+"""
+
+import asyncio
+import json
+import time
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from os import getenv
+from typing import Any, Dict, List, Optional, Tuple
+
+from agno.db.postgres import PostgresDb
+from agno.utils.log import log_debug, log_info, log_warning
+from sqlalchemy import Column, MetaData, String, Table, func, text
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.engine import Connection
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.types import BigInteger, DateTime
+
+from agents.history import HISTORY_TOOL_RESULT_TOKENS, RunArchive, truncate_text
+from knowledge.embedding_cache import prune_caches
+
+STORAGE_MAINTENANCE_INTERVAL = float(getenv("STORAGE_MAINTENANCE_INTERVAL", "86400"))
+STORAGE_COMPACT_AFTER_DAYS = float(getenv("STORAGE_COMPACT_AFTER_DAYS", "7"))
+STORAGE_ARCHIVE_AFTER_DAYS = float(getenv("STORAGE_ARCHIVE_AFTER_DAYS", "90"))
+STORAGE_RETENTION_DAYS = float(getenv("STORAGE_RETENTION_DAYS", "365"))
+STORAGE_TOOL_RESULT_TOKENS = int(getenv("STORAGE_TOOL_RESULT_TOKENS", str(HISTORY_TOOL_RESULT_TOKENS)))
+
+DAY = 86400
+# Last activity of a session, the partition key of the archive
+ACTIVITY = "coalesce(updated_at, created_at)"
+# Key of the advisory lock held during a pass
+LOCK_KEY = 0x53544F52
+# Leave the startup and warm-up of the app alone
+FIRST_PASS_DELAY = 60.0
+
+
+def month_bounds(timestamp: float) -> Tuple[int, int]:
+    """Epoch seconds of the start of the UTC month of `timestamp` and of the next month."""
+    start = datetime.fromtimestamp(timestamp, tz=timezone.utc).replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+    end = start.replace(year=start.year + start.month // 12, month=start.month % 12 + 1)
+    return int(start.timestamp()), int(end.timestamp())
+
+
+@dataclass
+class CompactionStats:
+    trimmed_tool_results: int = 0
+    dropped_history_messages: int = 0
+
+
+def compact_runs(node: Any, max_tokens: int, stats: CompactionStats) -> None:
+    """
+    Cut the tool results and drop the history messages of serialized runs, in place.
+
+    Walks the nested runs too: member runs of teams and step runs of workflows.
+    """
+    if isinstance(node, list):
+        for item in node:
+            compact_runs(item, max_tokens, stats)
+        return
+    if not isinstance(node, dict):
+        return
+    messages = node.get("messages")
+    if isinstance(messages, list):
+        kept = [message for message in messages if not (isinstance(message, dict) and message.get("from_history"))]
+        stats.dropped_history_messages += len(messages) - len(kept)
+        node["messages"] = kept
+    if node.get("role") == "tool" and isinstance(node.get("content"), str):
+        content = truncate_text(node["content"], max_tokens)
+        if content != node["content"]:
+            node["content"] = content
+            stats.trimmed_tool_results += 1
+    tools = node.get("tools")
+    for tool in tools if isinstance(tools, list) else []:
+        if isinstance(tool, dict) and isinstance(tool.get("result"), str):
+            result = truncate_text(tool["result"], max_tokens)
+            if result != tool["result"]:
+                tool["result"] = result
+                stats.trimmed_tool_results += 1
+    for value in node.values():
+        if isinstance(value, (dict, list)):
+            compact_runs(value, max_tokens, stats)
+
+
+@dataclass
+class StorageStats:
+    passes: int = 0
+    skipped_passes: int = 0
+    compacted_sessions: int = 0
+    trimmed_tool_results: int = 0
+    dropped_history_messages: int = 0
+    compacted_bytes: int = 0
+    archived_sessions: int = 0
+    dropped_partitions: int = 0
+    pruned_runs: int = 0
+    pruned_embeddings: int = 0
+    pass_time: float = 0.0
+    # Measured after the last pass
+    sessions: int = 0
+    sessions_bytes: int = 0
+    archived: int = 0
+    archive_bytes: int = 0
+    archive_partitions: int = 0
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "passes": self.passes,
+            "skipped_passes": self.skipped_passes,
+            "compacted_sessions": self.compacted_sessions,
+            "trimmed_tool_results": self.trimmed_tool_results,
+            "dropped_history_messages": self.dropped_history_messages,
+            "compacted_bytes": self.compacted_bytes,
+            "archived_sessions": self.archived_sessions,
+            "dropped_partitions": self.dropped_partitions,
+            "pruned_runs": self.pruned_runs,
+            "pruned_embeddings": self.pruned_embeddings,
+            "pass_seconds": round(self.pass_time, 3),
+            "sessions": self.sessions,
+            "sessions_bytes": self.sessions_bytes,
+            "archived": self.archived,
+            "archive_bytes": self.archive_bytes,
+            "archive_partitions": self.archive_partitions,
+        }
+
+
+class StorageMaintenance:
+    """
+    Indexes, compaction, archival and retention of the sessions table of a `PostgresDb`.
+
+    Args:
+        db (PostgresDb): Database of the sessions, usually `demo_db`.
+        compact_after_days (float): Idle days before a session is compacted.
+        archive_after_days (float): Idle days before a session is archived. 0 disables archival.
+        retention_days (float): Days archived sessions and runs are kept. 0 keeps them.
+        tool_result_tokens (int): Estimated tokens kept of each tool result.
+        runs_archive (Optional[RunArchive]): Archive of the runs moved out of their session by agents/history.py.
+        prune_embedding_caches (bool): Prune the embedding cache tables of the schema.
+        batch_size (int): Sessions compacted or archived per statement.
+    """
+
+    def __init__(
+        self,
+        db: PostgresDb,
+        compact_after_days: float = STORAGE_COMPACT_AFTER_DAYS,
+        archive_after_days: float = STORAGE_ARCHIVE_AFTER_DAYS,
+        retention_days: float = STORAGE_RETENTION_DAYS,
+        tool_result_tokens: int = STORAGE_TOOL_RESULT_TOKENS,
+        runs_archive: Optional[RunArchive] = None,
+        prune_embedding_caches: bool = True,
+        batch_size: int = 200,
+    ):
+        self.db = db
+        self.engine = db.db_engine
+        self.schema = db.db_schema
+        self.table = db.session_table_name
+        self.archive = f"{db.session_table_name}_archive"
+        self.compact_after_days = compact_after_days
+        self.archive_after_days = archive_after_days
+        self.retention_days = retention_days
+        self.tool_result_tokens = tool_result_tokens
+        self.runs_archive = runs_archive
+        self.prune_embedding_caches = prune_embedding_caches
+        self.batch_size = batch_size
+        self.stats = StorageStats()
+        self.checkpoints = Table(
+            "storage_maintenance_checkpoint",
+            MetaData(schema=self.schema),
+            Column("job", String, primary_key=True),
+            Column("compacted_before", BigInteger),
+            Column("updated_at", DateTime(timezone=True), server_default=func.now()),
+        )
+        self._task: Optional[asyncio.Task] = None
+
+    def _relation(self, name: str) -> str:
+        return f'"{self.schema}"."{name}"'
+
+    def _exists(self, conn: Connection, name: str) -> bool:
+        return bool(
+            conn.execute(text("SELECT to_regclass(:name) IS NOT NULL"), {"name": f"{self.schema}.{name}"}).scalar()
+        )
+
+    def _columns(self, conn: Connection) -> str:
+        """Columns of the sessions table, in the order of the archive."""
+        rows = conn.execute(
+            text(
+                "SELECT column_name FROM information_schema.columns WHERE table_schema = :schema "
+                "AND table_name = :table ORDER BY ordinal_position"
+            ),
+            {"schema": self.schema, "table": self.table},
+        )
+        return ", ".join(f'"{row[0]}"' for row in rows)
+
+    # ============================================================================
+    # Indexes and archive
+    # ============================================================================
+    def ensure_indexes(self) -> None:
+        """Create the indexes of the sessions table, without blocking its writes."""
+        indexes = {
+            f"idx_{self.table}_user_type_created": "(user_id, session_type, created_at DESC)",
+            f"idx_{self.table}_activity": f"(({ACTIVITY}))",
+        }
+        with self.engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+            for name, columns in indexes.items():
+                conn.execute(
+                    text(f'CREATE INDEX CONCURRENTLY IF NOT EXISTS "{name}" ON {self._relation(self.table)} {columns}')
+                )
+
+    def ensure_archive(self, conn: Connection) -> None:
+        conn.execute(
+            text(
+                f"CREATE TABLE IF NOT EXISTS {self._relation(self.archive)} "
+                f"(LIKE {self._relation(self.table)} INCLUDING DEFAULTS) PARTITION BY RANGE (({ACTIVITY}))"
+            )
+        )
+        conn.execute(
+            text(
+                f'CREATE INDEX IF NOT EXISTS "idx_{self.archive}_session_id" ON {self._relation(self.archive)} (session_id)'
+            )
+        )
+
+    def partition_name(self, start: int) -> str:
+        return f"{self.archive}_p{datetime.fromtimestamp(start, tz=timezone.utc):%Y%m}"
+
+    def ensure_partition(self, conn: Connection, timestamp: float) -> None:
+        start, end = month_bounds(timestamp)
+        conn.execute(
+            text(
+                f"CREATE TABLE IF NOT EXISTS {self._relation(self.partition_name(start))} PARTITION OF "
+                f"{self._relation(self.archive)} FOR VALUES FROM ({start}) TO ({end})"
+            )
+        )
+
+    def partitions(self, conn: Connection) -> List[Dict[str, Any]]:
+        """Name, rows and size of the archive partitions, oldest first."""
+        if not self._exists(conn, self.archive):
+            return []
+        rows = conn.execute(
+            text(
+                "SELECT c.relname AS name, c.reltuples::bigint AS rows, pg_total_relation_size(c.oid) AS bytes "
+                "FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+                "WHERE i.inhparent = to_regclass(:archive) ORDER BY c.relname"
+            ),
+            {"archive": f"{self.schema}.{self.archive}"},
+        )
+        return [dict(row._mapping) for row in rows]
+
+    # ============================================================================
+    # Pass
+    # ============================================================================
+    def compact_sessions(self, conn: Connection, now: float) -> int:
+        """Compact the sessions that went idle since the previous pass."""
+        self.checkpoints.create(conn, checkfirst=True)
+        row = conn.execute(self.checkpoints.select().where(self.checkpoints.c.job == "compaction")).first()
+        since, cutoff = (row.compacted_before or 0) if row else 0, int(now - self.compact_after_days * DAY)
+        compacted, after = 0, (since - 1, "")
+        while True:
+            page = conn.execute(
+                text(
+                    f"SELECT session_id, updated_at, {ACTIVITY} AS activity, runs FROM {self._relation(self.table)} "
+                    f"WHERE {ACTIVITY} >= :since AND {ACTIVITY} < :cutoff AND ({ACTIVITY}, session_id) > (:activity, :id) "
+                    f"ORDER BY {ACTIVITY}, session_id LIMIT :limit"
+                ),
+                {"since": since, "cutoff": cutoff, "activity": after[0], "id": after[1], "limit": self.batch_size},
+            ).all()
+            for session in page:
+                stats, size = CompactionStats(), len(json.dumps(session.runs or []))
+                runs = session.runs or []
+                compact_runs(runs, self.tool_result_tokens, stats)
+                if not stats.trimmed_tool_results and not stats.dropped_history_messages:
+                    continue
+                # Skipped when the session was updated meanwhile: it is compacted once idle again
+                updated = conn.execute(
+                    text(
+                        f"UPDATE {self._relation(self.table)} SET runs = CAST(:runs AS jsonb) "
+                        "WHERE session_id = :id AND updated_at IS NOT DISTINCT FROM CAST(:updated_at AS bigint)"
+                    ),
+                    {"runs": json.dumps(runs), "id": session.session_id, "updated_at": session.updated_at},
+                ).rowcount
+                if updated:
+                    compacted += 1
+                    self.stats.trimmed_tool_results += stats.trimmed_tool_results
+                    self.stats.dropped_history_messages += stats.dropped_history_messages
+                    self.stats.compacted_bytes += size - len(json.dumps(runs))
+            conn.commit()
+            if len(page) < self.batch_size:
+                break
+            after = (page[-1].activity, page[-1].session_id)
+        values = {"job": "compaction", "compacted_before": cutoff}
+        stmt = postgresql.insert(self.checkpoints).values(values)
+        conn.execute(stmt.on_conflict_do_update(index_elements=["job"], set_={**values, "updated_at": func.now()}))
+        conn.commit()
+        self.stats.compacted_sessions += compacted
+        return compacted
+
+    def archive_sessions(self, conn: Connection, now: float) -> int:
+        """Move the sessions idle for `archive_after_days` to the archive, one batch per transaction."""
+        if not self.archive_after_days:
+            return 0
+        cutoff = int(now - self.archive_after_days * DAY)
+        self.ensure_archive(conn)
+        months = conn.execute(
+            text(
+                f"SELECT DISTINCT date_trunc('month', to_timestamp({ACTIVITY}) AT TIME ZONE 'UTC') AS month "
+                f"FROM {self._relation(self.table)} WHERE {ACTIVITY} < :cutoff"
+            ),
+            {"cutoff": cutoff},
+        ).all()
+        for row in months:
+            self.ensure_partition(conn, row.month.replace(tzinfo=timezone.utc).timestamp())
+        conn.commit()
+        columns, archived = self._columns(conn), 0
+        while True:
+            moved = conn.execute(
+                text(
+                    f"WITH moved AS (DELETE FROM {self._relation(self.table)} WHERE session_id IN ("
+                    f"SELECT session_id FROM {self._relation(self.table)} WHERE {ACTIVITY} < :cutoff "
+                    f"ORDER BY {ACTIVITY} LIMIT :limit FOR UPDATE SKIP LOCKED) RETURNING {columns}) "
+                    f"INSERT INTO {self._relation(self.archive)} ({columns}) SELECT {columns} FROM moved"
+                ),
+                {"cutoff": cutoff, "limit": self.batch_size},
+            ).rowcount
+            conn.commit()
+            archived += moved
+            if moved < self.batch_size:
+                break
+        self.stats.archived_sessions += archived
+        return archived
+
+    def apply_retention(self, conn: Connection, now: float) -> None:
+        """Drop the archive partitions and the archived runs older than `retention_days`."""
+        if not self.retention_days:
+            return
+        cutoff = now - self.retention_days * DAY
+        for partition in self.partitions(conn):
+            start = datetime.strptime(partition["name"][-6:], "%Y%m").replace(tzinfo=timezone.utc).timestamp()
+            if month_bounds(start)[1] <= cutoff:
+                conn.execute(text(f"DROP TABLE IF EXISTS {self._relation(partition['name'])}"))
+                self.stats.dropped_partitions += 1
+                log_debug(f"Dropped archive partition {partition['name']}")
+        conn.commit()
+        if self.runs_archive is not None and self._exists(conn, self.runs_archive.table.name):
+            relation = f'"{self.runs_archive.schema}"."{self.runs_archive.table.name}"'
+            while True:
+                pruned = conn.execute(
+                    text(
+                        f"DELETE FROM {relation} WHERE ctid IN (SELECT ctid FROM {relation} "
+                        "WHERE archived_at < to_timestamp(:cutoff) LIMIT :limit)"
+                    ),
+                    {"cutoff": cutoff, "limit": self.batch_size * 10},
+                ).rowcount
+                conn.commit()
+                self.stats.pruned_runs += pruned
+                if pruned < self.batch_size * 10:
+                    break
+
+    def vacuum(self) -> None:
+        """Make the space of the compacted and archived sessions reusable, and refresh the row estimates."""
+        with self.engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+            conn.execute(text(f"VACUUM (ANALYZE) {self._relation(self.table)}"))
+            if self._exists(conn, self.archive):
+                conn.execute(text(f"ANALYZE {self._relation(self.archive)}"))
+
+    def measure(self, conn: Connection) -> None:
+        self.stats.sessions, self.stats.sessions_bytes = conn.execute(
+            text(
+                f"SELECT (SELECT count(*) FROM {self._relation(self.table)}), "
+                f"pg_total_relation_size(to_regclass(:table))"
+            ),
+            {"table": f"{self.schema}.{self.table}"},
+        ).one()
+        partitions = self.partitions(conn)
+        self.stats.archive_partitions = len(partitions)
+        self.stats.archived = sum(max(partition["rows"], 0) for partition in partitions)
+        self.stats.archive_bytes = sum(partition["bytes"] for partition in partitions)
+
+    def run_pass(self, now: Optional[float] = None) -> bool:
+        """
+        Run one pass, unless another process is running one.
+
+        Args:
+            now (Optional[float]): Epoch seconds the idle times are measured from. Defaults to the current time.
+        """
+        now = now if now is not None else time.time()
+        started = time.perf_counter()
+        with self.engine.connect() as conn:
+            if not self._exists(conn, self.table):
+                return False
+            if not conn.execute(text("SELECT pg_try_advisory_lock(:key)"), {"key": LOCK_KEY}).scalar():
+                self.stats.skipped_passes += 1
+                return False
+            conn.commit()
+            try:
+                self.ensure_indexes()
+                compacted = self.compact_sessions(conn, now)
+                archived = self.archive_sessions(conn, now)
+                self.apply_retention(conn, now)
+                if self.prune_embedding_caches:
+                    self.stats.pruned_embeddings += sum(prune_caches(self.engine, self.schema).values())
+                self.vacuum()
+                self.measure(conn)
+            finally:
+                conn.rollback()
+                conn.execute(text("SELECT pg_advisory_unlock(:key)"), {"key": LOCK_KEY})
+                conn.commit()
+        self.stats.passes += 1
+        self.stats.pass_time = time.perf_counter() - started
+        log_info(
+            f"Storage maintenance: compacted {compacted} sessions, archived {archived} "
+            f"in {self.stats.pass_time:.1f}s, {self.stats.sessions} sessions left"
+        )
+        return True
+
+    def restore(self, session_id: str) -> bool:
+        """Move an archived session back to the sessions table."""
+        with self.engine.begin() as conn:
+            if not self._exists(conn, self.archive):
+                return False
+            columns = self._columns(conn)
+            return bool(
+                conn.execute(
+                    text(
+                        f"WITH restored AS (DELETE FROM {self._relation(self.archive)} WHERE session_id = :id "
+                        f"RETURNING {columns}) INSERT INTO {self._relation(self.table)} ({columns}) "
+                        f"SELECT {columns} FROM restored ON CONFLICT (session_id) DO NOTHING"
+                    ),
+                    {"id": session_id},
+                ).rowcount
+            )
+
+    # ============================================================================
+    # Report
+    # ============================================================================
+    def report(self, session_id: Optional[str] = None, user_id: Optional[str] = None) -> Dict[str, Any]:
+        """Sizes of the sessions table and the archive, and the plans of the session reads of the AgentOS."""
+        with self.engine.connect() as conn:
+            self.measure(conn)
+            table = conn.execute(
+                text(
+                    f"SELECT pg_table_size(to_regclass(:table)) AS table_bytes, "
+                    f"pg_indexes_size(to_regclass(:table)) AS index_bytes, "
+                    f"coalesce(avg(pg_column_size(runs)), 0)::bigint AS avg_runs_bytes, "
+                    f"coalesce(max(pg_column_size(runs)), 0) AS max_runs_bytes FROM {self._relation(self.table)}"
+                ),
+                {"table": f"{self.schema}.{self.table}"},
+            ).one()
+            if session_id is None or user_id is None:
+                latest = conn.execute(
+                    text(
+                        f"SELECT session_id, user_id FROM {self._relation(self.table)} ORDER BY created_at DESC LIMIT 1"
+                    )
+                ).first()
+                session_id = session_id or (latest.session_id if latest else "")
+                user_id = user_id or (latest.user_id if latest else "")
+            queries = {
+                "session by id": (
+                    f"SELECT * FROM {self._relation(self.table)} WHERE session_id = :session_id",
+                    {"session_id": session_id},
+                ),
+                "sessions of a user": (
+                    (
+                        f"SELECT * FROM {self._relation(self.table)} WHERE user_id = :user_id "
+                        "AND session_type = 'agent' ORDER BY created_at DESC LIMIT 20"
+                    ),
+                    {"user_id": user_id},
+                ),
+            }
+            plans = {
+                name: "\n".join(
+                    row[0] for row in conn.execute(text(f"EXPLAIN (ANALYZE, BUFFERS, COSTS OFF) {sql}"), params)
+                )
+                for name, (sql, params) in queries.items()
+            }
+            partitions = self.partitions(conn)
+        return {**self.stats.to_dict(), **dict(table._mapping), "partitions": partitions, "plans": plans}
+
+    # ============================================================================
+    # Schedule
+    # ============================================================================
+    async def start(self, interval: float = STORAGE_MAINTENANCE_INTERVAL) -> None:
+        if interval > 0 and self._task is None:
+            self._task = asyncio.create_task(self._run(interval), name="storage-maintenance")
+
+    async def _run(self, interval: float) -> None:
+        await asyncio.sleep(FIRST_PASS_DELAY)
+        while True:
+            try:
+                await asyncio.to_thread(self.run_pass)
+            except SQLAlchemyError as e:
+                log_warning(f"Storage maintenance pass failed: {e}")
+            await asyncio.sleep(interval)
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+
+if __name__ == "__main__":
+    import argparse
+    import random
+    from statistics import quantiles
+    from uuid import uuid4
+
+    from agno.db.base import SessionType
+
+    from agents.history import run_archive
+    from db.demo_db import demo_db
+    from db.pool import get_engine
+
+    parser = argparse.ArgumentParser(description="Maintain the session storage of demo_db")
+    parser.add_argument("command", choices=["report", "run", "restore", "benchmark"])
+    parser.add_argument("--session-id", default=None, help="Session to restore, or whose read to explain")
+    parser.add_argument("--user-id", default=None, help="User whose session list to explain")
+    parser.add_argument("--months", type=int, default=12, help="Months of sessions generated by the benchmark")
+    parser.add_argument("--sessions-per-month", type=int, default=300)
+    parser.add_argument("--users", type=int, default=50)
+    parser.add_argument("--runs", type=int, default=4, help="Runs per generated session")
+    parser.add_argument("--tool-kb", type=int, default=4, help="KB of each generated tool result")
+    args = parser.parse_args()
+
+    if args.command == "report":
+        report = StorageMaintenance(demo_db, runs_archive=run_archive).report(args.session_id, args.user_id)
+        print(
+            f"{demo_db.db_schema}.{demo_db.session_table_name}: {report['sessions']} sessions, "
+            f"table {report['table_bytes'] / 1e6:.1f}MB, indexes {report['index_bytes'] / 1e6:.1f}MB, "
+            f"runs {report['avg_runs_bytes'] / 1e3:.1f}KB avg / {report['max_runs_bytes'] / 1e3:.1f}KB max per session"
+        )
+        print(f"archive: {report['archived']} sessions in {report['archive_partitions']} partitions")
+        for partition in report["partitions"]:
+            print(f"  {partition['name']:<40} {partition['rows']:>8} rows {partition['bytes'] / 1e6:>9.1f}MB")
+        for name, plan in report["plans"].items():
+            print(f"\n{name}:\n{plan}")
+    elif args.command == "run":
+        StorageMaintenance(demo_db, runs_archive=run_archive).run_pass()
+    elif args.command == "restore":
+        if not args.session_id:
+            parser.error("restore needs --session-id")
+        restored = StorageMaintenance(demo_db, runs_archive=run_archive).restore(args.session_id)
+        print(f"Restored {args.session_id}" if restored else f"{args.session_id} is not in the archive")
+    elif args.command == "benchmark":
+        # Two copies of the same growing data in scratch schemas, one maintained after each month
+        random.seed(0)
+        engine = get_engine()
+        dbs = {
+            name: PostgresDb(db_engine=engine, db_schema=f"storage_bench_{name}") for name in ("plain", "maintained")
+        }
+        tool_result = " ".join(random.choice(["revenue", "margin", "guidance", "growth"]) for _ in range(200))
+        tool_result = (tool_result * (args.tool_kb * 1024 // len(tool_result) + 1))[: args.tool_kb * 1024]
+
+        def session_row(created_at: int) -> Dict[str, Any]:
+            runs: List[Dict[str, Any]] = []
+            history: List[Dict[str, Any]] = []
+            for index in range(args.runs):
+                messages: List[Dict[str, Any]] = [
+                    {"role": "user", "content": f"Question {index} about the quarter"},
+                    {"role": "assistant", "content": None, "tool_calls": [{"id": f"call_{index}"}]},
+                    {"role": "tool", "content": tool_result, "tool_call_id": f"call_{index}"},
+                    {"role": "assistant", "content": "The quarter was strong. " * 20},
+                ]
+                runs.append(
+                    {
+                        "run_id": str(uuid4()),
+                        "agent_id": "finance-agent",
+                        "status": "COMPLETED",
+                        "created_at": created_at,
+                        "messages": [*history, *messages],
+                        "tools": [{"tool_call_id": f"call_{index}", "tool_name": "get_price", "result": tool_result}],
+                    }
+                )
+                # Stored history copies, as with `store_history_messages`
+                history = [*history, *({**message, "from_history": True} for message in messages)]
+            return {
+                "session_id": str(uuid4()),
+                "session_type": "agent",
+                "agent_id": "finance-agent",
+                "user_id": f"user-{random.randrange(args.users)}",
+                "runs": json.dumps(runs),
+                "created_at": created_at,
+                "updated_at": created_at + 600,
+            }
+
+        def timed(read: Any, count: int = 50) -> float:
+            timings = []
+            for _ in range(count):
+                started = time.perf_counter()
+                read()
+                timings.append((time.perf_counter() - started) * 1000)
+            return quantiles(timings, n=2)[0]
+
+        for db in dbs.values():
+            with engine.begin() as conn:
+                conn.execute(text(f"DROP SCHEMA IF EXISTS {db.db_schema} CASCADE"))
+            db._get_table(table_type="sessions", create_table_if_not_found=True)
+        maintenance = StorageMaintenance(
+            dbs["maintained"], compact_after_days=7, archive_after_days=90, retention_days=365
+        )
+        start = time.time() - args.months * 30 * DAY
+        print(f"{'month':>5} {'':<11} {'sessions':>9} {'table MB':>9} {'read ms':>8} {'list ms':>8}")
+        for month in range(1, args.months + 1):
+            month_start = start + (month - 1) * 30 * DAY
+            rows = [session_row(int(month_start + random.random() * 30 * DAY)) for _ in range(args.sessions_per_month)]
+            now = month_start + 30 * DAY
+            recent = max(rows, key=lambda row: row["created_at"])
+            for name, db in dbs.items():
+                with engine.begin() as conn:
+                    conn.execute(
+                        text(
+                            f'INSERT INTO {db.db_schema}."{db.session_table_name}" (session_id, session_type, '
+                            "agent_id, user_id, runs, created_at, updated_at) VALUES (:session_id, :session_type, "
+                            ":agent_id, :user_id, CAST(:runs AS jsonb), :created_at, :updated_at)"
+                        ),
+                        rows,
+                    )
+                    conn.execute(text(f'ANALYZE {db.db_schema}."{db.session_table_name}"'))
+                if name == "maintained":
+                    maintenance.run_pass(now=now)
+                read_ms = timed(
+                    lambda db=db, recent=recent: db.get_session(
+                        session_id=recent["session_id"], session_type=SessionType.AGENT
+                    )
+                )
+                list_ms = timed(
+                    lambda db=db, recent=recent: db.get_sessions(
+                        session_type=SessionType.AGENT, user_id=recent["user_id"], limit=20, page=1
+                    )
+                )
+                with engine.connect() as conn:
+                    sessions, size = conn.execute(
+                        text(
+                            f"SELECT count(*), pg_total_relation_size('{db.db_schema}.\"{db.session_table_name}\"') "
+                            f'FROM {db.db_schema}."{db.session_table_name}"'
+                        )
+                    ).one()
+                print(f"{month:>5} {name:<11} {sessions:>9} {size / 1e6:>9.1f} {read_ms:>8.2f} {list_ms:>8.2f}")
+        print(f"maintained: {maintenance.stats.to_dict()}")
+        for db in dbs.values():
+            with engine.begin() as conn:
+                conn.execute(text(f"DROP SCHEMA IF EXISTS {db.db_schema} CASCADE"))
@@ -0,0 +1,162 @@
+"""
+Shared connection pool for every component that talks to the database.
+
+Sessions, agent storage, knowledge tables and the embedding cache all get their engine from `get_engine()`, so the
+process holds a single pool sized from the environment instead of one default pool per component:
+
+    DB_POOL_SIZE            Connections kept open (default 10)
+    DB_MAX_OVERFLOW         Extra connections opened under load (default 20)
+    DB_POOL_TIMEOUT         Seconds to wait for a connection before failing (default 30)
+    DB_POOL_RECYCLE         Seconds after which a connection is replaced (default 1800)
+    DB_STATEMENT_TIMEOUT    Server-side statement timeout in milliseconds (default 0, disabled)
+
+Time spent waiting for a connection is recorded per pool and returned by `get_pool_stats()`.
+"""
+
+import os
+import time
+from dataclasses import dataclass
+from os import getenv
+from threading import Lock
+from typing import Any, Dict, Optional
+
+from sqlalchemy import exc
+from sqlalchemy.engine import Engine, create_engine
+from sqlalchemy.ext.asyncio import AsyncEngine, create_async_engine
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+
+from db.url import get_db_url
+
+
+def get_pool_config() -> Dict[str, int]:
+    return {
+        "pool_size": int(getenv("DB_POOL_SIZE", "10")),
+        "max_overflow": int(getenv("DB_MAX_OVERFLOW", "20")),
+        "pool_timeout": int(getenv("DB_POOL_TIMEOUT", "30")),
+        "pool_recycle": int(getenv("DB_POOL_RECYCLE", "1800")),
+        "statement_timeout": int(getenv("DB_STATEMENT_TIMEOUT", "0")),
+    }
+
+
+# ============================================================================
+# Pool wait metrics
+# ============================================================================
+@dataclass
+class PoolWaitStats:
+    checkouts: int = 0
+    timeouts: int = 0
+    total_wait: float = 0.0
+    max_wait: float = 0.0
+
+    def record(self, wait: float) -> None:
+        self.checkouts += 1
+        self.total_wait += wait
+        self.max_wait = max(self.max_wait, wait)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "checkouts": self.checkouts,
+            "timeouts": self.timeouts,
+            "total_wait_seconds": round(self.total_wait, 6),
+            "avg_wait_ms": round(self.total_wait / self.checkouts * 1000, 3) if self.checkouts else 0.0,
+            "max_wait_ms": round(self.max_wait * 1000, 3),
+        }
+
+
+class TimedQueuePool(QueuePool):
+    """QueuePool that records how long each checkout waits for a connection (including opening a new one)."""
+
+    wait_stats: PoolWaitStats
+
+    def __init__(self, *args: Any, **kwargs: Any):
+        super().__init__(*args, **kwargs)
+        self.wait_stats = PoolWaitStats()
+
+    def _do_get(self) -> Any:
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        except exc.TimeoutError:
+            self.wait_stats.timeouts += 1
+            raise
+        finally:
+            self.wait_stats.record(time.perf_counter() - started)
+
+    def recreate(self) -> QueuePool:
+        # Keep the counters when the engine replaces its pool (e.g. after a disconnect)
+        pool = super().recreate()
+        if isinstance(pool, TimedQueuePool):
+            pool.wait_stats = self.wait_stats
+        return pool
+
+
+class TimedAsyncQueuePool(TimedQueuePool, AsyncAdaptedQueuePool):
+    """Async variant of `TimedQueuePool`, used by `get_async_engine()`."""
+
+
+# ============================================================================
+# Engines
+# ============================================================================
+_lock = Lock()
+_engine: Optional[Engine] = None
+_async_engine: Optional[AsyncEngine] = None
+
+
+def _engine_kwargs() -> Dict[str, Any]:
+    config = get_pool_config()
+    kwargs: Dict[str, Any] = {
+        "pool_pre_ping": True,
+        "pool_size": config["pool_size"],
+        "max_overflow": config["max_overflow"],
+        "pool_timeout": config["pool_timeout"],
+        "pool_recycle": config["pool_recycle"],
+    }
+    if config["statement_timeout"] > 0:
+        kwargs["connect_args"] = {"options": f"-c statement_timeout={config['statement_timeout']}"}
+    return kwargs
+
+
+def get_engine() -> Engine:
+    """Return the process-wide engine, creating it on first use."""
+    global _engine
+    with _lock:
+        if _engine is None:
+            _engine = create_engine(get_db_url(), poolclass=TimedQueuePool, **_engine_kwargs())
+        return _engine
+
+
+def get_async_engine() -> AsyncEngine:
+    """Return the process-wide async engine for request paths, creating it on first use."""
+    global _async_engine
+    with _lock:
+        if _async_engine is None:
+            _async_engine = create_async_engine(get_db_url(), poolclass=TimedAsyncQueuePool, **_engine_kwargs())
+        return _async_engine
+
+
+def _discard_pools_after_fork() -> None:
+    # Connections opened before a fork belong to the parent, e.g. when app/serve.py preloads the app
+    if _engine is not None:
+        _engine.dispose(close=False)
+    if _async_engine is not None:
+        _async_engine.sync_engine.dispose(close=False)
+
+
+os.register_at_fork(after_in_child=_discard_pools_after_fork)
+
+
+def get_pool_stats() -> Dict[str, Dict[str, Any]]:
+    """Pool occupancy and checkout wait times of the engines created so far."""
+    stats: Dict[str, Dict[str, Any]] = {}
+    for name, pool in (
+        ("sync", _engine.pool if _engine else None),
+        ("async", _async_engine.pool if _async_engine else None),
+    ):
+        if isinstance(pool, TimedQueuePool):
+            stats[name] = {
+                "size": pool.size(),
+                "checked_out": pool.checkedout(),
+                "overflow": pool.overflow(),
+                **pool.wait_stats.to_dict(),
+            }
+    return stats
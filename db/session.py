@@ -1,16 +1,22 @@
-from typing import Generator
+from typing import AsyncGenerator, Generator
 
-from sqlalchemy.engine import Engine, create_engine
+from sqlalchemy.engine import Engine
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, async_sessionmaker
 from sqlalchemy.orm import Session, sessionmaker
 
+from db.pool import get_async_engine, get_engine
 from db.url import get_db_url
 
-# Create SQLAlchemy Engine using a database URL
+# Get the shared SQLAlchemy Engines (see db/pool.py for pool settings)
 db_url: str = get_db_url()
-db_engine: Engine = create_engine(db_url, pool_pre_ping=True)
+db_engine: Engine = get_engine()
+async_db_engine: AsyncEngine = get_async_engine()
 
-# Create a SessionLocal class
+# Create SessionLocal classes
 SessionLocal: sessionmaker[Session] = sessionmaker(autocommit=False, autoflush=False, bind=db_engine)
+AsyncSessionLocal: async_sessionmaker[AsyncSession] = async_sessionmaker(
+    autocommit=False, autoflush=False, bind=async_db_engine
+)
 
 
 def get_db() -> Generator[Session, None, None]:
@@ -25,3 +31,14 @@ def get_db() -> Generator[Session, None, None]:
         yield db
     finally:
         db.close()
+
+
+async def get_async_db() -> AsyncGenerator[AsyncSession, None]:
+    """
+    Dependency to get an async database session.
+
+    Yields:
+        AsyncSession: An SQLAlchemy async database session.
+    """
+    async with AsyncSessionLocal() as db:
+        yield db
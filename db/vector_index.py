@@ -0,0 +1,346 @@
+"""
+Vector index management for the PgVector knowledge tables.
+
+Usage:
+    python -m db.vector_index inspect
+    python -m db.vector_index build --type hnsw --m 16 --ef-construction 200
+    python -m db.vector_index rebuild --type ivfflat --lists 100
+    python -m db.vector_index drop --type hnsw
+    python -m db.vector_index build --type hnsw --quantization halfvec
+    python -m db.vector_index sweep --k 10 --ef-search 10,20,40,80,160 --probes 1,5,10,20
+
+Query-time settings used by the agents are read from the environment by `get_vector_index()`.
+"""
+
+import time
+from dataclasses import dataclass
+from os import getenv
+from statistics import mean, quantiles
+from typing import Any, Dict, List, Optional, Tuple, Union
+
+from agno.utils.log import log_info
+from agno.vectordb.pgvector.index import HNSW, Ivfflat
+from sqlalchemy import text
+from sqlalchemy.engine import Connection, Engine
+
+from db.pool import get_engine
+
+OPERATORS: Dict[str, str] = {"cosine": "<=>", "l2": "<->", "ip": "<#>"}
+OPCLASSES: Dict[str, str] = {"cosine": "vector_cosine_ops", "l2": "vector_l2_ops", "ip": "vector_ip_ops"}
+
+
+def get_vector_index() -> Union[HNSW, Ivfflat]:
+    """
+    Build the PgVector index configuration from the environment.
+
+    PGVECTOR_INDEX selects `hnsw` (default) or `ivfflat`. Build parameters (PGVECTOR_HNSW_M,
+    PGVECTOR_HNSW_EF_CONSTRUCTION, PGVECTOR_IVFFLAT_LISTS) and query-time parameters (PGVECTOR_HNSW_EF_SEARCH,
+    PGVECTOR_IVFFLAT_PROBES) default to the agno defaults, except `ef_search`: an HNSW scan returns at most
+    `ef_search` rows, so it defaults to the pgvector default of 40 instead of 5 to cover `max_results`.
+    """
+    if getenv("PGVECTOR_INDEX", "hnsw").lower() == "ivfflat":
+        return Ivfflat(
+            lists=int(getenv("PGVECTOR_IVFFLAT_LISTS", "100")),
+            probes=int(getenv("PGVECTOR_IVFFLAT_PROBES", "10")),
+            dynamic_lists=getenv("PGVECTOR_IVFFLAT_LISTS") is None,
+        )
+    return HNSW(
+        m=int(getenv("PGVECTOR_HNSW_M", "16")),
+        ef_construction=int(getenv("PGVECTOR_HNSW_EF_CONSTRUCTION", "200")),
+        ef_search=int(getenv("PGVECTOR_HNSW_EF_SEARCH", "40")),
+    )
+
+
+QUANTIZATIONS = ("halfvec", "binary")
+
+
+def index_name(table: str, index_type: str, quantization: Optional[str] = None) -> str:
+    """Index name used by agno's `PgVector.optimize()`, so both tools manage the same index."""
+    if index_type == "gin":
+        return f"{table}_content_gin_index"
+    if quantization is not None:
+        return f"{table}_{quantization}_{index_type}_index"
+    return f"{table}_{index_type}_index"
+
+
+def index_expression(distance: str, quantization: Optional[str] = None, dimensions: Optional[int] = None) -> str:
+    """
+    Indexed expression and operator class for the `embedding` column.
+
+    Quantized indexes are expression indexes, so the table keeps a single full-precision column for rescoring.
+    Queries must use the exact same expression to be served by the index.
+    """
+    if quantization is None:
+        return f"embedding {OPCLASSES[distance]}"
+    if quantization == "halfvec":
+        return f"(embedding::halfvec({dimensions})) halfvec_{OPCLASSES[distance].split('_', 1)[1]}"
+    if quantization == "binary":
+        return f"(binary_quantize(embedding)::bit({dimensions})) bit_hamming_ops"
+    raise ValueError(f"Unknown quantization: {quantization}")
+
+
+def get_dimensions(conn: Connection, table: str, schema: str = "ai") -> int:
+    """Dimensions of the `embedding` column, as declared in the table definition."""
+    return conn.execute(
+        text(
+            "SELECT atttypmod FROM pg_attribute WHERE attrelid = CAST(:relation AS regclass) AND attname = 'embedding'"
+        ),
+        {"relation": f'"{schema}"."{table}"'},
+    ).scalar_one()
+
+
+# ============================================================================
+# Inspect
+# ============================================================================
+def inspect_indexes(engine: Engine, table: str, schema: str = "ai") -> Dict[str, Any]:
+    """Return row count, table size and the definition and size of every index on the table."""
+    with engine.connect() as conn:
+        rows = conn.execute(text(f'SELECT count(*) FROM "{schema}"."{table}"')).scalar_one()
+        table_size = conn.execute(
+            text("SELECT pg_size_pretty(pg_table_size(:relation))"), {"relation": f'"{schema}"."{table}"'}
+        ).scalar_one()
+        indexes = [
+            dict(row._mapping)
+            for row in conn.execute(
+                text(
+                    "SELECT i.indexname AS name, am.amname AS method, i.indexdef AS definition, "
+                    "pg_size_pretty(pg_relation_size(c.oid)) AS size, c.reloptions AS options, "
+                    "ix.indisvalid AS valid "
+                    "FROM pg_indexes i "
+                    "JOIN pg_namespace n ON n.nspname = i.schemaname "
+                    "JOIN pg_class c ON c.relname = i.indexname AND c.relnamespace = n.oid "
+                    "JOIN pg_index ix ON ix.indexrelid = c.oid "
+                    "JOIN pg_am am ON am.oid = c.relam "
+                    "WHERE i.schemaname = :schema AND i.tablename = :table ORDER BY i.indexname"
+                ),
+                {"schema": schema, "table": table},
+            )
+        ]
+    return {"table": f"{schema}.{table}", "rows": rows, "table_size": table_size, "indexes": indexes}
+
+
+# ============================================================================
+# Build
+# ============================================================================
+def build_index(
+    engine: Engine,
+    table: str,
+    schema: str = "ai",
+    index_type: str = "hnsw",
+    distance: str = "cosine",
+    m: int = 16,
+    ef_construction: int = 200,
+    lists: Optional[int] = None,
+    name: Optional[str] = None,
+    concurrently: bool = True,
+    maintenance_work_mem: str = "2GB",
+    quantization: Optional[str] = None,
+    language: str = "english",
+) -> str:
+    """
+    Create a vector index on the `embedding` column, or with `index_type="gin"` the full-text index on `content`.
+
+    CONCURRENTLY keeps the table writable during the build, at the cost of a slower build.
+    IVFFlat `lists` defaults to rows / 1000 (sqrt(rows) above 1M rows), the pgvector recommendation.
+    With `quantization` set to `halfvec` or `binary`, the index is built over the quantized embedding.
+    """
+    name = name or index_name(table, index_type, quantization)
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        conn.execute(text(f"SET maintenance_work_mem = '{maintenance_work_mem}'"))
+        dimensions = get_dimensions(conn, table, schema) if quantization and index_type != "gin" else None
+        expression = index_expression(distance, quantization, dimensions)
+        if index_type == "hnsw":
+            using = f"hnsw ({expression}) WITH (m = {int(m)}, ef_construction = {int(ef_construction)})"
+        elif index_type == "ivfflat":
+            if lists is None:
+                rows = conn.execute(text(f'SELECT count(*) FROM "{schema}"."{table}"')).scalar_one()
+                lists = max(int(rows / 1000), 1) if rows < 1_000_000 else max(int(rows**0.5), 1)
+            using = f"ivfflat ({expression}) WITH (lists = {int(lists)})"
+        elif index_type == "gin":
+            # Must match the expression PgVector's keyword and hybrid searches filter on
+            using = f"gin (to_tsvector('{language}', content))"
+        else:
+            raise ValueError(f"Unknown index type: {index_type}")
+
+        log_info(f"Building index '{name}' on {schema}.{table} using {using}")
+        started = time.perf_counter()
+        conn.execute(
+            text(
+                f'CREATE INDEX {"CONCURRENTLY " if concurrently else ""}IF NOT EXISTS "{name}" '
+                f'ON "{schema}"."{table}" USING {using}'
+            )
+        )
+        log_info(f"Built index '{name}' in {time.perf_counter() - started:.1f}s")
+    return name
+
+
+def drop_index(engine: Engine, name: str, schema: str = "ai", concurrently: bool = True) -> None:
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        conn.execute(text(f'DROP INDEX {"CONCURRENTLY " if concurrently else ""}IF EXISTS "{schema}"."{name}"'))
+    log_info(f"Dropped index '{name}'")
+
+
+def rebuild_index(engine: Engine, table: str, schema: str = "ai", index_type: str = "hnsw", **kwargs: Any) -> str:
+    """
+    Rebuild an index with new parameters without blocking reads or writes.
+
+    The new index is built concurrently under a temporary name, then swapped in place of the old one.
+    """
+    name = index_name(table, index_type, kwargs.get("quantization"))
+    staging = f"{name}_rebuild"
+    drop_index(engine, staging, schema=schema)  # Left over by an interrupted rebuild, if any
+    build_index(engine, table, schema=schema, index_type=index_type, name=staging, concurrently=True, **kwargs)
+    drop_index(engine, name, schema=schema)
+    with engine.begin() as conn:
+        conn.execute(text(f'ALTER INDEX "{schema}"."{staging}" RENAME TO "{name}"'))
+    log_info(f"Swapped rebuilt index into '{name}'")
+    return name
+
+
+# ============================================================================
+# Recall / latency sweep
+# ============================================================================
+@dataclass
+class SweepResult:
+    setting: str
+    recall: float
+    p50_ms: float
+    p95_ms: float
+
+
+def _search(conn: Connection, table: str, schema: str, operator: str, query: str, k: int, tag: str) -> List[str]:
+    # The tag keeps the statement text distinct per setting: the driver prepares repeated statements,
+    # and a cached plan would otherwise carry over from one setting to the next
+    return list(
+        conn.execute(
+            text(
+                f"/* {tag} */ "
+                f'SELECT id FROM "{schema}"."{table}" '
+                f"ORDER BY embedding {operator} CAST(:query AS vector) LIMIT {int(k)}"
+            ),
+            {"query": query},
+        ).scalars()
+    )
+
+
+def _timed_searches(
+    engine: Engine, table: str, schema: str, operator: str, queries: List[str], k: int, settings: List[str]
+) -> Tuple[List[List[str]], List[float]]:
+    results: List[List[str]] = []
+    latencies: List[float] = []
+    with engine.connect() as conn:
+        for query in queries:
+            with conn.begin():
+                for setting in settings:
+                    conn.execute(text(f"SET LOCAL {setting}"))
+                started = time.perf_counter()
+                results.append(_search(conn, table, schema, operator, query, k, tag=", ".join(settings)))
+                latencies.append((time.perf_counter() - started) * 1000)
+    return results, latencies
+
+
+def sweep(
+    engine: Engine,
+    table: str,
+    schema: str = "ai",
+    k: int = 10,
+    num_queries: int = 50,
+    distance: str = "cosine",
+    ef_search: Optional[List[int]] = None,
+    probes: Optional[List[int]] = None,
+) -> List[SweepResult]:
+    """
+    Measure recall@k and latency of index scans against an exact sequential scan.
+
+    Query vectors are sampled from the table itself, so the sweep runs against the live data distribution.
+    """
+    operator = OPERATORS[distance]
+    with engine.connect() as conn:
+        queries = list(
+            conn.execute(
+                text(f'SELECT embedding::text FROM "{schema}"."{table}" ORDER BY random() LIMIT {int(num_queries)}')
+            ).scalars()
+        )
+    if not queries:
+        raise ValueError(f"Table {schema}.{table} is empty")
+
+    def summarize(
+        setting: str, results: List[List[str]], latencies: List[float], exact: List[List[str]]
+    ) -> SweepResult:
+        recall = mean(len(set(found) & set(truth)) / max(len(truth), 1) for found, truth in zip(results, exact))
+        cuts = quantiles(latencies, n=20) if len(latencies) > 1 else latencies * 19
+        return SweepResult(setting=setting, recall=recall, p50_ms=cuts[9], p95_ms=cuts[18])
+
+    exact, exact_latencies = _timed_searches(
+        engine, table, schema, operator, queries, k, ["enable_indexscan = off", "enable_bitmapscan = off"]
+    )
+    sweep_results = [summarize("exact scan", exact, exact_latencies, exact)]
+    for value in ef_search or []:
+        found, latencies = _timed_searches(
+            engine, table, schema, operator, queries, k, ["enable_seqscan = off", f"hnsw.ef_search = {int(value)}"]
+        )
+        sweep_results.append(summarize(f"hnsw.ef_search={value}", found, latencies, exact))
+    for value in probes or []:
+        found, latencies = _timed_searches(
+            engine, table, schema, operator, queries, k, ["enable_seqscan = off", f"ivfflat.probes = {int(value)}"]
+        )
+        sweep_results.append(summarize(f"ivfflat.probes={value}", found, latencies, exact))
+    return sweep_results
+
+
+if __name__ == "__main__":
+    import argparse
+
+    def int_list(value: str) -> List[int]:
+        return [int(v) for v in value.split(",") if v]
+
+    parser = argparse.ArgumentParser(description="Manage and tune vector indexes on PgVector knowledge tables")
+    parser.add_argument("command", choices=["inspect", "build", "rebuild", "drop", "sweep"])
+    parser.add_argument("--table", default="agno_docs")
+    parser.add_argument("--schema", default="ai")
+    parser.add_argument("--type", dest="index_type", choices=["hnsw", "ivfflat", "gin"], default="hnsw")
+    parser.add_argument("--distance", choices=list(OPERATORS), default="cosine")
+    parser.add_argument("--quantization", choices=QUANTIZATIONS, default=None, help="Index a quantized embedding")
+    parser.add_argument("--m", type=int, default=16)
+    parser.add_argument("--ef-construction", type=int, default=200)
+    parser.add_argument("--lists", type=int, default=None)
+    parser.add_argument("--maintenance-work-mem", default="2GB")
+    parser.add_argument("--blocking", action="store_true", help="Build without CONCURRENTLY (faster, locks writes)")
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--queries", type=int, default=50)
+    parser.add_argument("--ef-search", type=int_list, default=[10, 20, 40, 80, 160])
+    parser.add_argument("--probes", type=int_list, default=[])
+    args = parser.parse_args()
+
+    engine = get_engine()
+    build_params: Dict[str, Any] = {
+        "distance": args.distance,
+        "m": args.m,
+        "ef_construction": args.ef_construction,
+        "lists": args.lists,
+        "maintenance_work_mem": args.maintenance_work_mem,
+        "quantization": args.quantization,
+    }
+    if args.command == "inspect":
+        info = inspect_indexes(engine, args.table, args.schema)
+        print(f"{info['table']}: {info['rows']} rows, {info['table_size']}")
+        for index in info["indexes"]:
+            status = "" if index["valid"] else " (INVALID)"
+            print(f"  {index['name']} [{index['method']}] {index['size']}{status}\n    {index['definition']}")
+    elif args.command == "build":
+        build_index(engine, args.table, args.schema, args.index_type, concurrently=not args.blocking, **build_params)
+    elif args.command == "rebuild":
+        rebuild_index(engine, args.table, args.schema, args.index_type, **build_params)
+    elif args.command == "drop":
+        drop_index(
+            engine,
+            index_name(args.table, args.index_type, args.quantization),
+            args.schema,
+            concurrently=not args.blocking,
+        )
+    elif args.command == "sweep":
+        print(f"{'setting':<24} {'recall@' + str(args.k):>10} {'p50 ms':>8} {'p95 ms':>8}")
+        for result in sweep(
+            engine, args.table, args.schema, args.k, args.queries, args.distance, args.ef_search, args.probes
+        ):
+            print(f"{result.setting:<24} {result.recall:>10.3f} {result.p50_ms:>8.2f} {result.p95_ms:>8.2f}")
@@ -0,0 +1,65 @@
+import asyncio
+import re
+import time
+from dataclasses import dataclass
+from hashlib import blake2b
+from math import sqrt
+from typing import Dict, List, Optional, Tuple
+
+from agno.knowledge.embedder.base import Embedder
+
+_TOKEN_PATTERN = re.compile(r"\w+")
+
+
+@dataclass
+class StubEmbedder(Embedder):
+    """
+    Offline embedder used to benchmark the knowledge pipeline without calling a provider.
+
+    Embeddings are built by hashing tokens into `dimensions` buckets, so identical texts always
+    get identical vectors and texts sharing words end up close to each other. `latency` simulates
+    the round trip of a real embedding API (per request, not per text).
+    """
+
+    id: str = "stub-embedder"
+    dimensions: Optional[int] = 1536
+    enable_batch: bool = True
+    latency: float = 0.0
+
+    def _embed(self, text: str) -> List[float]:
+        dimensions = self.dimensions or 1536
+        vector = [0.0] * dimensions
+        for token in _TOKEN_PATTERN.findall(text.lower()):
+            digest = blake2b(token.encode(), digest_size=8).digest()
+            bucket = int.from_bytes(digest[:4], "little") % dimensions
+            vector[bucket] += 1.0 if digest[4] & 1 else -1.0
+        norm = sqrt(sum(value * value for value in vector)) or 1.0
+        return [value / norm for value in vector]
+
+    def _usage(self, texts: List[str]) -> Dict:
+        tokens = sum(len(_TOKEN_PATTERN.findall(text)) for text in texts)
+        return {"prompt_tokens": tokens, "total_tokens": tokens}
+
+    def get_embedding(self, text: str) -> List[float]:
+        if self.latency:
+            time.sleep(self.latency)
+        return self._embed(text)
+
+    def get_embedding_and_usage(self, text: str) -> Tuple[List[float], Optional[Dict]]:
+        return self.get_embedding(text), self._usage([text])
+
+    async def async_get_embedding(self, text: str) -> List[float]:
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        return self._embed(text)
+
+    async def async_get_embedding_and_usage(self, text: str) -> Tuple[List[float], Optional[Dict]]:
+        return await self.async_get_embedding(text), self._usage([text])
+
+    async def async_get_embeddings_batch_and_usage(
+        self, texts: List[str]
+    ) -> Tuple[List[List[float]], List[Optional[Dict]]]:
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        usage = self._usage(texts)
+        return [self._embed(text) for text in texts], [usage] * len(texts)
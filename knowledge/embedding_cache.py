@@ -0,0 +1,346 @@
+"""
+Content-addressed embedding cache shared by knowledge ingestion and search.
+
+Embeddings are keyed by (embedder id, dimensions, text hash) and stored in a Postgres table next to the
+vector tables, fronted by a bounded in-process LRU. Repeated queries and re-ingested chunks are served
+without calling the embedding provider.
+
+Expired rows and the oldest rows above `max_rows` are deleted by `prune()`. The storage maintenance pass of the app
+(db/maintenance.py) prunes every `*embedding_cache` table of its schema with `prune_caches`.
+
+    EMBEDDING_CACHE_MAX_ROWS    Rows kept per cache table when pruning (default 200000, 0 for no limit)
+
+Usage:
+    python -m knowledge.embedding_cache prune
+"""
+
+import asyncio
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from hashlib import sha256
+from os import getenv
+from threading import Lock
+from typing import Any, Dict, List, Optional, Tuple
+
+from agno.knowledge.embedder.base import Embedder
+from agno.utils.log import log_debug, logger
+from pgvector.sqlalchemy import Vector
+from sqlalchemy import Column, DateTime, Integer, MetaData, String, Table, func, text
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.engine import Engine, create_engine
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.sql.expression import delete, select
+
+EMBEDDING_CACHE_MAX_ROWS = int(getenv("EMBEDDING_CACHE_MAX_ROWS", "200000"))
+# Seconds after which a cached embedding expires
+DEFAULT_TTL = 30 * 24 * 60 * 60
+# Name suffix of the cache tables, by which `prune_caches` finds them
+CACHE_TABLE_SUFFIX = "embedding_cache"
+
+
+@dataclass
+class EmbeddingCacheStats:
+    memory_hits: int = 0
+    db_hits: int = 0
+    misses: int = 0
+
+    @property
+    def hits(self) -> int:
+        return self.memory_hits + self.db_hits
+
+    @property
+    def hit_ratio(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "memory_hits": self.memory_hits,
+            "db_hits": self.db_hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hit_ratio, 4),
+        }
+
+
+def cache_table(name: str, schema: str = "ai") -> Table:
+    return Table(
+        name,
+        MetaData(schema=schema),
+        Column("key", String, primary_key=True),
+        Column("embedder_id", String, nullable=False),
+        Column("dimensions", Integer),
+        Column("text_hash", String, nullable=False),
+        Column("embedding", Vector(), nullable=False),
+        Column("created_at", DateTime(timezone=True), server_default=func.now(), index=True),
+    )
+
+
+def prune_table(engine: Engine, table: Table, ttl: Optional[float], max_rows: Optional[int]) -> int:
+    """Delete the rows of a cache table older than `ttl` seconds and, if `max_rows` is set, the oldest rows above it."""
+    deleted = 0
+    with engine.begin() as conn:
+        if ttl is not None:
+            result = conn.execute(
+                delete(table).where(table.c.created_at <= func.now() - text(f"interval '{int(ttl)} seconds'"))
+            )
+            deleted += result.rowcount or 0
+        if max_rows is not None:
+            keep = select(table.c.key).order_by(table.c.created_at.desc()).limit(max_rows)
+            result = conn.execute(delete(table).where(table.c.key.not_in(keep.scalar_subquery())))
+            deleted += result.rowcount or 0
+    log_debug(f"Pruned {deleted} rows from {table.fullname}")
+    return deleted
+
+
+def prune_caches(
+    engine: Engine,
+    schema: str = "ai",
+    ttl: Optional[float] = DEFAULT_TTL,
+    max_rows: Optional[int] = EMBEDDING_CACHE_MAX_ROWS or None,
+) -> Dict[str, int]:
+    """
+    Prune every embedding cache table of `schema`, found by its name suffix.
+
+    Returns:
+        Dict[str, int]: Rows deleted by table name.
+    """
+    with engine.connect() as conn:
+        names = conn.execute(
+            text("SELECT tablename FROM pg_tables WHERE schemaname = :schema AND tablename LIKE :pattern"),
+            {"schema": schema, "pattern": "%" + CACHE_TABLE_SUFFIX.replace("_", r"\_")},
+        ).scalars()
+        tables = list(names)
+    return {name: prune_table(engine, cache_table(name, schema), ttl, max_rows) for name in tables}
+
+
+@dataclass
+class CachedEmbedder(Embedder):
+    """
+    Embedder wrapper that memoizes embeddings in memory and in Postgres.
+
+    Args:
+        embedder (Embedder): The embedder used on a cache miss.
+        db_url (Optional[str]): Database URL for the persistent cache. Ignored if `db_engine` is set.
+        db_engine (Optional[Engine]): Engine for the persistent cache. Without a database only the LRU is used.
+        table_name (str): Name of the cache table.
+        schema (str): Schema of the cache table.
+        max_size (int): Maximum number of embeddings kept in the in-process LRU.
+        ttl (Optional[float]): Seconds after which a cached embedding expires. None keeps entries forever.
+        max_rows (Optional[int]): Maximum number of rows kept in the cache table by `prune()`.
+            Defaults to `EMBEDDING_CACHE_MAX_ROWS`.
+    """
+
+    embedder: Optional[Embedder] = None
+    db_url: Optional[str] = None
+    db_engine: Optional[Engine] = None
+    table_name: str = "embedding_cache"
+    schema: str = "ai"
+    max_size: int = 10_000
+    ttl: Optional[float] = DEFAULT_TTL
+    max_rows: Optional[int] = EMBEDDING_CACHE_MAX_ROWS or None
+    stats: EmbeddingCacheStats = field(default_factory=EmbeddingCacheStats)
+
+    def __post_init__(self):
+        if self.embedder is None:
+            from agno.knowledge.embedder.openai import OpenAIEmbedder
+
+            self.embedder = OpenAIEmbedder()
+        self.dimensions = self.embedder.dimensions
+        self.batch_size = self.embedder.batch_size
+        self.enable_batch = True
+        if self.db_engine is None and self.db_url is not None:
+            self.db_engine = create_engine(self.db_url, pool_pre_ping=True)
+
+        self._lru: "OrderedDict[str, Tuple[List[float], float]]" = OrderedDict()
+        self._lock = Lock()
+        self._table_ready = False
+        self.table = cache_table(self.table_name, self.schema)
+
+    @property
+    def id(self) -> str:
+        return getattr(self.embedder, "id", None) or type(self.embedder).__name__
+
+    def cache_key(self, text: str) -> str:
+        text_hash = sha256(text.encode()).hexdigest()
+        return f"{self.id}:{self.dimensions}:{text_hash}"
+
+    # ============================================================================
+    # In-process LRU
+    # ============================================================================
+    def _memory_get(self, key: str) -> Optional[List[float]]:
+        with self._lock:
+            entry = self._lru.get(key)
+            if entry is None:
+                return None
+            embedding, created_at = entry
+            if self.ttl is not None and time.time() - created_at > self.ttl:
+                del self._lru[key]
+                return None
+            self._lru.move_to_end(key)
+            return embedding
+
+    def _memory_put(self, key: str, embedding: List[float], created_at: Optional[float] = None) -> None:
+        with self._lock:
+            self._lru[key] = (embedding, created_at or time.time())
+            self._lru.move_to_end(key)
+            while len(self._lru) > self.max_size:
+                self._lru.popitem(last=False)
+
+    # ============================================================================
+    # Postgres table
+    # ============================================================================
+    def _ensure_table(self) -> bool:
+        if self.db_engine is None:
+            return False
+        if not self._table_ready:
+            with self.db_engine.begin() as conn:
+                conn.execute(text("CREATE EXTENSION IF NOT EXISTS vector;"))
+                conn.execute(text(f"CREATE SCHEMA IF NOT EXISTS {self.schema};"))
+            self.table.create(self.db_engine, checkfirst=True)
+            self._table_ready = True
+        return True
+
+    def _db_get_many(self, keys: List[str]) -> Dict[str, Tuple[List[float], float]]:
+        try:
+            if not keys or not self._ensure_table():
+                return {}
+            stmt = select(self.table.c.key, self.table.c.embedding, self.table.c.created_at).where(
+                self.table.c.key.in_(keys)
+            )
+            if self.ttl is not None:
+                stmt = stmt.where(self.table.c.created_at > func.now() - text(f"interval '{int(self.ttl)} seconds'"))
+            with self.db_engine.connect() as conn:  # type: ignore[union-attr]
+                return {
+                    row.key: ([float(value) for value in row.embedding], row.created_at.timestamp())
+                    for row in conn.execute(stmt)
+                }
+        except SQLAlchemyError as e:
+            logger.warning(f"Embedding cache lookup failed: {e}")
+            return {}
+
+    def _db_put_many(self, items: Dict[str, List[float]]) -> None:
+        try:
+            if not items or not self._ensure_table():
+                return
+            rows = [
+                {
+                    "key": key,
+                    "embedder_id": self.id,
+                    "dimensions": self.dimensions,
+                    "text_hash": key.rsplit(":", 1)[-1],
+                    "embedding": embedding,
+                }
+                for key, embedding in items.items()
+            ]
+            insert_stmt = postgresql.insert(self.table).values(rows)
+            upsert_stmt = insert_stmt.on_conflict_do_update(
+                index_elements=["key"],
+                set_={"embedding": insert_stmt.excluded.embedding, "created_at": func.now()},
+            )
+            with self.db_engine.begin() as conn:  # type: ignore[union-attr]
+                conn.execute(upsert_stmt)
+        except SQLAlchemyError as e:
+            logger.warning(f"Embedding cache write failed: {e}")
+
+    def prune(self) -> int:
+        """Delete expired rows and, if `max_rows` is set, the oldest rows above the limit."""
+        if not self._ensure_table():
+            return 0
+        return prune_table(self.db_engine, self.table, self.ttl, self.max_rows)  # type: ignore[arg-type]
+
+    # ============================================================================
+    # Lookup
+    # ============================================================================
+    def _lookup(self, texts: List[str]) -> Tuple[List[str], Dict[str, List[float]]]:
+        """Return the cache keys for `texts` and the embeddings found in the LRU or in Postgres."""
+        keys = [self.cache_key(text) for text in texts]
+        found: Dict[str, List[float]] = {}
+        missing: List[str] = []
+        for key in keys:
+            embedding = self._memory_get(key)
+            if embedding is not None:
+                found[key] = embedding
+                self.stats.memory_hits += 1
+            elif key not in missing:
+                missing.append(key)
+        for key, (embedding, created_at) in self._db_get_many(missing).items():
+            self._memory_put(key, embedding, created_at)
+            found[key] = embedding
+            self.stats.db_hits += 1
+        return keys, found
+
+    def _store(self, keys: List[str], embeddings: List[List[float]]) -> None:
+        items = {key: embedding for key, embedding in zip(keys, embeddings) if embedding}
+        for key, embedding in items.items():
+            self._memory_put(key, embedding)
+        self._db_put_many(items)
+
+    # ============================================================================
+    # Embedder interface
+    # ============================================================================
+    def get_embedding(self, text: str) -> List[float]:
+        return self.get_embedding_and_usage(text)[0]
+
+    def get_embedding_and_usage(self, text: str) -> Tuple[List[float], Optional[Dict]]:
+        keys, found = self._lookup([text])
+        if keys[0] in found:
+            return found[keys[0]], None
+        self.stats.misses += 1
+        embedding, usage = self.embedder.get_embedding_and_usage(text)  # type: ignore[union-attr]
+        self._store(keys, [embedding])
+        return embedding, usage
+
+    async def async_get_embedding(self, text: str) -> List[float]:
+        return (await self.async_get_embedding_and_usage(text))[0]
+
+    async def async_get_embedding_and_usage(self, text: str) -> Tuple[List[float], Optional[Dict]]:
+        keys, found = await asyncio.to_thread(self._lookup, [text])
+        if keys[0] in found:
+            return found[keys[0]], None
+        self.stats.misses += 1
+        embedding, usage = await self.embedder.async_get_embedding_and_usage(text)  # type: ignore[union-attr]
+        await asyncio.to_thread(self._store, keys, [embedding])
+        return embedding, usage
+
+    async def async_get_embeddings_batch_and_usage(
+        self, texts: List[str]
+    ) -> Tuple[List[List[float]], List[Optional[Dict]]]:
+        """Embed a batch of texts, sending only the cache misses to the wrapped embedder."""
+        keys, found = await asyncio.to_thread(self._lookup, texts)
+        miss_keys: List[str] = []
+        miss_texts: List[str] = []
+        for key, content in zip(keys, texts):
+            if key not in found and key not in miss_keys:
+                miss_keys.append(key)
+                miss_texts.append(content)
+
+        usage_by_key: Dict[str, Optional[Dict]] = {}
+        if miss_texts:
+            self.stats.misses += len(miss_texts)
+            embedder: Any = self.embedder
+            if hasattr(embedder, "async_get_embeddings_batch_and_usage"):
+                embeddings, usages = await embedder.async_get_embeddings_batch_and_usage(miss_texts)
+            else:
+                results = await asyncio.gather(*[embedder.async_get_embedding_and_usage(t) for t in miss_texts])
+                embeddings, usages = [e for e, _ in results], [u for _, u in results]
+            await asyncio.to_thread(self._store, miss_keys, embeddings)
+            for key, embedding, usage in zip(miss_keys, embeddings, usages):
+                found[key] = embedding
+                usage_by_key[key] = usage
+
+        return [found.get(key, []) for key in keys], [usage_by_key.get(key) for key in keys]
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Maintain the embedding cache tables of demo_db")
+    parser.add_argument("command", choices=["prune"])
+    parser.add_argument("--max-rows", type=int, default=EMBEDDING_CACHE_MAX_ROWS, help="Rows kept per table, 0 for all")
+    args = parser.parse_args()
+
+    from db.demo_db import demo_db
+
+    for name, deleted in prune_caches(demo_db.db_engine, demo_db.db_schema, max_rows=args.max_rows or None).items():
+        print(f"{demo_db.db_schema}.{name}: pruned {deleted} rows")
@@ -0,0 +1,194 @@
+"""
+In-process fusion and diversification of hybrid search candidates.
+
+The database returns a wide candidate set in one round trip, with the vector distance and the text rank of every
+candidate. The candidates are then fused with reciprocal rank fusion and near-duplicate chunks are dropped, so each
+search returns fewer, more diverse chunks.
+
+Usage:
+    python -m knowledge.fusion --candidates 40,200,1000 --limit 10
+"""
+
+from dataclasses import dataclass
+from typing import Any, List, Optional, Sequence, Tuple
+
+import numpy as np
+from agno.knowledge.document import Document
+from numpy.typing import ArrayLike
+
+
+def reciprocal_rank_fusion(
+    rankings: Sequence[np.ndarray], num_candidates: int, k: int = 60, weights: Optional[Sequence[float]] = None
+) -> np.ndarray:
+    """
+    Fuse rankings with reciprocal rank fusion.
+
+    Args:
+        rankings: One array per ranking, holding candidate indices from best to worst. Candidates missing from a
+            ranking get no score from it.
+        num_candidates: Total number of candidates.
+        k: RRF constant. Larger values flatten the difference between the top ranks.
+        weights: Optional weight per ranking.
+
+    Returns:
+        np.ndarray: The fused score of every candidate.
+    """
+    scores = np.zeros(num_candidates, dtype=np.float64)
+    for i, ranking in enumerate(rankings):
+        weight = 1.0 if weights is None else weights[i]
+        scores[ranking] += weight / (k + np.arange(1, len(ranking) + 1))
+    return scores
+
+
+def select_diverse(embeddings: Sequence[Any], order: np.ndarray, limit: int, threshold: float = 0.95) -> List[int]:
+    """
+    Walk candidates in `order` and keep those whose cosine similarity to every kept candidate is below `threshold`.
+
+    Only the candidates walked through are compared, each against at most `limit` kept vectors, so the cost does not
+    grow with the size of the candidate set.
+
+    Returns:
+        List[int]: Indices of at most `limit` kept candidates, in `order`.
+    """
+    if limit <= 0 or len(order) == 0:
+        return []
+    kept: List[int] = []
+    kept_vectors: Optional[np.ndarray] = None
+    for i in order:
+        vector = np.asarray(embeddings[i], dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        if norm > 0:
+            vector = vector / norm
+        if kept_vectors is None:
+            kept_vectors = np.empty((limit, len(vector)), dtype=np.float32)
+        elif (kept_vectors[: len(kept)] @ vector).max() >= threshold:
+            continue
+        kept_vectors[len(kept)] = vector
+        kept.append(int(i))
+        if len(kept) == limit:
+            break
+    return kept
+
+
+@dataclass
+class FusionStage:
+    """
+    Post-retrieval stage for hybrid search.
+
+    Args:
+        candidate_factor (int): Candidates fetched per requested result, from each of the vector and keyword searches.
+        rrf_k (int): Reciprocal rank fusion constant.
+        vector_weight (float): Weight of the vector ranking in the fused score.
+        keyword_weight (float): Weight of the keyword ranking in the fused score.
+        dedupe_threshold (Optional[float]): Cosine similarity above which a chunk counts as a duplicate of a
+            better-ranked one. None keeps duplicates.
+    """
+
+    candidate_factor: int = 4
+    rrf_k: int = 60
+    vector_weight: float = 1.0
+    keyword_weight: float = 1.0
+    dedupe_threshold: Optional[float] = 0.95
+
+    def fuse(
+        self,
+        documents: List[Document],
+        vector_distances: ArrayLike,
+        text_ranks: ArrayLike,
+        limit: int,
+    ) -> List[Document]:
+        """
+        Fuse and diversify candidates.
+
+        Args:
+            documents: Candidate documents, with their embeddings.
+            vector_distances: Distance of each candidate to the query embedding (lower is better).
+            text_ranks: Text rank of each candidate (higher is better, 0 when the keywords don't match).
+            limit: Maximum number of documents to return.
+        """
+        if not documents:
+            return []
+        distances = np.asarray(vector_distances, dtype=np.float64)
+        ranks = np.asarray(text_ranks, dtype=np.float64)
+        vector_ranking = np.argsort(distances, kind="stable")
+        keyword_ranking = np.argsort(-ranks, kind="stable")[: int(np.count_nonzero(ranks > 0))]
+        scores = reciprocal_rank_fusion(
+            [vector_ranking, keyword_ranking],
+            len(documents),
+            k=self.rrf_k,
+            weights=[self.vector_weight, self.keyword_weight],
+        )
+        order = np.argsort(-scores, kind="stable")
+
+        embedded = all(document.embedding is not None and len(document.embedding) for document in documents)
+        if self.dedupe_threshold is None or not embedded:
+            selected = [int(i) for i in order[:limit]]
+        else:
+            embeddings = [document.embedding for document in documents]
+            selected = select_diverse(embeddings, order, limit, self.dedupe_threshold)
+
+        for i in selected:
+            documents[i].reranking_score = float(scores[i])
+        return [documents[i] for i in selected]
+
+
+# ============================================================================
+# Micro-benchmark
+# ============================================================================
+def synthetic_candidates(
+    num_candidates: int, dimensions: int = 1536, duplicate_ratio: float = 0.2, seed: int = 0
+) -> Tuple[List[Document], np.ndarray, np.ndarray]:
+    """
+    Random unit-norm candidates, a share of which are slightly perturbed copies of other candidates.
+
+    Returns the candidates, their cosine distance to a random query, and text ranks for the half of the candidates
+    that match the keywords.
+    """
+    rng = np.random.default_rng(seed)
+    embeddings = rng.standard_normal((num_candidates, dimensions)).astype(np.float32)
+    num_duplicates = int(num_candidates * duplicate_ratio)
+    sources = rng.integers(0, num_candidates - num_duplicates, size=num_duplicates)
+    noise = 0.05 * rng.standard_normal((num_duplicates, dimensions)).astype(np.float32)
+    embeddings[num_candidates - num_duplicates :] = embeddings[sources] + noise
+    embeddings /= np.linalg.norm(embeddings, axis=1, keepdims=True)
+    query = embeddings[rng.integers(0, num_candidates)] + rng.standard_normal(dimensions).astype(np.float32)
+    distances = 1 - embeddings @ (query / np.linalg.norm(query))
+    text_ranks = np.where(rng.random(num_candidates) < 0.5, rng.random(num_candidates), 0.0)
+    documents = [
+        Document(id=str(i), content=f"chunk {i}", embedding=embedding.tolist())
+        for i, embedding in enumerate(embeddings)
+    ]
+    return documents, distances, text_ranks
+
+
+if __name__ == "__main__":
+    import argparse
+    import time
+    from statistics import median
+
+    parser = argparse.ArgumentParser(description="Benchmark the hybrid search fusion stage on synthetic candidates")
+    parser.add_argument("--candidates", default="40,200,1000", help="Comma-separated candidate set sizes")
+    parser.add_argument("--dimensions", type=int, default=1536)
+    parser.add_argument("--limit", type=int, default=10)
+    parser.add_argument("--duplicate-ratio", type=float, default=0.2)
+    parser.add_argument("--runs", type=int, default=200)
+    args = parser.parse_args()
+
+    stage = FusionStage()
+    print(f"{'candidates':>10} {'p50 ms':>8} {'p95 ms':>8} {'returned':>9} {'duplicates dropped':>19}")
+    for num_candidates in [int(n) for n in args.candidates.split(",") if n]:
+        documents, distances, text_ranks = synthetic_candidates(num_candidates, args.dimensions, args.duplicate_ratio)
+
+        latencies: List[float] = []
+        for _ in range(args.runs):
+            started = time.perf_counter()
+            results = stage.fuse(documents, distances, text_ranks, args.limit)
+            latencies.append((time.perf_counter() - started) * 1000)
+        undeduped = FusionStage(dedupe_threshold=None).fuse(documents, distances, text_ranks, num_candidates)
+        returned_ids = [document.id for document in results]
+        considered = [document.id for document in undeduped][: [d.id for d in undeduped].index(returned_ids[-1]) + 1]
+        dropped = len(set(considered) - set(returned_ids))
+        print(
+            f"{num_candidates:>10} {median(latencies):>8.3f} {sorted(latencies)[int(len(latencies) * 0.95)]:>8.3f} "
+            f"{len(results):>9} {dropped:>19}"
+        )
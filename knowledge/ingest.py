@@ -0,0 +1,522 @@
+"""
+Streaming, incremental ingestion for PgVector knowledge tables.
+
+The source is read line by line and split into content-defined chunks: chunk boundaries only depend
+on the surrounding markdown section, so editing one page of the docs only changes the chunks of that page.
+Every chunk is addressed by the hash of its content within its source (`content_id`), kept in the `chunk_hash` key
+of the row's `meta_data`. Chunks already stored in the table are skipped, new chunks are embedded in bounded
+concurrent batches and written with COPY, and chunks that disappeared from the source are deleted at the end.
+Re-indexing therefore costs time in proportion to the diff.
+
+`ingest_knowledge` uses the same `content_id` and `content_hash` as `Knowledge.add_content` for the same URL or path,
+so the rows of a previous full load are replaced (not duplicated) by the first incremental run, and
+`add_content(..., skip_if_exists=True)` sees the source as loaded. It registers the content in the `contents_db` of the
+knowledge base like `add_content` does.
+
+Usage:
+    python -m knowledge.ingest --url https://docs.agno.com/llms-full.txt
+    python -m knowledge.ingest --file llms-full.txt --stub-embedder --dry-run
+"""
+
+import asyncio
+import json
+import time
+from dataclasses import dataclass, field
+from hashlib import sha256
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Protocol, Set, Tuple
+
+import psycopg
+from agno.db.base import BaseDb
+from agno.db.schemas.knowledge import KnowledgeRow
+from agno.knowledge.content import ContentStatus
+from agno.knowledge.embedder.base import Embedder
+from agno.knowledge.knowledge import Knowledge
+from agno.utils.log import log_debug, log_info, logger
+from agno.utils.string import generate_id
+from agno.vectordb.pgvector import PgVector
+from sqlalchemy import func
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.sql.expression import delete, select
+
+# ============================================================================
+# Sources
+# ============================================================================
+
+
+def iter_file_lines(path: str, encoding: str = "utf-8") -> Iterator[str]:
+    """Stream the lines of a local file."""
+    with Path(path).open(encoding=encoding) as f:
+        for line in f:
+            yield line.rstrip("\n")
+
+
+def iter_url_lines(url: str, timeout: float = 60.0) -> Iterator[str]:
+    """Stream the lines of a remote text document without loading it into memory."""
+    import httpx
+
+    with httpx.stream("GET", url, timeout=timeout, follow_redirects=True) as response:
+        response.raise_for_status()
+        for line in response.iter_lines():
+            yield line
+
+
+# ============================================================================
+# Chunking
+# ============================================================================
+@dataclass
+class Chunk:
+    content: str
+    index: int
+
+    @property
+    def hash(self) -> str:
+        return sha256(self.content.encode()).hexdigest()
+
+
+def source_content_hash(url: Optional[str] = None, path: Optional[str] = None) -> str:
+    """The `content_hash` `Knowledge.add_content` stores on the rows of a URL or path, checked by `skip_if_exists`."""
+    return sha256((str(path) if path is not None else url or "").encode()).hexdigest()
+
+
+def source_content_id(url: Optional[str] = None, path: Optional[str] = None) -> str:
+    """The `content_id` `Knowledge.add_content` assigns to the rows of a URL or path."""
+    return generate_id(source_content_hash(url=url, path=path))
+
+
+def row_id(content_id: str, chunk_hash: str) -> str:
+    """Row ids are scoped to the source, so the same chunk in two sources gets two rows."""
+    return sha256(f"{content_id}:{chunk_hash}".encode()).hexdigest()
+
+
+def iter_chunks(lines: Iterable[str], chunk_size: int = 5000) -> Iterator[Chunk]:
+    """
+    Split a stream of markdown lines into chunks of at most `chunk_size` characters.
+
+    A new chunk is always started at a top-level (`#`/`##`) heading outside of code fences, and within a
+    section paragraphs are packed greedily. Paragraphs longer than `chunk_size` are hard split.
+    """
+    index = 0
+    section: List[str] = []
+    section_size = 0
+    paragraph: List[str] = []
+    in_code_block = False
+
+    def flush_paragraph() -> Iterator[Chunk]:
+        nonlocal section_size, index
+        text = "\n".join(paragraph).strip("\n")
+        paragraph.clear()
+        if not text.strip():
+            return
+        if section and section_size + len(text) + 2 > chunk_size:
+            yield from flush_section()
+        while len(text) > chunk_size:
+            yield Chunk(content=text[:chunk_size], index=index)
+            index += 1
+            text = text[chunk_size:]
+        section.append(text)
+        section_size += len(text) + 2
+
+    def flush_section() -> Iterator[Chunk]:
+        nonlocal section_size, index
+        if section:
+            yield Chunk(content="\n\n".join(section), index=index)
+            index += 1
+        section.clear()
+        section_size = 0
+
+    for line in lines:
+        stripped = line.lstrip()
+        if stripped.startswith(("```", "~~~")):
+            in_code_block = not in_code_block
+        elif not in_code_block:
+            if line.startswith(("# ", "## ")):
+                yield from flush_paragraph()
+                yield from flush_section()
+            elif not stripped:
+                yield from flush_paragraph()
+                continue
+        paragraph.append(line)
+
+    yield from flush_paragraph()
+    yield from flush_section()
+
+
+# ============================================================================
+# Sinks
+# ============================================================================
+class ChunkSink(Protocol):
+    """
+    Storage of the chunk rows. Rows are matched by the `chunk_hash` of their `meta_data`; rows without one (loaded by
+    `Knowledge.add_content`) have the hash "", so they are deleted once the source is fully ingested.
+    """
+
+    def existing_hashes(self, content_id: str) -> Set[str]: ...
+
+    def write(self, rows: List[Dict[str, Any]]) -> None: ...
+
+    def delete(self, content_id: str, chunk_hashes: Set[str]) -> int: ...
+
+
+class PgVectorSink:
+    """Writes chunk rows straight into the table of a `PgVector` instance."""
+
+    columns = ("id", "name", "meta_data", "filters", "content", "embedding", "usage", "content_hash", "content_id")
+
+    def __init__(self, vector_db: PgVector):
+        self.vector_db = vector_db
+        self.vector_db.create()
+
+    def _chunk_hash(self) -> Any:
+        return func.coalesce(self.vector_db.table.c.meta_data["chunk_hash"].astext, "")
+
+    def existing_hashes(self, content_id: str) -> Set[str]:
+        table = self.vector_db.table
+        with self.vector_db.Session() as sess:
+            return set(sess.execute(select(self._chunk_hash()).where(table.c.content_id == content_id)).scalars())
+
+    def write(self, rows: List[Dict[str, Any]]) -> None:
+        if not rows:
+            return
+        connection = self.vector_db.db_engine.raw_connection()
+        try:
+            driver_connection = connection.driver_connection
+            if isinstance(driver_connection, psycopg.Connection):
+                self._copy(driver_connection, rows)
+            else:
+                self._insert(rows)
+            connection.commit()
+        finally:
+            connection.close()
+
+    def _copy(self, driver_connection: psycopg.Connection, rows: List[Dict[str, Any]]) -> None:
+        """Bulk load the rows with COPY (psycopg 3)."""
+        table = self.vector_db.table
+        columns = ", ".join(self.columns)
+        statement = f'COPY "{table.schema}"."{table.name}" ({columns}) FROM STDIN'
+        with driver_connection.cursor() as cur, cur.copy(statement) as copy:
+            for row in rows:
+                copy.write_row(
+                    (
+                        row["id"],
+                        row["name"],
+                        json.dumps(row["meta_data"]),
+                        json.dumps(row["filters"]) if row["filters"] is not None else None,
+                        row["content"],
+                        "[" + ",".join(str(value) for value in row["embedding"]) + "]",
+                        json.dumps(row["usage"]) if row["usage"] is not None else None,
+                        row["content_hash"],
+                        row["content_id"],
+                    )
+                )
+
+    def _insert(self, rows: List[Dict[str, Any]]) -> None:
+        """Fallback for drivers without COPY support: one multi-row INSERT per batch."""
+        with self.vector_db.Session() as sess, sess.begin():
+            sess.execute(postgresql.insert(self.vector_db.table).values(rows).on_conflict_do_nothing())
+
+    def delete(self, content_id: str, chunk_hashes: Set[str]) -> int:
+        if not chunk_hashes:
+            return 0
+        table = self.vector_db.table
+        with self.vector_db.Session() as sess, sess.begin():
+            result = sess.execute(
+                delete(table).where(table.c.content_id == content_id, self._chunk_hash().in_(list(chunk_hashes)))
+            )
+            return result.rowcount or 0  # type: ignore[attr-defined]
+
+
+class MemorySink:
+    """In-memory sink, used to benchmark chunking and embedding without a database."""
+
+    def __init__(self) -> None:
+        self.rows: Dict[str, Dict[str, Any]] = {}
+
+    def existing_hashes(self, content_id: str) -> Set[str]:
+        return {row["meta_data"].get("chunk_hash", "") for row in self.rows.values() if row["content_id"] == content_id}
+
+    def write(self, rows: List[Dict[str, Any]]) -> None:
+        for row in rows:
+            self.rows[row["id"]] = row
+
+    def delete(self, content_id: str, chunk_hashes: Set[str]) -> int:
+        ids = [
+            id
+            for id, row in self.rows.items()
+            if row["content_id"] == content_id and row["meta_data"].get("chunk_hash", "") in chunk_hashes
+        ]
+        for id in ids:
+            del self.rows[id]
+        return len(ids)
+
+
+# ============================================================================
+# Pipeline
+# ============================================================================
+@dataclass
+class IngestStats:
+    chunks: int = 0
+    skipped: int = 0
+    embedded: int = 0
+    failed: int = 0
+    deleted: int = 0
+    embed_seconds: float = 0.0
+    write_seconds: float = 0.0
+    elapsed_seconds: float = 0.0
+    batches: List[int] = field(default_factory=list)
+
+    def summary(self) -> str:
+        return (
+            f"chunks={self.chunks} skipped={self.skipped} embedded={self.embedded} failed={self.failed} "
+            f"deleted={self.deleted} batches={len(self.batches)} embed={self.embed_seconds:.2f}s "
+            f"write={self.write_seconds:.2f}s elapsed={self.elapsed_seconds:.2f}s"
+        )
+
+
+async def embed_texts(embedder: Embedder, texts: List[str]) -> Tuple[List[List[float]], List[Optional[Dict]]]:
+    """Embed a batch of texts with a single request when the embedder supports it."""
+    if hasattr(embedder, "async_get_embeddings_batch_and_usage"):
+        return await embedder.async_get_embeddings_batch_and_usage(texts)
+    results = await asyncio.gather(*[embedder.async_get_embedding_and_usage(text) for text in texts])
+    return [embedding for embedding, _ in results], [usage for _, usage in results]
+
+
+async def ingest(
+    lines: Iterable[str],
+    sink: ChunkSink,
+    embedder: Embedder,
+    name: str,
+    content_id: Optional[str] = None,
+    content_hash: Optional[str] = None,
+    meta_data: Optional[Dict[str, Any]] = None,
+    chunk_size: int = 5000,
+    batch_size: int = 100,
+    concurrency: int = 4,
+) -> IngestStats:
+    """
+    Incrementally sync a streamed source into a sink.
+
+    Args:
+        lines (Iterable[str]): Lines of the source document.
+        sink (ChunkSink): Where chunk rows are stored.
+        embedder (Embedder): Embedder used for new chunks.
+        name (str): Name of the content, stored on every row.
+        content_id (Optional[str]): Identifies the rows owned by this source. Derived from `name` by default,
+            `ingest_knowledge` passes the id `Knowledge.add_content` would use.
+        content_hash (Optional[str]): Hash of the source stored in the `content_hash` column, as agno does. Derived
+            from `name` by default, `ingest_knowledge` passes the hash `Knowledge.add_content` would use.
+        meta_data (Optional[Dict[str, Any]]): Metadata stored on every new row.
+        chunk_size (int): Maximum number of characters per chunk.
+        batch_size (int): Number of chunks per embedding request and per COPY.
+        concurrency (int): Maximum number of embedding batches in flight.
+
+    Returns:
+        IngestStats: Counters and timings for the run.
+    """
+    started = time.perf_counter()
+    stats = IngestStats()
+    content_id = content_id or generate_id(name)
+    content_hash = content_hash or sha256(name.encode()).hexdigest()
+    existing = await asyncio.to_thread(sink.existing_hashes, content_id)
+    log_info(f"Ingesting '{name}': {len(existing)} chunks already stored")
+
+    seen: Set[str] = set()
+    slots = asyncio.Semaphore(concurrency)
+    tasks: List[asyncio.Task] = []
+
+    async def process(batch: List[Chunk]) -> None:
+        try:
+            embed_started = time.perf_counter()
+            embeddings, usages = await embed_texts(embedder, [chunk.content for chunk in batch])
+            stats.embed_seconds += time.perf_counter() - embed_started
+
+            rows = []
+            for chunk, embedding, usage in zip(batch, embeddings, usages):
+                if not embedding:
+                    stats.failed += 1
+                    continue
+                rows.append(
+                    {
+                        "id": row_id(content_id, chunk.hash),
+                        "name": name,
+                        "meta_data": {**(meta_data or {}), "chunk": chunk.index, "chunk_hash": chunk.hash},
+                        "filters": None,
+                        "content": chunk.content.replace("\x00", "\ufffd"),
+                        "embedding": embedding,
+                        "usage": usage,
+                        "content_hash": content_hash,
+                        "content_id": content_id,
+                    }
+                )
+
+            write_started = time.perf_counter()
+            await asyncio.to_thread(sink.write, rows)
+            stats.write_seconds += time.perf_counter() - write_started
+            stats.embedded += len(rows)
+            stats.batches.append(len(rows))
+            log_debug(f"Stored batch of {len(rows)} chunks")
+        except Exception as e:  # noqa: BLE001 - a failed batch must keep the stale chunks, not abort the sync
+            stats.failed += len(batch)
+            logger.warning(f"Failed to embed or store a batch of {len(batch)} chunks: {e}")
+        finally:
+            slots.release()
+
+    async def dispatch(batch: List[Chunk]) -> None:
+        await slots.acquire()
+        tasks.append(asyncio.create_task(process(batch)))
+
+    chunks = iter_chunks(lines, chunk_size=chunk_size)
+    pending: List[Chunk] = []
+    while True:
+        # Read the source off the event loop so slow network reads don't stall in-flight batches
+        chunk = await asyncio.to_thread(next, chunks, None)
+        if chunk is None:
+            break
+        stats.chunks += 1
+        chunk_id = chunk.hash
+        if chunk_id in seen:
+            continue
+        seen.add(chunk_id)
+        if chunk_id in existing:
+            stats.skipped += 1
+            continue
+        pending.append(chunk)
+        if len(pending) >= batch_size:
+            await dispatch(pending)
+            pending = []
+    if pending:
+        await dispatch(pending)
+    for result in await asyncio.gather(*tasks, return_exceptions=True):
+        if isinstance(result, BaseException):
+            # Only reachable for errors `process` does not catch, e.g. cancellation
+            stats.failed += 1
+            logger.warning(f"Ingestion batch failed: {result!r}")
+
+    stale = existing - seen
+    if stats.failed:
+        # Keep the previous version searchable until the failed chunks are embedded on the next run
+        logger.warning(f"{stats.failed} chunks failed to embed, keeping {len(stale)} stale chunks")
+    elif stale:
+        stats.deleted = await asyncio.to_thread(sink.delete, content_id, stale)
+
+    stats.elapsed_seconds = time.perf_counter() - started
+    log_info(f"Ingested '{name}': {stats.summary()}")
+    return stats
+
+
+def register_content(
+    contents_db: BaseDb,
+    content_id: str,
+    name: str,
+    linked_to: Optional[str],
+    meta_data: Optional[Dict[str, Any]],
+    stats: IngestStats,
+) -> None:
+    """Record the ingested source in the contents table, the way `Knowledge.add_content` does."""
+    now = int(time.time())
+    previous = contents_db.get_knowledge_content(content_id)
+    contents_db.upsert_knowledge_content(
+        knowledge_row=KnowledgeRow(
+            id=content_id,
+            name=name,
+            description="",
+            metadata=meta_data,
+            linked_to=linked_to or "",
+            access_count=previous.access_count if previous else 0,
+            status=ContentStatus.FAILED if stats.failed else ContentStatus.COMPLETED,
+            status_message=f"{stats.failed} chunks failed to embed" if stats.failed else "",
+            created_at=previous.created_at if previous and previous.created_at else now,
+            updated_at=now,
+        )
+    )
+
+
+def ingest_knowledge(
+    knowledge: Knowledge,
+    name: str,
+    url: Optional[str] = None,
+    path: Optional[str] = None,
+    embedder: Optional[Embedder] = None,
+    sink: Optional[ChunkSink] = None,
+    **kwargs: Any,
+) -> IngestStats:
+    """
+    Sync a URL or local file into the vector table and the contents table of `knowledge`.
+
+    The rows use the `content_id` `knowledge.add_content` would use for the same source, so rows loaded with
+    `add_content` are replaced by the first run instead of duplicated.
+    """
+    if (url is None) == (path is None):
+        raise ValueError("Provide exactly one of 'url' or 'path'.")
+    vector_db = knowledge.vector_db
+    if not isinstance(vector_db, PgVector):
+        raise TypeError("Incremental ingestion requires a PgVector knowledge base.")
+    content_id = source_content_id(url=url, path=path)
+    meta_data = {"source": url or path}
+    lines = iter_url_lines(url) if url is not None else iter_file_lines(path)  # type: ignore[arg-type]
+    stats = asyncio.run(
+        ingest(
+            lines=lines,
+            sink=sink or PgVectorSink(vector_db),
+            embedder=embedder or vector_db.embedder,
+            name=name,
+            content_id=content_id,
+            content_hash=source_content_hash(url=url, path=path),
+            meta_data=meta_data,
+            **kwargs,
+        )
+    )
+    if isinstance(knowledge.contents_db, BaseDb):
+        register_content(knowledge.contents_db, content_id, name, knowledge.name, meta_data, stats)
+    return stats
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Incrementally ingest a document into the agno_docs knowledge base")
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--url", help="Stream the document from a URL")
+    source.add_argument("--file", help="Stream the document from a local file")
+    parser.add_argument("--name", default="Agno Documentation")
+    parser.add_argument("--chunk-size", type=int, default=5000)
+    parser.add_argument("--batch-size", type=int, default=100)
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--stub-embedder", action="store_true", help="Use the offline stub embedder")
+    parser.add_argument("--stub-latency", type=float, default=0.0, help="Simulated latency per embedding request")
+    parser.add_argument("--dry-run", action="store_true", help="Write to an in-memory sink instead of Postgres")
+    parser.add_argument("--repeat", type=int, default=1, help="Run the sync N times to measure incremental re-runs")
+    args = parser.parse_args()
+
+    from knowledge.embedders import StubEmbedder
+
+    embedder: Optional[Embedder] = StubEmbedder(latency=args.stub_latency) if args.stub_embedder else None
+    options: Dict[str, Any] = {
+        "chunk_size": args.chunk_size,
+        "batch_size": args.batch_size,
+        "concurrency": args.concurrency,
+    }
+    memory_sink = MemorySink()
+
+    for run in range(args.repeat):
+        if args.dry_run:
+            from agno.knowledge.embedder.openai import OpenAIEmbedder
+
+            embedder = embedder or OpenAIEmbedder(id="text-embedding-3-small")
+            stats = asyncio.run(
+                ingest(
+                    lines=iter_url_lines(args.url) if args.url else iter_file_lines(args.file),
+                    sink=memory_sink,
+                    embedder=embedder,
+                    name=args.name,
+                    content_id=source_content_id(url=args.url, path=args.file),
+                    content_hash=source_content_hash(url=args.url, path=args.file),
+                    meta_data={"source": args.url or args.file},
+                    **options,
+                )
+            )
+        else:
+            from agents.agno_knowledge_agent import knowledge as agno_docs
+
+            stats = ingest_knowledge(agno_docs, args.name, url=args.url, path=args.file, embedder=embedder, **options)
+        print(f"run {run + 1}: {stats.summary()}")
@@ -0,0 +1,349 @@
+"""
+Quantized vector search with exact rescoring for PgVector knowledge tables.
+
+The table keeps a single full-precision `embedding` column. A halfvec or binary-quantized expression index over
+that column serves a first-pass candidate search, and the top `limit * rescore_factor` candidates are rescored with
+the full-precision vectors. The index, which is what has to fit in RAM, shrinks 2x (halfvec) or 32x (binary) while
+searches return the same number of results as before. Hybrid search can hand its candidates to a `FusionStage`
+(see `knowledge.fusion`) instead of scoring them in SQL.
+
+Usage:
+    python -m db.vector_index build --type hnsw --quantization halfvec
+    python -m knowledge.quantized --quantization halfvec "What is Agno?" "How do I create a team?"
+"""
+
+import time
+from statistics import mean, median
+from typing import Any, Dict, List, Optional, Union
+
+from agno.filters import FilterExpr
+from agno.knowledge.document import Document
+from agno.utils.log import log_debug, log_info, logger
+from agno.vectordb.distance import Distance
+from agno.vectordb.pgvector import PgVector
+from agno.vectordb.pgvector.index import HNSW, Ivfflat
+from pgvector.sqlalchemy import BIT, HALFVEC, Vector
+from sqlalchemy import Float, and_, bindparam, cast, desc, func, literal_column, select, text, union
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.sql.elements import ColumnElement
+from sqlalchemy.sql.selectable import Select
+
+from db.vector_index import QUANTIZATIONS, build_index, index_name, inspect_indexes
+from knowledge.fusion import FusionStage
+
+SearchFilters = Optional[Union[Dict[str, Any], List[FilterExpr]]]
+
+
+class QuantizedPgVector(PgVector):
+    """
+    PgVector that searches a quantized index first and rescores the candidates with full-precision vectors.
+
+    Args:
+        quantization (Optional[str]): `halfvec`, `binary`, or None to search exactly like `PgVector`.
+        rescore_factor (int): Candidates fetched from the quantized index per requested result.
+        fusion (Optional[FusionStage]): Fuse and deduplicate hybrid search candidates in-process instead of
+            ranking them with the weighted score in SQL.
+        **kwargs: Passed to `PgVector`.
+    """
+
+    def __init__(
+        self,
+        table_name: str,
+        quantization: Optional[str] = "halfvec",
+        rescore_factor: int = 4,
+        fusion: Optional[FusionStage] = None,
+        **kwargs,
+    ):
+        if quantization is not None and quantization not in QUANTIZATIONS:
+            raise ValueError(f"Unknown quantization '{quantization}', expected one of {QUANTIZATIONS}")
+        super().__init__(table_name=table_name, **kwargs)
+        self.quantization: Optional[str] = quantization
+        self.rescore_factor: int = max(rescore_factor, 1)
+        self.fusion: Optional[FusionStage] = fusion
+
+    # ============================================================================
+    # Distance expressions
+    # ============================================================================
+    def _exact_distance(self, query_embedding: List[float]) -> ColumnElement:
+        if self.distance == Distance.l2:
+            return self.table.c.embedding.l2_distance(query_embedding)
+        if self.distance == Distance.max_inner_product:
+            return self.table.c.embedding.max_inner_product(query_embedding)
+        return self.table.c.embedding.cosine_distance(query_embedding)
+
+    def _quantized_distance(self, query_embedding: List[float]) -> ColumnElement:
+        """Distance on the quantized embedding, written exactly like the indexed expression."""
+        if self.quantization == "binary":
+            query = cast(
+                bindparam("query_embedding", query_embedding, type_=Vector(self.dimensions)), Vector(self.dimensions)
+            )
+            return cast(func.binary_quantize(self.table.c.embedding), BIT(self.dimensions)).op(
+                "<~>", return_type=Float
+            )(cast(func.binary_quantize(query), BIT(self.dimensions)))
+        quantized = cast(self.table.c.embedding, HALFVEC(self.dimensions))
+        if self.distance == Distance.l2:
+            return quantized.l2_distance(query_embedding)
+        if self.distance == Distance.max_inner_product:
+            return quantized.max_inner_product(query_embedding)
+        return quantized.cosine_distance(query_embedding)
+
+    def _apply_filters(self, stmt: Select, filters: SearchFilters) -> Select:
+        if filters is None:
+            return stmt
+        if isinstance(filters, dict):
+            return stmt.where(self.table.c.meta_data.contains(filters))
+        return stmt.where(
+            and_(*[self._dsl_to_sqlalchemy(f.to_dict() if hasattr(f, "to_dict") else f, self.table) for f in filters])
+        )
+
+    def _vector_candidates(self, query_embedding: List[float], num_candidates: int, filters: SearchFilters) -> Select:
+        distance = (
+            self._exact_distance(query_embedding)
+            if self.quantization is None
+            else self._quantized_distance(query_embedding)
+        )
+        stmt = select(self.table.c.id).order_by(distance).limit(num_candidates)
+        return self._apply_filters(stmt, filters)
+
+    # ============================================================================
+    # Search
+    # ============================================================================
+    def _execute(self, stmt: Select, num_candidates: int) -> List[Any]:
+        with self.Session() as sess, sess.begin():
+            # An index scan returns at most ef_search rows, so it must cover the candidate set
+            if isinstance(self.vector_index, HNSW):
+                ef_search = max(self.vector_index.ef_search, num_candidates)
+                sess.execute(text(f"SET LOCAL hnsw.ef_search = {int(ef_search)}"))
+            elif isinstance(self.vector_index, Ivfflat):
+                sess.execute(text(f"SET LOCAL ivfflat.probes = {int(self.vector_index.probes)}"))
+            return list(sess.execute(stmt).fetchall())
+
+    def _to_documents(self, results: List[Any]) -> List[Document]:
+        return [
+            Document(
+                id=result.id,
+                name=result.name,
+                meta_data=result.meta_data,
+                content=result.content,
+                embedder=self.embedder,
+                embedding=result.embedding,
+                usage=result.usage,
+            )
+            for result in results
+        ]
+
+    def _rerank(self, query: str, documents: List[Document]) -> List[Document]:
+        if self.reranker:
+            documents = self.reranker.rerank(query=query, documents=documents)
+        log_info(f"Found {len(documents)} documents")
+        return documents
+
+    def vector_search(self, query: str, limit: int = 5, filters: SearchFilters = None) -> List[Document]:
+        if self.quantization is None:
+            return super().vector_search(query=query, limit=limit, filters=filters)
+        try:
+            query_embedding = self.embedder.get_embedding(query)
+            if not query_embedding:
+                logger.error(f"Error getting embedding for Query: {query}")
+                return []
+
+            num_candidates = limit * self.rescore_factor
+            candidates = self._vector_candidates(query_embedding, num_candidates, filters).subquery()
+            stmt = (
+                select(*self._columns())
+                .where(self.table.c.id.in_(select(candidates.c.id)))
+                .order_by(self._exact_distance(query_embedding))
+                .limit(limit)
+            )
+            log_debug(f"Quantized vector search query: {stmt}")
+            return self._rerank(query, self._to_documents(self._execute(stmt, num_candidates)))
+        except SQLAlchemyError as e:
+            logger.error(f"Error during quantized vector search: {e}")
+            return []
+
+    def hybrid_search(self, query: str, limit: int = 5, filters: SearchFilters = None) -> List[Document]:
+        """
+        Hybrid search over a candidate set instead of the whole table.
+
+        Candidates are the union of the quantized vector search and the best keyword matches. They are then
+        scored with the same weighted combination of exact vector similarity and text rank as `PgVector`, or,
+        with a `fusion` stage, fetched in one query and fused with reciprocal rank fusion in-process.
+        """
+        if self.quantization is None and self.fusion is None:
+            return super().hybrid_search(query=query, limit=limit, filters=filters)
+        try:
+            query_embedding = self.embedder.get_embedding(query)
+            if not query_embedding:
+                logger.error(f"Error getting embedding for Query: {query}")
+                return []
+            if not 0 <= self.vector_score_weight <= 1:
+                raise ValueError("vector_score_weight must be between 0 and 1")
+
+            ts_vector = func.to_tsvector(self.content_language, self.table.c.content)
+            processed_query = self.enable_prefix_matching(query) if self.prefix_match else query
+            ts_query = func.websearch_to_tsquery(self.content_language, bindparam("query", value=processed_query))
+            text_rank = func.ts_rank_cd(ts_vector, ts_query)
+
+            num_candidates = limit * (self.fusion.candidate_factor if self.fusion else self.rescore_factor)
+            keyword_candidates = self._apply_filters(
+                select(self.table.c.id).where(ts_vector.op("@@")(ts_query)).order_by(text_rank.desc()),
+                filters,
+            ).limit(num_candidates)
+            candidates = union(
+                self._vector_candidates(query_embedding, num_candidates, filters), keyword_candidates
+            ).subquery()
+
+            vector_distance = self._exact_distance(query_embedding)
+            if self.fusion is not None:
+                stmt = select(
+                    *self._columns(), vector_distance.label("vector_distance"), text_rank.label("text_rank")
+                ).where(self.table.c.id.in_(select(candidates.c.id)))
+                log_debug(f"Fused hybrid search query: {stmt}")
+                results = self._execute(stmt, num_candidates)
+                documents = self.fusion.fuse(
+                    self._to_documents(results),
+                    [result.vector_distance for result in results],
+                    [result.text_rank for result in results],
+                    limit,
+                )
+                return self._rerank(query, documents)
+
+            if self.distance == Distance.max_inner_product:
+                vector_score = (vector_distance + 1) / 2
+            else:
+                vector_score = 1 / (1 + vector_distance)
+            hybrid_score = self.vector_score_weight * vector_score + (1 - self.vector_score_weight) * text_rank
+
+            stmt = (
+                select(*self._columns(), hybrid_score.label("hybrid_score"))
+                .where(self.table.c.id.in_(select(candidates.c.id)))
+                .order_by(desc(literal_column("hybrid_score")))
+                .limit(limit)
+            )
+            log_debug(f"Quantized hybrid search query: {stmt}")
+            return self._rerank(query, self._to_documents(self._execute(stmt, num_candidates)))
+        except SQLAlchemyError as e:
+            logger.error(f"Error during quantized hybrid search: {e}")
+            return []
+
+    def _columns(self) -> List[Any]:
+        return [
+            self.table.c.id,
+            self.table.c.name,
+            self.table.c.meta_data,
+            self.table.c.content,
+            self.table.c.embedding,
+            self.table.c.usage,
+        ]
+
+    def _create_vector_index(self, force_recreate: bool = False) -> None:
+        """Build the quantized index used by the first-pass search (called by `optimize()`)."""
+        if self.quantization is None or self.vector_index is None:
+            return super()._create_vector_index(force_recreate=force_recreate)
+        index_type = "ivfflat" if isinstance(self.vector_index, Ivfflat) else "hnsw"
+        name = index_name(self.table_name, index_type, self.quantization)
+        if force_recreate:
+            self._drop_index(name)
+        params: Dict[str, Any] = (
+            {"lists": None if self.vector_index.dynamic_lists else self.vector_index.lists}
+            if isinstance(self.vector_index, Ivfflat)
+            else {"m": self.vector_index.m, "ef_construction": self.vector_index.ef_construction}
+        )
+        build_index(
+            self.db_engine,
+            self.table_name,
+            schema=self.schema,
+            index_type=index_type,
+            distance={Distance.l2: "l2", Distance.max_inner_product: "ip"}.get(self.distance, "cosine"),
+            quantization=self.quantization,
+            concurrently=False,
+            **params,
+        )
+
+    def _create_gin_index(self, force_recreate: bool = False) -> None:
+        """Build the full-text index used by the keyword branch of hybrid search, with a quoted text search config."""
+        name = index_name(self.table_name, "gin")
+        if force_recreate:
+            self._drop_index(name)
+        build_index(
+            self.db_engine,
+            self.table_name,
+            schema=self.schema,
+            index_type="gin",
+            language=self.content_language,
+            concurrently=False,
+        )
+
+
+# ============================================================================
+# Layout comparison
+# ============================================================================
+def compare_layouts(vector_db: QuantizedPgVector, queries: List[str], limit: int = 10, runs: int = 5) -> Dict[str, Any]:
+    """
+    Compare the full-precision layout with the quantized one on the live table.
+
+    Reports index sizes, search latency for vector and hybrid search, result counts, and the overlap of the
+    quantized results with the full-precision results.
+    """
+    quantization = vector_db.quantization
+    indexes = inspect_indexes(vector_db.db_engine, vector_db.table_name, vector_db.schema)["indexes"]
+    report: Dict[str, Any] = {
+        "index_sizes": {index["name"]: index["size"] for index in indexes if index["method"] in ("hnsw", "ivfflat")}
+    }
+    for search_type in ("vector", "hybrid"):
+        results: Dict[Optional[str], List[List[str]]] = {}
+        latencies: Dict[Optional[str], List[float]] = {}
+        for mode in (None, quantization):
+            vector_db.quantization = mode
+            search = vector_db.vector_search if search_type == "vector" else vector_db.hybrid_search
+            search(queries[0], limit=limit)  # Warm up connections and the embedding cache
+            results[mode], latencies[mode] = [], []
+            for query in queries:
+                for _ in range(runs):
+                    started = time.perf_counter()
+                    documents = search(query, limit=limit)
+                    latencies[mode].append((time.perf_counter() - started) * 1000)
+                results[mode].append([document.id or "" for document in documents])
+        vector_db.quantization = quantization
+        report[search_type] = {
+            "full_p50_ms": median(latencies[None]),
+            "quantized_p50_ms": median(latencies[quantization]),
+            "full_results": mean(len(ids) for ids in results[None]),
+            "quantized_results": mean(len(ids) for ids in results[quantization]),
+            "overlap": mean(
+                len(set(full) & set(quantized)) / max(len(full), 1)
+                for full, quantized in zip(results[None], results[quantization])
+            ),
+        }
+    return report
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Compare the full-precision and quantized agno_docs layouts")
+    parser.add_argument("queries", nargs="*", default=["What is Agno?", "What is AgentOS?", "How do teams work?"])
+    parser.add_argument("--quantization", choices=QUANTIZATIONS, default="halfvec")
+    parser.add_argument("--limit", type=int, default=10)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--stub-embedder", action="store_true", help="Embed queries with the offline stub embedder")
+    args = parser.parse_args()
+
+    from agents.agno_knowledge_agent import knowledge as agno_docs
+    from knowledge.embedders import StubEmbedder
+
+    assert isinstance(agno_docs.vector_db, QuantizedPgVector)
+    vector_db = agno_docs.vector_db
+    vector_db.quantization = args.quantization
+    if args.stub_embedder:
+        vector_db.embedder = StubEmbedder()
+
+    report = compare_layouts(vector_db, args.queries, limit=args.limit, runs=args.runs)
+    for name, size in report["index_sizes"].items():
+        print(f"{name}: {size}")
+    for search_type in ("vector", "hybrid"):
+        r = report[search_type]
+        print(
+            f"{search_type:>6}: full p50={r['full_p50_ms']:.2f}ms quantized p50={r['quantized_p50_ms']:.2f}ms "
+            f"results={r['full_results']:.0f}/{r['quantized_results']:.0f} overlap@{args.limit}={r['overlap']:.3f}"
+        )
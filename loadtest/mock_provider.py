@@ -0,0 +1,432 @@
+"""
+Local stand-in for the OpenAI and Anthropic APIs, used to load-test the AgentOS without calling a provider.
+
+Serves `/v1/chat/completions` and `/v1/embeddings` (OpenAI) and `/v1/messages` (Anthropic), streamed or not. Every
+answer waits `ttft` seconds, then produces `tokens` words `token_interval` seconds apart. When the request offers
+tools and the conversation does not end with a tool result, the model calls one of them with probability
+`tool_call_rate`, with arguments built from the tool's JSON schema. Structured outputs get a JSON document matching
+the requested schema. Embeddings are the token-hash vectors of `StubEmbedder`.
+
+Anthropic prompt caching is simulated: the tools and system blocks up to a `cache_control` breakpoint are hashed,
+and a prefix of at least `MIN_CACHEABLE_TOKENS` is reported as `cache_creation_input_tokens` the first time and
+`cache_read_input_tokens` afterwards. `/stats` shows the cache reads and writes.
+
+With `rate_limit_rpm`, chat completions or messages beyond that many requests a minute (after a burst of a minute's
+worth) are answered 429 with a `retry-after` header, as the providers do.
+
+Point the SDKs at it with `OPENAI_BASE_URL=http://127.0.0.1:8100/v1` and `ANTHROPIC_BASE_URL=http://127.0.0.1:8100`.
+With `--mcp-port`, the MCP stand-in of `tools/mcp_pool.py` is served as well, for `AGNO_MCP_URL`.
+
+Usage:
+    python -m loadtest.mock_provider --port 8100 --ttft 0.3 --tokens 200 --token-interval 0.01
+"""
+
+import asyncio
+import base64
+import json
+import random
+import time
+from collections import Counter, deque
+from dataclasses import dataclass
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+from uuid import uuid4
+
+import numpy as np
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+from agents.prompt_cache import prefix_hash
+from knowledge.embedders import StubEmbedder
+
+# Vocabulary of the generated answers
+WORDS = (
+    "the agent reviewed recent results and found steady growth across core segments while costs stayed flat as "
+    "analysts expect demand to hold through next quarter with margins improving as new products ship"
+)
+# Shorter prefixes are not cached by Anthropic
+MIN_CACHEABLE_TOKENS = 1024
+
+
+@dataclass
+class MockSettings:
+    ttft: float = 0.3
+    tokens: int = 200
+    token_interval: float = 0.01
+    tool_call_rate: float = 0.5
+    rate_limit_rpm: float = 0.0
+    seed: Optional[int] = None
+
+
+def sample_value(schema: Dict[str, Any], defs: Optional[Dict[str, Any]] = None, name: str = "") -> Any:
+    """Smallest value matching a JSON schema, enough for tool arguments and structured outputs."""
+    defs = defs if defs is not None else schema.get("$defs", {})
+    if "$ref" in schema:
+        return sample_value(defs.get(schema["$ref"].rsplit("/", 1)[-1], {}), defs, name)
+    if "enum" in schema:
+        return schema["enum"][0]
+    for key in ("anyOf", "oneOf", "allOf"):
+        options = [option for option in schema.get(key, []) if option.get("type") != "null"]
+        if options:
+            return sample_value(options[0], defs, name)
+    kind = schema.get("type")
+    if isinstance(kind, list):
+        kind = next((k for k in kind if k != "null"), None)
+    if kind == "object" or "properties" in schema:
+        properties = schema.get("properties", {})
+        return {key: sample_value(value, defs, key) for key, value in properties.items()}
+    if kind == "array":
+        return [sample_value(schema.get("items", {}), defs, name)]
+    if kind == "integer":
+        return 1
+    if kind == "number":
+        return 1.0
+    if kind == "boolean":
+        return False
+    if "symbol" in name.lower() or "ticker" in name.lower():
+        return "NVDA"
+    if "url" in name.lower():
+        return "https://www.youtube.com/watch?v=dQw4w9WgXcQ"
+    return "AI agents"
+
+
+class MockProvider:
+    def __init__(self, settings: MockSettings):
+        self.settings = settings
+        self.random = random.Random(settings.seed)
+        self.embedder = StubEmbedder()
+        self.requests: Counter = Counter()
+        self.tool_calls = 0
+        self.output_tokens = 0
+        # Token counts of the cached prefixes by hash, and the cache usage of the latest Anthropic requests
+        self.prompt_cache: Dict[str, int] = {}
+        self.cache_requests: deque = deque(maxlen=1000)
+        self.cache_read_tokens = 0
+        self.cache_write_tokens = 0
+        # Requests left of the rate limit of each API, refilled continuously up to a minute's worth
+        self.rate_limited = 0
+        self.reset_rate_limit()
+
+    def reset_rate_limit(self) -> None:
+        self.allowance: Dict[str, Tuple[float, float]] = {}
+
+    def retry_after(self, api: str) -> Optional[float]:
+        """Seconds to wait when a request to `api` now would exceed the rate limit, or None to serve it."""
+        rpm = self.settings.rate_limit_rpm
+        if not rpm:
+            return None
+        now = time.monotonic()
+        allowance, updated = self.allowance.get(api, (rpm, now))
+        allowance = min(rpm, allowance + (now - updated) * rpm / 60)
+        if allowance >= 1:
+            self.allowance[api] = (allowance - 1, now)
+            return None
+        self.allowance[api] = (allowance, now)
+        self.rate_limited += 1
+        return (1 - allowance) * 60 / rpm
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "requests": dict(self.requests),
+            "tool_calls": self.tool_calls,
+            "output_tokens": self.output_tokens,
+            "cache_read_tokens": self.cache_read_tokens,
+            "cache_write_tokens": self.cache_write_tokens,
+            "cached_prefixes": len(self.prompt_cache),
+            "rate_limited": self.rate_limited,
+        }
+
+    def cache_usage(self, body: Dict[str, Any], input_tokens: int) -> Dict[str, int]:
+        """Usage of an Anthropic request, with its cached prefix read or written."""
+        usage = {"input_tokens": input_tokens, "cache_read_input_tokens": 0, "cache_creation_input_tokens": 0}
+        system = body.get("system")
+        if not isinstance(system, list) or not any("cache_control" in block for block in system):
+            return usage
+        prefix = prefix_hash(body)
+        breakpoint = next(i for i, block in enumerate(system) if "cache_control" in block)
+        tokens = len(json.dumps([*(body.get("tools") or []), *system[: breakpoint + 1]])) // 4
+        if tokens >= MIN_CACHEABLE_TOKENS:
+            key = "cache_read_input_tokens" if prefix in self.prompt_cache else "cache_creation_input_tokens"
+            self.prompt_cache[prefix] = tokens
+            usage[key] = tokens
+            usage["input_tokens"] = max(input_tokens - tokens, 0)
+            self.cache_read_tokens += usage["cache_read_input_tokens"]
+            self.cache_write_tokens += usage["cache_creation_input_tokens"]
+        self.cache_requests.append({"prefix": prefix, "tokens": tokens, **usage})
+        return usage
+
+    def words(self) -> List[str]:
+        self.output_tokens += self.settings.tokens
+        words = WORDS.split(" ")
+        return [f"{self.random.choice(words)} " for _ in range(self.settings.tokens)]
+
+    def choose_tool(self, tools: List[Dict[str, Any]], after_tool_result: bool) -> Optional[Dict[str, Any]]:
+        if not tools or after_tool_result or self.random.random() >= self.settings.tool_call_rate:
+            return None
+        self.tool_calls += 1
+        return self.random.choice(tools)
+
+    async def pace(self, chunks: List[Any]) -> AsyncIterator[Any]:
+        """Yield the chunks at the configured speed: `ttft` before the first one, `token_interval` between them."""
+        await asyncio.sleep(self.settings.ttft)
+        for i, chunk in enumerate(chunks):
+            if i and self.settings.token_interval:
+                await asyncio.sleep(self.settings.token_interval)
+            yield chunk
+
+    async def wait_full_response(self, chunks: int) -> None:
+        await asyncio.sleep(self.settings.ttft + self.settings.token_interval * max(chunks - 1, 0))
+
+    # ============================================================================
+    # OpenAI
+    # ============================================================================
+    async def chat_completions(self, body: Dict[str, Any]) -> Any:
+        model = body.get("model", "mock")
+        self.requests[f"openai:{model}"] += 1
+        messages = body.get("messages", [])
+        prompt_tokens = sum(len(str(m.get("content") or "")) for m in messages) // 4
+        tools = [t["function"] for t in body.get("tools") or [] if t.get("type") == "function"]
+        tool = self.choose_tool(tools, bool(messages) and messages[-1].get("role") == "tool")
+
+        response_format = body.get("response_format") or {}
+        if tool is not None:
+            arguments = json.dumps(sample_value(tool.get("parameters") or {}))
+            call = {"id": f"call_{uuid4().hex[:24]}", "type": "function"}
+            chunks: List[Dict[str, Any]] = [
+                {"tool_calls": [{"index": 0, **call, "function": {"name": tool["name"], "arguments": arguments}}]}
+            ]
+            message: Dict[str, Any] = {
+                "role": "assistant",
+                "content": None,
+                "tool_calls": [{**call, "function": {"name": tool["name"], "arguments": arguments}}],
+            }
+            finish_reason = "tool_calls"
+        else:
+            if response_format.get("type") == "json_schema":
+                schema = response_format.get("json_schema", {}).get("schema", {})
+                parts = [json.dumps(sample_value(schema))]
+            elif response_format.get("type") == "json_object":
+                parts = [json.dumps({"content": "".join(self.words()).strip()})]
+            else:
+                parts = self.words()
+            chunks = [{"content": part} for part in parts]
+            message = {"role": "assistant", "content": "".join(parts)}
+            finish_reason = "stop"
+        completion_tokens = max(len(chunks), 1)
+        usage = {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "total_tokens": prompt_tokens + completion_tokens,
+        }
+        base = {"id": f"chatcmpl-{uuid4().hex[:24]}", "created": int(time.time()), "model": model}
+
+        if not body.get("stream"):
+            await self.wait_full_response(len(chunks))
+            choice = {"index": 0, "message": message, "finish_reason": finish_reason}
+            return JSONResponse({**base, "object": "chat.completion", "choices": [choice], "usage": usage})
+
+        include_usage = (body.get("stream_options") or {}).get("include_usage", False)
+
+        async def stream() -> AsyncIterator[str]:
+            chunk_base = {**base, "object": "chat.completion.chunk"}
+            async for delta in self.pace(chunks):
+                choice = {"index": 0, "delta": {"role": "assistant", **delta}, "finish_reason": None}
+                yield f"data: {json.dumps({**chunk_base, 'choices': [choice]})}\n\n"
+            choice = {"index": 0, "delta": {}, "finish_reason": finish_reason}
+            yield f"data: {json.dumps({**chunk_base, 'choices': [choice]})}\n\n"
+            if include_usage:
+                yield f"data: {json.dumps({**chunk_base, 'choices': [], 'usage': usage})}\n\n"
+            yield "data: [DONE]\n\n"
+
+        return StreamingResponse(stream(), media_type="text/event-stream")
+
+    async def embeddings(self, body: Dict[str, Any]) -> Any:
+        model = body.get("model", "mock")
+        self.requests[f"openai:{model}"] += 1
+        texts = body.get("input", [])
+        texts = [texts] if isinstance(texts, str) else [str(text) for text in texts]
+        self.embedder.dimensions = body.get("dimensions") or 1536
+        data = []
+        for i, text in enumerate(texts):
+            vector = self.embedder._embed(text)
+            embedding: Any = vector
+            if body.get("encoding_format") == "base64":
+                embedding = base64.b64encode(np.asarray(vector, dtype=np.float32).tobytes()).decode()
+            data.append({"object": "embedding", "index": i, "embedding": embedding})
+        tokens = self.embedder._usage(texts)["prompt_tokens"]
+        await asyncio.sleep(self.settings.ttft / 4)
+        return JSONResponse(
+            {
+                "object": "list",
+                "data": data,
+                "model": model,
+                "usage": {"prompt_tokens": tokens, "total_tokens": tokens},
+            }
+        )
+
+    # ============================================================================
+    # Anthropic
+    # ============================================================================
+    async def messages(self, body: Dict[str, Any]) -> Any:
+        model = body.get("model", "mock")
+        self.requests[f"anthropic:{model}"] += 1
+        messages = body.get("messages", [])
+        input_tokens = (len(json.dumps(messages)) + len(json.dumps(body.get("system", "")))) // 4
+        last = messages[-1] if messages else {}
+        after_tool_result = isinstance(last.get("content"), list) and any(
+            isinstance(block, dict) and block.get("type") == "tool_result" for block in last["content"]
+        )
+        tools = [t for t in body.get("tools") or [] if "input_schema" in t]
+        tool = self.choose_tool(tools, after_tool_result)
+
+        output_format = body.get("output_format") or {}
+        if tool is not None:
+            arguments = sample_value(tool.get("input_schema") or {})
+            block: Dict[str, Any] = {"type": "tool_use", "id": f"toolu_{uuid4().hex[:24]}", "name": tool["name"]}
+            content = [{**block, "input": arguments}]
+            start_block = {**block, "input": {}}
+            deltas = [{"type": "input_json_delta", "partial_json": json.dumps(arguments)}]
+            stop_reason = "tool_use"
+        else:
+            if output_format.get("type") == "json_schema":
+                parts = [json.dumps(sample_value(output_format.get("schema", {})))]
+            else:
+                parts = self.words()
+            content = [{"type": "text", "text": "".join(parts)}]
+            start_block = {"type": "text", "text": ""}
+            deltas = [{"type": "text_delta", "text": part} for part in parts]
+            stop_reason = "end_turn"
+        output_tokens = max(len(deltas), 1)
+        input_usage = self.cache_usage(body, input_tokens)
+        message = {
+            "id": f"msg_{uuid4().hex[:24]}",
+            "type": "message",
+            "role": "assistant",
+            "model": model,
+            "stop_sequence": None,
+        }
+
+        if not body.get("stream"):
+            await self.wait_full_response(len(deltas))
+            usage = {**input_usage, "output_tokens": output_tokens}
+            return JSONResponse({**message, "content": content, "stop_reason": stop_reason, "usage": usage})
+
+        def event(name: str, data: Dict[str, Any]) -> str:
+            return f"event: {name}\ndata: {json.dumps({'type': name, **data})}\n\n"
+
+        async def stream() -> AsyncIterator[str]:
+            usage = {**input_usage, "output_tokens": 1}
+            yield event("message_start", {"message": {**message, "content": [], "stop_reason": None, "usage": usage}})
+            yield event("content_block_start", {"index": 0, "content_block": start_block})
+            async for delta in self.pace(deltas):
+                yield event("content_block_delta", {"index": 0, "delta": delta})
+            yield event("content_block_stop", {"index": 0})
+            yield event(
+                "message_delta",
+                {
+                    "delta": {"stop_reason": stop_reason, "stop_sequence": None},
+                    "usage": {"output_tokens": output_tokens},
+                },
+            )
+            yield event("message_stop", {})
+
+        return StreamingResponse(stream(), media_type="text/event-stream")
+
+
+def create_mock_app(settings: MockSettings) -> FastAPI:
+    provider = MockProvider(settings)
+    app = FastAPI(title="Mock LLM provider")
+    app.state.provider = provider
+
+    @app.post("/v1/chat/completions")
+    async def chat_completions(request: Request) -> Any:
+        retry_after = provider.retry_after("openai")
+        if retry_after is not None:
+            return JSONResponse(
+                {"error": {"message": "Rate limit reached", "type": "requests", "code": "rate_limit_exceeded"}},
+                status_code=429,
+                headers={"retry-after": f"{retry_after:.3f}"},
+            )
+        return await provider.chat_completions(await request.json())
+
+    @app.post("/v1/embeddings")
+    async def embeddings(request: Request) -> Any:
+        return await provider.embeddings(await request.json())
+
+    @app.post("/v1/messages")
+    async def messages(request: Request) -> Any:
+        retry_after = provider.retry_after("anthropic")
+        if retry_after is not None:
+            return JSONResponse(
+                {"type": "error", "error": {"type": "rate_limit_error", "message": "Rate limit reached"}},
+                status_code=429,
+                headers={"retry-after": f"{retry_after:.3f}"},
+            )
+        return await provider.messages(await request.json())
+
+    @app.get("/health")
+    async def health() -> Dict[str, str]:
+        return {"status": "ok"}
+
+    @app.get("/stats")
+    async def stats() -> Dict[str, Any]:
+        return provider.stats()
+
+    return app
+
+
+def serve_mock_provider(settings: MockSettings) -> MockProvider:
+    """Serve the mock provider from a background thread on a free port and point the SDKs of this process at it."""
+    import os
+    import socket
+    import threading
+
+    import uvicorn
+
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        port = s.getsockname()[1]
+    app = create_mock_app(settings)
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.05)
+    os.environ["ANTHROPIC_BASE_URL"] = f"http://127.0.0.1:{port}"
+    os.environ["OPENAI_BASE_URL"] = f"http://127.0.0.1:{port}/v1"
+    os.environ.setdefault("ANTHROPIC_API_KEY", "mock")
+    os.environ.setdefault("OPENAI_API_KEY", "mock")
+    return app.state.provider
+
+
+if __name__ == "__main__":
+    import argparse
+    import logging
+
+    import uvicorn
+
+    from tools.mcp_pool import serve_stand_in
+
+    parser = argparse.ArgumentParser(description="Serve a mock OpenAI/Anthropic API")
+    parser.add_argument("--port", type=int, default=8100)
+    parser.add_argument("--mcp-port", type=int, help="Also serve the MCP stand-in on this port")
+    parser.add_argument("--ttft", type=float, default=0.3, help="Seconds before the first token")
+    parser.add_argument("--tokens", type=int, default=200, help="Tokens per answer")
+    parser.add_argument("--token-interval", type=float, default=0.01, help="Seconds between tokens")
+    parser.add_argument("--tool-call-rate", type=float, default=0.5, help="Probability of calling an offered tool")
+    parser.add_argument(
+        "--rate-limit-rpm", type=float, default=0.0, help="Answer 429 beyond this many requests a minute"
+    )
+    parser.add_argument("--seed", type=int)
+    args = parser.parse_args()
+
+    if args.mcp_port:
+        logging.getLogger("mcp").setLevel(logging.WARNING)
+        serve_stand_in(args.mcp_port, latency=0.0)
+    settings = MockSettings(
+        ttft=args.ttft,
+        tokens=args.tokens,
+        token_interval=args.token_interval,
+        tool_call_rate=args.tool_call_rate,
+        rate_limit_rpm=args.rate_limit_rpm,
+        seed=args.seed,
+    )
+    uvicorn.run(create_mock_app(settings), host="127.0.0.1", port=args.port, log_level="warning")
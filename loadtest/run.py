@@ -0,0 +1,376 @@
+"""
+Load test of the AgentOS against the mock provider.
+
+Starts the mock provider (`loadtest/mock_provider.py`) and the app (`loadtest/serve.py`), replays a request mix at a
+fixed concurrency over the streaming run routes, and reports per agent, team and workflow:
+throughput, latency p50/p95/p99, time to first token and SQL statements per request.
+
+The mix is a JSONL file with one request per line, `{"id": "finance-agent", "message": "..."}`. The id is resolved
+to an agent, team or workflow of the app. Without `--mix`, the `quick_prompts` of `app/config.yaml` are replayed.
+Each worker keeps one session per target, so history and memories grow as they would for a real user.
+
+Save a report with `--output` and compare later runs with `--baseline`: the run fails when p95 latency, time to
+first token or SQL statements per request grow by more than `--tolerance`, or throughput drops by more than it.
+
+Usage:
+    python -m loadtest.run --requests 200 --concurrency 16
+    python -m loadtest.run --export-mix loadtest/mix.jsonl
+    python -m loadtest.run --mix loadtest/mix.jsonl --output baseline.json
+    python -m loadtest.run --baseline baseline.json --tolerance 0.2
+    python -m loadtest.run --profile dev --output dev.json  # the reload and AGNO_DEBUG mode of compose.yaml
+"""
+
+import asyncio
+import json
+import os
+import random
+import subprocess
+import sys
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from statistics import quantiles
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+from uuid import uuid4
+
+import httpx
+import yaml
+
+CONFIG_PATH = Path(__file__).parent.parent.joinpath("app", "config.yaml")
+
+
+# ============================================================================
+# Request mix
+# ============================================================================
+def quick_prompt_mix(config_path: Path = CONFIG_PATH) -> List[Dict[str, str]]:
+    """Requests built from the chat quick prompts of the AgentOS config."""
+    with open(config_path) as f:
+        config = yaml.safe_load(f)
+    prompts = (config.get("chat") or {}).get("quick_prompts") or {}
+    return [{"id": target_id, "message": message} for target_id, messages in prompts.items() for message in messages]
+
+
+def load_mix(path: str) -> List[Dict[str, str]]:
+    with open(path) as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def resolve_routes(client: httpx.Client, mix: List[Dict[str, str]]) -> List[Tuple[str, str]]:
+    """Map each request of the mix to its run route, e.g. ("agents/finance-agent", message)."""
+    routes: Dict[str, str] = {}
+    for kind in ("agents", "teams", "workflows"):
+        for component in client.get(f"/{kind}").raise_for_status().json():
+            routes[component["id"]] = f"{kind}/{component['id']}"
+    requests = []
+    for item in mix:
+        if item["id"] not in routes:
+            raise SystemExit(f"Unknown agent, team or workflow in the mix: {item['id']}")
+        requests.append((routes[item["id"]], item["message"]))
+    return requests
+
+
+# ============================================================================
+# Measurements
+# ============================================================================
+@dataclass
+class RouteResults:
+    latencies: List[float] = field(default_factory=list)
+    ttfts: List[float] = field(default_factory=list)
+    errors: int = 0
+
+    @property
+    def requests(self) -> int:
+        return len(self.latencies) + self.errors
+
+
+def percentiles(values: List[float]) -> Dict[str, float]:
+    if not values:
+        return {"p50": 0.0, "p95": 0.0, "p99": 0.0}
+    p = quantiles(values, n=100, method="inclusive") if len(values) > 1 else [values[0]] * 99
+    return {"p50": round(p[49] * 1000, 1), "p95": round(p[94] * 1000, 1), "p99": round(p[98] * 1000, 1)}
+
+
+def is_content(event: str, data: str) -> bool:
+    if not event.endswith("Content"):
+        return False
+    try:
+        return bool(json.loads(data).get("content"))
+    except ValueError:
+        return False
+
+
+async def run_request(client: httpx.AsyncClient, route: str, message: str, session_id: str, user_id: str) -> Any:
+    """Stream one run, returning (latency, time to first token) or None when the run fails."""
+    started = time.perf_counter()
+    ttft: Optional[float] = None
+    failed = False
+    data = {"message": message, "stream": "true", "session_id": session_id, "user_id": user_id}
+    async with client.stream("POST", f"/{route}/runs", data=data) as response:
+        if response.status_code != 200:
+            await response.aread()
+            return None
+        event = ""
+        async for line in response.aiter_lines():
+            if line.startswith("event:"):
+                event = line[6:].strip()
+                failed = failed or event.endswith("Error")
+            elif line.startswith("data:") and ttft is None and is_content(event, line[5:]):
+                ttft = time.perf_counter() - started
+    if failed:
+        return None
+    latency = time.perf_counter() - started
+    return latency, ttft if ttft is not None else latency
+
+
+async def replay(
+    base_url: str,
+    requests: List[Tuple[str, str]],
+    total: int,
+    concurrency: int,
+    timeout: float,
+    seed: int,
+) -> Tuple[Dict[str, RouteResults], float]:
+    """Send `total` requests drawn from the mix with `concurrency` workers, returning the results and wall time."""
+    rng = random.Random(seed)
+    schedule: Iterator[Tuple[str, str]] = iter([rng.choice(requests) for _ in range(total)])
+    results: Dict[str, RouteResults] = {}
+    run_id = uuid4().hex[:8]
+
+    async def worker(index: int, client: httpx.AsyncClient) -> None:
+        user_id = f"loadtest-{run_id}-{index}"
+        for route, message in schedule:
+            route_results = results.setdefault(route, RouteResults())
+            try:
+                result = await run_request(client, route, message, f"{user_id}-{route.replace('/', '-')}", user_id)
+            except httpx.HTTPError:
+                result = None
+            if result is None:
+                route_results.errors += 1
+            else:
+                route_results.latencies.append(result[0])
+                route_results.ttfts.append(result[1])
+
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=base_url, timeout=timeout, limits=limits) as client:
+        started = time.perf_counter()
+        await asyncio.gather(*[worker(i, client) for i in range(concurrency)])
+        return results, time.perf_counter() - started
+
+
+def build_report(
+    results: Dict[str, RouteResults], elapsed: float, queries: Dict[str, int], settings: Dict[str, Any]
+) -> Dict[str, Any]:
+    routes: Dict[str, Any] = {}
+    for route, r in sorted(results.items()):
+        routes[route] = {
+            "requests": r.requests,
+            "errors": r.errors,
+            "throughput": round(len(r.latencies) / elapsed, 3),
+            "latency_ms": percentiles(r.latencies),
+            "ttft_ms": percentiles(r.ttfts),
+            "db_queries_per_request": round(queries.get(route, 0) / r.requests, 1) if r.requests else 0.0,
+        }
+    latencies = [latency for r in results.values() for latency in r.latencies]
+    ttfts = [ttft for r in results.values() for ttft in r.ttfts]
+    requests = sum(r.requests for r in results.values())
+    return {
+        "settings": settings,
+        "elapsed_seconds": round(elapsed, 2),
+        "total": {
+            "requests": requests,
+            "errors": sum(r.errors for r in results.values()),
+            "throughput": round(len(latencies) / elapsed, 3),
+            "latency_ms": percentiles(latencies),
+            "ttft_ms": percentiles(ttfts),
+            "db_queries_per_request": round(sum(queries.get(route, 0) for route in results) / requests, 1)
+            if requests
+            else 0.0,
+            "background_db_queries": queries.get("background", 0),
+        },
+        "routes": routes,
+    }
+
+
+def print_report(report: Dict[str, Any]) -> None:
+    header = f"{'route':<32} {'reqs':>5} {'err':>4} {'req/s':>7} {'p50':>8} {'p95':>8} {'p99':>8} {'ttft50':>8} {'ttft95':>8} {'sql/req':>8}"
+    print(header)
+    print("-" * len(header))
+    for route, r in [*report["routes"].items(), ("total", report["total"])]:
+        latency, ttft = r["latency_ms"], r["ttft_ms"]
+        print(
+            f"{route:<32} {r['requests']:>5} {r['errors']:>4} {r['throughput']:>7.2f} {latency['p50']:>8.0f} "
+            f"{latency['p95']:>8.0f} {latency['p99']:>8.0f} {ttft['p50']:>8.0f} {ttft['p95']:>8.0f} "
+            f"{r['db_queries_per_request']:>8.1f}"
+        )
+    print(f"latencies in ms, {report['elapsed_seconds']}s, {report['total']['background_db_queries']} background SQL")
+
+
+def regressions(report: Dict[str, Any], baseline: Dict[str, Any], tolerance: float) -> List[str]:
+    """Describe the metrics of `report` that are worse than `baseline` by more than `tolerance`."""
+    found = []
+    current_routes = {**report["routes"], "total": report["total"]}
+    for route, before in {**baseline["routes"], "total": baseline["total"]}.items():
+        after = current_routes.get(route)
+        if after is None:
+            continue
+        checks = [
+            ("p95 latency", before["latency_ms"]["p95"], after["latency_ms"]["p95"]),
+            ("p95 ttft", before["ttft_ms"]["p95"], after["ttft_ms"]["p95"]),
+            ("sql/request", before["db_queries_per_request"], after["db_queries_per_request"]),
+        ]
+        for metric, old, new in checks:
+            if old and new > old * (1 + tolerance):
+                found.append(f"{route}: {metric} {old} -> {new}")
+        if before["throughput"] and after["throughput"] < before["throughput"] * (1 - tolerance):
+            found.append(f"{route}: throughput {before['throughput']} -> {after['throughput']}")
+        if after["errors"] > before["errors"]:
+            found.append(f"{route}: errors {before['errors']} -> {after['errors']}")
+    return found
+
+
+# ============================================================================
+# Processes
+# ============================================================================
+def start_process(args: List[str], env: Dict[str, str], health_url: str, timeout: float = 120) -> subprocess.Popen:
+    process = subprocess.Popen([sys.executable, "-m", *args], env=env)
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise SystemExit(f"{args[0]} exited with code {process.returncode}")
+        try:
+            if httpx.get(health_url, timeout=1).status_code == 200:
+                return process
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.25)
+    process.terminate()
+    raise SystemExit(f"{args[0]} did not start within {timeout}s")
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Load-test the AgentOS against a mock LLM provider")
+    parser.add_argument("--mix", help="JSONL request mix. Defaults to the quick prompts of app/config.yaml")
+    parser.add_argument("--export-mix", help="Write the quick prompts as a JSONL mix to this path and exit")
+    parser.add_argument("--requests", type=int, default=100, help="Requests to send, after the warmup")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--warmup", type=int, default=10, help="Requests sent before measuring")
+    parser.add_argument("--timeout", type=float, default=300, help="Seconds allowed per request")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--app-url", help="Test an app that is already running instead of starting one")
+    parser.add_argument("--port", type=int, default=7777, help="Port of the app started by the harness")
+    parser.add_argument("--mock-port", type=int, default=8100, help="Port of the mock provider")
+    parser.add_argument("--profile", choices=["production", "dev"], default="production", help="Serving profile")
+    parser.add_argument("--workers", type=int, default=1, help="Workers of the production profile")
+    parser.add_argument("--ttft", type=float, default=0.3, help="Mock seconds before the first token")
+    parser.add_argument("--tokens", type=int, default=200, help="Mock tokens per answer")
+    parser.add_argument("--token-interval", type=float, default=0.01, help="Mock seconds between tokens")
+    parser.add_argument("--tool-call-rate", type=float, default=0.5, help="Mock probability of calling a tool")
+    parser.add_argument("--tool-latency", type=float, default=0.2, help="Seconds taken by the stubbed tools")
+    parser.add_argument(
+        "--rate-limit-rpm",
+        type=float,
+        default=0.0,
+        help="Mock requests per minute per provider, with the app held to it",
+    )
+    parser.add_argument("--output", help="Write the report as JSON to this path")
+    parser.add_argument("--baseline", help="Report of an earlier run to compare with")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Allowed relative regression")
+    args = parser.parse_args()
+
+    if args.export_mix:
+        with open(args.export_mix, "w") as f:
+            f.writelines(json.dumps(item) + "\n" for item in quick_prompt_mix())
+        raise SystemExit(0)
+
+    processes: List[subprocess.Popen] = []
+    base_url = args.app_url
+    try:
+        if base_url is None:
+            mock_url = f"http://127.0.0.1:{args.mock_port}"
+            env = {
+                **os.environ,
+                "OPENAI_BASE_URL": f"{mock_url}/v1",
+                "ANTHROPIC_BASE_URL": mock_url,
+                "AGNO_MCP_URL": f"http://127.0.0.1:{args.mock_port + 1}/mcp",
+                "OPENAI_API_KEY": "mock",
+                "ANTHROPIC_API_KEY": "mock",
+                "PARALLEL_API_KEY": "mock",
+                "LOADTEST_TOOL_LATENCY": str(args.tool_latency),
+                # Admission control (agents/admission.py) holds the calls to the mock provider's limit, if any
+                "ADMISSION_LIMITS": f"openai:rpm={args.rate_limit_rpm};anthropic:rpm={args.rate_limit_rpm}"
+                if args.rate_limit_rpm
+                else os.environ.get("ADMISSION_LIMITS", ""),
+            }
+            mock_args = [
+                "loadtest.mock_provider",
+                f"--port={args.mock_port}",
+                f"--mcp-port={args.mock_port + 1}",
+                f"--ttft={args.ttft}",
+                f"--tokens={args.tokens}",
+                f"--token-interval={args.token_interval}",
+                f"--tool-call-rate={args.tool_call_rate}",
+                f"--rate-limit-rpm={args.rate_limit_rpm}",
+                f"--seed={args.seed}",
+            ]
+            processes.append(start_process(mock_args, env, f"{mock_url}/health"))
+            base_url = f"http://127.0.0.1:{args.port}"
+            serve_args = [
+                "loadtest.serve",
+                f"--port={args.port}",
+                f"--profile={args.profile}",
+                f"--workers={args.workers}",
+            ]
+            processes.append(start_process(serve_args, env, f"{base_url}/health"))
+
+        with httpx.Client(base_url=base_url, timeout=30) as client:
+            mix = load_mix(args.mix) if args.mix else quick_prompt_mix()
+            requests = resolve_routes(client, mix)
+
+            def query_counts() -> Dict[str, int]:
+                # Workers count their own queries: ask on new connections until every worker answered
+                workers = args.workers if args.profile == "production" and args.app_url is None else 1
+                counts: Dict[int, Dict[str, int]] = {}
+                for _ in range(workers * 20):
+                    response = httpx.get(f"{base_url}/loadtest/db-queries", timeout=30)
+                    if response.status_code != 200:
+                        return {}
+                    body = response.json()
+                    counts[body.get("pid", 0)] = body["queries"]
+                    if len(counts) == workers:
+                        break
+                else:
+                    print(f"SQL counts from {len(counts)} of {workers} workers only")
+                total: Dict[str, int] = {}
+                for worker_counts in counts.values():
+                    for route, count in worker_counts.items():
+                        total[route] = total.get(route, 0) + count
+                return total
+
+            if args.warmup:
+                asyncio.run(replay(base_url, requests, args.warmup, args.concurrency, args.timeout, args.seed + 1))
+            before = query_counts()
+            results, elapsed = asyncio.run(
+                replay(base_url, requests, args.requests, args.concurrency, args.timeout, args.seed)
+            )
+            after = query_counts()
+
+        queries = {route: count - before.get(route, 0) for route, count in after.items()}
+        settings = {k: v for k, v in vars(args).items() if k not in ("output", "baseline", "export_mix")}
+        report = build_report(results, elapsed, queries, settings)
+        print_report(report)
+        if args.output:
+            with open(args.output, "w") as f:
+                json.dump(report, f, indent=2)
+        if args.baseline:
+            with open(args.baseline) as f:
+                found = regressions(report, json.load(f), args.tolerance)
+            for regression in found:
+                print(f"REGRESSION {regression}")
+            if found:
+                raise SystemExit(1)
+    finally:
+        for process in processes[::-1]:
+            process.terminate()
+            process.wait(timeout=30)
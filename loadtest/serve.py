@@ -0,0 +1,183 @@
+"""
+Serve `app.main` for load tests: provider calls go to the mock provider and network tools are stubbed.
+
+Set `OPENAI_BASE_URL`, `ANTHROPIC_BASE_URL` and `AGNO_MCP_URL` to the mock provider before starting it (the harness
+in `loadtest/run.py` does). On top of that:
+- Web search, Hacker News and Parallel tools answer a canned result after `LOADTEST_TOOL_LATENCY` seconds.
+- Finance tools read from `FakeSource`, through the real cache.
+- YouTube tools load captions from `tools/fixtures/youtube_transcript.json` into the real transcript store.
+- SQL statements are counted per agent, team and workflow run route and exposed at `GET /loadtest/db-queries`.
+
+The app is served with the production profile of `app/serve.py`, or with `--profile dev` like `compose.yaml` serves
+it: one worker with reload and `AGNO_DEBUG`.
+
+Usage:
+    python -m loadtest.serve --port 7777
+    python -m loadtest.serve --port 7777 --profile dev
+"""
+
+import asyncio
+import functools
+import gc
+import inspect
+import json
+import os
+import time
+from collections import Counter
+from contextvars import ContextVar
+from os import getenv
+from pathlib import Path
+from typing import Any, Callable, Dict, Optional
+
+from agno.tools import Toolkit
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from app.telemetry import run_route
+
+LOADTEST_TOOL_LATENCY = float(getenv("LOADTEST_TOOL_LATENCY", "0.2"))
+
+# Tool functions answered by `stub_function`, by toolkit class. None stubs every function of the toolkit
+STUBBED_TOOLS: Dict[str, Optional[set]] = {
+    "ParallelTools": None,
+    "DuckDuckGoTools": None,
+    "HackerNewsTools": None,
+    "YouTubeTranscriptTools": {"get_youtube_video_data"},
+}
+STUB_RESULT = json.dumps(
+    [
+        {
+            "title": f"Result {i}",
+            "url": f"https://example.com/result-{i}",
+            "content": "Analysts expect demand to hold through next quarter as new products ship.",
+        }
+        for i in range(1, 4)
+    ]
+)
+YOUTUBE_FIXTURE = Path(__file__).parent.parent.joinpath("tools", "fixtures", "youtube_transcript.json")
+
+# ============================================================================
+# DB query counts
+# ============================================================================
+# Route of the run being served, e.g. "agents/finance-agent". Queries made outside a run count as "background"
+current_route: ContextVar[str] = ContextVar("current_route", default="background")
+query_counts: Counter = Counter()
+
+
+def count_query(*_: Any) -> None:
+    query_counts[current_route.get()] += 1
+
+
+class RouteContextMiddleware:
+    """Sets `current_route` for the whole request, including the streamed response and the threads it starts."""
+
+    def __init__(self, app: Any):
+        self.app = app
+
+    async def __call__(self, scope: Dict[str, Any], receive: Any, send: Any) -> None:
+        route = run_route(scope.get("path", "")) if scope["type"] == "http" else None
+        if route is None:
+            await self.app(scope, receive, send)
+            return
+        token = current_route.set(route)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            current_route.reset(token)
+
+
+# ============================================================================
+# Stub tools
+# ============================================================================
+def stub_function(entrypoint: Callable) -> Callable:
+    """Stand-in with the signature of `entrypoint`, so that the model sees the same tool."""
+    if inspect.iscoroutinefunction(entrypoint):
+
+        @functools.wraps(entrypoint)
+        async def async_stub(*args: Any, **kwargs: Any) -> str:
+            await asyncio.sleep(LOADTEST_TOOL_LATENCY)
+            return STUB_RESULT
+
+        return async_stub
+
+    @functools.wraps(entrypoint)
+    def stub(*args: Any, **kwargs: Any) -> str:
+        time.sleep(LOADTEST_TOOL_LATENCY)
+        return STUB_RESULT
+
+    return stub
+
+
+def stub_tools() -> Dict[str, int]:
+    """Stub the network tools of every toolkit in the process, returning the stubbed functions per toolkit."""
+    from tools.finance import CachedYFinanceTools, FakeSource
+    from tools.youtube import YouTubeTranscriptTools
+
+    with open(YOUTUBE_FIXTURE) as f:
+        fixture = json.load(f)
+    snippets, title = fixture["snippets"], fixture.get("title")
+
+    stubbed: Counter = Counter()
+    # Workflows build agents inside their steps, out of reach of the AgentOS, so look at every toolkit
+    for toolkit in [obj for obj in gc.get_objects() if isinstance(obj, Toolkit)]:
+        name = type(toolkit).__name__
+        if isinstance(toolkit, CachedYFinanceTools):
+            toolkit.source = FakeSource(latency=LOADTEST_TOOL_LATENCY, jitter=LOADTEST_TOOL_LATENCY / 3)
+            stubbed[name] += 1
+        if isinstance(toolkit, YouTubeTranscriptTools):
+            toolkit.fetch_snippets = lambda video_id: snippets  # type: ignore[method-assign]
+            toolkit.fetch_title = lambda video_id: title  # type: ignore[method-assign]
+        if name not in STUBBED_TOOLS:
+            continue
+        names = STUBBED_TOOLS[name]
+        for function_name, function in toolkit.functions.items():
+            if function.entrypoint is not None and (names is None or function_name in names):
+                function.entrypoint = stub_function(function.entrypoint)
+                stubbed[name] += 1
+    return dict(stubbed)
+
+
+def create_loadtest_app() -> Any:
+    """Import the AgentOS app, build its components, stub their tools and add the DB query counter."""
+    from app.main import app, registry
+
+    # Components are imported lazily, their toolkits only exist once built
+    registry.build_all()
+    stubbed = stub_tools()
+    event.listen(Engine, "before_cursor_execute", count_query)
+    app.add_middleware(RouteContextMiddleware)
+
+    @app.get("/loadtest/db-queries")
+    async def db_queries() -> Dict[str, Any]:
+        # Each worker counts its own queries, see `--workers`
+        return {"queries": dict(query_counts), "stubbed_tools": stubbed, "pid": os.getpid()}
+
+    return app
+
+
+if __name__ == "__main__":
+    import argparse
+
+    import uvicorn
+
+    from app.serve import ServeSettings, serve
+
+    parser = argparse.ArgumentParser(description="Serve the AgentOS with stubbed tools for load tests")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=7777)
+    parser.add_argument(
+        "--profile",
+        choices=["production", "dev"],
+        default="production",
+        help="production: app/serve.py workers. dev: a single worker with reload and AGNO_DEBUG, like compose.yaml",
+    )
+    parser.add_argument("--workers", type=int, help="Workers of the production profile, defaults to SERVE_WORKERS")
+    args = parser.parse_args()
+
+    if args.profile == "dev":
+        os.environ["AGNO_DEBUG"] = "true"
+        uvicorn.run("loadtest.serve:create_loadtest_app", factory=True, host=args.host, port=args.port, reload=True)
+    else:
+        settings = ServeSettings.from_env()
+        settings.host, settings.port, settings.workers = args.host, args.port, args.workers or settings.workers
+        serve("loadtest.serve:create_loadtest_app", settings, factory=True)
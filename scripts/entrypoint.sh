@@ -23,6 +23,14 @@ fi
 case "$1" in
   chill)
     ;;
+  dev)
+    # Single worker with file watching, for local development
+    exec uvicorn app.main:app --host 0.0.0.0 --port "${PORT:-8000}" --reload
+    ;;
+  serve)
+    # Production profile: one worker per core, see app/serve.py
+    exec python -m app.serve --host 0.0.0.0 --port "${PORT:-8000}"
+    ;;
   *)
     echo "Running: $@"
     exec "$@"
@@ -0,0 +1,381 @@
+"""
+Fan-out execution for teams: the members work on their tasks concurrently, then the leader merges their answers.
+
+In agno's default mode the leader delegates through tool calls, one model turn per decision. It thinks, delegates to
+one member, reads the answer, delegates to the next one, and so on. A team run costs the sum of its members and of
+the leader turns between them. `FanOutTeam` instead:
+- Plans the task of every member up front from `member_tasks`, without a model call.
+- Runs the members concurrently with a deadline each (see workflows/quorum.py). A member that fails or misses its
+  deadline is cancelled and reported to the leader as missing.
+- Makes a single leader call that merges the answers. The leader has no delegation or think tools, its other tools
+  (e.g. `update_user_memory`) are kept.
+
+A run then takes about as long as its slowest member plus that one call. `run` and `arun` (and so `print_response`)
+both fan out. Streamed runs with `stream_events` report each member as a `delegate_task_to_member` tool call, started
+when the members start and completed as each of them finishes, ahead of the leader's events.
+
+Usage:
+    python -m teams.fanout --benchmark
+"""
+
+import asyncio
+import queue
+import re
+import threading
+from dataclasses import dataclass
+from textwrap import dedent
+from typing import Any, AsyncIterator, Dict, Iterator, List, Optional, Tuple, Union
+from uuid import uuid4
+
+from agno.agent import Agent
+from agno.models.message import Message
+from agno.models.response import ToolExecution
+from agno.run.team import ToolCallCompletedEvent, ToolCallStartedEvent
+from agno.team.team import Team
+from agno.utils.log import log_debug
+
+from workflows.quorum import BranchResult, QuorumPolicy, gather_quorum
+
+HOW_TO_RESPOND = re.compile(r"<how_to_respond>\n.*?</how_to_respond>\n", re.DOTALL)
+FAN_OUT_HOW_TO_RESPOND = dedent("""\
+    <how_to_respond>
+    - Your team members have already worked on the request. Their answers are in `member_responses` of the additional context, by member name.
+    - Merge their answers into your response. You cannot delegate tasks.
+    - Members listed in `missing_members` failed or ran out of time: mark the data they were asked for as "N/A".
+    </how_to_respond>
+    """)
+# Tools of the leader that fan-out replaces: delegation and the think steps between delegations
+FAN_OUT_REMOVED_TOOLS = {
+    "delegate_task_to_member",
+    "delegate_task_to_members",
+    "get_member_information",
+    "think",
+    "analyze",
+}
+
+
+@dataclass(init=False)
+class FanOutTeam(Team):
+    """
+    Team that runs all of its members concurrently and merges their answers in one leader call.
+
+    Args:
+        member_tasks (Optional[Dict[str, str]]): Task of each member by name, formatted with the `{input}` of the run.
+            Members without a task are given the input as is.
+        fan_out (bool): Run the members concurrently. False keeps agno's delegation through tool calls.
+        member_timeout (Optional[float]): Seconds after which a member is cancelled. None waits for every member.
+    """
+
+    member_tasks: Optional[Dict[str, str]] = None
+    fan_out: bool = True
+    member_timeout: Optional[float] = 90.0
+
+    def __init__(
+        self,
+        member_tasks: Optional[Dict[str, str]] = None,
+        fan_out: bool = True,
+        member_timeout: Optional[float] = 90.0,
+        **kwargs: Any,
+    ):
+        super().__init__(**kwargs)
+        self.member_tasks = member_tasks
+        self.fan_out = fan_out
+        self.member_timeout = member_timeout
+
+    def plan(self, input: str) -> Dict[str, Tuple[Union[Agent, Team], str]]:
+        """Member and task of every branch for `input`, by member name."""
+        tasks = self.member_tasks or {}
+        return {
+            str(member.name or member.id): (member, tasks.get(str(member.name), "{input}").format(input=input))
+            for member in self.members
+        }
+
+    async def astream_members(
+        self, input: str, user_id: Optional[str] = None, session_id: Optional[str] = None
+    ) -> AsyncIterator[Union[ToolCallStartedEvent, ToolCallCompletedEvent, BranchResult]]:
+        """
+        Run every member on its task concurrently, cancelling the members that exceed `member_timeout`.
+
+        Yields a started event per member, then a completed event and the `BranchResult` of each member as it finishes.
+        """
+
+        def member_branch(member: Union[Agent, Team], task: str) -> Any:
+            async def branch() -> Optional[str]:
+                response = await member.arun(input=task, user_id=user_id, session_id=session_id, stream=False)  # type: ignore
+                return response.content if isinstance(response.content, str) else None
+
+            return branch
+
+        branches = {}
+        tools: Dict[str, ToolExecution] = {}
+        for name, (member, task) in self.plan(input).items():
+            # As in agno's delegation: members of a team do not store sessions of their own
+            self._initialize_member(member)
+            branches[name] = member_branch(member, task)
+            tools[name] = ToolExecution(
+                tool_call_id=str(uuid4()),
+                tool_name="delegate_task_to_member",
+                tool_args={"member_id": name, "task": task},
+            )
+            yield ToolCallStartedEvent(
+                session_id=session_id, team_id=self.id or "", team_name=self.name or "", tool=tools[name]
+            )
+        async for result in gather_quorum(branches, QuorumPolicy(None, self.member_timeout)):
+            log_debug(f"Member {result.name}: {'done' if result.success else result.error} in {result.elapsed:.2f}s")
+            tool = tools[result.name]
+            tool.result = result.content if result.success else result.error or "no content"
+            tool.tool_call_error = not result.success
+            yield ToolCallCompletedEvent(
+                session_id=session_id, team_id=self.id or "", team_name=self.name or "", tool=tool, content=tool.result
+            )
+            yield result
+
+    async def arun_members(
+        self, input: str, user_id: Optional[str] = None, session_id: Optional[str] = None
+    ) -> List[BranchResult]:
+        """The results of `astream_members`."""
+        return [
+            item
+            async for item in self.astream_members(input, user_id=user_id, session_id=session_id)
+            if isinstance(item, BranchResult)
+        ]
+
+    def stream_members(
+        self, input: str, user_id: Optional[str] = None, session_id: Optional[str] = None
+    ) -> Iterator[Union[ToolCallStartedEvent, ToolCallCompletedEvent, BranchResult]]:
+        """`astream_members` for the sync `run`, on an event loop of its own in a thread."""
+        items: "queue.Queue[Any]" = queue.Queue()
+        done = object()
+
+        async def produce() -> None:
+            try:
+                async for item in self.astream_members(input, user_id=user_id, session_id=session_id):
+                    items.put(item)
+            finally:
+                items.put(done)
+
+        thread = threading.Thread(target=asyncio.run, args=(produce(),), daemon=True)
+        thread.start()
+        while (item := items.get()) is not done:
+            yield item
+        thread.join()
+
+    @staticmethod
+    def merge_dependencies(results: List[BranchResult], dependencies: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+        """Dependencies of the leader call: the caller's, with the answers of the members."""
+        return {
+            **(dependencies or {}),
+            "member_responses": {result.name: result.content for result in results if result.success},
+            "missing_members": {result.name: result.error or "no content" for result in results if not result.success},
+        }
+
+    def _stream_events(self, kwargs: Dict[str, Any]) -> bool:
+        return bool(kwargs.get("stream_events") or kwargs.get("stream_intermediate_steps") or self.stream_events)
+
+    # ============================================================================
+    # Team overrides
+    # ============================================================================
+    def run(  # type: ignore[override]
+        self,
+        input: Any,
+        *,
+        stream: Optional[bool] = None,
+        session_id: Optional[str] = None,
+        user_id: Optional[str] = None,
+        dependencies: Optional[Dict[str, Any]] = None,
+        **kwargs: Any,
+    ) -> Any:
+        if not self.fan_out or not self.members:
+            return super().run(  # type: ignore[call-overload]
+                input, stream=stream, session_id=session_id, user_id=user_id, dependencies=dependencies, **kwargs
+            )
+        session_id = session_id or str(uuid4())
+        # The answers of the members are passed to the leader as dependencies
+        kwargs.pop("add_dependencies_to_context", None)
+        if stream if stream is not None else self.stream:
+            return self._fan_out_stream(input, session_id, user_id, dependencies, kwargs)
+        results = [
+            item
+            for item in self.stream_members(str(input), user_id=user_id, session_id=session_id)
+            if isinstance(item, BranchResult)
+        ]
+        return super().run(
+            input,
+            stream=False,
+            session_id=session_id,
+            user_id=user_id,
+            dependencies=self.merge_dependencies(results, dependencies),
+            add_dependencies_to_context=True,
+            **kwargs,
+        )
+
+    def _fan_out_stream(
+        self, input: Any, session_id: str, user_id: Optional[str], dependencies: Any, kwargs: Dict[str, Any]
+    ) -> Iterator[Any]:
+        results: List[BranchResult] = []
+        for item in self.stream_members(str(input), user_id=user_id, session_id=session_id):
+            if isinstance(item, BranchResult):
+                results.append(item)
+            elif self._stream_events(kwargs):
+                yield item
+        yield from super().run(
+            input,
+            stream=True,
+            session_id=session_id,
+            user_id=user_id,
+            dependencies=self.merge_dependencies(results, dependencies),
+            add_dependencies_to_context=True,
+            **kwargs,
+        )
+
+    def arun(  # type: ignore[override]
+        self,
+        input: Any,
+        *,
+        stream: Optional[bool] = None,
+        session_id: Optional[str] = None,
+        user_id: Optional[str] = None,
+        dependencies: Optional[Dict[str, Any]] = None,
+        **kwargs: Any,
+    ) -> Any:
+        if not self.fan_out or not self.members:
+            return super().arun(  # type: ignore[call-overload]
+                input, stream=stream, session_id=session_id, user_id=user_id, dependencies=dependencies, **kwargs
+            )
+        # The members and the leader share the session, as with agno's delegation
+        session_id = session_id or str(uuid4())
+        kwargs.pop("add_dependencies_to_context", None)
+        if stream if stream is not None else self.stream:
+            return self._afan_out_stream(input, session_id, user_id, dependencies, kwargs)
+        return self._afan_out(input, session_id, user_id, dependencies, kwargs)
+
+    async def _afan_out(
+        self, input: Any, session_id: str, user_id: Optional[str], dependencies: Any, kwargs: Dict[str, Any]
+    ) -> Any:
+        results = await self.arun_members(str(input), user_id=user_id, session_id=session_id)
+        return await super().arun(
+            input,
+            stream=False,
+            session_id=session_id,
+            user_id=user_id,
+            dependencies=self.merge_dependencies(results, dependencies),
+            add_dependencies_to_context=True,
+            **kwargs,
+        )
+
+    async def _afan_out_stream(
+        self, input: Any, session_id: str, user_id: Optional[str], dependencies: Any, kwargs: Dict[str, Any]
+    ) -> AsyncIterator[Any]:
+        results: List[BranchResult] = []
+        async for item in self.astream_members(str(input), user_id=user_id, session_id=session_id):
+            if isinstance(item, BranchResult):
+                results.append(item)
+            elif self._stream_events(kwargs):
+                yield item
+        async for event in super().arun(
+            input,
+            stream=True,
+            session_id=session_id,
+            user_id=user_id,
+            dependencies=self.merge_dependencies(results, dependencies),
+            add_dependencies_to_context=True,
+            **kwargs,
+        ):
+            yield event
+
+    def _determine_tools_for_model(self, *args: Any, **kwargs: Any) -> Any:
+        tools = super()._determine_tools_for_model(*args, **kwargs)
+        # The leader only merges the answers: no delegation and no think steps in between
+        if self.fan_out:
+            tools = [tool for tool in tools if getattr(tool, "name", None) not in FAN_OUT_REMOVED_TOOLS]
+        return tools
+
+    def _fan_out_system_message(self, message: Optional[Message]) -> Optional[Message]:
+        if self.fan_out and message is not None and isinstance(message.content, str):
+            message.content = HOW_TO_RESPOND.sub(FAN_OUT_HOW_TO_RESPOND, message.content, count=1)
+        return message
+
+    def get_system_message(self, *args: Any, **kwargs: Any) -> Optional[Message]:
+        return self._fan_out_system_message(super().get_system_message(*args, **kwargs))
+
+    async def aget_system_message(self, *args: Any, **kwargs: Any) -> Optional[Message]:
+        return self._fan_out_system_message(await super().aget_system_message(*args, **kwargs))
+
+
+if __name__ == "__main__":
+    import argparse
+    import asyncio
+    import time
+    from statistics import mean
+
+    parser = argparse.ArgumentParser(description="Compare fan-out team runs with the same member runs in sequence")
+    parser.add_argument("--benchmark", action="store_true")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--ttft", type=float, default=0.5, help="Seconds before the first token of the mock provider")
+    parser.add_argument("--tokens", type=int, default=100, help="Tokens per answer of the mock provider")
+    parser.add_argument("--tool-call-rate", type=float, default=0.5)
+    args = parser.parse_args()
+    if not args.benchmark:
+        parser.print_help()
+        raise SystemExit(0)
+
+    from loadtest.mock_provider import MockSettings, serve_mock_provider
+
+    serve_mock_provider(
+        MockSettings(
+            ttft=args.ttft, tokens=args.tokens, token_interval=0.01, tool_call_rate=args.tool_call_rate, seed=0
+        )
+    )
+
+    from loadtest.serve import stub_tools
+    from teams.finance_team import finance_team
+
+    stub_tools()
+    request = "Compare NVDA and AMD: fundamentals, recent news and outlook"
+
+    async def sequential() -> Dict[str, float]:
+        """The work of a fan-out run done one call after another, a lower bound for agno's delegation."""
+        session_id, started = str(uuid4()), time.perf_counter()
+        results = []
+        for name, (member, task) in finance_team.plan(request).items():
+            member_started = time.perf_counter()
+            response = await member.arun(input=task, session_id=session_id, stream=False)  # type: ignore
+            results.append(BranchResult(name, str(response.content), True, time.perf_counter() - member_started))
+        members = time.perf_counter() - started
+        await Team.arun(
+            finance_team,
+            request,
+            stream=False,
+            session_id=session_id,
+            dependencies=finance_team.merge_dependencies(results, None),
+            add_dependencies_to_context=True,
+        )
+        return {
+            "total": time.perf_counter() - started,
+            "members": members,
+            "merge": time.perf_counter() - started - members,
+        }
+
+    async def fan_out() -> Dict[str, float]:
+        session_id, started = str(uuid4()), time.perf_counter()
+        results = await finance_team.arun_members(request, session_id=session_id)
+        members = time.perf_counter() - started
+        await Team.arun(
+            finance_team,
+            request,
+            stream=False,
+            session_id=session_id,
+            dependencies=finance_team.merge_dependencies(results, None),
+            add_dependencies_to_context=True,
+        )
+        total = time.perf_counter() - started
+        slowest = max(result.elapsed for result in results)
+        return {"total": total, "members": members, "merge": total - members, "slowest member": slowest}
+
+    async def main() -> None:
+        for label, run in (("sequential", sequential), ("fan-out", fan_out)):
+            timings = [await run() for _ in range(args.runs)]
+            summary = ", ".join(f"{key} {mean(t[key] for t in timings):.2f}s" for key in timings[0])
+            print(f"{label:<11} {summary}")
+
+    asyncio.run(main())
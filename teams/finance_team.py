@@ -1,12 +1,20 @@
+from os import getenv
 from textwrap import dedent
 
-from agno.models.anthropic import Claude
-from agno.team.team import Team
 from agno.tools.reasoning import ReasoningTools
 
 from agents.finance_agent import finance_agent
+from agents.history import history_settings
+from agents.memory_queue import memory_settings
+from agents.prompt_cache import CachedClaude
 from agents.research_agent import research_agent
 from db.demo_db import demo_db
+from teams.fanout import FanOutTeam
+
+# "fanout" runs both members concurrently and merges their answers in one leader call (see teams/fanout.py),
+# "delegate" lets the leader delegate through tool calls
+FINANCE_TEAM_MODE = getenv("FINANCE_TEAM_MODE", "fanout")
+FINANCE_TEAM_MEMBER_TIMEOUT = float(getenv("FINANCE_TEAM_MEMBER_TIMEOUT", "90"))
 
 # ============================================================================
 # Description & Instructions
@@ -15,12 +23,29 @@ description = dedent("""\
     You are the Finance Team — a coordinated unit that combines fundamentals (Finance Agent)
     with up-to-date context and sources (Research Agent) to deliver a single, decision-ready brief.
     """)
-instructions = dedent("""\
-    1) Planning & Routing
-       - Decompose the request into data needs (tickers, timeframe, metrics, comparisons).
-       - Route fundamentals/ratios/tables to Finance Agent.
-       - Route news/context/sentiment/source gathering to Research Agent.
-       - Run tool calls in parallel when possible; then merge results.
+if FINANCE_TEAM_MODE == "fanout":
+    # The members have already answered when the leader runs, see member_tasks below
+    routing = dedent("""\
+        1) Merging
+           - The Finance Agent has provided the fundamentals, ratios and its comparison table (get_comparison_table).
+           - The Research Agent has provided the news, context, sentiment and sources.
+           - Merge both answers into one brief; do not ask for more data.
+        """)
+    comparison_table = "Reuse the Finance Agent's comparison table as-is; do not recompute ratios."
+else:
+    routing = dedent("""\
+        1) Planning & Routing
+           - Decompose the request into data needs (tickers, timeframe, metrics, comparisons).
+           - Route fundamentals/ratios/tables to Finance Agent.
+           - Route news/context/sentiment/source gathering to Research Agent.
+           - Run tool calls in parallel when possible; then merge results.
+        """)
+    comparison_table = (
+        "Ask the Finance Agent for its comparison table (get_comparison_table) and reuse it as-is; "
+        "do not recompute ratios."
+    )
+
+instructions = routing + dedent(f"""\
 
     2) Evidence & Integrity
        - Label data with timestamp and source (publication)
@@ -30,7 +55,8 @@ instructions = dedent("""\
     3) Output Structure (concise)
        - Title: tickers + scope.
        - Market Snapshot: 1 short paragraph (company, ticker, timestamp).
-       - Key Metrics Table(s): price, % change, market cap, P/E, EPS, revenue, EBITDA, dividend, 52w range; add P/S, EV/EBITDA, YoY growth if derivable.
+       - Key Metrics Table(s): price, % change, market cap, P/E, EPS, revenue, EBITDA, dividend, 52w range, P/S, EV/EBITDA, YoY growth.
+         {comparison_table}
        - News & Sentiment: 3–6 bullets with sources (publisher/date).
        - Insights: 3–6 bullets (drivers, risks, valuation/context).
        - Optional Outlook: horizon, thesis, risks, confidence (low/med/high).
@@ -44,19 +70,39 @@ instructions = dedent("""\
        - Return only the final consolidated analysis (no internal member responses).
     """)
 
+# Tasks of the members in fan-out mode, planned from the request without a model call
+member_tasks = {
+    str(finance_agent.name): dedent("""\
+        Provide the fundamentals for this request: prices, key metrics and ratios, and the comparison table
+        (get_comparison_table) of the tickers involved. Label every figure with its timestamp and source.
+
+        Request: {input}
+        """),
+    str(research_agent.name): dedent("""\
+        Gather the recent news, context and sentiment for this request, with 3-6 sourced findings
+        (title, publisher, date, link if available).
+
+        Request: {input}
+        """),
+}
+
 # ============================================================================
 # Create the Team
 # ============================================================================
-finance_team = Team(
+finance_team = FanOutTeam(
     name="Finance Team",
-    model=Claude(id="claude-sonnet-4-5"),
+    model=CachedClaude(id="claude-sonnet-4-5"),
     members=[finance_agent, research_agent],
-    tools=[ReasoningTools(add_instructions=True)],
+    member_tasks=member_tasks,
+    fan_out=FINANCE_TEAM_MODE == "fanout",
+    member_timeout=FINANCE_TEAM_MEMBER_TIMEOUT,
+    # The fan-out leader only merges the answers, it thinks between delegations in delegate mode
+    tools=[] if FINANCE_TEAM_MODE == "fanout" else [ReasoningTools(add_instructions=True)],
     description=description,
     instructions=instructions,
     db=demo_db,
-    add_history_to_context=True,
+    **history_settings(),
     add_datetime_to_context=True,
-    enable_agentic_memory=True,
+    **memory_settings(),
     markdown=True,
 )
@@ -0,0 +1,119 @@
+"""
+Thread-safe TTL cache with single-flight loading, shared by the cached toolkits.
+"""
+
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+from dataclasses import dataclass, field
+from threading import Lock
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+
+
+@dataclass
+class CacheStats:
+    hits: int = 0
+    misses: int = 0
+    # Requests that waited on an identical in-flight load instead of starting their own
+    coalesced: int = 0
+    errors: int = 0
+    load_time: float = 0.0
+    by_field: Dict[str, Dict[str, int]] = field(default_factory=dict)
+
+    def count(self, field_name: str, outcome: str) -> None:
+        setattr(self, outcome, getattr(self, outcome) + 1)
+        counts = self.by_field.setdefault(field_name, {"hits": 0, "misses": 0, "coalesced": 0, "errors": 0})
+        counts[outcome] += 1
+
+    @property
+    def hit_ratio(self) -> float:
+        total = self.hits + self.misses + self.coalesced
+        return (self.hits + self.coalesced) / total if total else 0.0
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "errors": self.errors,
+            "hit_ratio": round(self.hit_ratio, 4),
+            "avg_load_ms": round(self.load_time / self.misses * 1000, 3) if self.misses else 0.0,
+            "by_field": self.by_field,
+        }
+
+
+class TTLCache:
+    """
+    Bounded LRU cache where every entry has its own time-to-live.
+
+    `get_or_load()` runs the loader once per key at a time: concurrent callers asking for a key that is being loaded
+    wait for that load and share its result. Failed loads are not cached.
+    """
+
+    def __init__(self, max_size: int = 1024):
+        self.max_size = max_size
+        self.stats = CacheStats()
+        self._entries: "OrderedDict[Hashable, Tuple[Any, float]]" = OrderedDict()
+        self._inflight: Dict[Hashable, Future] = {}
+        self._lock = Lock()
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        with self._lock:
+            return self._get(key)
+
+    def _get(self, key: Hashable) -> Optional[Any]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        value, expires_at = entry
+        if time.monotonic() >= expires_at:
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return value
+
+    def set(self, key: Hashable, value: Any, ttl: float) -> None:
+        with self._lock:
+            self._entries[key] = (value, time.monotonic() + ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def get_or_load(self, key: Hashable, loader: Callable[[], Any], ttl: float, field_name: str = "default") -> Any:
+        with self._lock:
+            value = self._get(key)
+            if value is not None:
+                self.stats.count(field_name, "hits")
+                return value
+            future = self._inflight.get(key)
+            leader = future is None
+            if future is None:
+                future = Future()
+                self._inflight[key] = future
+                self.stats.count(field_name, "misses")
+            else:
+                self.stats.count(field_name, "coalesced")
+
+        if not leader:
+            return future.result()
+
+        started = time.perf_counter()
+        try:
+            value = loader()
+        except Exception as e:
+            with self._lock:
+                self.stats.count(field_name, "errors")
+                del self._inflight[key]
+            future.set_exception(e)
+            raise
+        self.stats.load_time += time.perf_counter() - started
+        if value is not None:
+            self.set(key, value, ttl)
+        with self._lock:
+            del self._inflight[key]
+        future.set_result(value)
+        return value
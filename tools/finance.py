@@ -0,0 +1,708 @@
+"""
+Cached Yahoo Finance toolkit for the finance agents.
+
+Every Yahoo Finance call goes through a shared TTL cache with per-field lifetimes (quotes expire in seconds,
+fundamentals and statements in hours), and identical calls in flight at the same time are made only once. The
+`get_stock_snapshots` tool fetches the key metrics of several tickers concurrently in a single tool call.
+
+Usage:
+    python -m tools.finance --latency 0.3 --users 8
+"""
+
+import hashlib
+import json
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from threading import Lock
+from typing import Any, Dict, List, Optional, Protocol, Tuple
+
+import pandas as pd
+from agno.tools import Toolkit
+from agno.utils.log import log_debug
+
+from tools.cache import TTLCache
+
+try:
+    import yfinance as yf
+    from yfinance.exceptions import YFException
+except ImportError:
+    raise ImportError("`yfinance` not installed. Please install using `pip install yfinance`.")
+
+# Errors raised by a data source that are reported to the model instead of failing the run
+SOURCE_ERRORS = (YFException, OSError, KeyError, ValueError, TypeError, AttributeError, IndexError)
+
+# Seconds each kind of data stays cached
+DEFAULT_TTLS: Dict[str, float] = {
+    "quote": 30,
+    "info": 15 * 60,
+    "history": 5 * 60,
+    "financials": 24 * 60 * 60,
+    "recommendations": 6 * 60 * 60,
+    "news": 10 * 60,
+}
+
+
+# ============================================================================
+# Data sources
+# ============================================================================
+class FinanceSource(Protocol):
+    def quote(self, symbol: str) -> Dict[str, Any]: ...
+
+    def info(self, symbol: str) -> Dict[str, Any]: ...
+
+    def history(self, symbol: str, period: str, interval: str) -> pd.DataFrame: ...
+
+    def financials(self, symbol: str) -> pd.DataFrame: ...
+
+    def recommendations(self, symbol: str) -> pd.DataFrame: ...
+
+    def news(self, symbol: str) -> List[Dict[str, Any]]: ...
+
+
+class YahooSource:
+    """Live data from Yahoo Finance."""
+
+    def __init__(self, session: Optional[Any] = None):
+        self.session = session
+
+    def _ticker(self, symbol: str) -> Any:
+        return yf.Ticker(symbol, session=self.session)
+
+    def quote(self, symbol: str) -> Dict[str, Any]:
+        fast_info = self._ticker(symbol).fast_info
+        return {
+            "price": fast_info.last_price,
+            "previous_close": fast_info.previous_close,
+            "currency": fast_info.currency,
+            "market_cap": fast_info.market_cap,
+        }
+
+    def info(self, symbol: str) -> Dict[str, Any]:
+        return self._ticker(symbol).info
+
+    def history(self, symbol: str, period: str, interval: str) -> pd.DataFrame:
+        return self._ticker(symbol).history(period=period, interval=interval)
+
+    def financials(self, symbol: str) -> pd.DataFrame:
+        return self._ticker(symbol).financials
+
+    def recommendations(self, symbol: str) -> pd.DataFrame:
+        return self._ticker(symbol).recommendations
+
+    def news(self, symbol: str) -> List[Dict[str, Any]]:
+        return self._ticker(symbol).news
+
+
+class FakeSource:
+    """
+    Deterministic offline data with a simulated round trip, used to benchmark the cache.
+
+    Values are derived from the symbol, so repeated calls return the same data. `calls` counts source calls per field.
+    """
+
+    def __init__(self, latency: float = 0.3, jitter: float = 0.1):
+        self.latency = latency
+        self.jitter = jitter
+        self.calls: Dict[str, int] = {}
+        self._lock = Lock()
+
+    def _call(self, field: str, symbol: str) -> random.Random:
+        with self._lock:
+            self.calls[field] = self.calls.get(field, 0) + 1
+        if self.latency:
+            time.sleep(self.latency * (1 + random.uniform(-self.jitter, self.jitter)))
+        return random.Random(int(hashlib.md5(symbol.encode()).hexdigest()[:8], 16))
+
+    def quote(self, symbol: str) -> Dict[str, Any]:
+        rng = self._call("quote", symbol)
+        price = round(rng.uniform(20, 900), 2)
+        return {
+            "price": price,
+            "previous_close": round(price * rng.uniform(0.95, 1.05), 2),
+            "currency": "USD",
+            "market_cap": int(price * rng.uniform(1e8, 1e10)),
+        }
+
+    def info(self, symbol: str) -> Dict[str, Any]:
+        rng = self._call("info", symbol)
+        price = round(rng.uniform(20, 900), 2)
+        return {
+            "symbol": symbol,
+            "shortName": f"{symbol} Inc.",
+            "longName": f"{symbol} Incorporated",
+            "sector": rng.choice(["Technology", "Communication Services", "Consumer Cyclical"]),
+            "industry": "Software",
+            "currency": "USD",
+            "regularMarketPrice": price,
+            "marketCap": int(price * rng.uniform(1e8, 1e10)),
+            "trailingPE": round(rng.uniform(10, 80), 2),
+            "forwardPE": round(rng.uniform(10, 60), 2),
+            "priceToBook": round(rng.uniform(1, 40), 2),
+            "trailingEps": round(rng.uniform(0.5, 15), 2),
+            "totalRevenue": int(rng.uniform(1e9, 4e11)),
+            "ebitda": int(rng.uniform(1e8, 1.5e11)),
+            "enterpriseValue": int(price * rng.uniform(1e8, 1e10)),
+            "dividendYield": round(rng.uniform(0, 3), 2),
+            "beta": round(rng.uniform(0.6, 2.2), 2),
+            "fiftyTwoWeekLow": round(price * 0.7, 2),
+            "fiftyTwoWeekHigh": round(price * 1.3, 2),
+            "revenueGrowth": round(rng.uniform(-0.1, 0.5), 3),
+            "grossMargins": round(rng.uniform(0.3, 0.8), 3),
+            "ebitdaMargins": round(rng.uniform(0.1, 0.6), 3),
+        }
+
+    def history(self, symbol: str, period: str, interval: str) -> pd.DataFrame:
+        rng = self._call("history", symbol)
+        index = pd.date_range(end=pd.Timestamp.now(tz="UTC").normalize(), periods=21, freq="B")
+        close = [round(rng.uniform(20, 900), 2) for _ in index]
+        return pd.DataFrame({"Open": close, "High": close, "Low": close, "Close": close, "Volume": 1_000_000}, index)
+
+    def financials(self, symbol: str) -> pd.DataFrame:
+        rng = self._call("financials", symbol)
+        years = pd.to_datetime(["2022-12-31", "2023-12-31", "2024-12-31"])
+        return pd.DataFrame(
+            {year: {"Total Revenue": rng.uniform(1e9, 4e11), "EBITDA": rng.uniform(1e8, 1.5e11)} for year in years}
+        )
+
+    def recommendations(self, symbol: str) -> pd.DataFrame:
+        rng = self._call("recommendations", symbol)
+        return pd.DataFrame(
+            [{"period": "0m", "strongBuy": rng.randint(0, 20), "buy": rng.randint(0, 20), "hold": rng.randint(0, 10)}]
+        )
+
+    def news(self, symbol: str) -> List[Dict[str, Any]]:
+        self._call("news", symbol)
+        return [{"title": f"{symbol} headline {i}", "publisher": "Fake Wire"} for i in range(5)]
+
+
+# ============================================================================
+# Ratios
+# ============================================================================
+# Column label -> display format, in table order
+COMPARISON_COLUMNS: Dict[str, str] = {
+    "Price": "price",
+    "Change %": "pct",
+    "Market Cap": "money",
+    "P/E": "multiple",
+    "Fwd P/E": "multiple",
+    "P/S": "multiple",
+    "EV/EBITDA": "multiple",
+    "EPS": "price",
+    "Revenue": "money",
+    "Revenue YoY %": "pct",
+    "EBITDA": "money",
+    "Gross Margin %": "pct",
+    "EBITDA Margin %": "pct",
+    "Dividend Yield %": "pct",
+    "52w Low": "price",
+    "52w High": "price",
+}
+
+
+def annual_revenue(financials: Optional[pd.DataFrame]) -> Dict[str, Optional[float]]:
+    """Latest and previous fiscal year revenue from an income statement (fields as rows, periods as columns)."""
+    if financials is None or financials.empty or "Total Revenue" not in financials.index:
+        return {"revenue_latest": None, "revenue_previous": None}
+    revenue = financials.loc["Total Revenue"].dropna().sort_index(ascending=False)
+    return {
+        "revenue_latest": float(revenue.iloc[0]) if len(revenue) > 0 else None,
+        "revenue_previous": float(revenue.iloc[1]) if len(revenue) > 1 else None,
+    }
+
+
+def compute_ratios(raw: pd.DataFrame) -> pd.DataFrame:
+    """
+    Compute the comparison metrics for every ticker in one vectorized pass.
+
+    Args:
+        raw: One row per ticker with the quote fields (`price`, `previous_close`, `market_cap`), the Yahoo `info`
+            fields and the `revenue_latest` / `revenue_previous` annual revenue.
+
+    Returns:
+        pd.DataFrame: One row per ticker and one column per `COMPARISON_COLUMNS` entry, NaN where unavailable.
+    """
+    raw = raw.reindex(
+        columns=[
+            "price",
+            "previous_close",
+            "market_cap",
+            "regularMarketPrice",
+            "marketCap",
+            "trailingPE",
+            "forwardPE",
+            "trailingEps",
+            "totalRevenue",
+            "revenueGrowth",
+            "ebitda",
+            "enterpriseValue",
+            "grossMargins",
+            "ebitdaMargins",
+            "dividendYield",
+            "fiftyTwoWeekLow",
+            "fiftyTwoWeekHigh",
+            "revenue_latest",
+            "revenue_previous",
+        ]
+    ).apply(pd.to_numeric, errors="coerce")
+
+    def positive(column: pd.Series) -> pd.Series:
+        return column.where(column > 0)
+
+    price = raw["price"].fillna(raw["regularMarketPrice"])
+    market_cap = raw["market_cap"].fillna(raw["marketCap"])
+    revenue = raw["totalRevenue"].fillna(raw["revenue_latest"])
+    ebitda = raw["ebitda"]
+    yoy = (raw["revenue_latest"] / positive(raw["revenue_previous"]) - 1).fillna(raw["revenueGrowth"])
+    return pd.DataFrame(
+        {
+            "Price": price,
+            "Change %": (price / positive(raw["previous_close"]) - 1) * 100,
+            "Market Cap": market_cap,
+            "P/E": raw["trailingPE"].fillna(price / positive(raw["trailingEps"])),
+            "Fwd P/E": raw["forwardPE"],
+            "P/S": market_cap / positive(revenue),
+            "EV/EBITDA": raw["enterpriseValue"] / positive(ebitda),
+            "EPS": raw["trailingEps"],
+            "Revenue": revenue,
+            "Revenue YoY %": yoy * 100,
+            "EBITDA": ebitda,
+            "Gross Margin %": raw["grossMargins"] * 100,
+            "EBITDA Margin %": (ebitda / positive(revenue)).fillna(raw["ebitdaMargins"]) * 100,
+            # Yahoo reports dividendYield in percent
+            "Dividend Yield %": raw["dividendYield"],
+            "52w Low": raw["fiftyTwoWeekLow"],
+            "52w High": raw["fiftyTwoWeekHigh"],
+        },
+        index=raw.index,
+    )
+
+
+def format_table(ratios: pd.DataFrame) -> str:
+    """Render the ratios as a markdown table with one row per ticker, writing N/A for missing values."""
+
+    def money(value: float) -> str:
+        for divisor, suffix in ((1e12, "T"), (1e9, "B"), (1e6, "M")):
+            if abs(value) >= divisor:
+                return f"{value / divisor:.2f}{suffix}"
+        return f"{value:,.0f}"
+
+    formatters = {
+        "price": lambda value: f"{value:,.2f}",
+        "pct": lambda value: f"{value:.1f}",
+        "money": money,
+        "multiple": lambda value: f"{value:.1f}x",
+    }
+    columns = list(COMPARISON_COLUMNS)
+    lines = ["| Ticker | " + " | ".join(columns) + " |", "|---" * (len(columns) + 1) + "|"]
+    for symbol, row in ratios[columns].iterrows():
+        cells = [
+            "N/A" if pd.isna(row[column]) else formatters[COMPARISON_COLUMNS[column]](row[column]) for column in columns
+        ]
+        lines.append(f"| {symbol} | " + " | ".join(cells) + " |")
+    return "\n".join(lines)
+
+
+# ============================================================================
+# Toolkit
+# ============================================================================
+class CachedYFinanceTools(Toolkit):
+    """
+    Drop-in replacement for agno's `YFinanceTools` backed by a shared cache.
+
+    Args:
+        source (Optional[FinanceSource]): Data source. Defaults to live Yahoo Finance.
+        ttls (Optional[Dict[str, float]]): Per-field TTL overrides, see `DEFAULT_TTLS`.
+        cache (Optional[TTLCache]): Cache to use, e.g. to share one cache between toolkits.
+        max_workers (int): Concurrent source calls made by `get_stock_snapshots`.
+        enable_cache (bool): Set to False to call the source directly, e.g. as a benchmark baseline.
+    """
+
+    def __init__(
+        self,
+        source: Optional[FinanceSource] = None,
+        ttls: Optional[Dict[str, float]] = None,
+        cache: Optional[TTLCache] = None,
+        max_workers: int = 8,
+        enable_cache: bool = True,
+        **kwargs,
+    ):
+        tools: List[Any] = [
+            self.get_current_stock_price,
+            self.get_stock_snapshots,
+            self.get_comparison_table,
+            self.get_company_info,
+            self.get_stock_fundamentals,
+            self.get_income_statements,
+            self.get_key_financial_ratios,
+            self.get_analyst_recommendations,
+            self.get_company_news,
+            self.get_technical_indicators,
+            self.get_historical_stock_prices,
+        ]
+        self.source: FinanceSource = source or YahooSource()
+        self.ttls: Dict[str, float] = {**DEFAULT_TTLS, **(ttls or {})}
+        self.cache: TTLCache = cache or TTLCache()
+        self.max_workers = max_workers
+        self.enable_cache = enable_cache
+        super().__init__(name="yfinance_tools", tools=tools, **kwargs)
+
+    def _fetch(self, field: str, symbol: str, *args: str) -> Any:
+        symbol = symbol.strip().upper()
+        loader = getattr(self.source, field)
+        if not self.enable_cache:
+            return loader(symbol, *args)
+        return self.cache.get_or_load(
+            (field, symbol, *args), lambda: loader(symbol, *args), self.ttls[field], field_name=field
+        )
+
+    def _snapshot(self, symbol: str) -> Dict[str, Any]:
+        quote = self._fetch("quote", symbol)
+        info = self._fetch("info", symbol)
+        price, previous_close = quote.get("price"), quote.get("previous_close")
+        return {
+            "symbol": symbol.strip().upper(),
+            "name": info.get("shortName"),
+            "price": price,
+            "change_pct": round((price / previous_close - 1) * 100, 2) if price and previous_close else "N/A",
+            "currency": quote.get("currency") or info.get("currency", "USD"),
+            "market_cap": quote.get("market_cap") or info.get("marketCap", "N/A"),
+            "pe_ratio": info.get("trailingPE", "N/A"),
+            "forward_pe": info.get("forwardPE", "N/A"),
+            "eps": info.get("trailingEps", "N/A"),
+            "revenue": info.get("totalRevenue", "N/A"),
+            "ebitda": info.get("ebitda", "N/A"),
+            "dividend_yield": info.get("dividendYield", "N/A"),
+            "52_week_low": info.get("fiftyTwoWeekLow", "N/A"),
+            "52_week_high": info.get("fiftyTwoWeekHigh", "N/A"),
+        }
+
+    def get_current_stock_price(self, symbol: str) -> str:
+        """
+        Use this function to get the current stock price for a given symbol.
+
+        Args:
+            symbol (str): The stock symbol.
+
+        Returns:
+            str: The current stock price or error message.
+        """
+        try:
+            log_debug(f"Fetching current price for {symbol}")
+            current_price = self._fetch("quote", symbol).get("price")
+            return f"{current_price:.4f}" if current_price else f"Could not fetch current price for {symbol}"
+        except SOURCE_ERRORS as e:
+            return f"Error fetching current price for {symbol}: {e}"
+
+    def get_stock_snapshots(self, symbols: List[str]) -> str:
+        """
+        Use this function to get the key metrics of one or more stocks in a single call. Prefer it over calling
+        the single-stock tools once per ticker when comparing companies.
+
+        Args:
+            symbols (List[str]): The stock symbols, e.g. ["AAPL", "GOOGL", "MSFT"].
+
+        Returns:
+            str: JSON mapping each symbol to its price, % change, market cap, P/E, forward P/E, EPS, revenue,
+                EBITDA, dividend yield and 52-week range, plus the time the data was fetched.
+        """
+        log_debug(f"Fetching snapshots for {symbols}")
+
+        def snapshot(symbol: str) -> Dict[str, Any]:
+            try:
+                return self._snapshot(symbol)
+            except SOURCE_ERRORS as e:
+                return {"symbol": symbol, "error": str(e)}
+
+        with ThreadPoolExecutor(max_workers=max(min(self.max_workers, len(symbols) * 2), 1)) as executor:
+            snapshots = list(executor.map(snapshot, symbols))
+        return json.dumps(
+            {
+                "as_of": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+                "source": "Yahoo Finance",
+                "stocks": {s["symbol"]: s for s in snapshots},
+            },
+            indent=2,
+        )
+
+    def get_comparison_table(self, symbols: List[str]) -> str:
+        """
+        Use this function to get a ready-made comparison table of one or more stocks. It computes price, % change,
+        market cap, P/E, forward P/E, P/S, EV/EBITDA, EPS, revenue, revenue YoY growth, EBITDA, gross and EBITDA
+        margins, dividend yield and the 52-week range. Use the table as-is instead of computing ratios yourself.
+
+        Args:
+            symbols (List[str]): The stock symbols, e.g. ["AAPL", "GOOGL", "MSFT"].
+
+        Returns:
+            str: A markdown table with one row per ticker (N/A marks unavailable metrics), with the data timestamp.
+        """
+        log_debug(f"Building comparison table for {symbols}")
+        symbols = list(dict.fromkeys(symbol.strip().upper() for symbol in symbols))
+
+        def fetch(request: Tuple[str, str]) -> Any:
+            try:
+                return self._fetch(*request)
+            except SOURCE_ERRORS as e:
+                log_debug(f"Could not fetch {request[0]} for {request[1]}: {e}")
+                return None
+
+        requests = [(field, symbol) for symbol in symbols for field in ("quote", "info", "financials")]
+        with ThreadPoolExecutor(max_workers=max(min(self.max_workers, len(requests)), 1)) as executor:
+            fetched = dict(zip(requests, executor.map(fetch, requests)))
+
+        raw = pd.DataFrame.from_dict(
+            {
+                symbol: {
+                    **(fetched[("info", symbol)] or {}),
+                    **(fetched[("quote", symbol)] or {}),
+                    **annual_revenue(fetched[("financials", symbol)]),
+                }
+                for symbol in symbols
+            },
+            orient="index",
+        )
+        as_of = datetime.now(timezone.utc).isoformat(timespec="seconds")
+        return f"Source: Yahoo Finance, as of {as_of}\n\n{format_table(compute_ratios(raw))}"
+
+    def get_company_info(self, symbol: str) -> str:
+        """Use this function to get company information and overview for a given stock symbol.
+
+        Args:
+            symbol (str): The stock symbol.
+
+        Returns:
+            str: JSON containing company profile and overview.
+        """
+        try:
+            log_debug(f"Fetching company info for {symbol}")
+            info = self._fetch("info", symbol)
+            if info is None:
+                return f"Could not fetch company info for {symbol}"
+            currency = info.get("currency", "USD")
+            company_info = {
+                "Name": info.get("shortName"),
+                "Symbol": info.get("symbol"),
+                "Current Stock Price": f"{self._fetch('quote', symbol).get('price')} {currency}",
+                "Market Cap": f"{info.get('marketCap', info.get('enterpriseValue'))} {currency}",
+                "Sector": info.get("sector"),
+                "Industry": info.get("industry"),
+                "Country": info.get("country"),
+                "EPS": info.get("trailingEps"),
+                "P/E Ratio": info.get("trailingPE"),
+                "52 Week Low": info.get("fiftyTwoWeekLow"),
+                "52 Week High": info.get("fiftyTwoWeekHigh"),
+                "50 Day Average": info.get("fiftyDayAverage"),
+                "200 Day Average": info.get("twoHundredDayAverage"),
+                "Website": info.get("website"),
+                "Summary": info.get("longBusinessSummary"),
+                "Analyst Recommendation": info.get("recommendationKey"),
+                "Number Of Analyst Opinions": info.get("numberOfAnalystOpinions"),
+                "Employees": info.get("fullTimeEmployees"),
+                "Total Cash": info.get("totalCash"),
+                "Free Cash flow": info.get("freeCashflow"),
+                "Operating Cash flow": info.get("operatingCashflow"),
+                "EBITDA": info.get("ebitda"),
+                "Revenue Growth": info.get("revenueGrowth"),
+                "Gross Margins": info.get("grossMargins"),
+                "Ebitda Margins": info.get("ebitdaMargins"),
+            }
+            return json.dumps(company_info, indent=2)
+        except SOURCE_ERRORS as e:
+            return f"Error fetching company profile for {symbol}: {e}"
+
+    def get_stock_fundamentals(self, symbol: str) -> str:
+        """Use this function to get fundamental data for a given stock symbol.
+
+        Args:
+            symbol (str): The stock symbol.
+
+        Returns:
+            str: A JSON string containing the company name, sector, industry, market cap, forward P/E, P/B,
+                dividend yield, trailing EPS, beta and 52-week range, or an error message.
+        """
+        try:
+            log_debug(f"Fetching fundamentals for {symbol}")
+            info = self._fetch("info", symbol)
+            fundamentals = {
+                "symbol": symbol,
+                "company_name": info.get("longName", ""),
+                "sector": info.get("sector", ""),
+                "industry": info.get("industry", ""),
+                "market_cap": info.get("marketCap", "N/A"),
+                "pe_ratio": info.get("forwardPE", "N/A"),
+                "pb_ratio": info.get("priceToBook", "N/A"),
+                "dividend_yield": info.get("dividendYield", "N/A"),
+                "eps": info.get("trailingEps", "N/A"),
+                "beta": info.get("beta", "N/A"),
+                "52_week_high": info.get("fiftyTwoWeekHigh", "N/A"),
+                "52_week_low": info.get("fiftyTwoWeekLow", "N/A"),
+            }
+            return json.dumps(fundamentals, indent=2)
+        except SOURCE_ERRORS as e:
+            return f"Error getting fundamentals for {symbol}: {e}"
+
+    def get_income_statements(self, symbol: str) -> str:
+        """Use this function to get income statements for a given stock symbol.
+
+        Args:
+            symbol (str): The stock symbol.
+
+        Returns:
+            str: JSON containing income statements.
+        """
+        try:
+            log_debug(f"Fetching income statements for {symbol}")
+            return self._fetch("financials", symbol).to_json(orient="index")
+        except SOURCE_ERRORS as e:
+            return f"Error fetching income statements for {symbol}: {e}"
+
+    def get_key_financial_ratios(self, symbol: str) -> str:
+        """Use this function to get key financial ratios for a given stock symbol.
+
+        Args:
+            symbol (str): The stock symbol.
+
+        Returns:
+            str: JSON containing key financial ratios.
+        """
+        try:
+            log_debug(f"Fetching key financial ratios for {symbol}")
+            return json.dumps(self._fetch("info", symbol), indent=2)
+        except SOURCE_ERRORS as e:
+            return f"Error fetching key financial ratios for {symbol}: {e}"
+
+    def get_analyst_recommendations(self, symbol: str) -> str:
+        """Use this function to get analyst recommendations for a given stock symbol.
+
+        Args:
+            symbol (str): The stock symbol.
+
+        Returns:
+            str: JSON containing analyst recommendations.
+        """
+        try:
+            log_debug(f"Fetching analyst recommendations for {symbol}")
+            return self._fetch("recommendations", symbol).to_json(orient="index")
+        except SOURCE_ERRORS as e:
+            return f"Error fetching analyst recommendations for {symbol}: {e}"
+
+    def get_company_news(self, symbol: str, num_stories: int = 3) -> str:
+        """Use this function to get company news and press releases for a given stock symbol.
+
+        Args:
+            symbol (str): The stock symbol.
+            num_stories (int): The number of news stories to return. Defaults to 3.
+
+        Returns:
+            str: JSON containing company news and press releases.
+        """
+        try:
+            log_debug(f"Fetching company news for {symbol}")
+            return json.dumps(self._fetch("news", symbol)[:num_stories], indent=2)
+        except SOURCE_ERRORS as e:
+            return f"Error fetching company news for {symbol}: {e}"
+
+    def get_technical_indicators(self, symbol: str, period: str = "3mo") -> str:
+        """Use this function to get technical indicators for a given stock symbol.
+
+        Args:
+            symbol (str): The stock symbol.
+            period (str): The time period for which to retrieve technical indicators.
+                Valid periods: 1d, 5d, 1mo, 3mo, 6mo, 1y, 2y, 5y, 10y, ytd, max. Defaults to 3mo.
+
+        Returns:
+            str: JSON containing technical indicators.
+        """
+        try:
+            log_debug(f"Fetching technical indicators for {symbol}")
+            return self._fetch("history", symbol, period, "1d").to_json(orient="index")
+        except SOURCE_ERRORS as e:
+            return f"Error fetching technical indicators for {symbol}: {e}"
+
+    def get_historical_stock_prices(self, symbol: str, period: str = "1mo", interval: str = "1d") -> str:
+        """
+        Use this function to get the historical stock price for a given symbol.
+
+        Args:
+            symbol (str): The stock symbol.
+            period (str): The period for which to retrieve historical prices. Defaults to "1mo".
+                        Valid periods: 1d,5d,1mo,3mo,6mo,1y,2y,5y,10y,ytd,max
+            interval (str): The interval between data points. Defaults to "1d".
+                        Valid intervals: 1d,5d,1wk,1mo,3mo
+
+        Returns:
+          str: JSON containing the historical prices or an error message.
+        """
+        try:
+            log_debug(f"Fetching historical prices for {symbol}")
+            return self._fetch("history", symbol, period, interval).to_json(orient="index")
+        except SOURCE_ERRORS as e:
+            return f"Error fetching historical prices for {symbol}: {e}"
+
+
+# ============================================================================
+# Offline benchmark
+# ============================================================================
+SCENARIOS: Dict[str, List[str]] = {
+    "Investment Brief": ["AAPL"],
+    "Sector Compare": ["AAPL", "GOOGL", "MSFT"],
+    "Risk Profile": ["TSLA"],
+    "AI Basket": ["NVDA", "GOOGL", "MSFT", "AMD"],
+    "Earnings Prep": ["MSFT"],
+}
+
+
+def per_ticker_calls(toolkit: CachedYFinanceTools, symbols: List[str]) -> None:
+    """The calls an agent makes today: the same few tools, one ticker at a time."""
+    for symbol in symbols:
+        toolkit.get_current_stock_price(symbol)
+        toolkit.get_stock_fundamentals(symbol)
+        toolkit.get_company_info(symbol)
+        toolkit.get_income_statements(symbol)
+
+
+def batched_calls(toolkit: CachedYFinanceTools, symbols: List[str]) -> None:
+    """The same data with a single comparison table call for all tickers."""
+    toolkit.get_comparison_table(symbols)
+
+
+if __name__ == "__main__":
+    import argparse
+    from statistics import mean, median
+
+    parser = argparse.ArgumentParser(description="Benchmark the cached finance toolkit against a fake data source")
+    parser.add_argument("--latency", type=float, default=0.3, help="Simulated Yahoo round trip in seconds")
+    parser.add_argument("--users", type=int, default=8, help="Concurrent users, each running every scenario")
+    parser.add_argument("--stagger", type=float, default=0.5, help="Max random delay before each user starts")
+    args = parser.parse_args()
+
+    def run(label: str, enable_cache: bool, calls: Any) -> None:
+        source = FakeSource(latency=args.latency)
+        toolkit = CachedYFinanceTools(source=source, enable_cache=enable_cache)
+        latencies: List[float] = []
+        lock = Lock()
+
+        def user(index: int) -> None:
+            time.sleep(random.uniform(0, args.stagger))
+            for symbols in SCENARIOS.values():
+                started = time.perf_counter()
+                calls(toolkit, symbols)
+                with lock:
+                    latencies.append(time.perf_counter() - started)
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=args.users) as executor:
+            list(executor.map(user, range(args.users)))
+        elapsed = time.perf_counter() - started
+        stats = toolkit.cache.stats
+        print(
+            f"{label:<22} source calls={sum(source.calls.values()):>4} hit ratio={stats.hit_ratio:>5.2f} "
+            f"coalesced={stats.coalesced:>4} scenario p50={median(latencies):>6.2f}s "
+            f"mean={mean(latencies):>6.2f}s total={elapsed:>6.2f}s"
+        )
+
+    run("uncached, per ticker", False, per_ticker_calls)
+    run("cached, per ticker", True, per_ticker_calls)
+    run("cached, batched", True, batched_calls)
@@ -0,0 +1,585 @@
+"""
+Warm, shared MCP sessions for agents that use remote MCP servers.
+
+`MCPTools` holds a single session, never reconnects it, and opens (and closes) a new one for every run when it is not
+connected already. `PooledMCPTools` keeps a bounded pool of initialized sessions instead:
+
+- The pool is started when AgentOS starts (AgentOS connects every MCP toolkit in its lifespan) and closed on shutdown.
+- Each session is owned by a background task that pings it while idle and reconnects it with exponential backoff and
+  jitter when it fails.
+- Tool calls go to the ready session with the fewest calls in flight. Calls that fail because the connection was lost
+  are retried on another session.
+- The tool list is cached for `tools_ttl` seconds and invalidated when the server sends `tools/list_changed` or when
+  a session reconnects, so runs do not list the tools again.
+
+Connect and handshake latency, tool list loads and call retries are recorded in `MCPPoolStats`.
+
+Usage:
+    python -m tools.mcp_pool --runs 20 --concurrency 4 --latency 0.05
+"""
+
+import asyncio
+import random
+import time
+from contextlib import AbstractAsyncContextManager
+from dataclasses import asdict, dataclass, field
+from datetime import timedelta
+from functools import partial
+from typing import Any, Awaitable, Callable, Dict, List, Literal, Optional, Self, TypeVar
+
+import anyio
+import httpx
+from agno.tools.function import Function
+from agno.tools.mcp import MCPTools
+from agno.utils.log import log_debug, log_info, log_warning
+from agno.utils.mcp import get_entrypoint_for_tool
+from mcp import ClientSession, types
+from mcp.client.sse import sse_client
+from mcp.client.stdio import stdio_client
+from mcp.client.streamable_http import streamablehttp_client
+from mcp.shared.exceptions import McpError
+
+# Errors that mean the session is gone, as opposed to a failed tool call
+CONNECTION_ERRORS = (OSError, httpx.TransportError, anyio.ClosedResourceError, anyio.BrokenResourceError)
+# McpError codes for a closed connection and for a session the server no longer knows
+RETRYABLE_ERROR_CODES = {types.CONNECTION_CLOSED, 32600}
+
+TransportFactory = Callable[[], AbstractAsyncContextManager[Any]]
+T = TypeVar("T")
+
+
+class MCPUnavailableError(RuntimeError):
+    """No MCP session became ready in time."""
+
+
+@dataclass
+class MCPPoolStats:
+    connects: int = 0
+    connect_failures: int = 0
+    # Seconds spent opening the transport and running the MCP initialize handshake
+    connect_time: float = 0.0
+    max_connect_time: float = 0.0
+    tool_list_loads: int = 0
+    tool_list_hits: int = 0
+    tool_list_time: float = 0.0
+    calls: int = 0
+    retries: int = 0
+    call_errors: int = 0
+
+    def record_connect(self, elapsed: float) -> None:
+        self.connects += 1
+        self.connect_time += elapsed
+        self.max_connect_time = max(self.max_connect_time, elapsed)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "connects": self.connects,
+            "connect_failures": self.connect_failures,
+            "avg_connect_ms": round(self.connect_time / self.connects * 1000, 3) if self.connects else 0.0,
+            "max_connect_ms": round(self.max_connect_time * 1000, 3),
+            "tool_list_loads": self.tool_list_loads,
+            "tool_list_hits": self.tool_list_hits,
+            "avg_tool_list_ms": round(self.tool_list_time / self.tool_list_loads * 1000, 3)
+            if self.tool_list_loads
+            else 0.0,
+            "calls": self.calls,
+            "retries": self.retries,
+            "call_errors": self.call_errors,
+        }
+
+
+@dataclass
+class _Connection:
+    index: int
+    session: Optional[ClientSession] = None
+    in_flight: int = 0
+    ready: asyncio.Event = field(default_factory=asyncio.Event)
+    broken: asyncio.Event = field(default_factory=asyncio.Event)
+    task: Optional["asyncio.Task[None]"] = None
+
+    def mark_broken(self) -> None:
+        self.ready.clear()
+        self.broken.set()
+
+
+class MCPSessionPool:
+    """
+    Bounded pool of initialized MCP sessions to one server, shared by concurrent runs.
+
+    Args:
+        transport (TransportFactory): Returns a new transport context (e.g. `streamablehttp_client(url)`).
+        size (int): Number of sessions kept open.
+        read_timeout (float): Seconds to wait for a response to a request.
+        connect_timeout (float): Seconds a call waits for a ready session before failing.
+        tools_ttl (float): Seconds the tool list is cached.
+        health_check_interval (float): Seconds between pings of an idle session.
+        min_backoff (float): First delay before reconnecting a failed session.
+        max_backoff (float): Maximum delay between reconnection attempts.
+    """
+
+    def __init__(
+        self,
+        transport: TransportFactory,
+        size: int = 2,
+        read_timeout: float = 30.0,
+        connect_timeout: float = 10.0,
+        tools_ttl: float = 300.0,
+        health_check_interval: float = 60.0,
+        min_backoff: float = 0.5,
+        max_backoff: float = 30.0,
+    ):
+        self.transport = transport
+        self.size = size
+        self.read_timeout = read_timeout
+        self.connect_timeout = connect_timeout
+        self.tools_ttl = tools_ttl
+        self.health_check_interval = health_check_interval
+        self.min_backoff = min_backoff
+        self.max_backoff = max_backoff
+        self.stats = MCPPoolStats()
+        # Incremented whenever the cached tool list changes, so toolkits only rebuild their functions when needed
+        self.tools_version = 0
+
+        self._connections: List[_Connection] = []
+        self._closing = False
+        self._tools: Optional[List[types.Tool]] = None
+        self._tools_expire_at = 0.0
+        self._tools_lock: Optional[asyncio.Lock] = None
+
+    @property
+    def started(self) -> bool:
+        return bool(self._connections) and not self._closing
+
+    @property
+    def ready(self) -> bool:
+        return any(conn.ready.is_set() for conn in self._connections)
+
+    # ============================================================================
+    # Lifecycle
+    # ============================================================================
+    async def start(self) -> None:
+        """Start the session tasks. Sessions connect in the background, see `wait_ready()`."""
+        if self.started:
+            return
+        self._closing = False
+        self._tools_lock = asyncio.Lock()
+        self._connections = [_Connection(index=i) for i in range(self.size)]
+        for conn in self._connections:
+            conn.task = asyncio.create_task(self._maintain(conn), name=f"mcp-session-{conn.index}")
+        log_debug(f"Started MCP session pool with {self.size} sessions")
+
+    async def wait_ready(self, timeout: Optional[float] = None) -> None:
+        """Wait until at least one session is initialized."""
+        if not self._connections:
+            raise MCPUnavailableError("MCP session pool is not started")
+        waiters = [asyncio.create_task(conn.ready.wait()) for conn in self._connections]
+        try:
+            done, _ = await asyncio.wait(
+                waiters, timeout=timeout or self.connect_timeout, return_when=asyncio.FIRST_COMPLETED
+            )
+        finally:
+            for waiter in waiters:
+                waiter.cancel()
+        if not done:
+            raise MCPUnavailableError(f"No MCP session ready after {timeout or self.connect_timeout} seconds")
+
+    async def close(self) -> None:
+        self._closing = True
+        for conn in self._connections:
+            conn.mark_broken()
+        tasks = [conn.task for conn in self._connections if conn.task is not None]
+        if tasks:
+            _, pending = await asyncio.wait(tasks, timeout=5)
+            for task in pending:
+                task.cancel()
+        self._connections = []
+        self._tools = None
+        log_debug("Closed MCP session pool")
+
+    async def _maintain(self, conn: _Connection) -> None:
+        """Keep one session open. The transport is entered and exited in this task, as anyio requires."""
+        backoff = self.min_backoff
+        while not self._closing:
+            started = time.perf_counter()
+            try:
+                async with self.transport() as streams:
+                    read, write = streams[0], streams[1]
+                    async with ClientSession(
+                        read,
+                        write,
+                        read_timeout_seconds=timedelta(seconds=self.read_timeout),
+                        message_handler=partial(self._on_message, conn),
+                    ) as session:
+                        await session.initialize()
+                        elapsed = time.perf_counter() - started
+                        self.stats.record_connect(elapsed)
+                        log_debug(f"MCP session {conn.index} ready in {elapsed * 1000:.1f}ms")
+                        if self.stats.connects > self.size:
+                            # The server may have changed since the tools were listed
+                            self.invalidate_tools()
+                        conn.session = session
+                        conn.broken.clear()
+                        conn.ready.set()
+                        backoff = self.min_backoff
+                        await self._watch(conn, session)
+            except Exception as e:  # noqa: BLE001 - any failure of the transport must lead to a reconnect
+                self.stats.connect_failures += 1
+                log_warning(f"MCP session {conn.index} failed: {e!r}")
+            finally:
+                # Wakes up the requests still waiting on this session, see `_request()`
+                conn.mark_broken()
+                conn.session = None
+            if self._closing:
+                break
+            # Full jitter, so the sessions do not reconnect in lockstep
+            delay = random.uniform(0, backoff)
+            backoff = min(backoff * 2, self.max_backoff)
+            log_debug(f"Reconnecting MCP session {conn.index} in {delay:.2f}s")
+            await asyncio.sleep(delay)
+
+    async def _watch(self, conn: _Connection, session: ClientSession) -> None:
+        """Return when the session breaks or the pool closes, pinging it while it is idle."""
+        while not conn.broken.is_set():
+            try:
+                await asyncio.wait_for(conn.broken.wait(), timeout=self.health_check_interval)
+            except asyncio.TimeoutError:
+                if conn.in_flight == 0:
+                    await asyncio.wait_for(session.send_ping(), timeout=self.read_timeout)
+
+    async def _on_message(self, conn: _Connection, message: Any) -> None:
+        if isinstance(message, Exception):
+            log_warning(f"MCP session {conn.index} transport error: {message!r}")
+            conn.mark_broken()
+        elif isinstance(message, types.ServerNotification) and isinstance(
+            message.root, types.ToolListChangedNotification
+        ):
+            log_debug("MCP server tool list changed")
+            self.invalidate_tools()
+
+    # ============================================================================
+    # Requests
+    # ============================================================================
+    async def _acquire(self) -> _Connection:
+        ready = [conn for conn in self._connections if conn.ready.is_set() and conn.session is not None]
+        if not ready:
+            await self.wait_ready()
+            ready = [conn for conn in self._connections if conn.ready.is_set() and conn.session is not None]
+            if not ready:
+                raise MCPUnavailableError("No MCP session ready")
+        return min(ready, key=lambda conn: conn.in_flight)
+
+    async def _request(self, conn: _Connection, request: Callable[[ClientSession], Awaitable[T]]) -> T:
+        """
+        Send `request` on the session of `conn`. The client session does not fail its pending requests when the
+        transport dies, so the request is abandoned with a `ConnectionError` as soon as the session breaks.
+        """
+        assert conn.session is not None
+        call = asyncio.ensure_future(request(conn.session))
+        broken = asyncio.ensure_future(conn.broken.wait())
+        try:
+            await asyncio.wait({call, broken}, return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            broken.cancel()
+            if not call.done():
+                call.cancel()
+        if not call.done():
+            raise ConnectionError(f"MCP session {conn.index} was lost")
+        return call.result()
+
+    async def send_ping(self) -> None:
+        """No-op: sessions are pinged by the pool while idle, so callers do not need a round trip per request."""
+
+    async def call_tool(self, name: str, arguments: Optional[Dict[str, Any]] = None) -> types.CallToolResult:
+        self.stats.calls += 1
+        error: Optional[Exception] = None
+        for attempt in range(self.size + 1):
+            conn = await self._acquire()
+            conn.in_flight += 1
+            try:
+                return await self._request(conn, lambda session: session.call_tool(name, arguments))
+            except McpError as e:
+                if e.error.code not in RETRYABLE_ERROR_CODES:
+                    if e.error.code == httpx.codes.REQUEST_TIMEOUT:
+                        conn.mark_broken()
+                    self.stats.call_errors += 1
+                    raise
+                conn.mark_broken()
+                error = e
+            except CONNECTION_ERRORS as e:
+                conn.mark_broken()
+                error = e
+            finally:
+                conn.in_flight -= 1
+            self.stats.retries += 1
+            log_debug(f"Retrying MCP tool '{name}' after connection error (attempt {attempt + 1}): {error!r}")
+        self.stats.call_errors += 1
+        raise error  # type: ignore[misc]
+
+    def invalidate_tools(self) -> None:
+        self._tools_expire_at = 0.0
+
+    async def list_tools(self) -> List[types.Tool]:
+        """Return the server's tools, listing them at most once per `tools_ttl` or invalidation."""
+        if self._tools is not None and time.monotonic() < self._tools_expire_at:
+            self.stats.tool_list_hits += 1
+            return self._tools
+        assert self._tools_lock is not None, "MCP session pool is not started"
+        async with self._tools_lock:
+            # Another run may have listed the tools while this one waited
+            if self._tools is not None and time.monotonic() < self._tools_expire_at:
+                self.stats.tool_list_hits += 1
+                return self._tools
+            started = time.perf_counter()
+            conn = await self._acquire()
+            tools: List[types.Tool] = []
+            cursor: Optional[str] = None
+            while True:
+                result = await self._request(conn, partial(ClientSession.list_tools, cursor=cursor))
+                tools.extend(result.tools)
+                cursor = result.nextCursor
+                if not cursor:
+                    break
+            self.stats.tool_list_loads += 1
+            self.stats.tool_list_time += time.perf_counter() - started
+            if self._tools is None or [t.model_dump() for t in tools] != [t.model_dump() for t in self._tools]:
+                self.tools_version += 1
+            self._tools = tools
+            self._tools_expire_at = time.monotonic() + self.tools_ttl
+            return tools
+
+
+class PooledMCPTools(MCPTools):
+    """
+    Drop-in replacement for `MCPTools` backed by an `MCPSessionPool`.
+
+    Args:
+        url (Optional[str]): URL of the MCP server for the "sse" and "streamable-http" transports.
+        transport (str): "streamable-http", "sse" or "stdio".
+        pool_size (int): Number of sessions kept open.
+        tools_ttl (float): Seconds the tool list is cached.
+        health_check_interval (float): Seconds between pings of an idle session.
+        max_backoff (float): Maximum delay between reconnection attempts.
+    """
+
+    def __init__(
+        self,
+        command: Optional[str] = None,
+        *,
+        url: Optional[str] = None,
+        transport: Literal["stdio", "sse", "streamable-http"] = "streamable-http",
+        pool_size: int = 2,
+        tools_ttl: float = 300.0,
+        health_check_interval: float = 60.0,
+        max_backoff: float = 30.0,
+        **kwargs: Any,
+    ):
+        # Checking the connection and tools on every run is cheap with a pool, and lets a run pick up a new tool list
+        super().__init__(command, url=url, transport=transport, refresh_connection=True, **kwargs)
+        self.pool = MCPSessionPool(
+            self._open_transport,
+            size=pool_size,
+            read_timeout=self.timeout_seconds,
+            connect_timeout=self.timeout_seconds,
+            tools_ttl=tools_ttl,
+            health_check_interval=health_check_interval,
+            max_backoff=max_backoff,
+        )
+        self._tools_version = -1
+
+    def _open_transport(self) -> AbstractAsyncContextManager[Any]:
+        params: Dict[str, Any] = asdict(self.server_params) if self.server_params is not None else {}  # type: ignore[arg-type]
+        if self.transport == "streamable-http":
+            params.setdefault("url", self.url)
+            return streamablehttp_client(**params)
+        if self.transport == "sse":
+            params.setdefault("url", self.url)
+            return sse_client(**params)
+        if self.server_params is None:
+            raise ValueError("server_params must be provided when using stdio transport.")
+        return stdio_client(self.server_params)  # type: ignore[arg-type]
+
+    @property
+    def initialized(self) -> bool:
+        return self.pool.started
+
+    async def is_alive(self) -> bool:
+        return self.pool.ready
+
+    async def connect(self, force: bool = False) -> None:
+        """Start the pool and wait for a first session. Failed sessions keep reconnecting in the background."""
+        started = time.perf_counter()
+        await self.pool.start()
+        try:
+            await self.pool.wait_ready()
+            await self.build_tools()
+        except (MCPUnavailableError, McpError, *CONNECTION_ERRORS) as e:
+            log_warning(f"MCP server at {self.url} is not available yet: {e}")
+            return
+        log_info(f"Connected to MCP server at {self.url} in {(time.perf_counter() - started) * 1000:.1f}ms")
+
+    async def close(self) -> None:
+        await self.pool.close()
+
+    async def __aenter__(self) -> Self:
+        await self.connect()
+        return self
+
+    async def __aexit__(self, _exc_type, _exc_val, _exc_tb):
+        await self.close()
+
+    async def build_tools(self) -> None:
+        """Register the server's tools, rebuilding the functions only when the cached tool list changed."""
+        tools = await self.pool.list_tools()
+        if self.pool.tools_version == self._tools_version:
+            return
+        self._check_tools_filters(
+            available_tools=[tool.name for tool in tools],
+            include_tools=self.include_tools,
+            exclude_tools=self.exclude_tools,
+        )
+        prefix = f"{self.tool_name_prefix}_" if self.tool_name_prefix else ""
+        functions: Dict[str, Function] = {}
+        for tool in tools:
+            if self.exclude_tools and tool.name in self.exclude_tools:
+                continue
+            if self.include_tools is not None and tool.name not in self.include_tools:
+                continue
+            functions[prefix + tool.name] = Function(
+                name=prefix + tool.name,
+                description=tool.description,
+                parameters=tool.inputSchema,
+                # The pool stands in for the session: calls go to the least busy session and survive reconnects
+                entrypoint=get_entrypoint_for_tool(tool, self.pool),  # type: ignore[arg-type]
+                skip_entrypoint_processing=True,
+            )
+        self.functions = functions
+        self._tools_version = self.pool.tools_version
+        log_debug(f"Registered {len(functions)} MCP tools from {self.url}")
+
+
+# ============================================================================
+# Local stand-in server and benchmark
+# ============================================================================
+STAND_IN_DOCS = {
+    "agent": "Agents are created with `Agent(model=..., tools=[...], instructions=...)` and run with `agent.run()`.",
+    "team": "Teams coordinate several agents: `Team(members=[...], model=...)`.",
+    "workflow": "Workflows chain steps: `Workflow(steps=[Step(...), Parallel(...)])`.",
+    "knowledge": "Knowledge bases store embeddings in a vector db such as `PgVector` for agentic search.",
+    "mcp": "Use `MCPTools(transport='streamable-http', url=...)` to give an agent the tools of an MCP server.",
+}
+
+
+def create_stand_in_app(latency: float = 0.0) -> Any:
+    """ASGI app of a local MCP server exposing a `SearchAgno` tool, adding `latency` seconds to every HTTP request."""
+    from mcp.server.fastmcp import FastMCP
+
+    server = FastMCP("agno-docs-stand-in")
+
+    @server.tool(name="SearchAgno")
+    def search_agno(query: str) -> str:
+        """Search the Agno documentation."""
+        words = query.lower().split()
+        matches = [text for topic, text in STAND_IN_DOCS.items() if any(topic in word for word in words)]
+        return "\n\n".join(matches or list(STAND_IN_DOCS.values()))
+
+    app = server.streamable_http_app()
+
+    async def delayed_app(scope: Dict[str, Any], receive: Any, send: Any) -> None:
+        if scope["type"] == "http" and latency > 0:
+            await asyncio.sleep(latency)
+        await app(scope, receive, send)
+
+    return delayed_app
+
+
+def serve_stand_in(port: int, latency: float) -> Any:
+    """Run the stand-in server in a background thread and return the uvicorn server."""
+    import threading
+
+    import uvicorn
+
+    server = uvicorn.Server(
+        uvicorn.Config(create_stand_in_app(latency), host="127.0.0.1", port=port, log_level="warning")
+    )
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.05)
+    return server
+
+
+if __name__ == "__main__":
+    import argparse
+    import logging
+    from statistics import quantiles
+
+    parser = argparse.ArgumentParser(description="Compare per-run MCP connections with a warm session pool")
+    parser.add_argument("--url", help="MCP server to benchmark. Defaults to a local stand-in server")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.05, help="Seconds added to each request by the stand-in")
+    parser.add_argument("--runs", type=int, default=20)
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--pool-size", type=int, default=2)
+    parser.add_argument("--serve", action="store_true", help="Only run the stand-in server")
+    args = parser.parse_args()
+
+    if args.serve:
+        serve_stand_in(args.port, args.latency)
+        print(f"Stand-in MCP server on http://127.0.0.1:{args.port}/mcp (Ctrl+C to stop)")
+        while True:
+            time.sleep(3600)
+
+    # The MCP client and server log every HTTP request at INFO
+    for name in ("httpx", "mcp"):
+        logging.getLogger(name).setLevel(logging.WARNING)
+
+    url = args.url or f"http://127.0.0.1:{args.port}/mcp"
+
+    def search_function(tools: MCPTools) -> Function:
+        # MCPTools registers the tool as "_SearchAgno" when no prefix is set
+        return next(f for name, f in tools.functions.items() if name.endswith("SearchAgno"))
+
+    if args.url is None:
+        serve_stand_in(args.port, args.latency)
+
+    async def per_run_connection() -> float:
+        # What an agent run does when its MCPTools is not connected yet: connect, list, ping, call, close
+        started = time.perf_counter()
+        async with MCPTools(transport="streamable-http", url=url) as tools:
+            await search_function(tools).entrypoint(query="how do I create an agent?")  # type: ignore[misc]
+        return time.perf_counter() - started
+
+    async def pooled(tools: PooledMCPTools) -> float:
+        # What an agent run does with a pooled toolkit: check the pool, refresh the tools from the cache, call
+        started = time.perf_counter()
+        if not await tools.is_alive():
+            await tools.connect(force=True)
+        await tools.build_tools()
+        await search_function(tools).entrypoint(query="how do I create an agent?")  # type: ignore[misc]
+        return time.perf_counter() - started
+
+    async def measure(run: Callable[[], Any]) -> List[float]:
+        semaphore = asyncio.Semaphore(args.concurrency)
+
+        async def limited() -> float:
+            async with semaphore:
+                return await run()
+
+        return list(await asyncio.gather(*[limited() for _ in range(args.runs)]))
+
+    def report(label: str, latencies: List[float]) -> None:
+        p = quantiles(latencies, n=20)
+        print(f"{label:<20} p50={p[9] * 1000:8.1f}ms p95={p[18] * 1000:8.1f}ms max={max(latencies) * 1000:8.1f}ms")
+
+    async def main() -> None:
+        print(f"{args.runs} runs against {url}, {args.concurrency} concurrent")
+        report("connect per run", await measure(per_run_connection))
+
+        tools = PooledMCPTools(url=url, pool_size=args.pool_size)
+        started = time.perf_counter()
+        await tools.connect()
+        print(f"pool startup: {(time.perf_counter() - started) * 1000:.1f}ms (paid once, in the AgentOS lifespan)")
+        report(f"pool of {args.pool_size}", await measure(partial(pooled, tools)))
+        print(tools.pool.stats.to_dict())
+        await tools.close()
+
+    asyncio.run(main())
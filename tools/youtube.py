@@ -0,0 +1,514 @@
+"""
+YouTube transcript store and search tools for the YouTube agent.
+
+Captions are fetched once per video, split into time windows and stored in Postgres next to the agent sessions.
+Instead of pulling the whole transcript into the context on every question, the agent searches the windows relevant
+to the question or reads a map-reduce summary. The summary is computed in the background as soon as the transcript is
+stored, and cached with it.
+
+Usage:
+    python -m tools.youtube --fixture tools/fixtures/youtube_transcript.json --offline "how do I reduce costs?"
+"""
+
+import json
+import re
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional
+from urllib.parse import urlencode
+from urllib.request import urlopen
+
+from agno.agent import Agent
+from agno.models.base import Model
+from agno.tools.youtube import YouTubeTools
+from agno.utils.log import log_debug, log_info, log_warning
+from sqlalchemy import Column, DateTime, Float, Integer, MetaData, String, Table, Text, func, literal_column, text
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.sql.expression import delete, select
+
+try:
+    from youtube_transcript_api import YouTubeTranscriptApi, YouTubeTranscriptApiException
+except ImportError:
+    raise ImportError(
+        "`youtube_transcript_api` not installed. Please install using `pip install youtube_transcript_api`"
+    )
+
+# (instructions, text) -> summary
+Summarizer = Callable[[str, str], str]
+
+
+@dataclass
+class TranscriptChunk:
+    index: int
+    start: float
+    end: float
+    text: str
+
+    def format(self) -> str:
+        return f"[{format_timestamp(self.start)}-{format_timestamp(self.end)}] {self.text}"
+
+
+def format_timestamp(seconds: float) -> str:
+    minutes, secs = divmod(int(seconds), 60)
+    hours, minutes = divmod(minutes, 60)
+    return f"{hours}:{minutes:02d}:{secs:02d}" if hours else f"{minutes}:{secs:02d}"
+
+
+def parse_timestamp(value: str) -> float:
+    """Parse `h:mm:ss`, `m:ss` or a number of seconds."""
+    seconds = 0.0
+    for part in value.strip().split(":"):
+        seconds = seconds * 60 + float(part)
+    return seconds
+
+
+def chunk_transcript(snippets: List[Dict[str, Any]], window_seconds: float = 60) -> List[TranscriptChunk]:
+    """Group caption snippets (`text`, `start`, `duration`) into windows of about `window_seconds`."""
+    chunks: List[TranscriptChunk] = []
+    lines: List[str] = []
+    window_start = end = 0.0
+    for snippet in snippets:
+        start = float(snippet["start"])
+        if lines and start - window_start >= window_seconds:
+            chunks.append(TranscriptChunk(len(chunks), window_start, end, " ".join(lines)))
+            lines = []
+        if not lines:
+            window_start = start
+        lines.append(snippet["text"].replace("\n", " ").strip())
+        end = start + float(snippet.get("duration", 0))
+    if lines:
+        chunks.append(TranscriptChunk(len(chunks), window_start, end, " ".join(lines)))
+    return chunks
+
+
+# ============================================================================
+# Store
+# ============================================================================
+class TranscriptStore:
+    """
+    Transcripts and their summaries, keyed by video id, stored as timestamped windows in Postgres.
+
+    Args:
+        db_engine (Engine): Engine of the database, usually `demo_db.db_engine`.
+        schema (str): Schema of the transcript tables.
+    """
+
+    def __init__(self, db_engine: Engine, schema: str = "ai"):
+        self.db_engine = db_engine
+        self.schema = schema
+        metadata = MetaData(schema=schema)
+        self.transcripts = Table(
+            "youtube_transcripts",
+            metadata,
+            Column("video_id", String, primary_key=True),
+            Column("title", String),
+            Column("language", String),
+            Column("duration", Float),
+            Column("num_chunks", Integer),
+            Column("summary", Text),
+            Column("created_at", DateTime(timezone=True), server_default=func.now()),
+            Column("summarized_at", DateTime(timezone=True)),
+        )
+        self.chunks = Table(
+            "youtube_transcript_chunks",
+            metadata,
+            Column("video_id", String, primary_key=True),
+            Column("chunk_index", Integer, primary_key=True),
+            Column("start", Float, nullable=False),
+            Column("end", Float, nullable=False),
+            Column("text", Text, nullable=False),
+        )
+        self._metadata = metadata
+        self._tables_ready = False
+
+    def _ensure_tables(self) -> None:
+        if not self._tables_ready:
+            with self.db_engine.begin() as conn:
+                conn.execute(text(f"CREATE SCHEMA IF NOT EXISTS {self.schema};"))
+            self._metadata.create_all(self.db_engine, checkfirst=True)
+            self._tables_ready = True
+
+    def get(self, video_id: str) -> Optional[Dict[str, Any]]:
+        self._ensure_tables()
+        with self.db_engine.connect() as conn:
+            row = conn.execute(select(self.transcripts).where(self.transcripts.c.video_id == video_id)).first()
+        return dict(row._mapping) if row else None
+
+    def save(
+        self,
+        video_id: str,
+        chunks: List[TranscriptChunk],
+        title: Optional[str] = None,
+        language: Optional[str] = None,
+        replace: bool = False,
+    ) -> bool:
+        """
+        Store the windows of a video and return whether this call stored them. The first writer wins, so concurrent
+        first loads of a video don't conflict; pass `replace` to overwrite, e.g. after changing the window size.
+        """
+        self._ensure_tables()
+        transcript = {
+            "video_id": video_id,
+            "title": title,
+            "language": language,
+            "duration": chunks[-1].end if chunks else 0.0,
+            "num_chunks": len(chunks),
+            "summary": None,
+            "summarized_at": None,
+        }
+        insert_stmt = postgresql.insert(self.transcripts).values(transcript)
+        with self.db_engine.begin() as conn:
+            if replace:
+                conn.execute(
+                    insert_stmt.on_conflict_do_update(
+                        index_elements=["video_id"], set_={k: v for k, v in transcript.items() if k != "video_id"}
+                    )
+                )
+                conn.execute(delete(self.chunks).where(self.chunks.c.video_id == video_id))
+            elif not conn.execute(insert_stmt.on_conflict_do_nothing(index_elements=["video_id"])).rowcount:
+                log_debug(f"Transcript of video {video_id} was already stored")
+                return False
+            if chunks:
+                conn.execute(
+                    postgresql.insert(self.chunks).on_conflict_do_nothing(),
+                    [
+                        {"video_id": video_id, "chunk_index": c.index, "start": c.start, "end": c.end, "text": c.text}
+                        for c in chunks
+                    ],
+                )
+        log_debug(f"Stored {len(chunks)} transcript windows for video {video_id}")
+        return True
+
+    def _to_chunks(self, rows: Any) -> List[TranscriptChunk]:
+        return [TranscriptChunk(row.chunk_index, row.start, row.end, row.text) for row in rows]
+
+    def get_chunks(
+        self, video_id: str, start: Optional[float] = None, end: Optional[float] = None
+    ) -> List[TranscriptChunk]:
+        """All windows of a video, or those overlapping [`start`, `end`]."""
+        stmt = select(self.chunks).where(self.chunks.c.video_id == video_id)
+        if start is not None:
+            stmt = stmt.where(self.chunks.c.end >= start)
+        if end is not None:
+            stmt = stmt.where(self.chunks.c.start <= end)
+        with self.db_engine.connect() as conn:
+            return self._to_chunks(conn.execute(stmt.order_by(self.chunks.c.chunk_index)))
+
+    def search(self, video_id: str, query: str, limit: int = 4) -> List[TranscriptChunk]:
+        """Windows that best match any of the query terms, by full-text rank, returned in time order."""
+        terms = re.findall(r"\w+", query.lower())
+        if not terms:
+            return []
+        ts_vector = func.to_tsvector(literal_column("'english'"), self.chunks.c.text)
+        # OR the terms, so questions phrased in natural language still match. websearch_to_tsquery never fails on
+        # user text, where to_tsquery rejects terms like `_`.
+        ts_query = func.websearch_to_tsquery(literal_column("'english'"), " or ".join(terms))
+        rank = func.ts_rank_cd(ts_vector, ts_query)
+        best = (
+            select(self.chunks, rank.label("rank"))
+            .where(self.chunks.c.video_id == video_id, ts_vector.op("@@")(ts_query))
+            .order_by(rank.desc())
+            .limit(limit)
+            .subquery()
+        )
+        with self.db_engine.connect() as conn:
+            return self._to_chunks(conn.execute(select(best).order_by(best.c.chunk_index)))
+
+    def save_summary(self, video_id: str, summary: str) -> None:
+        with self.db_engine.begin() as conn:
+            conn.execute(
+                self.transcripts.update()
+                .where(self.transcripts.c.video_id == video_id)
+                .values(summary=summary, summarized_at=func.now())
+            )
+
+
+# ============================================================================
+# Map-reduce summary
+# ============================================================================
+MAP_INSTRUCTIONS = "Summarize this section of a video transcript in 2-4 short bullet points. Keep names and numbers."
+REDUCE_INSTRUCTIONS = (
+    "Combine these timestamped section summaries of one video into a summary: a 2-3 sentence overview, "
+    "then the key points as bullets, each starting with the timestamp of its section."
+)
+
+
+def model_summarizer(model: Model) -> Summarizer:
+    """Summarizer that calls `model`, preferably a small and fast one."""
+
+    def summarize(instructions: str, content: str) -> str:
+        agent = Agent(model=model, instructions=instructions, markdown=False, telemetry=False)
+        return str(agent.run(content).content or "")
+
+    return summarize
+
+
+def extractive_summarizer(instructions: str, content: str) -> str:
+    """
+    Offline summarizer used to test and benchmark without a model.
+
+    The map step keeps the first two complete sentences of a section; the reduce step returns its input.
+    """
+    if instructions == REDUCE_INSTRUCTIONS:
+        return content
+    sentences = re.findall(r"[A-Z][^.!?]*[.!?]", content)
+    return "\n".join(f"- {sentence}" for sentence in sentences[:2])
+
+
+def map_reduce_summary(
+    chunks: List[TranscriptChunk], summarizer: Summarizer, section_seconds: float = 300, max_workers: int = 4
+) -> str:
+    """Summarize sections of about `section_seconds` concurrently, then combine the section summaries."""
+    sections: List[List[TranscriptChunk]] = []
+    for chunk in chunks:
+        if not sections or chunk.end - sections[-1][0].start > section_seconds:
+            sections.append([])
+        sections[-1].append(chunk)
+
+    def summarize_section(section: List[TranscriptChunk]) -> str:
+        content = " ".join(chunk.text for chunk in section)
+        summary = summarizer(MAP_INSTRUCTIONS, content)
+        return f"[{format_timestamp(section[0].start)}-{format_timestamp(section[-1].end)}]\n{summary}"
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        section_summaries = list(executor.map(summarize_section, sections))
+    if len(section_summaries) == 1:
+        return section_summaries[0]
+    return summarizer(REDUCE_INSTRUCTIONS, "\n\n".join(section_summaries))
+
+
+# ============================================================================
+# Toolkit
+# ============================================================================
+class YouTubeTranscriptTools(YouTubeTools):
+    """
+    YouTube tools that serve transcripts from a `TranscriptStore` instead of returning the full captions.
+
+    Args:
+        store (TranscriptStore): Where transcripts and summaries are kept.
+        summarizer (Optional[Summarizer]): Summarizer used for the map-reduce summary. Defaults to gpt-5-mini.
+        window_seconds (float): Length of the stored transcript windows.
+        section_seconds (float): Length of the sections summarized in the map step.
+        max_search_windows (int): Upper bound on the windows returned by a search.
+        precompute_summary (bool): Summarize a video in the background once its transcript is stored, so that
+            `get_video_summary` doesn't wait for the map-reduce.
+    """
+
+    def __init__(
+        self,
+        store: TranscriptStore,
+        summarizer: Optional[Summarizer] = None,
+        window_seconds: float = 60,
+        section_seconds: float = 300,
+        max_search_windows: int = 8,
+        precompute_summary: bool = True,
+        **kwargs,
+    ):
+        super().__init__(enable_get_video_captions=False, enable_get_video_timestamps=False, **kwargs)
+        if summarizer is None:
+            from agno.models.openai import OpenAIChat
+
+            summarizer = model_summarizer(OpenAIChat(id="gpt-5-mini"))
+        self.store = store
+        self.summarizer = summarizer
+        self.window_seconds = window_seconds
+        self.section_seconds = section_seconds
+        self.max_search_windows = max_search_windows
+        self.precompute_summary = precompute_summary
+        self._summary_pool = ThreadPoolExecutor(max_workers=2, thread_name_prefix="youtube-summary")
+        self._pending_summaries: Dict[str, Future] = {}
+        self._pending_lock = threading.Lock()
+        self.register(self.search_video_transcript)
+        self.register(self.get_video_transcript_window)
+        self.register(self.get_video_summary)
+
+    def fetch_snippets(self, video_id: str) -> List[Dict[str, Any]]:
+        kwargs: Dict[str, Any] = {}
+        if self.languages:
+            kwargs["languages"] = self.languages
+        if self.proxies:
+            kwargs["proxies"] = self.proxies
+        captions = YouTubeTranscriptApi().fetch(video_id, **kwargs)
+        return [{"text": s.text, "start": s.start, "duration": s.duration} for s in captions]
+
+    def fetch_title(self, video_id: str) -> Optional[str]:
+        """Title of the video from YouTube's oEmbed endpoint, None when it can't be fetched."""
+        params = urlencode({"format": "json", "url": f"https://www.youtube.com/watch?v={video_id}"})
+        try:
+            with urlopen(f"https://www.youtube.com/oembed?{params}", timeout=10) as response:
+                return json.loads(response.read().decode()).get("title")
+        except (OSError, ValueError) as e:
+            log_debug(f"Could not fetch the title of video {video_id}: {e}")
+            return None
+
+    def load_transcript(self, video_id: str) -> Dict[str, Any]:
+        """Return the stored transcript of a video, fetching and storing the captions on first use."""
+        transcript = self.store.get(video_id)
+        if transcript is None:
+            log_info(f"Fetching captions for video {video_id}")
+            chunks = chunk_transcript(self.fetch_snippets(video_id), self.window_seconds)
+            language = self.languages[0] if self.languages else None
+            stored = self.store.save(video_id, chunks, title=self.fetch_title(video_id), language=language)
+            if stored and self.precompute_summary:
+                self._start_summary(video_id)
+            # Re-read: another worker may have stored the video first
+            transcript = self.store.get(video_id)
+        return transcript or {}
+
+    def _video_id(self, url: str) -> str:
+        video_id = self.get_youtube_video_id(url) if "/" in url else url
+        if not video_id:
+            raise ValueError("Error getting video ID from URL, please provide a valid YouTube url")
+        return video_id
+
+    def search_video_transcript(self, url: str, query: str, num_windows: int = 4) -> str:
+        """Use this function to answer a question about a YouTube video. It returns only the timestamped
+        transcript windows most relevant to the query, instead of the full captions.
+
+        Args:
+            url: The URL of the YouTube video.
+            query: What to look for, e.g. the question or its key terms.
+            num_windows: How many transcript windows to return. Defaults to 4.
+
+        Returns:
+            str: The matching windows in time order, each prefixed with its [start-end] timestamps.
+        """
+        try:
+            video_id = self._video_id(url)
+            transcript = self.load_transcript(video_id)
+            chunks = self.store.search(video_id, query, limit=min(num_windows, self.max_search_windows))
+            if not chunks:
+                return f"No transcript windows match '{query}'. Try other terms or use get_video_summary."
+            header = f"Video {video_id} ({format_timestamp(transcript.get('duration') or 0)} long)"
+            return "\n".join([header, *[chunk.format() for chunk in chunks]])
+        except (ValueError, YouTubeTranscriptApiException, SQLAlchemyError, OSError) as e:
+            return f"Error searching transcript: {e}"
+
+    def get_video_transcript_window(self, url: str, start: str, end: str) -> str:
+        """Use this function to read what is said in a YouTube video between two timestamps.
+
+        Args:
+            url: The URL of the YouTube video.
+            start: Start timestamp, e.g. "12:30" or "1:02:00".
+            end: End timestamp, e.g. "15:00".
+
+        Returns:
+            str: The transcript windows overlapping the time range, with timestamps.
+        """
+        try:
+            video_id = self._video_id(url)
+            self.load_transcript(video_id)
+            chunks = self.store.get_chunks(video_id, parse_timestamp(start), parse_timestamp(end))
+            return "\n".join(chunk.format() for chunk in chunks) or f"No transcript between {start} and {end}"
+        except (ValueError, YouTubeTranscriptApiException, SQLAlchemyError, OSError) as e:
+            return f"Error getting transcript window: {e}"
+
+    def get_video_summary(self, url: str) -> str:
+        """Use this function to get a summary of a whole YouTube video, with timestamped key points.
+        The summary is computed once per video, when its transcript is first loaded, and cached.
+
+        Args:
+            url: The URL of the YouTube video.
+
+        Returns:
+            str: The summary of the video.
+        """
+        try:
+            video_id = self._video_id(url)
+            return self.summarize(video_id)
+        except (ValueError, YouTubeTranscriptApiException, SQLAlchemyError, OSError) as e:
+            return f"Error summarizing video: {e}"
+
+    def _start_summary(self, video_id: str) -> None:
+        with self._pending_lock:
+            if video_id in self._pending_summaries:
+                return
+            future = self._summary_pool.submit(self._compute_summary, video_id)
+            self._pending_summaries[video_id] = future
+
+        def done(future: Future) -> None:
+            with self._pending_lock:
+                self._pending_summaries.pop(video_id, None)
+            if future.exception() is not None:
+                log_warning(f"Could not summarize video {video_id}: {future.exception()}")
+
+        future.add_done_callback(done)
+
+    def summarize(self, video_id: str) -> str:
+        """Return the cached summary of a video, waiting for the one being computed or computing it if needed."""
+        transcript = self.load_transcript(video_id)
+        if transcript.get("summary"):
+            return transcript["summary"]
+        with self._pending_lock:
+            pending = self._pending_summaries.get(video_id)
+        if pending is not None:
+            return pending.result()
+        return self._compute_summary(video_id)
+
+    def _compute_summary(self, video_id: str) -> str:
+        started = time.perf_counter()
+        summary = map_reduce_summary(self.store.get_chunks(video_id), self.summarizer, self.section_seconds)
+        self.store.save_summary(video_id, summary)
+        log_info(f"Summarized video {video_id} in {time.perf_counter() - started:.1f}s")
+        return summary
+
+
+def load_fixture(path: str) -> Dict[str, Any]:
+    """Load a transcript fixture: `video_id`, `title`, `language` and caption `snippets`."""
+    with open(path) as f:
+        return json.load(f)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    from db.pool import get_engine
+
+    parser = argparse.ArgumentParser(description="Load a transcript into the store and compare context sizes")
+    parser.add_argument("queries", nargs="*", default=["how do I reduce costs?", "what about memory?"])
+    parser.add_argument("--fixture", help="Transcript fixture to load instead of fetching captions")
+    parser.add_argument("--url", help="YouTube URL to fetch captions for")
+    parser.add_argument("--window-seconds", type=float, default=60)
+    parser.add_argument("--section-seconds", type=float, default=300)
+    parser.add_argument("--offline", action="store_true", help="Use the extractive summarizer instead of a model")
+    args = parser.parse_args()
+
+    store = TranscriptStore(get_engine())
+    tools = YouTubeTranscriptTools(
+        store,
+        summarizer=extractive_summarizer if args.offline else None,
+        window_seconds=args.window_seconds,
+        section_seconds=args.section_seconds,
+    )
+    if args.fixture:
+        fixture = load_fixture(args.fixture)
+        video_id = fixture["video_id"]
+        snippets = fixture["snippets"]
+        store.save(
+            video_id,
+            chunk_transcript(snippets, args.window_seconds),
+            fixture.get("title"),
+            fixture["language"],
+            replace=True,
+        )
+    elif args.url:
+        video_id = tools._video_id(args.url)
+        snippets = tools.fetch_snippets(video_id)
+    else:
+        parser.error("Provide --fixture or --url")
+
+    full_captions = " ".join(snippet["text"] for snippet in snippets)
+    print(f"full captions: {len(full_captions):>7} chars")
+    for query in args.queries:
+        started = time.perf_counter()
+        result = tools.search_video_transcript(video_id, query)
+        print(f"search '{query}': {len(result):>7} chars in {(time.perf_counter() - started) * 1000:.1f}ms")
+    for attempt in ("first", "cached"):
+        started = time.perf_counter()
+        summary = tools.get_video_summary(video_id)
+        print(f"summary ({attempt}): {len(summary):>7} chars in {(time.perf_counter() - started) * 1000:.1f}ms")
+    print(f"\n{summary}")
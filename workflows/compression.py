@@ -0,0 +1,514 @@
+"""
+Cross-source consolidation of researcher outputs before they are handed to the writer.
+
+The researchers often cite the same pages and repeat the same facts. `compress_research()`:
+
+1. Extracts every citation, dedupes it by canonical URL and replaces it with a numbered reference (`[3]`), listing each
+   source once in a trailing "Sources" section. Footnotes written by the researchers (`[1]` with a `[1]: url` or
+   `1. [title](url)` list) are resolved against their own section's list, then the lists are dropped: their URLs are
+   already in that section. Once the research is merged, references are renumbered in order of appearance. Code and
+   other brackets (`arr[1]`, `[2023]`) are left as written.
+2. Collapses near-duplicate paragraphs across (and within) sources using MinHash over word shingles. The first copy is
+   kept and inherits the references of the dropped copies, so no source is lost.
+3. Enforces a token budget by trimming the last paragraphs of the largest sections. The sources are always kept.
+
+Usage:
+    python -m workflows.compression --fixture workflows/fixtures/research_outputs.json --budget 1000
+"""
+
+import re
+import zlib
+from dataclasses import dataclass, field
+from functools import lru_cache
+from typing import Callable, Dict, List, Optional, Set, Tuple
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+import numpy as np
+
+# Rough size of a token for English markdown, used to enforce the budget without a tokenizer
+CHARS_PER_TOKEN = 4
+TRACKING_PARAMS = {"ref", "source", "fbclid", "gclid", "mc_cid", "mc_eid"}
+GENERIC_TITLES = {"source", "link", "here", "docs", "this", "article"}
+# Sentences shorter than this are too generic to be compared
+MIN_SENTENCE_WORDS = 8
+
+# While the research is consolidated, references are private-use markers, so they can't be confused with the brackets
+# of the research itself. They are written as `[n]` once renumbered.
+REFERENCE_OPEN, REFERENCE_CLOSE = "\ue000", "\ue001"
+REFERENCE_PATTERN = re.compile(rf"{REFERENCE_OPEN}(\d+){REFERENCE_CLOSE}")
+LINK_PATTERN = re.compile(r"\[([^\]]+)\]\((https?://[^)\s]+)\)|(https?://[^\s<>()\[\]]+)")
+REFERENCE_LINE_PATTERN = re.compile(rf"^\s*(?:[-*+]|\d+[.)])\s+(?:\[[^\]]*\])?{REFERENCE_PATTERN.pattern}\s*$")
+# Fenced code blocks (closed or running to the end of the text) and inline code spans
+CODE_PATTERN = re.compile(r"^[ \t]*```.*?(?:^[ \t]*```[^\n]*$|\Z)|`[^`\n]+`", re.MULTILINE | re.DOTALL)
+HEADING_PATTERN = re.compile(r"^(#{1,6})\s+(.*)$")
+SENTENCE_PATTERN = re.compile(r"(?<=[.!?])\s+")
+# Footnote definitions of a researcher: `[1]: url "title"`, `[^1]: url`, `1. [title](url)`, `[1] url`, ...
+FOOTNOTE_PATTERN = re.compile(
+    r"^\s*(?:\[\^?(\d+)\]:?|(\d+)[.)])\s+"
+    r'(?:\[([^\]]+)\]\((https?://[^)\s]+)\)|<?(https?://[^\s>]+)>?(?:\s+"([^"]*)")?)\s*$'
+)
+# A footnote marker: `[1]`, `[^1]`, or the label of a reference-style link `[title][1]`
+FOOTNOTE_MARKER_PATTERN = re.compile(r"\[\^?(\d+)\](?![(:])")
+
+
+def estimate_tokens(text: str) -> int:
+    return -(-len(text) // CHARS_PER_TOKEN)
+
+
+def reference(number: int) -> str:
+    return f"{REFERENCE_OPEN}{number}{REFERENCE_CLOSE}"
+
+
+def outside_code(text: str, replace: Callable[[str], str]) -> str:
+    """Apply `replace` to the parts of `text` that are not fenced code or inline code."""
+    parts: List[str] = []
+    position = 0
+    for match in CODE_PATTERN.finditer(text):
+        parts.extend((replace(text[position : match.start()]), match.group(0)))
+        position = match.end()
+    parts.append(replace(text[position:]))
+    return "".join(parts)
+
+
+# ============================================================================
+# Citations
+# ============================================================================
+def _split_url(url: str) -> Tuple[str, str, str, str]:
+    parts = urlsplit(url)
+    query = [(k, v) for k, v in parse_qsl(parts.query, keep_blank_values=True) if not _is_tracking(k)]
+    return parts.scheme.lower(), parts.netloc.lower(), parts.path, urlencode(sorted(query))
+
+
+def _is_tracking(param: str) -> bool:
+    return param.lower().startswith("utm_") or param.lower() in TRACKING_PARAMS
+
+
+def canonical_url(url: str) -> str:
+    """Key identifying the page behind `url`: scheme, `www.`, trailing slash, fragment and tracking params ignored."""
+    _, netloc, path, query = _split_url(url)
+    netloc = netloc.removeprefix("www.")
+    return urlunsplit(("https", netloc, path.rstrip("/"), query, ""))
+
+
+def clean_url(url: str) -> str:
+    """`url` without tracking params and fragment, as shown in the sources."""
+    scheme, netloc, path, query = _split_url(url)
+    return urlunsplit((scheme, netloc, path, query, ""))
+
+
+@dataclass
+class Source:
+    number: int
+    url: str
+    titles: List[str] = field(default_factory=list)
+
+    @property
+    def title(self) -> Optional[str]:
+        # Prefer a descriptive link text over "Source", "docs", ...
+        return max(self.titles, key=len) if self.titles else None
+
+
+@dataclass
+class Citations:
+    sources: Dict[str, Source] = field(default_factory=dict)
+    occurrences: int = 0
+
+    def reference(self, url: str, title: Optional[str] = None) -> int:
+        self.occurrences += 1
+        key = canonical_url(url)
+        source = self.sources.get(key)
+        if source is None:
+            source = self.sources[key] = Source(number=len(self.sources) + 1, url=clean_url(url))
+        if title and title.lower() not in GENERIC_TITLES and title not in source.titles:
+            source.titles.append(title)
+        return source.number
+
+    def rewrite(
+        self, text: str, footnotes: Optional[Dict[int, Tuple[str, Optional[str]]]] = None
+    ) -> Tuple[str, Set[int]]:
+        """
+        Replace the links in `text` with numbered references, returning the numbers used. Footnote markers are
+        resolved against `footnotes` (the definitions of the section). Brackets without a definition and code are
+        left as written.
+        """
+        numbers: Set[int] = set()
+
+        def replace_footnote(match: re.Match) -> str:
+            footnote = (footnotes or {}).get(int(match.group(1)))
+            if footnote is None:
+                return match.group(0)
+            number = self.reference(*footnote)
+            numbers.add(number)
+            return reference(number)
+
+        def replace(match: re.Match) -> str:
+            title, link_url, bare_url = match.groups()
+            if link_url:
+                number = self.reference(link_url, title)
+                numbers.add(number)
+                return f"[{title}]{reference(number)}"
+            # Punctuation right after a bare URL belongs to the sentence
+            url = bare_url.rstrip(".,;:!?'\"")
+            number = self.reference(url)
+            numbers.add(number)
+            return f"{reference(number)}{bare_url[len(url) :]}"
+
+        def rewrite_prose(prose: str) -> str:
+            if footnotes:
+                prose = FOOTNOTE_MARKER_PATTERN.sub(replace_footnote, prose)
+            return LINK_PATTERN.sub(replace, prose)
+
+        return outside_code(text, rewrite_prose), numbers
+
+    def numbers(self, text: str) -> Set[int]:
+        """Reference numbers used in text that was already rewritten."""
+        return {int(number) for number in REFERENCE_PATTERN.findall(text)}
+
+    def renumber(self, texts: List[str]) -> Dict[int, int]:
+        """
+        Number the sources in order of first reference in `texts`, the final text of the merged research. Sources
+        that are no longer referenced (their paragraphs were trimmed) come last. Returns the old to new numbers.
+        """
+        order: Dict[int, None] = {}
+        for text in texts:
+            for number in REFERENCE_PATTERN.findall(text):
+                order.setdefault(int(number))
+        by_number = {source.number: key for key, source in self.sources.items()}
+        for number in by_number:
+            order.setdefault(number)
+        mapping = {old: new for new, old in enumerate((n for n in order if n in by_number), start=1)}
+        sources: Dict[str, Source] = {}
+        for old, new in mapping.items():
+            key = by_number[old]
+            sources[key] = self.sources[key]
+            sources[key].number = new
+        self.sources = sources
+        return mapping
+
+    def render(self) -> str:
+        lines = []
+        for source in self.sources.values():
+            title = f' "{source.title.replace(chr(34), chr(39))}"' if source.title else ""
+            lines.append(f"[{source.number}]: {source.url}{title}")
+        return "\n".join(lines)
+
+
+# ============================================================================
+# Near-duplicate detection
+# ============================================================================
+MINHASH_PRIME = (1 << 31) - 1
+
+
+@lru_cache(maxsize=4)
+def _permutations(num_perm: int, seed: int = 7) -> Tuple[np.ndarray, np.ndarray]:
+    rng = np.random.default_rng(seed)
+    return rng.integers(1, MINHASH_PRIME, num_perm, dtype=np.int64), rng.integers(
+        0, MINHASH_PRIME, num_perm, dtype=np.int64
+    )
+
+
+def shingles(text: str, size: int = 3) -> Set[str]:
+    """Word n-grams of `text` with markdown, references and URLs removed."""
+    words = re.sub(rf"{REFERENCE_PATTERN.pattern}|https?://\S+|[^\w\s]", " ", text.lower()).split()
+    if len(words) <= size:
+        return {" ".join(words)} if words else set()
+    return {" ".join(words[i : i + size]) for i in range(len(words) - size + 1)}
+
+
+def minhash(shingle_set: Set[str], num_perm: int = 64) -> np.ndarray:
+    a, b = _permutations(num_perm)
+    hashes = np.fromiter((zlib.crc32(s.encode()) % MINHASH_PRIME for s in shingle_set), dtype=np.int64)
+    # a < 2^31 and hashes < 2^31, so the products fit in int64
+    return ((np.outer(a, hashes) + b[:, None]) % MINHASH_PRIME).min(axis=1)
+
+
+# ============================================================================
+# Consolidation
+# ============================================================================
+@dataclass
+class Block:
+    section: str
+    text: str
+    heading_level: int = 0
+    code: bool = False
+    references: Set[int] = field(default_factory=set)
+    tokens: int = 0
+
+
+@dataclass
+class CompressionStats:
+    input_tokens: int = 0
+    output_tokens: int = 0
+    blocks: int = 0
+    duplicate_blocks: int = 0
+    duplicate_sentences: int = 0
+    reference_blocks: int = 0
+    trimmed_blocks: int = 0
+    citations: int = 0
+    sources: int = 0
+
+
+class DuplicateIndex:
+    """MinHash signatures of the text kept so far, each pointing to the block that holds it."""
+
+    def __init__(self, threshold: float, num_perm: int):
+        self.threshold = threshold
+        self.num_perm = num_perm
+        self._signatures = np.empty((0, num_perm), dtype=np.int64)
+        self._blocks: List[Block] = []
+
+    def match(self, text: str) -> Tuple[Optional[Block], Optional[np.ndarray]]:
+        """Return the block holding a near-duplicate of `text` (if any) and the signature of `text`."""
+        shingle_set = shingles(text)
+        if not shingle_set:
+            return None, None
+        signature = minhash(shingle_set, self.num_perm)
+        if self._blocks:
+            similarity = (self._signatures == signature).mean(axis=1)
+            best = int(similarity.argmax())
+            if similarity[best] >= self.threshold:
+                return self._blocks[best], signature
+        return None, signature
+
+    def add(self, signature: np.ndarray, block: Block) -> None:
+        self._signatures = np.vstack([self._signatures, signature])
+        self._blocks.append(block)
+
+
+def _inherit_references(block: Block, references: Set[int]) -> None:
+    """Cite the sources of a dropped duplicate on the copy that is kept."""
+    missing = sorted(references - block.references)
+    if missing:
+        block.text += ("\n" if block.code else " ") + "".join(reference(number) for number in missing)
+        block.references.update(missing)
+
+
+def _dedupe_sentences(block: Block, index: DuplicateIndex, citations: Citations) -> int:
+    """Remove the sentences of `block` that repeat an earlier sentence, returning how many were removed."""
+    removed = 0
+    lines: List[str] = []
+    for line in block.text.split("\n"):
+        sentences: List[str] = []
+        for sentence in SENTENCE_PATTERN.split(line):
+            if len(sentence.split()) >= MIN_SENTENCE_WORDS:
+                duplicate_of, signature = index.match(sentence)
+                if duplicate_of is not None:
+                    _inherit_references(duplicate_of, citations.numbers(sentence))
+                    removed += 1
+                    continue
+                if signature is not None:
+                    index.add(signature, block)
+            sentences.append(sentence)
+        if sentences:
+            lines.append(" ".join(sentences))
+    block.text = "\n".join(lines)
+    block.references = citations.numbers(block.text)
+    return removed
+
+
+def _extract_footnotes(content: str) -> Tuple[str, Dict[int, Tuple[str, Optional[str]]]]:
+    """Remove the footnote definitions from `content`, returning them by number as (url, title)."""
+    footnotes: Dict[int, Tuple[str, Optional[str]]] = {}
+    lines: List[str] = []
+    in_code = False
+    for line in content.split("\n"):
+        if line.lstrip().startswith("```"):
+            in_code = not in_code
+        match = None if in_code else FOOTNOTE_PATTERN.match(line)
+        if match is None:
+            lines.append(line)
+            continue
+        number, list_number, link_title, link_url, bare_url, quoted_title = match.groups()
+        footnotes[int(number or list_number)] = (link_url or bare_url, link_title or quoted_title)
+    return "\n".join(lines), footnotes
+
+
+def _paragraphs(content: str) -> List[str]:
+    """Split markdown on blank lines, keeping each fenced code block whole."""
+    paragraphs: List[List[str]] = [[]]
+    in_code = False
+    for line in content.strip().split("\n"):
+        fence = line.lstrip().startswith("```")
+        if fence and not in_code and paragraphs[-1]:
+            paragraphs.append([])
+        if in_code or fence or line.strip():
+            paragraphs[-1].append(line)
+        elif paragraphs[-1]:
+            paragraphs.append([])
+        if fence:
+            in_code = not in_code
+            if not in_code:
+                paragraphs.append([])
+    return ["\n".join(lines) for lines in paragraphs if lines]
+
+
+def _split_blocks(section: str, content: str) -> List[Block]:
+    blocks: List[Block] = []
+    for chunk in _paragraphs(content):
+        if chunk.lstrip().startswith("```"):
+            blocks.append(Block(section, chunk, code=True))
+            continue
+        lines = chunk.strip().split("\n")
+        # A heading directly followed by text becomes its own block
+        while lines and (heading := HEADING_PATTERN.match(lines[0].strip())):
+            blocks.append(Block(section, lines.pop(0).strip(), heading_level=len(heading.group(1))))
+        if lines:
+            blocks.append(Block(section, "\n".join(lines)))
+    return blocks
+
+
+def _drop_empty_headings(blocks: List[Block]) -> List[Block]:
+    """Drop headings that no longer have any content before the next heading of the same or a higher level."""
+    kept: List[Block] = []
+    for block in reversed(blocks):
+        if block.heading_level:
+            following = kept[-1] if kept else None
+            if (
+                following is None
+                or following.section != block.section
+                or (following.heading_level and following.heading_level <= block.heading_level)
+            ):
+                continue
+        kept.append(block)
+    return kept[::-1]
+
+
+def compress_research(
+    sections: Dict[str, str],
+    token_budget: Optional[int] = None,
+    similarity_threshold: float = 0.7,
+    num_perm: int = 64,
+) -> Tuple[str, CompressionStats]:
+    """
+    Consolidate the research of several sources into one markdown document.
+
+    Args:
+        sections (Dict[str, str]): Research markdown by source name, in priority order.
+        token_budget (Optional[int]): Maximum estimated tokens of the result. None keeps every unique paragraph.
+        similarity_threshold (float): Estimated Jaccard similarity above which two paragraphs (or sentences) are
+            duplicates.
+        num_perm (int): Number of MinHash permutations.
+
+    Returns:
+        Tuple[str, CompressionStats]: The consolidated research and what was removed from it.
+    """
+    stats = CompressionStats(input_tokens=sum(estimate_tokens(content) for content in sections.values()))
+    citations = Citations()
+    paragraphs = DuplicateIndex(similarity_threshold, num_perm)
+    sentences = DuplicateIndex(similarity_threshold, num_perm)
+    blocks: List[Block] = []
+
+    for name, content in sections.items():
+        content, footnotes = _extract_footnotes(content)
+        if footnotes:
+            stats.reference_blocks += 1
+        content, _ = citations.rewrite(content, footnotes)
+        for block in _split_blocks(name, content):
+            stats.blocks += 1
+            block.references = citations.numbers(block.text)
+            if block.heading_level:
+                blocks.append(block)
+                continue
+            if not block.code and all(REFERENCE_LINE_PATTERN.match(line) for line in block.text.split("\n")):
+                stats.reference_blocks += 1
+                continue
+
+            duplicate_of, signature = paragraphs.match(block.text)
+            if duplicate_of is not None:
+                _inherit_references(duplicate_of, block.references)
+                stats.duplicate_blocks += 1
+                continue
+            if not block.code:
+                stats.duplicate_sentences += _dedupe_sentences(block, sentences, citations)
+            if not block.text:
+                stats.duplicate_blocks += 1
+                continue
+            if signature is not None:
+                paragraphs.add(signature, block)
+            blocks.append(block)
+
+    blocks = _drop_empty_headings(blocks)
+    sources_text = citations.render()
+
+    def render(blocks: List[Block]) -> str:
+        parts: List[str] = []
+        for name in sections:
+            section_blocks = [block.text for block in blocks if block.section == name]
+            if section_blocks:
+                parts.append(f"## {name}\n\n" + "\n\n".join(section_blocks))
+        if sources_text:
+            parts.append(f"## Sources\n\n{sources_text}")
+        return "\n\n".join(parts) + "\n"
+
+    if token_budget is not None:
+        for block in blocks:
+            block.tokens = estimate_tokens(block.text) + 1
+        total = estimate_tokens(render(blocks))
+        while total > token_budget:
+            tokens_by_section: Dict[str, int] = {}
+            for block in blocks:
+                if not block.heading_level:
+                    tokens_by_section[block.section] = tokens_by_section.get(block.section, 0) + block.tokens
+            if not tokens_by_section:
+                break
+            largest = max(tokens_by_section, key=lambda name: tokens_by_section[name])
+            index = max(i for i, block in enumerate(blocks) if block.section == largest and not block.heading_level)
+            total -= blocks.pop(index).tokens
+            stats.trimmed_blocks += 1
+        blocks = _drop_empty_headings(blocks)
+
+    # Number the merged sources in reading order, so each `[n]` names one source and the list reads 1, 2, 3, ...
+    mapping = citations.renumber([block.text for block in blocks])
+    for block in blocks:
+        block.text = REFERENCE_PATTERN.sub(lambda match: f"[{mapping[int(match.group(1))]}]", block.text)
+    sources_text = citations.render()
+    result = render(blocks)
+    stats.output_tokens = estimate_tokens(result)
+    stats.citations = citations.occurrences
+    stats.sources = len(citations.sources)
+    return result, stats
+
+
+if __name__ == "__main__":
+    import argparse
+    import json
+    import time
+
+    parser = argparse.ArgumentParser(description="Measure research consolidation on recorded researcher outputs")
+    parser.add_argument("--fixture", default="workflows/fixtures/research_outputs.json")
+    parser.add_argument("--budget", type=int, default=None, help="Token budget of the consolidated research")
+    parser.add_argument("--threshold", type=float, default=0.7, help="Near-duplicate similarity threshold")
+    parser.add_argument("--show", action="store_true", help="Print the consolidated research")
+    args = parser.parse_args()
+
+    with open(args.fixture) as f:
+        outputs: Dict[str, str] = json.load(f)["outputs"]
+
+    # What the writer received before: every output pasted verbatim
+    baseline = "".join(f"## {name} \n\n{content}\n\n" for name, content in outputs.items())
+    compress_research(outputs, args.budget, args.threshold)  # Warm up numpy
+    started = time.perf_counter()
+    compressed, stats = compress_research(outputs, args.budget, args.threshold)
+    elapsed = time.perf_counter() - started
+
+    # URLs in code are not citations
+    prose = CODE_PATTERN.sub(" ", baseline)
+    input_urls = {canonical_url(m.group(2) or m.group(3).rstrip(".,;:!?")) for m in LINK_PATTERN.finditer(prose)}
+    output_urls = {canonical_url(m.group(2) or m.group(3)) for m in LINK_PATTERN.finditer(compressed)}
+    output_urls |= {canonical_url(url) for url in re.findall(r"^\[\d+\]: (\S+)", compressed, re.MULTILINE)}
+
+    if args.show:
+        print(compressed)
+    print(f"{'':<22}{'baseline':>10}{'compressed':>12}")
+    print(f"{'characters':<22}{len(baseline):>10}{len(compressed):>12}")
+    print(f"{'estimated tokens':<22}{estimate_tokens(baseline):>10}{stats.output_tokens:>12}")
+    print(f"{'citations':<22}{stats.citations:>10}{stats.sources:>12}")
+    print(f"reduction: {1 - stats.output_tokens / estimate_tokens(baseline):.1%}, in {elapsed * 1000:.2f}ms")
+    print(
+        f"paragraphs: {stats.blocks} in, {stats.duplicate_blocks} duplicates, {stats.reference_blocks} reference lists, "
+        f"{stats.trimmed_blocks} trimmed for the budget; {stats.duplicate_sentences} duplicate sentences"
+    )
+    print(f"sources kept: {len(output_urls & input_urls)}/{len(input_urls)}")
+    # Code and brackets that are not footnotes (`counts[1]`, `[2023]`) must come through unchanged
+    literals = set(CODE_PATTERN.findall(baseline)) | set(re.findall(r"\[(?:19|20)\d\d\]", prose))
+    print(f"code spans and bracketed years kept: {sum(literal in compressed for literal in literals)}/{len(literals)}")
@@ -0,0 +1,123 @@
+"""
+First-finished-first gathering of concurrent branches, with a per-branch deadline and a quorum.
+
+Branches are started together and their results are yielded as they complete. Once `quorum` branches have succeeded,
+stragglers get `grace` more seconds and are then cancelled, so the latency of the whole phase is bounded by the
+fastest sufficient branches instead of the slowest one.
+
+Usage:
+    python -m workflows.quorum --runs 100 --quorum 2 --deadline 60
+"""
+
+import asyncio
+import time
+from dataclasses import dataclass
+from typing import AsyncIterator, Awaitable, Callable, Dict, List, Optional
+
+
+@dataclass
+class BranchResult:
+    name: str
+    content: Optional[str] = None
+    success: bool = False
+    elapsed: float = 0.0
+    error: Optional[str] = None
+
+
+@dataclass
+class QuorumPolicy:
+    """
+    Args:
+        quorum (Optional[int]): Successful branches needed to proceed. None waits for every branch.
+        deadline (Optional[float]): Seconds after which a branch is cancelled and counted as failed.
+        grace (float): Seconds to keep waiting for the remaining branches once the quorum is reached.
+    """
+
+    quorum: Optional[int] = 2
+    deadline: Optional[float] = 90.0
+    grace: float = 0.0
+
+
+async def gather_quorum(
+    branches: Dict[str, Callable[[], Awaitable[Optional[str]]]], policy: QuorumPolicy
+) -> AsyncIterator[BranchResult]:
+    """Run `branches` concurrently and yield each result as soon as it is available, until the policy is met."""
+    started = time.perf_counter()
+
+    async def run(name: str, branch: Callable[[], Awaitable[Optional[str]]]) -> BranchResult:
+        try:
+            content = await asyncio.wait_for(branch(), timeout=policy.deadline)
+            return BranchResult(name, content, bool(content), time.perf_counter() - started)
+        except asyncio.TimeoutError:
+            return BranchResult(name, elapsed=time.perf_counter() - started, error="deadline exceeded")
+        except Exception as e:  # noqa: BLE001 - a failed branch must not fail the other branches
+            return BranchResult(name, elapsed=time.perf_counter() - started, error=str(e) or type(e).__name__)
+
+    tasks = [asyncio.create_task(run(name, branch), name=name) for name, branch in branches.items()]
+    quorum = min(policy.quorum or len(tasks), len(tasks))
+    succeeded = 0
+    wait_until: Optional[float] = None
+    pending = set(tasks)
+    try:
+        while pending:
+            timeout = None if wait_until is None else max(wait_until - time.perf_counter(), 0)
+            done, pending = await asyncio.wait(pending, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+            if not done:
+                break  # Grace period is over
+            for task in done:
+                result = task.result()
+                succeeded += result.success
+                yield result
+            if succeeded >= quorum and wait_until is None:
+                wait_until = time.perf_counter() + policy.grace
+    finally:
+        # Also runs when the consumer stops iterating early, so no branch outlives the phase
+        for task in pending:
+            task.cancel()
+    for task in pending:
+        yield BranchResult(task.get_name(), elapsed=time.perf_counter() - started, error="skipped after quorum")
+
+
+if __name__ == "__main__":
+    import argparse
+    import random
+    from statistics import quantiles
+
+    parser = argparse.ArgumentParser(description="Simulate research phase latency: wait for all vs quorum")
+    parser.add_argument("--runs", type=int, default=100)
+    parser.add_argument("--branches", type=int, default=3)
+    parser.add_argument("--quorum", type=int, default=2)
+    parser.add_argument("--deadline", type=float, default=60.0)
+    parser.add_argument("--median", type=float, default=0.05, help="Median branch latency in seconds")
+    parser.add_argument("--sigma", type=float, default=0.8, help="Log-normal spread of branch latency")
+    args = parser.parse_args()
+
+    def make_branch(delay: float) -> Callable[[], Awaitable[Optional[str]]]:
+        async def branch() -> Optional[str]:
+            await asyncio.sleep(delay)
+            return "research"
+
+        return branch
+
+    async def phase(policy: QuorumPolicy, delays: List[float]) -> float:
+        started = time.perf_counter()
+        branches = {f"branch-{i}": make_branch(delay) for i, delay in enumerate(delays)}
+        async for _ in gather_quorum(branches, policy):
+            pass
+        return time.perf_counter() - started
+
+    async def main() -> None:
+        rng = random.Random(0)
+        samples = [
+            [rng.lognormvariate(0, args.sigma) * args.median for _ in range(args.branches)] for _ in range(args.runs)
+        ]
+        for label, policy in (
+            ("wait for all", QuorumPolicy(quorum=None, deadline=args.deadline)),
+            (f"quorum {args.quorum}/{args.branches}", QuorumPolicy(quorum=args.quorum, deadline=args.deadline)),
+        ):
+            # One phase at a time so event loop contention does not skew the timings
+            latencies = [await phase(policy, delays) for delays in samples]
+            p = quantiles(latencies, n=100)
+            print(f"{label:<14} p50={p[49] * 1000:7.1f}ms p95={p[94] * 1000:7.1f}ms p99={p[98] * 1000:7.1f}ms")
+
+    asyncio.run(main())
@@ -0,0 +1,324 @@
+"""
+Topic-keyed cache of research workflow results, stored next to the agent sessions in `demo_db`.
+
+Requests are keyed on their normalized text. With an embedder, a request that misses the exact key is also matched
+against the cached requests by cosine similarity, so "latest news on rust?" reuses the research for "Latest Rust
+news". Entries expire after `ttl` seconds. A hit either returns the cached report (mode "full") or only reuses the
+research and lets the writer run again (mode "research").
+
+Usage:
+    python -m workflows.research_cache --lookup "latest rust news"
+    python -m workflows.research_cache --prune
+"""
+
+import asyncio
+import re
+import time
+from dataclasses import dataclass
+from hashlib import sha256
+from threading import Lock
+from typing import Any, Dict, List, Optional, Tuple
+
+from agno.knowledge.embedder.base import Embedder
+from agno.utils.log import log_debug, log_info, logger
+from pgvector.sqlalchemy import Vector
+from sqlalchemy import Column, DateTime, Float, Integer, MetaData, String, Table, Text, func, text
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.sql.expression import delete, select, update
+
+
+def normalize_topic(topic: str) -> str:
+    """Lowercase the request and drop punctuation and extra whitespace."""
+    return " ".join(re.sub(r"[^\w\s]", " ", topic.lower()).split())
+
+
+@dataclass
+class CachedResearch:
+    key: str
+    topic: str
+    research: str
+    report: Optional[str]
+    research_seconds: float
+    writer_seconds: Optional[float]
+    similarity: float = 1.0
+
+
+@dataclass
+class ResearchCacheStats:
+    exact_hits: int = 0
+    semantic_hits: int = 0
+    misses: int = 0
+    # Hits that returned the cached report, skipping the writer as well
+    report_hits: int = 0
+    saved_seconds: float = 0.0
+
+    @property
+    def hits(self) -> int:
+        return self.exact_hits + self.semantic_hits
+
+    @property
+    def hit_ratio(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "exact_hits": self.exact_hits,
+            "semantic_hits": self.semantic_hits,
+            "report_hits": self.report_hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hit_ratio, 4),
+            "saved_seconds": round(self.saved_seconds, 3),
+        }
+
+
+class ResearchCache:
+    """
+    Args:
+        db_engine (Engine): Engine of the database, usually `demo_db.db_engine`.
+        ttl (float): Seconds a cached result stays valid.
+        mode (str): "full" returns the cached report, "research" only reuses the research phase.
+        embedder (Optional[Embedder]): Embedder for near-duplicate lookup. Without one only exact keys match.
+        similarity_threshold (float): Minimum cosine similarity for a near-duplicate hit.
+        table_name (str): Name of the cache table.
+        schema (str): Schema of the cache table.
+    """
+
+    def __init__(
+        self,
+        db_engine: Engine,
+        ttl: float = 3600,
+        mode: str = "full",
+        embedder: Optional[Embedder] = None,
+        similarity_threshold: float = 0.92,
+        table_name: str = "research_workflow_cache",
+        schema: str = "ai",
+    ):
+        if mode not in ("full", "research"):
+            raise ValueError(f"Unknown research cache mode: {mode}")
+        self.db_engine = db_engine
+        self.ttl = ttl
+        self.mode = mode
+        self.embedder = embedder
+        self.similarity_threshold = similarity_threshold
+        self.schema = schema
+        self.stats = ResearchCacheStats()
+        self.table = Table(
+            table_name,
+            MetaData(schema=schema),
+            Column("key", String, primary_key=True),
+            Column("topic", Text, nullable=False),
+            Column("research", Text, nullable=False),
+            Column("report", Text),
+            Column("embedder_id", String),
+            Column("embedding", Vector()),
+            Column("research_seconds", Float, nullable=False),
+            Column("writer_seconds", Float),
+            Column("hits", Integer, nullable=False, server_default="0"),
+            Column("created_at", DateTime(timezone=True), server_default=func.now()),
+            Column("expires_at", DateTime(timezone=True), nullable=False, index=True),
+        )
+        # Runs whose research was stored and whose report is still being written: run id -> (key, research done at)
+        self._pending: Dict[str, Tuple[str, float]] = {}
+        self._lock = Lock()
+        self._table_ready = False
+
+    @property
+    def embedder_id(self) -> Optional[str]:
+        if self.embedder is None:
+            return None
+        return f"{getattr(self.embedder, 'id', None) or type(self.embedder).__name__}:{self.embedder.dimensions}"
+
+    def cache_key(self, topic: str) -> str:
+        return sha256(normalize_topic(topic).encode()).hexdigest()
+
+    def _ensure_table(self) -> None:
+        if not self._table_ready:
+            with self.db_engine.begin() as conn:
+                conn.execute(text("CREATE EXTENSION IF NOT EXISTS vector;"))
+                conn.execute(text(f"CREATE SCHEMA IF NOT EXISTS {self.schema};"))
+            self.table.create(self.db_engine, checkfirst=True)
+            self._table_ready = True
+
+    # ============================================================================
+    # Lookup
+    # ============================================================================
+    def _get(self, key: Optional[str] = None, embedding: Optional[List[float]] = None) -> Optional[CachedResearch]:
+        """Return the entry for `key`, or the entry most similar to `embedding` above the similarity threshold."""
+        columns = [c for c in self.table.c if c.name != "embedding"]
+        similarity = 1.0
+        try:
+            self._ensure_table()
+            with self.db_engine.begin() as conn:
+                if key is not None:
+                    row = conn.execute(
+                        select(*columns).where(self.table.c.key == key, self.table.c.expires_at > func.now())
+                    ).first()
+                else:
+                    # No ANN index: the TTL keeps the table small enough for an exact scan
+                    distance = self.table.c.embedding.cosine_distance(embedding).label("distance")
+                    row = conn.execute(
+                        select(*columns, distance)
+                        .where(
+                            self.table.c.expires_at > func.now(),
+                            self.table.c.embedder_id == self.embedder_id,
+                            self.table.c.embedding.is_not(None),
+                        )
+                        .order_by(distance)
+                        .limit(1)
+                    ).first()
+                    if row is not None:
+                        similarity = 1 - row.distance
+                        if similarity < self.similarity_threshold:
+                            return None
+                if row is None:
+                    return None
+                conn.execute(update(self.table).where(self.table.c.key == row.key).values(hits=self.table.c.hits + 1))
+        except SQLAlchemyError as e:
+            logger.warning(f"Research cache lookup failed: {e}")
+            return None
+        return CachedResearch(
+            key=row.key,
+            topic=row.topic,
+            research=row.research,
+            report=row.report,
+            research_seconds=row.research_seconds,
+            writer_seconds=row.writer_seconds,
+            similarity=similarity,
+        )
+
+    def _record(self, topic: str, cached: Optional[CachedResearch]) -> Optional[CachedResearch]:
+        with self._lock:
+            if cached is None:
+                self.stats.misses += 1
+            elif cached.key == self.cache_key(topic):
+                self.stats.exact_hits += 1
+            else:
+                self.stats.semantic_hits += 1
+        if cached is not None:
+            log_info(f"Research cache hit for '{topic}' (matched '{cached.topic}', similarity {cached.similarity:.3f})")
+        return cached
+
+    def lookup(self, topic: str) -> Tuple[Optional[CachedResearch], Optional[List[float]]]:
+        """
+        Return the cached result for `topic`, trying the exact key before the most similar cached topic, and the
+        embedding of `topic` if one was computed (to be passed on to `save_research()`).
+        """
+        cached = self._get(key=self.cache_key(topic))
+        embedding = None
+        if cached is None and self.embedder is not None:
+            embedding = self.embedder.get_embedding(normalize_topic(topic)) or None
+            cached = self._get(embedding=embedding) if embedding else None
+        return self._record(topic, cached), embedding
+
+    async def alookup(self, topic: str) -> Tuple[Optional[CachedResearch], Optional[List[float]]]:
+        cached = await asyncio.to_thread(self._get, self.cache_key(topic))
+        embedding = None
+        if cached is None and self.embedder is not None:
+            embedding = await self.embedder.async_get_embedding(normalize_topic(topic)) or None
+            cached = await asyncio.to_thread(self._get, None, embedding) if embedding else None
+        return self._record(topic, cached), embedding
+
+    def use_report(self, cached: CachedResearch) -> bool:
+        """Whether a hit can return the cached report, and records the latency it saves."""
+        with self._lock:
+            if self.mode == "full" and cached.report is not None:
+                self.stats.report_hits += 1
+                self.stats.saved_seconds += cached.research_seconds + (cached.writer_seconds or 0.0)
+                return True
+            self.stats.saved_seconds += cached.research_seconds
+            return False
+
+    # ============================================================================
+    # Write-through
+    # ============================================================================
+    def save_research(
+        self,
+        topic: str,
+        research: str,
+        research_seconds: float,
+        embedding: Optional[List[float]] = None,
+        run_id: Optional[str] = None,
+    ) -> None:
+        key = self.cache_key(topic)
+        row = {
+            "key": key,
+            "topic": topic,
+            "research": research,
+            "report": None,
+            "embedder_id": self.embedder_id if embedding is not None else None,
+            "embedding": embedding,
+            "research_seconds": research_seconds,
+            "writer_seconds": None,
+            "expires_at": func.now() + text(f"interval '{int(self.ttl)} seconds'"),
+        }
+        try:
+            self._ensure_table()
+            insert_stmt = postgresql.insert(self.table).values(row)
+            with self.db_engine.begin() as conn:
+                conn.execute(
+                    insert_stmt.on_conflict_do_update(
+                        index_elements=["key"],
+                        set_={**{k: v for k, v in row.items() if k != "key"}, "hits": 0, "created_at": func.now()},
+                    )
+                )
+        except SQLAlchemyError as e:
+            logger.warning(f"Research cache write failed: {e}")
+            return
+        if run_id is not None:
+            with self._lock:
+                self._pending[run_id] = (key, time.perf_counter())
+                # Runs whose writer failed never claim their entry
+                while len(self._pending) > 1024:
+                    self._pending.pop(next(iter(self._pending)))
+        log_debug(f"Cached research for '{topic}'")
+
+    def save_report(self, run_id: Optional[str], report: str) -> None:
+        """Attach the writer's report to the research cached earlier in the same run."""
+        with self._lock:
+            pending = self._pending.pop(run_id, None) if run_id is not None else None
+        if pending is None:
+            return
+        key, research_done_at = pending
+        try:
+            with self.db_engine.begin() as conn:
+                conn.execute(
+                    update(self.table)
+                    .where(self.table.c.key == key)
+                    .values(report=report, writer_seconds=time.perf_counter() - research_done_at)
+                )
+        except SQLAlchemyError as e:
+            logger.warning(f"Research cache write failed: {e}")
+
+    def prune(self) -> int:
+        """Delete expired entries."""
+        self._ensure_table()
+        with self.db_engine.begin() as conn:
+            deleted = conn.execute(delete(self.table).where(self.table.c.expires_at <= func.now())).rowcount or 0
+        log_debug(f"Pruned {deleted} rows from research cache")
+        return deleted
+
+
+if __name__ == "__main__":
+    import argparse
+    import json
+
+    from db.pool import get_engine
+
+    parser = argparse.ArgumentParser(description="Inspect the research workflow cache")
+    parser.add_argument("--lookup", help="Look up a request (exact match only)")
+    parser.add_argument("--prune", action="store_true", help="Delete expired entries")
+    args = parser.parse_args()
+
+    cache = ResearchCache(get_engine())
+    if args.prune:
+        print(f"Deleted {cache.prune()} expired entries")
+    if args.lookup:
+        cached, _ = cache.lookup(args.lookup)
+        if cached is None:
+            print("Miss")
+        else:
+            print(json.dumps({"topic": cached.topic, "has_report": cached.report is not None}, indent=2))
+            print(cached.report or cached.research)
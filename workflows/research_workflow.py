@@ -1,17 +1,61 @@
+import asyncio
+import time
+from dataclasses import dataclass, field
+from os import getenv
 from textwrap import dedent
-from typing import Dict, List, Optional
+from typing import AsyncIterator, Awaitable, Callable, Dict, List, Optional, Union
 
 from agno.agent import Agent
+from agno.knowledge.embedder.openai import OpenAIEmbedder
 from agno.models.openai import OpenAIChat
+from agno.run import RunContext
+from agno.run.agent import RunContentEvent, RunOutput
 from agno.tools.duckduckgo import DuckDuckGoTools
 from agno.tools.hackernews import HackerNewsTools
 from agno.tools.parallel import ParallelTools
 from agno.tools.reasoning import ReasoningTools
+from agno.utils.log import log_debug
 from agno.workflow import Step, Workflow
 from agno.workflow.parallel import Parallel
 from agno.workflow.step import StepInput, StepOutput
 
 from db.demo_db import demo_db
+from knowledge.embedding_cache import CachedEmbedder
+from workflows.compression import compress_research
+from workflows.quorum import BranchResult, QuorumPolicy, gather_quorum
+from workflows.research_cache import ResearchCache
+
+# "streaming" hands the writer the first researchers to finish, "parallel" waits for all of them
+RESEARCH_MODE = getenv("RESEARCH_MODE", "streaming")
+research_policy = QuorumPolicy(
+    quorum=int(getenv("RESEARCH_QUORUM", "2")),
+    deadline=float(getenv("RESEARCH_BRANCH_DEADLINE", "90")),
+    grace=float(getenv("RESEARCH_QUORUM_GRACE", "5")),
+)
+
+# Estimated tokens of research handed to the writer after deduplication, 0 for no limit
+RESEARCH_TOKEN_BUDGET = int(getenv("RESEARCH_TOKEN_BUDGET", "6000"))
+
+# Results of recent requests, reused for the same or a similar request. RESEARCH_CACHE_TTL=0 disables the cache
+RESEARCH_CACHE_TTL = float(getenv("RESEARCH_CACHE_TTL", "3600"))
+RESEARCH_CACHE_SIMILARITY = float(getenv("RESEARCH_CACHE_SIMILARITY", "0.92"))
+research_cache: Optional[ResearchCache] = (
+    ResearchCache(
+        demo_db.db_engine,
+        ttl=RESEARCH_CACHE_TTL,
+        mode=getenv("RESEARCH_CACHE_MODE", "full"),
+        embedder=CachedEmbedder(
+            embedder=OpenAIEmbedder(id="text-embedding-3-small"),
+            db_engine=demo_db.db_engine,
+            table_name="research_topic_embedding_cache",
+        )
+        if RESEARCH_CACHE_SIMILARITY > 0
+        else None,
+        similarity_threshold=RESEARCH_CACHE_SIMILARITY,
+    )
+    if RESEARCH_CACHE_TTL > 0
+    else None
+)
 
 # ============================================================================
 # Create Research Agents
@@ -96,7 +140,8 @@ writer = Agent(
         2. Identify key themes, insights, and important details.
         3. Structure the content logically with clear sections and sub-sections.
         4. Write in a clear, engaging style appropriate for the topic.
-        5. Include relevant citations and links from the research.
+        5. Include relevant citations and links from the research. Sources are cited as numbered references
+           like [3], with their URLs listed under "Sources" at the end of the research.
         6. Use reasoning tools to think through complex topics and structure the content.
         """),
     add_history_to_context=True,
@@ -105,6 +150,20 @@ writer = Agent(
 )
 
 
+def consolidate_research(sections: Dict[str, str], missing: Optional[List[str]] = None) -> str:
+    """Dedupe the citations and repeated paragraphs of the researchers and fit their research in the token budget"""
+    research, stats = compress_research(sections, token_budget=RESEARCH_TOKEN_BUDGET or None)
+    log_debug(
+        f"Consolidated research from {stats.input_tokens} to {stats.output_tokens} tokens: {stats.sources} sources, "
+        f"{stats.duplicate_blocks} duplicate paragraphs, {stats.trimmed_blocks} paragraphs over budget"
+    )
+    parts = ["Please use the following extracted research create a comprehensive report on the user's request. \n\n"]
+    parts.append(research)
+    if missing:
+        parts.append(f"\nSources not included: {', '.join(missing)}\n")
+    return "".join(parts)
+
+
 async def consolidate_research_step_function(input: StepInput) -> StepOutput:
     """Consolidate the research from the different agents"""
     # Get all previous step outputs
@@ -116,18 +175,115 @@ async def consolidate_research_step_function(input: StepInput) -> StepOutput:
     # Get the list of step outputs from the parallel step
     parallel_step_output_list: Optional[List[StepOutput]] = parallel_step_output.steps if parallel_step_output else None
     # Create the research content by combining the content of the different step outputs
-    research_content = (
-        "Please use the following extracted research create a comprehensive report on the user's request. \n\n"
-    )
     if parallel_step_output_list and len(parallel_step_output_list) > 0:
-        for step_output in parallel_step_output_list:
-            research_content += f"## {step_output.step_name} \n\n{step_output.content}\n\n"
-
+        research_content = consolidate_research(
+            {str(step_output.step_name): str(step_output.content) for step_output in parallel_step_output_list}
+        )
         return StepOutput(content=research_content, success=True)
 
     return StepOutput(content="No research content found", success=False)
 
 
+@dataclass
+class ResearchContext:
+    """Research handed to the writer, built one section at a time as the researchers finish."""
+
+    sections: Dict[str, str] = field(default_factory=dict)
+    missing: List[str] = field(default_factory=list)
+
+    def add(self, result: BranchResult) -> Optional[str]:
+        """Add a researcher's result, returning its section (None if the researcher failed or was skipped)."""
+        if not result.success or result.content is None:
+            self.missing.append(f"{result.name} ({result.error or 'no content'})")
+            return None
+        self.sections[result.name] = result.content
+        return f"## {result.name} \n\n{result.content}\n\n"
+
+    def render(self) -> str:
+        return consolidate_research(self.sections, self.missing)
+
+
+async def stream_research_step_function(
+    step_input: StepInput, run_context: Optional[RunContext] = None
+) -> AsyncIterator[Union[RunContentEvent, StepOutput]]:
+    """Run the researchers concurrently and consolidate their research as each one finishes"""
+    topic = step_input.get_input_as_string() or ""
+    session_id = run_context.session_id if run_context else None
+    user_id = run_context.user_id if run_context else None
+
+    embedding = None
+    if research_cache is not None:
+        cached, embedding = await research_cache.alookup(topic)
+        if cached is not None:
+            if research_cache.use_report(cached):
+                # Skip the writer as well: the cached report becomes the workflow output
+                yield StepOutput(content=cached.report, stop=True)
+            else:
+                yield StepOutput(content=cached.research)
+            return
+    started = time.perf_counter()
+    runs: Dict[str, RunOutput] = {}
+
+    def researcher_branch(name: str, agent: Agent) -> Callable[[], Awaitable[Optional[str]]]:
+        async def branch() -> Optional[str]:
+            response = await agent.arun(input=topic, session_id=session_id, user_id=user_id)
+            runs[name] = response
+            return response.content if isinstance(response.content, str) else None
+
+        return branch
+
+    agents = {step.name or str(step.agent.name): step.agent for step in researcher_steps if step.agent}
+    branches = {name: researcher_branch(name, agent) for name, agent in agents.items()}
+    context = ResearchContext()
+    results: List[BranchResult] = []
+    async for result in gather_quorum(branches, research_policy):
+        results.append(result)
+        section = context.add(result)
+        if section is not None:
+            yield RunContentEvent(content=section)
+
+    # One nested output per researcher, as the Parallel step records them, so the workflow run keeps their answers.
+    # The researchers' full runs are stored in their own sessions, under the session id of the workflow.
+    steps = [researcher_output(result, agents[result.name], runs.get(result.name)) for result in results]
+    if not context.sections:
+        yield StepOutput(content="No research content found", success=False, steps=steps)
+        return
+    research = context.render()
+    if research_cache is not None:
+        await asyncio.to_thread(
+            research_cache.save_research,
+            topic,
+            research,
+            time.perf_counter() - started,
+            embedding,
+            run_context.run_id if run_context else None,
+        )
+    yield StepOutput(content=research, success=True, steps=steps)
+
+
+def researcher_output(result: BranchResult, agent: Agent, run: Optional[RunOutput]) -> StepOutput:
+    """Step output of a researcher run by the streaming research step"""
+    return StepOutput(
+        step_name=result.name,
+        step_type="Step",
+        executor_type="agent",
+        executor_name=agent.name,
+        content=result.content,
+        step_run_id=run.run_id if run else None,
+        metrics=run.metrics if run else None,
+        success=result.success,
+        error=result.error,
+    )
+
+
+def cache_report_step_function(step_input: StepInput, run_context: Optional[RunContext] = None) -> StepOutput:
+    """Store the writer's report with the research it was written from, and pass it on unchanged"""
+    report = step_input.previous_step_content
+    if research_cache is not None and run_context is not None and isinstance(report, str):
+        research_cache.save_report(run_context.run_id, report)
+    return StepOutput(content=report)
+
+
 # ============================================================================
 # Create Workflow Steps
 # ============================================================================
@@ -150,6 +306,16 @@ research_consolidation_step = Step(
     executor=consolidate_research_step_function,
 )
 
+streaming_research_step = Step(
+    name="Research Phase",
+    executor=stream_research_step_function,
+)
+
+cache_report_step = Step(
+    name="Cache Report",
+    executor=cache_report_step_function,
+)
+
 writer_step = Step(
     name="Writer",
     agent=writer,
@@ -164,7 +330,9 @@ research_workflow = Workflow(
         A parallel workflow that researches information from multiple sources simultaneously,
         then synthesizes and reviews the information for publication.
         """),
-    steps=[
+    steps=[streaming_research_step, writer_step, cache_report_step]
+    if RESEARCH_MODE == "streaming"
+    else [
         Parallel(*researcher_steps, name="Research Phase"),  # type: ignore
         research_consolidation_step,
         writer_step,